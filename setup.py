@@ -54,6 +54,16 @@ class CMakeBuild(build_ext):
         if "CMAKE_ARGS" in os.environ:
             cmake_args += [item for item in os.environ["CMAKE_ARGS"].split(" ") if item]
 
+        # The width of the observable masks (a multiple of 64). Graphs with more observables than this are decoded
+        # with a much slower method, so wheels for graphs with many observables can be built with wider masks.
+        if "PYMATCHING_OBS_INT_BITS" in os.environ:
+            obs_int_bits = os.environ["PYMATCHING_OBS_INT_BITS"]
+            if not obs_int_bits.isdigit() or int(obs_int_bits) == 0 or int(obs_int_bits) % 64 != 0:
+                raise ValueError(
+                    f"PYMATCHING_OBS_INT_BITS must be a positive multiple of 64, but got '{obs_int_bits}'."
+                )
+            cmake_args += [f"-DPYMATCHING_OBS_INT_BITS={obs_int_bits}"]
+
         # # In this example, we pass in the version to C++. You might not need to.
         # cmake_args += [f"-DPYMATCHING_VERSION_INFO={self.distribution.get_version()}"]
 
@@ -12,19 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Union, List, TYPE_CHECKING, Tuple, Set, Dict, Optional
+from typing import Union, List, TYPE_CHECKING, Tuple, Set, Dict, Optional, Iterable, Iterator
+import collections
+import concurrent.futures
+import mmap as _mmap
+import os
+import sys
 import warnings
 from pathlib import Path
 
 import numpy as np
 import pymatching
-import networkx as nx
-from scipy.sparse import csc_matrix, spmatrix
-import matplotlib.cbook
 
+# networkx, scipy and matplotlib are slow to import, so they are only imported by the methods that use them, and
+# `import pymatching` does not import them.
 if TYPE_CHECKING:
     import stim  # pragma: no cover
     import rustworkx as rx  # pragma: no cover
+    import networkx as nx  # pragma: no cover
+    from scipy.sparse import csc_matrix, csr_matrix, spmatrix  # pragma: no cover
 
 import pymatching._cpp_pymatching as _cpp_pm
 
@@ -36,11 +42,21 @@ class Matching:
     methods. Alternatively, it can be loaded from a parity check matrix (a `scipy.sparse` matrix or `numpy.ndarray`
     with one or two non-zero elements in each column), a NetworkX or rustworkx graph, or from
     a `stim.DetectorErrorModel`.
+
+    `Matching` objects can be pickled (e.g. to send them to `multiprocessing` or
+    `concurrent.futures.ProcessPoolExecutor` workers). The graph is pickled using a compact binary encoding, and the
+    decoder is compiled again in the process that unpickles it.
+
+    A `Matching` object can be shared between threads. Calls made on the same object from different threads (e.g.
+    to `Matching.decode`, `Matching.decode_batch`, or while iterating over `Matching.decode_stream`) are run one at
+    a time, each waiting for the previous call to finish, so they do not decode in parallel. To decode a batch of
+    shots in parallel, use the `num_threads` argument of `Matching.decode_batch`, or give each thread its own
+    `Matching` object.
     """
 
     def __init__(self,
-                 graph: Union[csc_matrix, np.ndarray, "rx.PyGraph", nx.Graph, List[
-                     List[int]], 'stim.DetectorErrorModel', spmatrix] = None,
+                 graph: Union["csc_matrix", np.ndarray, "rx.PyGraph", "nx.Graph", List[
+                     List[int]], 'stim.DetectorErrorModel', "spmatrix"] = None,
                  weights: Union[float, np.ndarray, List[float]] = None,
                  error_probabilities: Union[float, np.ndarray, List[float]] = None,
                  repetitions: int = None,
@@ -144,31 +160,29 @@ class Matching:
             if graph is None:
                 return
             del kwargs["H"]
+        # A graph can only be an instance of a networkx, rustworkx or stim type if that module has already been
+        # imported, so there is no need to import these modules here.
         # Networkx graph
-        if isinstance(graph, nx.Graph):
+        nx = sys.modules.get("networkx")
+        if nx is not None and isinstance(graph, nx.Graph):
             self.load_from_networkx(graph)
             return
         # Rustworkx PyGraph
-        try:
-            import rustworkx as rx
-            if isinstance(graph, rx.PyGraph):
-                self.load_from_rustworkx(graph)
-                return
-        except ImportError:  # pragma no cover
-            pass
+        rx = sys.modules.get("rustworkx")
+        if rx is not None and isinstance(graph, rx.PyGraph):
+            self.load_from_rustworkx(graph)
+            return
         # stim.DetectorErrorModel
-        try:
-            import stim
+        stim = sys.modules.get("stim")
+        if stim is not None:
             if isinstance(graph, stim.DetectorErrorModel):
                 self._load_from_detector_error_model(graph, enable_correlations=enable_correlations)
                 return
             elif isinstance(graph, stim.Circuit):
-                self.from_stim_circuit
                 self._load_from_detector_error_model(graph.detector_error_model(decompose_errors=True), enable_correlations=enable_correlations)
                 return
-        except ImportError:  # pragma no cover
-            pass
         # scipy.csc_matrix
+        from scipy.sparse import csc_matrix
         try:
             graph = csc_matrix(graph)
         except TypeError:
@@ -220,11 +234,19 @@ class Matching:
                *,
                return_weight: bool = False,
                enable_correlations: bool = False,
+               erased_edges: Union[np.ndarray, List[int], None] = None,
                **kwargs
                ) -> Union[np.ndarray, Tuple[np.ndarray, int]]:
         r"""
         Decode the syndrome `z` using minimum-weight perfect matching
 
+        The fault IDs crossed by each edge are stored as a fixed-width bit mask, which is 64 bits wide in the
+        published wheels. If the graph has more fault IDs than fit in the mask (more than 64, by default), the
+        correction is instead found by extracting the path of each matched edge with a search graph, which is much
+        slower. PyMatching can be built from source with wider masks, for graphs with up to e.g. 256 fault IDs, by
+        setting the `PYMATCHING_OBS_INT_BITS` environment variable to a multiple of 64 when installing it, e.g.
+        `PYMATCHING_OBS_INT_BITS=256 pip install pymatching --no-binary pymatching`.
+
         Parameters
         ----------
         z : numpy.ndarray
@@ -254,6 +276,11 @@ class Matching:
             `stim.DetectorErrorModel` with `enable_correlations=True`. For a description
             of the correlated matching algorithm, see https://arxiv.org/abs/1310.0863.
             By default, False
+        erased_edges: np.ndarray or list[int], optional
+            The indices of edges that are known to have been erased (e.g. heralded by leakage detection or atom
+            loss), in the order given by `Matching.edges_array` (and `Matching.edges`). An erased edge has an error
+            with probability 1/2, so its weight is set to zero while decoding `z`. Edges with negative weights cannot
+            be erased. By default, None (no erasures)
 
         Returns
         -------
@@ -335,10 +362,22 @@ class Matching:
         >>> syndrome[:,1:] = syndrome[:,:-1] ^ syndrome[:,1:]
         >>> m.decode(syndrome)
         array([0, 0, 1, 0], dtype=uint8)
+
+        Erased edges are given a weight of zero:
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, fault_ids={0}, weight=2)
+        >>> m.add_edge(1, 2, fault_ids={1}, weight=1)
+        >>> m.add_edge(2, 0, fault_ids={2}, weight=2)
+        >>> m.decode([1, 1, 0])
+        array([1, 0, 0], dtype=uint8)
+        >>> m.decode([1, 1, 0], erased_edges=[1, 2])
+        array([0, 1, 1], dtype=uint8)
         """
         detection_events = self._syndrome_array_to_detection_events(z)
         correction, weight = self._matching_graph.decode(
-            detection_events, enable_correlations=enable_correlations
+            detection_events,
+            enable_correlations=enable_correlations,
+            erased_edges=np.zeros(0, dtype=np.int64) if erased_edges is None else erased_edges
         )
         if return_weight:
             return correction, weight
@@ -352,7 +391,11 @@ class Matching:
             return_weights: bool = False,
             bit_packed_shots: bool = False,
             bit_packed_predictions: bool = False,
-            enable_correlations: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+            enable_correlations: bool = False,
+            num_threads: int = 1,
+            weight_overrides: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+            erasures: Union[Tuple[np.ndarray, np.ndarray], List[List[int]], np.ndarray, "spmatrix", None] = None
+    ) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
         """
         Decode from a 2D `shots` array containing a batch of syndrome measurements. A faster
         alternative to using `pymatching.Matching.decode` and iterating over the shots in Python.
@@ -396,6 +439,35 @@ class Matching:
             `stim.DetectorErrorModel` with `enable_correlations=True`. For a description
             of the correlated matching algorithm, see https://arxiv.org/abs/1310.0863.
             By default, False
+        num_threads : int
+            The number of threads to use for decoding. The shots are split into `num_threads` contiguous
+            blocks, each of which is decoded on its own thread (with the GIL released) using its own decoder
+            state, while the edges of the graph are shared between the threads. The predictions and weights
+            returned are identical to (and in the same order as) those returned when `num_threads==1`. Must be
+            at least 1. By default, 1
+        weight_overrides : tuple[np.ndarray, np.ndarray, np.ndarray], optional
+            Edge weights to use in place of those of the graph for individual shots (e.g. weights derived from soft
+            measurement information), given as a tuple `(shot_indptr, edge_indices, weights)` in compressed sparse row
+            format: while decoding shot `i`, the weight of edge ``edge_indices[k]`` is set to ``weights[k]``, for each
+            `k` in ``range(shot_indptr[i], shot_indptr[i+1])``. `shot_indptr` must therefore have length
+            `num_shots + 1`. Edges are indexed in the order of `pymatching.Matching.edges_array` (which is also the
+            order of `pymatching.Matching.edges`). The weights of the graph are restored after each shot, and the cost
+            of applying the overrides is proportional to the number of overridden edges in the shot, rather than the
+            size of the graph. Override weights must be non-negative, and edges that have a negative weight cannot be
+            overridden. Since weights are stored as integers in the decoder, override weights larger than the
+            largest absolute edge weight in the graph (or than `2**24-1`, if all the edge weights are integers) are
+            clamped to it, and an override weight of `np.inf` therefore gives an edge the largest weight possible.
+            By default, None (no overrides)
+        erasures : tuple[np.ndarray, np.ndarray] or list[list[int]] or np.ndarray or scipy.sparse.spmatrix, optional
+            The edges that are known to have been erased in each shot (e.g. heralded by leakage detection or atom
+            loss), which are given a weight of zero while decoding the shot. Either a tuple `(shot_indptr,
+            edge_indices)` in compressed sparse row format, such that the erased edges of shot `i` are
+            ``edge_indices[shot_indptr[i]:shot_indptr[i+1]]``, a list containing a list of erased edges for each
+            shot, or a 2D numpy array or `scipy.sparse` matrix of shape `(num_shots, self.num_edges)` where a
+            non-zero element `(i, j)` indicates that edge `j` is erased in shot `i`. Edges are indexed as for
+            `weight_overrides` (which are applied first), and edges with negative weights cannot be erased. Erasures
+            of error mechanisms tagged in a `stim.DetectorErrorModel` can be converted to erased edges using
+            `pymatching.Matching.erasure_matrix`. By default, None (no erasures)
 
         Returns
         -------
@@ -405,7 +477,7 @@ class Matching:
             fault id `j` was flipped in the shot `i`.
         weights: np.ndarray
             The weights of the MWPM solutions, a numpy array of `dtype=float`. `weights[i]` is the weight of the
-            MWPM solution in shot `i`.
+            MWPM solution in shot `i` (computed using its override weights, if any).
 
         Examples
         --------
@@ -447,18 +519,513 @@ class Matching:
         >>> predicted_observables.shape
         (10000, 1)
         >>> num_errors = np.sum(np.any(predicted_observables != actual_observables, axis=1))
+
+        Large batches can be decoded using multiple threads:
+        >>> predicted_observables = matching.decode_batch(
+        ...     syndrome, bit_packed_shots=True, bit_packed_predictions=True, num_threads=4
+        ... )
+        >>> predicted_observables.shape
+        (10000, 1)
+
+        The weights of some edges can be changed for individual shots:
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, fault_ids={0}, weight=2)
+        >>> m.add_edge(1, 2, fault_ids={1}, weight=1)
+        >>> m.add_edge(2, 0, fault_ids={2}, weight=2)
+        >>> shots = np.array([[1, 1, 0], [1, 1, 0]], dtype=np.uint8)
+        >>> m.decode_batch(shots, weight_overrides=([0, 0, 1], [0], [4.0]))
+        array([[1, 0, 0],
+               [0, 1, 1]], dtype=uint8)
+        >>> m.decode_batch(shots, erasures=[[], [1, 2]])
+        array([[1, 0, 0],
+               [0, 1, 1]], dtype=uint8)
         """
+        if isinstance(erasures, np.ndarray):
+            if erasures.ndim != 2:
+                raise ValueError("`erasures` must be a 2D array of shape (num_shots, num_edges).")
+            shots_with_erasures, edge_indices = np.nonzero(erasures)
+            shot_indptr = np.zeros(erasures.shape[0] + 1, dtype=np.int64)
+            np.cumsum(np.bincount(shots_with_erasures, minlength=erasures.shape[0]), out=shot_indptr[1:])
+            erasures = (shot_indptr, edge_indices)
+        elif erasures is not None and not isinstance(erasures, tuple):
+            edge_indices, shot_indptr = _to_csr_indices(erasures)
+            erasures = (shot_indptr, edge_indices)
         predictions, weights = self._matching_graph.decode_batch(
             shots,
             bit_packed_predictions=bit_packed_predictions,
             bit_packed_shots=bit_packed_shots,
-            enable_correlations=enable_correlations
+            enable_correlations=enable_correlations,
+            num_threads=num_threads,
+            weight_overrides=weight_overrides,
+            erasures=erasures
+        )
+        if return_weights:
+            return predictions, weights
+        else:
+            return predictions
+
+    def decode_batch_sparse(
+            self,
+            indices: Union[np.ndarray, List[np.ndarray], List[List[int]], "spmatrix"],
+            indptr: Optional[np.ndarray] = None,
+            *,
+            return_weights: bool = False,
+            bit_packed_predictions: bool = False,
+            enable_correlations: bool = False,
+            num_threads: int = 1) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode a batch of shots given as the indices of their detection events, rather than as a dense array.
+        When detection events are sparse (e.g. at low physical error rates), this is faster than
+        `pymatching.Matching.decode_batch`, which must scan every detector of every shot to find the
+        detection events.
+
+        The shots can be given in compressed sparse row (CSR) format, as a pair `(indices, indptr)`, where the
+        detection events of shot `i` are ``indices[indptr[i]:indptr[i+1]]``. Alternatively, `indices` can be a list
+        containing one array (or list) of detection event indices per shot, or a `scipy.sparse` matrix with one row
+        per shot, in which case `indptr` must not be given.
+
+        Parameters
+        ----------
+        indices : np.ndarray or list[np.ndarray] or scipy.sparse.spmatrix
+            If `indptr` is given, a 1D integer array containing the detection events of all the shots, concatenated.
+            Otherwise, either a list of 1D integer arrays, where `indices[i]` contains the detection events of shot
+            `i`, or a `scipy.sparse` matrix of shape `(num_shots, syndrome_length)`, where a non-zero element
+            `(i, j)` indicates that there is a detection event at detector `j` in shot `i`. The detection events of
+            a shot do not need to be sorted, and a detection event that appears twice in the same shot cancels out.
+        indptr : np.ndarray, optional
+            A 1D integer array of length `num_shots + 1` such that the detection events of shot `i` are
+            ``indices[indptr[i]:indptr[i+1]]``.
+        return_weights : bool
+            If True, then also return a numpy array containing the weights of the solutions for all the shots.
+            By default, False.
+        bit_packed_predictions : bool
+            Set to `True` if the returned predictions should be bit-packed, with the bit for fault id `m` in
+            shot `s` in ``(obs[s, m // 8] >> (m % 8)) & 1``
+        enable_correlations : bool
+            If `enable_correlations==True`, two-pass correlated matching is used for decoding (see
+            `pymatching.Matching.decode_batch`). By default, False
+        num_threads : int
+            The number of threads to use for decoding (see `pymatching.Matching.decode_batch`). By default, 1
+
+        Returns
+        -------
+        predictions: np.ndarray
+            The batch of predictions output by the decoder, in the same format as returned by
+            `pymatching.Matching.decode_batch`.
+        weights: np.ndarray
+            The weights of the MWPM solutions, a numpy array of `dtype=float`. Only returned if
+            `return_weights==True`.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import pymatching
+        >>> matching = pymatching.Matching()
+        >>> matching.add_edge(0, 1, fault_ids={0})
+        >>> matching.add_edge(1, 2, fault_ids={1})
+        >>> matching.add_edge(2, 3, fault_ids={2})
+        >>> matching.add_boundary_edge(3, fault_ids={3})
+        >>> matching.decode_batch_sparse([[0, 1], [], [2]])
+        array([[1, 0, 0, 0],
+               [0, 0, 0, 0],
+               [0, 0, 1, 1]], dtype=uint8)
+        >>> matching.decode_batch_sparse(np.array([0, 1, 2]), np.array([0, 2, 2, 3]))
+        array([[1, 0, 0, 0],
+               [0, 0, 0, 0],
+               [0, 0, 1, 1]], dtype=uint8)
+        """
+        if indptr is None:
+            indices, indptr = _to_csr_indices(indices)
+        predictions, weights = self._matching_graph.decode_batch_sparse(
+            indices,
+            indptr,
+            bit_packed_predictions=bit_packed_predictions,
+            enable_correlations=enable_correlations,
+            num_threads=num_threads
+        )
+        if return_weights:
+            return predictions, weights
+        else:
+            return predictions
+
+    def decode_batch_sliding_window(
+            self,
+            shots: np.ndarray,
+            detector_times: Union[np.ndarray, List[float]],
+            commit_duration: float,
+            buffer_duration: float,
+            *,
+            return_weights: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode a batch of shots using a sliding window, rather than matching each whole shot at once. This is
+        intended for long memory experiments, where each detector has a time coordinate (e.g. the round in which
+        it is measured), and reduces the size of the graph that must be matched at once from the whole experiment
+        to a single window.
+
+        The detectors are divided into a sequence of windows, each containing the detectors in a commit region
+        of duration `commit_duration`, followed by a buffer region of duration `buffer_duration`. Each window starts
+        where the commit region of the previous window ends, and edges from a window to later detectors are
+        treated as boundary edges. After a window is decoded, the edges of its solution that start in its commit
+        region are committed to the prediction, and any detection events they leave at later detectors are carried
+        forward into the next window. Windows with identical subgraphs share the same decoder.
+
+        When the buffer is long enough that every window contains the whole graph, this gives the same
+        predictions as `pymatching.Matching.decode_batch`. Shorter buffers use less memory and time per window, at
+        the cost of (usually slightly) less accurate predictions.
+
+        Parameters
+        ----------
+        shots : np.ndarray
+            A binary numpy array of dtype `np.uint8` with shape `(num_shots, syndrome_length)`, in the same format
+            as the (non bit-packed) `shots` of `pymatching.Matching.decode_batch`.
+        detector_times : np.ndarray or list[float]
+            The time coordinate of each node of the matching graph, with length `num_nodes`. The times given for
+            boundary nodes are ignored. For a graph loaded from a stim detector error model, this can be the last
+            coordinate of each detector (see the example below).
+        commit_duration : float
+            The duration of the commit region of each window, which must be positive.
+        buffer_duration : float
+            The duration of the buffer region of each window, which must be non-negative.
+        return_weights : bool
+            If True, then also return a numpy array containing the total weight of the committed edges for each
+            shot. By default, False.
+
+        Returns
+        -------
+        predictions: np.ndarray
+            The batch of predictions output by the decoder, a binary numpy array of dtype `np.uint8` with shape
+            `(num_shots, self.num_fault_ids)`.
+        weights: np.ndarray
+            The total weights of the committed edges, a numpy array of `dtype=float`. Only returned if
+            `return_weights==True`.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import stim
+        >>> import pymatching
+        >>> circuit = stim.Circuit.generated("surface_code:rotated_memory_x", distance=3, rounds=20,
+        ...                                  after_clifford_depolarization=0.005)
+        >>> model = circuit.detector_error_model(decompose_errors=True)
+        >>> matching = pymatching.Matching.from_detector_error_model(model)
+        >>> times = np.array([c[-1] for c in model.get_detector_coordinates().values()])
+        >>> sampler = circuit.compile_detector_sampler(seed=0)
+        >>> syndrome, actual_observables = sampler.sample(shots=1000, separate_observables=True)
+        >>> predictions = matching.decode_batch_sliding_window(syndrome, times, commit_duration=3,
+        ...                                                    buffer_duration=3)
+        >>> predictions.shape
+        (1000, 1)
+        >>> num_errors = np.sum(np.any(predictions != actual_observables, axis=1))
+        >>> print(num_errors < 100)
+        True
+        """
+        shots = np.asarray(shots, dtype=np.uint8)
+        detector_times = np.asarray(detector_times, dtype=np.float64)
+        predictions, weights = self._matching_graph.decode_batch_sliding_window(
+            shots,
+            detector_times,
+            commit_duration,
+            buffer_duration
+        )
+        if return_weights:
+            return predictions, weights
+        else:
+            return predictions
+
+    def decode_batch_parallel_window(
+            self,
+            shots: np.ndarray,
+            detector_times: Union[np.ndarray, List[float]],
+            commit_duration: float,
+            buffer_duration: float,
+            *,
+            num_threads: int = 1,
+            return_weights: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode a batch of shots using parallel windows, where the windows of each shot are decoded concurrently
+        using `num_threads` threads. Unlike `pymatching.Matching.decode_batch` (which decodes different shots on
+        different threads), this reduces the time taken to decode each individual shot of a long memory
+        experiment, by splitting it into windows along the time coordinates of the detectors.
+
+        The detectors are divided into alternating slabs: commit slabs of duration `commit_duration`, separated
+        by gap slabs of duration `buffer_duration`. In the first layer, each commit slab is decoded together
+        with the gap slab on either side of it, treating edges that leave the window as boundary edges, and
+        the edges of its solution that touch the commit slab are committed. In the second layer, each gap
+        slab is decoded on its own, resolving the detection events left in it by the first layer. The windows in
+        each layer are independent, and are decoded concurrently.
+
+        The threads are started once for the whole batch. If the batch has at least `num_threads` shots, each
+        thread decodes a block of whole shots (the windows of each shot in turn) instead, which gives the same
+        predictions while only synchronizing the threads once per batch rather than once per layer of each shot.
+
+        The buffer duration must be at least the time spanned by any edge, and the detection events in each gap
+        slab must be able to be matched within it (for example, to the spatial boundary of a surface code).
+
+        Parameters
+        ----------
+        shots : np.ndarray
+            A binary numpy array of dtype `np.uint8` with shape `(num_shots, syndrome_length)`, in the same format
+            as the (non bit-packed) `shots` of `pymatching.Matching.decode_batch`.
+        detector_times : np.ndarray or list[float]
+            The time coordinate of each node of the matching graph (see
+            `pymatching.Matching.decode_batch_sliding_window`).
+        commit_duration : float
+            The duration of each commit slab, which must be positive.
+        buffer_duration : float
+            The duration of each gap slab, which must be non-negative.
+        num_threads : int
+            The number of threads used to decode the windows of each shot (or, for a batch with at least
+            `num_threads` shots, the shots of the batch). By default, 1
+        return_weights : bool
+            If True, then also return a numpy array containing the total weight of the committed edges for each
+            shot. By default, False.
+
+        Returns
+        -------
+        predictions: np.ndarray
+            The batch of predictions output by the decoder, a binary numpy array of dtype `np.uint8` with shape
+            `(num_shots, self.num_fault_ids)`.
+        weights: np.ndarray
+            The total weights of the committed edges, a numpy array of `dtype=float`. Only returned if
+            `return_weights==True`.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import stim
+        >>> import pymatching
+        >>> circuit = stim.Circuit.generated("surface_code:rotated_memory_x", distance=3, rounds=50,
+        ...                                  after_clifford_depolarization=0.005)
+        >>> model = circuit.detector_error_model(decompose_errors=True)
+        >>> matching = pymatching.Matching.from_detector_error_model(model)
+        >>> times = np.array([c[-1] for c in model.get_detector_coordinates().values()])
+        >>> sampler = circuit.compile_detector_sampler(seed=0)
+        >>> syndrome, actual_observables = sampler.sample(shots=1000, separate_observables=True)
+        >>> predictions = matching.decode_batch_parallel_window(syndrome, times, commit_duration=6,
+        ...                                                     buffer_duration=4, num_threads=2)
+        >>> predictions.shape
+        (1000, 1)
+        >>> num_differences = np.sum(np.any(predictions != matching.decode_batch(syndrome), axis=1))
+        >>> print(num_differences < 50)
+        True
+        """
+        shots = np.asarray(shots, dtype=np.uint8)
+        detector_times = np.asarray(detector_times, dtype=np.float64)
+        predictions, weights = self._matching_graph.decode_batch_parallel_window(
+            shots,
+            detector_times,
+            commit_duration,
+            buffer_duration,
+            num_threads=num_threads
+        )
+        if return_weights:
+            return predictions, weights
+        else:
+            return predictions
+
+    @staticmethod
+    def decode_batch_sliding_window_from_detector_error_model(
+            model: 'stim.DetectorErrorModel',
+            shots: np.ndarray,
+            commit_duration: float,
+            buffer_duration: float,
+            *,
+            return_weights: bool = False) -> Union[np.ndarray, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Decode a batch of shots from a `stim.DetectorErrorModel` using a sliding window (see
+        `pymatching.Matching.decode_batch_sliding_window`), without loading the full matching graph of the model.
+
+        If the model contains a long REPEAT block (as in a memory experiment with many rounds), only a few
+        repetitions of the block are converted into a matching graph, and the neighbours, weights and fault ids of
+        the remaining repetitions are found by translating those of the middle repetition. The memory used by the
+        graph, and the time taken to load it, then scale with the size of a single round rather than with the
+        number of rounds. The predictions are the same as those of `pymatching.Matching.decode_batch_sliding_window`
+        for the `pymatching.Matching` loaded from the same model. The time coordinate of each detector is the last
+        of its coordinates in the model, so every detector must have coordinates.
+
+        Parameters
+        ----------
+        model : stim.DetectorErrorModel
+            A stim DetectorErrorModel, with all error mechanisms either graphlike, or decomposed into graphlike
+            error mechanisms
+        shots : np.ndarray
+            A binary numpy array of dtype `np.uint8` with shape `(num_shots, model.num_detectors)`.
+        commit_duration : float
+            The duration of the commit region of each window, which must be positive.
+        buffer_duration : float
+            The duration of the buffer region of each window, which must be non-negative.
+        return_weights : bool
+            If True, then also return a numpy array containing the total weight of the committed edges for each
+            shot. By default, False.
+
+        Returns
+        -------
+        predictions: np.ndarray
+            The batch of predictions output by the decoder, a binary numpy array of dtype `np.uint8` with shape
+            `(num_shots, model.num_observables)`.
+        weights: np.ndarray
+            The total weights of the committed edges, a numpy array of `dtype=float`. Only returned if
+            `return_weights==True`.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import stim
+        >>> import pymatching
+        >>> circuit = stim.Circuit.generated("surface_code:rotated_memory_x", distance=3, rounds=1000,
+        ...                                  after_clifford_depolarization=0.002)
+        >>> model = circuit.detector_error_model(decompose_errors=True)
+        >>> sampler = circuit.compile_detector_sampler(seed=0)
+        >>> syndrome, actual_observables = sampler.sample(shots=100, separate_observables=True)
+        >>> predictions = pymatching.Matching.decode_batch_sliding_window_from_detector_error_model(
+        ...     model, syndrome, commit_duration=3, buffer_duration=3)
+        >>> predictions.shape
+        (100, 1)
+        """
+        shots = np.asarray(shots, dtype=np.uint8)
+        predictions, weights = _cpp_pm.decode_batch_sliding_window_from_detector_error_model(
+            str(model),
+            shots,
+            commit_duration,
+            buffer_duration
         )
         if return_weights:
             return predictions, weights
         else:
             return predictions
 
+    def decode_stream(
+            self,
+            shots: Union[Iterable[np.ndarray], "stim.CompiledDetectorSampler"],
+            *,
+            num_shots: Optional[int] = None,
+            chunk_size: int = 1024,
+            max_chunks_in_flight: int = 2,
+            return_weights: bool = False,
+            bit_packed_shots: bool = False,
+            bit_packed_predictions: bool = False,
+            enable_correlations: bool = False,
+            num_threads: int = 1) -> Iterator[Union[np.ndarray, Tuple[np.ndarray, ...]]]:
+        """
+        Decode a stream of chunks of shots, yielding the predictions for each chunk as soon as it has been decoded.
+        Unlike `pymatching.Matching.decode_batch`, the shots do not all need to be held in memory at once, so
+        this can be used to decode an arbitrarily large number of shots using a fixed amount of memory.
+
+        Each chunk is decoded on a background thread (with the GIL released), so decoding a chunk overlaps with
+        producing the next chunk (e.g. sampling it, or reading it from disk) and with consuming the predictions of
+        the previous chunk. At most `max_chunks_in_flight` chunks are being decoded, or waiting to be decoded or
+        yielded, at any one time. Other methods of the `Matching` object can be called while iterating over the
+        stream, and wait for the chunk being decoded (if any) to finish.
+
+        Parameters
+        ----------
+        shots : Iterable[np.ndarray] or stim.CompiledDetectorSampler
+            Either an iterable of 2D numpy arrays, each of which is a chunk of shots in the format accepted by
+            `pymatching.Matching.decode_batch`, or a `stim.CompiledDetectorSampler`, in which case `num_shots` shots
+            are sampled from it in chunks of `chunk_size` shots.
+        num_shots : int, optional
+            The total number of shots to sample. Required if `shots` is a `stim.CompiledDetectorSampler`, and must
+            not be given otherwise.
+        chunk_size : int
+            The number of shots in each chunk sampled from a `stim.CompiledDetectorSampler`. Ignored if `shots` is
+            an iterable of arrays. By default, 1024
+        max_chunks_in_flight : int
+            The maximum number of chunks that can be decoded, or waiting to be decoded or yielded, at any one time.
+            Must be at least 1. By default, 2
+        return_weights : bool
+            If True, then also yield the weights of the solutions for each chunk. By default, False.
+        bit_packed_shots : bool
+            Set to `True` if the chunks of shots are bit-packed (see `pymatching.Matching.decode_batch`). If `shots`
+            is a `stim.CompiledDetectorSampler`, then the shots (and the actual observables) are sampled bit-packed.
+            By default, False.
+        bit_packed_predictions : bool
+            Set to `True` if the yielded predictions should be bit-packed. By default, False.
+        enable_correlations : bool
+            If `enable_correlations==True`, two-pass correlated matching is used for decoding (see
+            `pymatching.Matching.decode_batch`). By default, False
+        num_threads : int
+            The number of threads used to decode each chunk (see `pymatching.Matching.decode_batch`). By default, 1
+
+        Yields
+        ------
+        predictions: np.ndarray
+            The predictions for each chunk, in the same order as the chunks, in the format returned by
+            `pymatching.Matching.decode_batch`.
+        actual_observables: np.ndarray
+            Only yielded if `shots` is a `stim.CompiledDetectorSampler`, in which case each item yielded is a tuple
+            `(predictions, actual_observables)`, where `actual_observables` are the observable flips sampled
+            alongside the chunk of shots.
+        weights: np.ndarray
+            Only yielded if `return_weights==True`, in which case the weights of the solutions in the chunk are
+            the last element of the tuple yielded for each chunk.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import pymatching
+        >>> import stim
+        >>> circuit = stim.Circuit.generated("surface_code:rotated_memory_x",
+        ...                                  distance=5,
+        ...                                  rounds=5,
+        ...                                  after_clifford_depolarization=0.005)
+        >>> model = circuit.detector_error_model(decompose_errors=True)
+        >>> matching = pymatching.Matching.from_detector_error_model(model)
+        >>> sampler = circuit.compile_detector_sampler()
+        >>> num_errors = 0
+        >>> for predicted, actual in matching.decode_stream(sampler, num_shots=10000, chunk_size=1000):
+        ...     num_errors += np.sum(np.any(predicted != actual, axis=1))
+
+        Any iterable of chunks of shots can be decoded, such as a generator reading chunks from a file:
+        >>> def chunks():
+        ...     for _ in range(10):
+        ...         yield sampler.sample(shots=1000)
+        >>> num_shots = 0
+        >>> for predicted in matching.decode_stream(chunks()):
+        ...     num_shots += predicted.shape[0]
+        >>> num_shots
+        10000
+        """
+        if max_chunks_in_flight < 1:
+            raise ValueError("`max_chunks_in_flight` must be at least 1.")
+        from_sampler = hasattr(shots, "sample")
+        if from_sampler:
+            if num_shots is None:
+                raise ValueError("`num_shots` must be given when `shots` is a `stim.CompiledDetectorSampler`.")
+            if chunk_size < 1:
+                raise ValueError("`chunk_size` must be at least 1.")
+            chunks = _sample_in_chunks(shots, num_shots, chunk_size, bit_packed_shots)
+        else:
+            if num_shots is not None:
+                raise ValueError("`num_shots` can only be given when `shots` is a `stim.CompiledDetectorSampler`.")
+            chunks = ((chunk,) for chunk in shots)
+
+        def decode_chunk(chunk: Tuple[np.ndarray, ...]) -> Tuple[np.ndarray, ...]:
+            predictions, weights = self._matching_graph.decode_batch(
+                chunk[0],
+                bit_packed_predictions=bit_packed_predictions,
+                bit_packed_shots=bit_packed_shots,
+                enable_correlations=enable_correlations,
+                num_threads=num_threads
+            )
+            return (predictions,) + chunk[1:] + ((weights,) if return_weights else ())
+
+        # The chunks are decoded one at a time on a single background thread, since concurrent calls to
+        # `decode_batch` on the same graph would only wait for each other (use `num_threads` to parallelize).
+        pending = collections.deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            try:
+                for chunk in chunks:
+                    pending.append(executor.submit(decode_chunk, chunk))
+                    while len(pending) >= max_chunks_in_flight:
+                        result = pending.popleft().result()
+                        yield result if len(result) > 1 else result[0]
+                while pending:
+                    result = pending.popleft().result()
+                    yield result if len(result) > 1 else result[0]
+            finally:
+                for future in pending:
+                    future.cancel()
+
     def decode_to_edges_array(self,
                               syndrome: Union[np.ndarray, List[bool], List[int]],
                               *,
@@ -630,6 +1197,9 @@ class Matching:
         Note that you may need to call `plt.figure()` before and `plt.show()` after calling
         this function.
         """
+        import matplotlib
+        import networkx as nx
+
         # Ignore matplotlib deprecation warnings from networkx.draw_networkx
         warnings.filterwarnings("ignore", category=matplotlib.MatplotlibDeprecationWarning)
         warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -834,6 +1404,123 @@ class Matching:
         self._matching_graph.add_boundary_edge(node, fault_ids, weight,
                                                error_probability, merge_strategy)
 
+    def add_edges(
+            self,
+            node1: Union[np.ndarray, List[int]],
+            node2: Union[np.ndarray, List[int]],
+            weights: Union[float, np.ndarray, List[float]] = 1.0,
+            error_probabilities: Union[float, np.ndarray, List[float]] = None,
+            fault_ids_indptr: Union[np.ndarray, List[int]] = None,
+            fault_ids_indices: Union[np.ndarray, List[int]] = None,
+            *,
+            merge_strategy: str = "disallow"
+    ) -> None:
+        """
+        Add many edges to the matching graph at once
+
+        Edge `i` is `(node1[i], node2[i])`. Adding edges using this method is equivalent to calling `Matching.add_edge`
+        for each edge in turn, but is much faster for large graphs, since all the edges are added in a single call to
+        the C++ extension, without creating any Python objects for each edge.
+
+        Parameters
+        ----------
+        node1: np.ndarray or list[int]
+            The first node of each edge, a 1D array of non-negative integers
+        node2: np.ndarray or list[int]
+            The second node of each edge, a 1D array of non-negative integers with the same size as `node1`
+        weights: float or np.ndarray or list[float], optional
+            The weight of each edge, either as an array with one element per edge, or as a float giving the weight of
+            every edge. Edges whose weight has an absolute value exceeding the maximum absolute edge weight of
+            2**24-1=16,777,215 are not added to the graph, and a warning is raised. By default 1.0
+        error_probabilities: float or np.ndarray or list[float], optional
+            The error probability of each edge, either as an array with one element per edge, or as a float giving the
+            error probability of every edge. By default None (no error probabilities)
+        fault_ids_indptr: np.ndarray or list[int], optional
+            Together with `fault_ids_indices`, the fault ids of the edges in compressed sparse row format: the fault ids
+            of edge `i` are `fault_ids_indices[fault_ids_indptr[i]:fault_ids_indptr[i+1]]`. `fault_ids_indptr` must
+            have one more element than the number of edges. By default None (no fault ids)
+        fault_ids_indices: np.ndarray or list[int], optional
+            The fault ids of all the edges, concatenated (see `fault_ids_indptr`). By default None (no fault ids)
+        merge_strategy: str, optional
+            Which strategy to use if an edge is already in the graph (including an earlier edge in the same call).
+            The available options are the same as for `Matching.add_edge`. The edges are added in order, so if an edge
+            raises a `ValueError` because it is already in the graph (using the "disallow" strategy), the edges before
+            it will have been added. By default, "disallow"
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edges(
+        ...     node1=np.array([0, 1]),
+        ...     node2=np.array([1, 2]),
+        ...     weights=np.array([1.5, 2.0]),
+        ...     fault_ids_indptr=np.array([0, 1, 3]),
+        ...     fault_ids_indices=np.array([0, 1, 2])
+        ... )
+        >>> m.edges()
+        [(0, 1, {'fault_ids': {0}, 'weight': 1.5, 'error_probability': -1.0}), (1, 2, {'fault_ids': {1, 2}, 'weight': 2.0, 'error_probability': -1.0})]
+        """
+        node1 = np.asarray(node1, dtype=np.int64)
+        arrays = _edge_attribute_arrays(
+            node1.size, weights, error_probabilities, fault_ids_indptr, fault_ids_indices
+        )
+        self._matching_graph.add_edges(node1, np.asarray(node2, dtype=np.int64), *arrays, merge_strategy)
+
+    def add_boundary_edges(
+            self,
+            nodes: Union[np.ndarray, List[int]],
+            weights: Union[float, np.ndarray, List[float]] = 1.0,
+            error_probabilities: Union[float, np.ndarray, List[float]] = None,
+            fault_ids_indptr: Union[np.ndarray, List[int]] = None,
+            fault_ids_indices: Union[np.ndarray, List[int]] = None,
+            *,
+            merge_strategy: str = "disallow"
+    ) -> None:
+        """
+        Add many boundary edges to the matching graph at once
+
+        Boundary edge `i` connects `nodes[i]` to the boundary. Adding boundary edges using this method is equivalent
+        to calling `Matching.add_boundary_edge` for each edge in turn, but is much faster for large graphs.
+
+        Parameters
+        ----------
+        nodes: np.ndarray or list[int]
+            The node of each boundary edge, a 1D array of non-negative integers
+        weights: float or np.ndarray or list[float], optional
+            The weight of each boundary edge, either as an array with one element per edge, or as a float giving the
+            weight of every edge. By default 1.0
+        error_probabilities: float or np.ndarray or list[float], optional
+            The error probability of each boundary edge, either as an array with one element per edge, or as a float
+            giving the error probability of every edge. By default None (no error probabilities)
+        fault_ids_indptr: np.ndarray or list[int], optional
+            Together with `fault_ids_indices`, the fault ids of the edges in compressed sparse row format (see
+            `Matching.add_edges`). By default None (no fault ids)
+        fault_ids_indices: np.ndarray or list[int], optional
+            The fault ids of all the edges, concatenated (see `Matching.add_edges`). By default None (no fault ids)
+        merge_strategy: str, optional
+            Which strategy to use if a boundary edge is already in the graph. The available options are the same as
+            for `Matching.add_boundary_edge`. By default, "disallow"
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1)
+        >>> m.add_boundary_edges(np.array([0, 1]), weights=2.0, error_probabilities=np.array([0.1, 0.2]))
+        >>> m
+        <pymatching.Matching object with 2 detectors, 0 boundary nodes, and 3 edges>
+        >>> m.get_boundary_edge_data(1)
+        {'fault_ids': set(), 'weight': 2.0, 'error_probability': 0.2}
+        """
+        nodes = np.asarray(nodes, dtype=np.int64)
+        arrays = _edge_attribute_arrays(
+            nodes.size, weights, error_probabilities, fault_ids_indptr, fault_ids_indices
+        )
+        self._matching_graph.add_boundary_edges(nodes, *arrays, merge_strategy)
+
     def has_edge(self, node1: int, node2: int) -> bool:
         """
         Returns True if edge `(node1, node2)` is in the graph.
@@ -925,16 +1612,194 @@ class Matching:
         """
         return self._matching_graph.get_edges()
 
+    def edges_array(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Edges of the matching graph, as NumPy arrays
+        Returns the edges of the matching graph as a tuple of arrays
+        ``(node1, node2, weights, error_probabilities, fault_ids_indptr, fault_ids_indices)``, in the same order as
+        `Matching.edges`. The arrays are filled directly by the C++ extension, without creating a Python object for
+        each edge, so this is much faster than `Matching.edges` for large graphs.
+
+        Returns
+        -------
+        node1: np.ndarray
+            The first node of each edge (an int64 array)
+        node2: np.ndarray
+            The second node of each edge (an int64 array), which is -1 for a boundary edge
+        weights: np.ndarray
+            The weight of each edge (a float64 array)
+        error_probabilities: np.ndarray
+            The error probability of each edge (a float64 array), which is -1 if not specified
+        fault_ids_indptr: np.ndarray
+            An int64 array with one more element than the number of edges. The fault ids of edge `i` are
+            ``fault_ids_indices[fault_ids_indptr[i]:fault_ids_indptr[i+1]]``
+        fault_ids_indices: np.ndarray
+            The fault ids of all the edges, concatenated (an int64 array)
+
+        Examples
+        --------
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, fault_ids={0, 2}, weight=2.5, error_probability=0.1)
+        >>> m.add_boundary_edge(1, fault_ids=1)
+        >>> node1, node2, weights, error_probabilities, fault_ids_indptr, fault_ids_indices = m.edges_array()
+        >>> node1, node2
+        (array([0, 1]), array([ 1, -1]))
+        >>> weights, error_probabilities
+        (array([2.5, 1. ]), array([ 0.1, -1. ]))
+        >>> fault_ids_indptr, fault_ids_indices
+        (array([0, 2, 3]), array([0, 2, 1]))
+        """
+        return self._matching_graph.get_edges_array()
+
+    def to_scipy_csr(self) -> "csr_matrix":
+        """Adjacency matrix of the matching graph
+        Returns the weighted adjacency matrix of the matching graph as a symmetric `scipy.sparse.csr_matrix`, where
+        element ``(i, j)`` is the weight of the edge ``(i, j)``. Edges with a weight of zero are stored as explicit
+        zeros. As in `Matching.to_networkx`, if the graph has any boundary edges, the matrix has an extra row and
+        column for the virtual boundary node, which has index `Matching.num_nodes`. The matrix is filled by the C++
+        extension without creating a Python object for each edge.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The weighted adjacency matrix of the matching graph
+
+        Examples
+        --------
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, weight=2)
+        >>> m.add_boundary_edge(1, weight=3)
+        >>> m.to_scipy_csr().toarray()
+        array([[0., 2., 0.],
+               [2., 0., 3.],
+               [0., 3., 0.]])
+        """
+        from scipy.sparse import csr_matrix
+
+        data, indices, indptr, num_rows = self._matching_graph.get_adjacency_csr()
+        adjacency = csr_matrix((data, indices, indptr), shape=(num_rows, num_rows))
+        adjacency.sort_indices()
+        return adjacency
+
+    def set_edge_weights(self, weights: Union[np.ndarray, List[float]]) -> None:
+        """Set the weights of all the edges in the matching graph
+        Sets the weight of every edge at once, where ``weights[i]`` is the new weight of edge ``i`` in the order
+        given by `Matching.edges_array` (and `Matching.edges`). The structure of the graph and the fault ids and error
+        probabilities of the edges are unchanged. Unless the graph has boundary nodes or negative edge weights, the
+        decoder is rescaled in place the next time it is used, rather than being rebuilt from scratch.
+
+        Parameters
+        ----------
+        weights: np.ndarray or list[float]
+            The new weight of each edge, with one element per edge. The absolute value of each weight must be at most
+            2**24-1=16,777,215.
+
+        Examples
+        --------
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, weight=1)
+        >>> m.add_boundary_edge(1, weight=2)
+        >>> m.set_edge_weights([3, 4])
+        >>> m.edges_array()[2]
+        array([3., 4.])
+        """
+        self._matching_graph.set_edge_weights(weights)
+
+    def set_error_probabilities(self, error_probabilities: Union[np.ndarray, List[float]]) -> None:
+        """Set the error probabilities of all the edges in the matching graph
+        Sets the error probability of every edge at once, where ``error_probabilities[i]`` is the new error
+        probability of edge ``i`` in the order given by `Matching.edges_array` (and `Matching.edges`). The weight of
+        each edge is set to the log-likelihood ratio ``log((1-p)/p)`` of its new error probability ``p``. As for
+        `Matching.set_edge_weights`, the decoder is updated in place where possible. This is much faster than loading
+        a new detector error model when only the error probabilities have changed (e.g. when sweeping the noise
+        strength). Any implied weights used for correlated matching are left unchanged.
+
+        Parameters
+        ----------
+        error_probabilities: np.ndarray or list[float]
+            The new error probability of each edge, with one element per edge. Each error probability must be
+            greater than 0 and less than 1.
+
+        Examples
+        --------
+        >>> import pymatching
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, error_probability=0.1)
+        >>> m.add_boundary_edge(1, error_probability=0.1)
+        >>> m.set_error_probabilities([0.2, 0.25])
+        >>> m.edges_array()[3]
+        array([0.2 , 0.25])
+        >>> m.edges_array()[2].round(4)
+        array([1.3863, 1.0986])
+        """
+        self._matching_graph.set_error_probabilities(error_probabilities)
+
+    def erasure_matrix(self, model: "stim.DetectorErrorModel") -> "csr_matrix":
+        """Erased edges of each erasure tagged in a detector error model
+        Returns a `scipy.sparse.csr_matrix` of shape `(num_erasures, self.num_edges)` and `dtype=bool`, where element
+        ``(k, j)`` is True if edge `j` (in the order given by `Matching.edges_array`) is caused by an error mechanism in
+        `model` that is tagged ``erasure:k``, e.g. ``error[erasure:3](0.1) D0 D1``. Each component of a decomposed
+        error tagged ``erasure:k`` is caused by erasure `k`. If a boolean array `heralds` of shape `(num_shots,
+        num_erasures)` records which erasures were heralded in each shot, then
+        ``scipy.sparse.csr_matrix(heralds) @ matching.erasure_matrix(model)`` gives the erased edges in each shot, in
+        the format accepted by the `erasures` argument of `Matching.decode_batch`.
+
+        Parameters
+        ----------
+        model : stim.DetectorErrorModel
+            The detector error model that this matching graph was loaded from (or one with the same graphlike
+            errors), with erasure errors tagged ``erasure:k`` for some non-negative integer `k`. Errors with other
+            tags, or with a probability of zero, are ignored.
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            The edges caused by each erasure, with `num_erasures` one more than the largest erasure index in `model`
+
+        Examples
+        --------
+        >>> import stim
+        >>> import numpy as np
+        >>> import scipy.sparse
+        >>> import pymatching
+        >>> model = stim.DetectorErrorModel('''
+        ...     error[erasure:0](0.1) D0 D1
+        ...     error(0.1) D1 L0
+        ...     error[erasure:0](0.1) D0
+        ...     error[erasure:1](0.1) D1 D2
+        ...     error(0.1) D2
+        ... ''')
+        >>> m = pymatching.Matching.from_detector_error_model(model)
+        >>> m.erasure_matrix(model).toarray()
+        array([[ True, False,  True, False, False],
+               [False, False, False,  True, False]])
+        >>> heralds = np.array([[0, 0], [1, 0]], dtype=bool)
+        >>> erased_edges = scipy.sparse.csr_matrix(heralds) @ m.erasure_matrix(model)
+        >>> m.decode_batch(np.array([[0, 1, 0], [0, 1, 0]], dtype=np.uint8), erasures=erased_edges)
+        array([[1],
+               [0]], dtype=uint8)
+        """
+        from scipy.sparse import csr_matrix
+
+        erasures, edge_indices = _cpp_pm.detector_error_model_erasure_edges(str(model), self._matching_graph)
+        num_erasures = int(erasures.max()) + 1 if erasures.size > 0 else 0
+        matrix = csr_matrix((np.ones(erasures.size, dtype=bool), (erasures, edge_indices)),
+                            shape=(num_erasures, self.num_edges))
+        matrix.sum_duplicates()
+        return matrix
+
     @staticmethod
     def from_check_matrix(
-            check_matrix: Union[csc_matrix, spmatrix, np.ndarray, List[List[int]]],
+            check_matrix: Union["csc_matrix", "spmatrix", np.ndarray, List[List[int]]],
             weights: Union[float, np.ndarray, List[float]] = None,
             error_probabilities: Union[float, np.ndarray, List[float]] = None,
             repetitions: int = None,
             timelike_weights: Union[float, np.ndarray, List[float]] = None,
             measurement_error_probabilities: Union[float, np.ndarray, List[float]] = None,
             *,
-            faults_matrix: Union[csc_matrix, spmatrix, np.ndarray, List[List[int]]] = None,
+            faults_matrix: Union["csc_matrix", "spmatrix", np.ndarray, List[List[int]]] = None,
             merge_strategy: str = "smallest-weight",
             use_virtual_boundary_node: bool = False,
             **kwargs
@@ -1052,14 +1917,14 @@ class Matching:
         return m
 
     def load_from_check_matrix(self,
-                               check_matrix: Union[csc_matrix, spmatrix, np.ndarray, List[List[int]]] = None,
+                               check_matrix: Union["csc_matrix", "spmatrix", np.ndarray, List[List[int]]] = None,
                                weights: Union[float, np.ndarray, List[float]] = None,
                                error_probabilities: Union[float, np.ndarray, List[float]] = None,
                                repetitions: int = None,
                                timelike_weights: Union[float, np.ndarray, List[float]] = None,
                                measurement_error_probabilities: Union[float, np.ndarray, List[float]] = None,
                                *,
-                               faults_matrix: Union[csc_matrix, spmatrix, np.ndarray, List[List[int]]] = None,
+                               faults_matrix: Union["csc_matrix", "spmatrix", np.ndarray, List[List[int]]] = None,
                                merge_strategy: str = "smallest-weight",
                                use_virtual_boundary_node: bool = False,
                                **kwargs
@@ -1165,6 +2030,8 @@ class Matching:
             if check_matrix is None:
                 raise ValueError("No check_matrix provided")
 
+        from scipy.sparse import csc_matrix
+
         if not isinstance(check_matrix, csc_matrix):
             try:
                 check_matrix = csc_matrix(check_matrix)
@@ -1417,6 +2284,71 @@ class Matching:
         )
         return m
 
+    def save(self, path: Union[str, Path]) -> None:
+        """
+        Saves the matching graph to a file, in a flat, versioned binary format that can be loaded with
+        `pymatching.Matching.load`.
+
+        As well as the edges of the graph, the file contains the discretised graph used by the decoder (including
+        the implied edge weights used for correlated matching, if the graph was loaded with
+        `enable_correlations=True`). This means that loading the file is much faster than constructing the graph
+        again (e.g. using `Matching.from_detector_error_model`), since the detector error model does not need to be
+        parsed, nor the graph discretised. The file can also be used by the `pymatching` command line tool, using
+        its `--compiled_dem` argument.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The path of the file to write to
+
+        Examples
+        --------
+        >>> import pymatching
+        >>> import tempfile, os
+        >>> m = pymatching.Matching()
+        >>> m.add_edge(0, 1, fault_ids={0}, weight=2)
+        >>> m.add_boundary_edge(1, fault_ids={1}, weight=3)
+        >>> with tempfile.TemporaryDirectory() as d:
+        ...     m.save(os.path.join(d, "graph.pmg"))
+        ...     loaded = pymatching.Matching.load(os.path.join(d, "graph.pmg"))
+        >>> loaded.edges()
+        [(0, 1, {'fault_ids': {0}, 'weight': 2.0, 'error_probability': -1.0}), (1, None, {'fault_ids': {1}, 'weight': 3.0, 'error_probability': -1.0})]
+        """
+        data = self._matching_graph.serialize(include_compiled_graph=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    @staticmethod
+    def load(path: Union[str, Path]) -> 'pymatching.Matching':
+        """
+        Loads a matching graph from a file written by `pymatching.Matching.save`.
+
+        Loading is fast since the compiled decoder is read directly from the file rather than being rebuilt from the
+        edges. The file is memory-mapped (read-only) while it is deserialized, rather than first being read into a
+        temporary `bytes` object, but the graph and decoder are copied into memory owned by the returned `Matching`.
+        The file is not kept open or mapped afterwards, so processes that load the same file do not share memory.
+
+        Parameters
+        ----------
+        path : str or pathlib.Path
+            The path of the file to load
+
+        Returns
+        -------
+        pymatching.Matching
+            The matching graph saved in the file, with its decoder already compiled
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                with _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ) as data:
+                    graph = _cpp_pm.deserialize_matching_graph(data)
+            else:
+                # An empty file can't be memory-mapped
+                graph = _cpp_pm.deserialize_matching_graph(f.read())
+        m = Matching()
+        m._matching_graph = graph
+        return m
+
     def _load_from_detector_error_model(self, model: 'stim.DetectorErrorModel', *, enable_correlations: bool = False) -> None:
         try:
             import stim
@@ -1433,7 +2365,7 @@ class Matching:
         )
 
     @staticmethod
-    def from_networkx(graph: nx.Graph, *, min_num_fault_ids: int = None) -> 'pymatching.Matching':
+    def from_networkx(graph: "nx.Graph", *, min_num_fault_ids: int = None) -> 'pymatching.Matching':
         r"""
         Returns a new `pymatching.Matching` object from a NetworkX graph
 
@@ -1485,7 +2417,7 @@ class Matching:
         )
         return m
 
-    def load_from_networkx(self, graph: nx.Graph, *, min_num_fault_ids: int = None) -> None:
+    def load_from_networkx(self, graph: "nx.Graph", *, min_num_fault_ids: int = None) -> None:
         r"""
         Load a matching graph from a NetworkX graph into a `pymatching.Matching` object
 
@@ -1532,41 +2464,22 @@ class Matching:
         <pymatching.Matching object with 1 detector, 2 boundary nodes, and 2 edges>
         """
 
+        import networkx as nx
+
         if not isinstance(graph, nx.Graph):
             raise TypeError("G must be a NetworkX graph")
         boundary = {i for i, attr in graph.nodes(data=True)
                     if attr.get("is_boundary", False)}
         num_nodes = graph.number_of_nodes()
-        all_fault_ids = set()
         num_fault_ids = 0 if min_num_fault_ids is None else min_num_fault_ids
         g = _cpp_pm.MatchingGraph(num_nodes, num_fault_ids)
         g.set_boundary(boundary)
-        for (u, v, attr) in graph.edges(data=True):
-            u, v = int(u), int(v)
-            if "fault_ids" in attr and "qubit_id" in attr:
-                raise ValueError("Both `fault_ids` and `qubit_id` were provided as edge attributes, however use "
-                                 "of `qubit_id` has been deprecated in favour of `fault_ids`. Please only supply "
-                                 "`fault_ids` as an edge attribute.")
-            if "fault_ids" not in attr and "qubit_id" in attr:
-                fault_ids = attr["qubit_id"]  # Still accept qubit_id as well for now
-            else:
-                fault_ids = attr.get("fault_ids", set())
-            if isinstance(fault_ids, (int, np.integer)):
-                fault_ids = {int(fault_ids)} if fault_ids != -1 else set()
-            else:
-                try:
-                    fault_ids = set(fault_ids)
-                    if not all(isinstance(q, (int, np.integer)) for q in fault_ids):
-                        raise TypeError("fault_ids must be a set of ints, not {}".format(fault_ids))
-                except TypeError:
-                    raise TypeError(
-                        "fault_ids property must be an int or a set of int"
-                        " (or convertible to a set), not {}".format(fault_ids))
-            all_fault_ids = all_fault_ids | fault_ids
-            weight = attr.get("weight", 1)  # Default weight is 1 if not provided
-            e_prob = attr.get("error_probability", -1)
-            # Note: NetworkX graphs do not support parallel edges (merge strategy is redundant)
-            g.add_edge(u, v, fault_ids, weight, e_prob, merge_strategy="smallest-weight")
+        edges = list(graph.edges(data=True))
+        node1 = np.array([u for u, _, _ in edges], dtype=np.int64)
+        node2 = np.array([v for _, v, _ in edges], dtype=np.int64)
+        arrays = _edge_arrays_from_edge_attributes([attr for _, _, attr in edges])
+        # Note: NetworkX graphs do not support parallel edges (merge strategy is redundant)
+        g.add_edges(node1, node2, *arrays, merge_strategy="smallest-weight")
         self._matching_graph = g
 
     def load_from_retworkx(self, graph: "rx.PyGraph", *, min_num_fault_ids: int = None) -> None:
@@ -1626,39 +2539,34 @@ class Matching:
             raise ImportError("rustworkx must be installed to use Matching.load_from_rustworkx")
         if not isinstance(graph, rx.PyGraph):
             raise TypeError("G must be a rustworkx graph")
-        boundary = {i for i in graph.node_indices() if graph[i].get("is_boundary", False)}
+        boundary = {i for i, attr in zip(graph.node_indices(), graph.nodes()) if attr.get("is_boundary", False)}
         num_nodes = len(graph)
         num_fault_ids = 0 if min_num_fault_ids is None else min_num_fault_ids
         g = _cpp_pm.MatchingGraph(num_nodes, num_fault_ids)
         g.set_boundary(boundary)
-        for (u, v, attr) in graph.weighted_edge_list():
-            u, v = int(u), int(v)
-            if "fault_ids" in attr and "qubit_id" in attr:
-                raise ValueError("Both `fault_ids` and `qubit_id` were provided as edge attributes, however use "
-                                 "of `qubit_id` has been deprecated in favour of `fault_ids`. Please only supply "
-                                 "`fault_ids` as an edge attribute.")
-            if "fault_ids" not in attr and "qubit_id" in attr:
-                fault_ids = attr["qubit_id"]  # Still accept qubit_id as well for now
-            else:
-                fault_ids = attr.get("fault_ids", set())
-            if isinstance(fault_ids, (int, np.integer)):
-                fault_ids = {int(fault_ids)} if fault_ids != -1 else set()
-            else:
-                try:
-                    fault_ids = set(fault_ids)
-                    if not all(isinstance(q, (int, np.integer)) for q in fault_ids):
-                        raise TypeError("fault_ids must be a set of ints, not {}".format(fault_ids))
-                except TypeError:
-                    raise TypeError(
-                        "fault_ids property must be an int or a set of int"
-                        " (or convertible to a set), not {}".format(fault_ids))
-            weight = attr.get("weight", 1)  # Default weight is 1 if not provided
-            e_prob = attr.get("error_probability", -1)
-            # Note: rustworkx graphs do not support parallel edges (merge strategy is redundant)
-            g.add_edge(u, v, fault_ids, weight, e_prob, merge_strategy="smallest-weight")
+        endpoints = np.array(graph.edge_list(), dtype=np.int64).reshape(-1, 2)
+        arrays = _edge_arrays_from_edge_attributes(list(graph.edges()))
+        # Note: rustworkx graphs do not support parallel edges (merge strategy is redundant)
+        g.add_edges(endpoints[:, 0], endpoints[:, 1], *arrays, merge_strategy="smallest-weight")
         self._matching_graph = g
 
-    def to_networkx(self) -> nx.Graph:
+    def _edges_with_virtual_boundary_node(self) -> Tuple[List[Tuple[int, int, Dict]], bool]:
+        """Returns the edges `(u, v, attr)` of the matching graph, in the same format as `Matching.edges`, except that
+        boundary edges are connected to a virtual boundary node with index `Matching.num_nodes`. Also returns whether
+        there are any boundary edges."""
+        node1, node2, weights, error_probabilities, fault_ids_indptr, fault_ids_indices = self.edges_array()
+        is_boundary_edge = node2 == -1
+        node2[is_boundary_edge] = self.num_nodes
+        fault_ids_indptr = fault_ids_indptr.tolist()
+        fault_ids_indices = fault_ids_indices.tolist()
+        edges = [
+            (u, v, {"fault_ids": set(fault_ids_indices[start:end]), "weight": w, "error_probability": p})
+            for u, v, w, p, start, end in zip(node1.tolist(), node2.tolist(), weights.tolist(),
+                                              error_probabilities.tolist(), fault_ids_indptr, fault_ids_indptr[1:])
+        ]
+        return edges, bool(np.any(is_boundary_edge))
+
+    def to_networkx(self) -> "nx.Graph":
         """Convert to NetworkX graph
         Returns a NetworkX graph corresponding to the matching graph. Each edge
         has attributes `fault_ids`, `weight` and `error_probability` and each node has
@@ -1669,15 +2577,12 @@ class Matching:
         NetworkX.Graph
             NetworkX Graph corresponding to the matching graph
         """
+        import networkx as nx
+
         graph = nx.Graph()
         num_nodes = self.num_nodes
-        has_virtual_boundary = False
-        for u, v, data in self.edges():
-            if v is None:
-                graph.add_edge(u, num_nodes, **data)
-                has_virtual_boundary = True
-            else:
-                graph.add_edge(u, v, **data)
+        edges, has_virtual_boundary = self._edges_with_virtual_boundary_node()
+        graph.add_edges_from(edges)
         boundary = self.boundary
         for i in graph.nodes:
             is_boundary = i in boundary
@@ -1715,14 +2620,7 @@ class Matching:
 
         graph = rx.PyGraph(multigraph=False)
         num_nodes = self.num_nodes
-        has_virtual_boundary = False
-        edges = []
-        for u, v, data in self.edges():
-            if v is None:
-                edges.append((u, num_nodes, data))
-                has_virtual_boundary = True
-            else:
-                edges.append((u, v, data))
+        edges, has_virtual_boundary = self._edges_with_virtual_boundary_node()
         graph.add_nodes_from([{} for _ in range(num_nodes + has_virtual_boundary)])
         graph.extend_from_weighted_edge_list(edges)
         boundary = self.boundary
@@ -1837,3 +2735,117 @@ class Matching:
             The number of detectors
         """
         return self._matching_graph.get_num_detectors()
+
+
+def _edge_attribute_arrays(
+        num_edges: int,
+        weights: Union[float, np.ndarray, List[float]],
+        error_probabilities: Union[float, np.ndarray, List[float], None],
+        fault_ids_indptr: Union[np.ndarray, List[int], None],
+        fault_ids_indices: Union[np.ndarray, List[int], None]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Converts the edge attributes given to `Matching.add_edges` or `Matching.add_boundary_edges` to the arrays
+    `(fault_ids_indptr, fault_ids_indices, weights, error_probabilities)` taken by the C++ extension, broadcasting
+    scalar weights and error probabilities to one per edge."""
+    if (fault_ids_indptr is None) != (fault_ids_indices is None):
+        raise ValueError("`fault_ids_indptr` and `fault_ids_indices` must either both be provided or both be None.")
+    if fault_ids_indptr is None:
+        fault_ids_indptr = np.zeros(num_edges + 1, dtype=np.int64)
+        fault_ids_indices = np.zeros(0, dtype=np.int64)
+    if error_probabilities is None:
+        error_probabilities = -1.0
+    weights = np.asarray(weights, dtype=np.float64)
+    if weights.ndim == 0:
+        weights = np.full(num_edges, weights)
+    error_probabilities = np.asarray(error_probabilities, dtype=np.float64)
+    if error_probabilities.ndim == 0:
+        error_probabilities = np.full(num_edges, error_probabilities)
+    return (np.asarray(fault_ids_indptr, dtype=np.int64), np.asarray(fault_ids_indices, dtype=np.int64), weights,
+            error_probabilities)
+
+
+def _edge_arrays_from_edge_attributes(
+        edge_attributes: List[Dict]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Gathers the attributes of the edges of a NetworkX or rustworkx graph into the arrays
+    `(fault_ids_indptr, fault_ids_indices, weights, error_probabilities)` taken by `MatchingGraph.add_edges`. Each
+    element of `edge_attributes` is a dict with the (optional) keys `fault_ids` (or `qubit_id`), `weight` and
+    `error_probability`."""
+    weights = np.array([attr.get("weight", 1) for attr in edge_attributes],  # Default weight is 1 if not provided
+                       dtype=np.float64)
+    error_probabilities = np.array([attr.get("error_probability", -1) for attr in edge_attributes], dtype=np.float64)
+
+    if any("qubit_id" in attr for attr in edge_attributes):
+        all_fault_ids = []
+        for attr in edge_attributes:
+            if "qubit_id" not in attr:
+                all_fault_ids.append(attr.get("fault_ids", ()))
+            elif "fault_ids" in attr:
+                raise ValueError("Both `fault_ids` and `qubit_id` were provided as edge attributes, however use "
+                                 "of `qubit_id` has been deprecated in favour of `fault_ids`. Please only supply "
+                                 "`fault_ids` as an edge attribute.")
+            else:
+                all_fault_ids.append(attr["qubit_id"])  # Still accept qubit_id as well for now
+    else:
+        all_fault_ids = [attr.get("fault_ids", ()) for attr in edge_attributes]
+
+    fault_ids_indptr = np.zeros(len(all_fault_ids) + 1, dtype=np.int64)
+    if set(map(type, all_fault_ids)) <= {int}:
+        # Each edge has a single fault id, or none if its fault id is -1
+        fault_ids_indices = np.array(all_fault_ids, dtype=np.int64)
+        has_fault_id = fault_ids_indices != -1
+        np.cumsum(has_fault_id, out=fault_ids_indptr[1:])
+        return fault_ids_indptr, fault_ids_indices[has_fault_id], weights, error_probabilities
+
+    if not set(map(type, all_fault_ids)) <= {set, frozenset}:
+        all_fault_ids = [_fault_ids_to_set(fault_ids) for fault_ids in all_fault_ids]
+    np.cumsum([len(fault_ids) for fault_ids in all_fault_ids], out=fault_ids_indptr[1:])
+    fault_ids_indices = np.array([q for fault_ids in all_fault_ids for q in fault_ids])
+    # The fault ids of all the edges are type-checked at once
+    if fault_ids_indices.size > 0 and fault_ids_indices.dtype.kind not in "iub":
+        raise TypeError("fault_ids property must be an int or a set of int (or convertible to a set)")
+    return fault_ids_indptr, fault_ids_indices.astype(np.int64), weights, error_probabilities
+
+
+def _to_csr_indices(
+        rows: Union[List[np.ndarray], List[List[int]], "spmatrix"]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Converts `rows`, either a list of 1D integer arrays (or lists) or a `scipy.sparse` matrix, to the arrays
+    `(indices, indptr)` of the compressed sparse row format, where the elements (or the columns of the non-zero
+    elements) of row `i` are ``indices[indptr[i]:indptr[i+1]]``."""
+    if hasattr(rows, "tocsr"):
+        csr = rows.tocsr()
+        csr.eliminate_zeros()
+        return csr.indices, csr.indptr
+    rows = [np.asarray(row, dtype=np.int64).reshape(-1) for row in rows]
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum([row.shape[0] for row in rows], out=indptr[1:])
+    indices = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    return indices, indptr
+
+
+def _fault_ids_to_set(fault_ids: Union[int, Iterable[int]]) -> Set[int]:
+    if isinstance(fault_ids, (set, frozenset)):
+        return fault_ids
+    if isinstance(fault_ids, (int, np.integer)):
+        return {int(fault_ids)} if fault_ids != -1 else set()
+    try:
+        return set(fault_ids)
+    except TypeError:
+        raise TypeError(
+            "fault_ids property must be an int or a set of int"
+            " (or convertible to a set), not {}".format(fault_ids))
+
+
+def _sample_in_chunks(
+        sampler: "stim.CompiledDetectorSampler",
+        num_shots: int,
+        chunk_size: int,
+        bit_packed: bool
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Samples `num_shots` shots from `sampler` in chunks of at most `chunk_size` shots, yielding a tuple
+    `(detection_events, observable_flips)` for each chunk."""
+    while num_shots > 0:
+        shots_in_chunk = min(chunk_size, num_shots)
+        yield sampler.sample(shots=shots_in_chunk, separate_observables=True, bit_packed=bit_packed)
+        num_shots -= shots_in_chunk
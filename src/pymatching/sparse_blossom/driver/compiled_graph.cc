@@ -0,0 +1,48 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/compiled_graph.h"
+
+pm::CompiledMatchingGraph::CompiledMatchingGraph() = default;
+
+pm::CompiledMatchingGraph::CompiledMatchingGraph(pm::MatchingGraph graph) : _matching_graph(std::move(graph)) {
+    // The unconverted implied weights are only needed while constructing the graph
+    _matching_graph.implied_weights_unconverted = {};
+}
+
+pm::CompiledMatchingGraph::CompiledMatchingGraph(pm::MatchingGraph graph, pm::SearchGraph search_graph)
+    : _matching_graph(std::move(graph)), _search_graph(std::move(search_graph)) {
+    _matching_graph.implied_weights_unconverted = {};
+    _search_graph.implied_weights_unconverted = {};
+}
+
+const pm::MatchingGraph& pm::CompiledMatchingGraph::matching_graph() const {
+    return _matching_graph;
+}
+
+const pm::SearchGraph& pm::CompiledMatchingGraph::search_graph() const {
+    return _search_graph;
+}
+
+bool pm::CompiledMatchingGraph::has_search_graph() const {
+    return _search_graph.nodes.size() == _matching_graph.nodes.size();
+}
+
+pm::Mwpm pm::CompiledMatchingGraph::make_workspace() const {
+    auto mwpm = has_search_graph()
+                    ? pm::Mwpm(pm::GraphFlooder(_matching_graph.clone()), pm::SearchFlooder(_search_graph.clone()))
+                    : pm::Mwpm(pm::GraphFlooder(_matching_graph.clone()));
+    mwpm.flooder.sync_negative_weight_observables_and_detection_events();
+    return mwpm;
+}
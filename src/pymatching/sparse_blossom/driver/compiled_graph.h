@@ -0,0 +1,54 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_COMPILED_GRAPH_H
+#define PYMATCHING2_COMPILED_GRAPH_H
+
+#include "pymatching/sparse_blossom/flooder/graph.h"
+#include "pymatching/sparse_blossom/matcher/mwpm.h"
+#include "pymatching/sparse_blossom/search/search_graph.h"
+
+namespace pm {
+
+/// A matching graph (and optionally a search graph) that has been compiled from a UserGraph, and that is never
+/// modified or decoded with directly. Any number of independent decoder workspaces can be created from it, and
+/// since it is immutable it can be shared between threads that are each creating their own workspaces.
+///
+/// Creating a workspace only allocates the per-node state used while decoding (including each node's pointers to its
+/// neighbors): the edge weights and observables of the graph (and the implied weights used for correlations) are
+/// shared with the workspace rather than copied. A workspace only copies the edge weights (or the edge markers of the search graph) if it needs to
+/// modify them while decoding, e.g. to decode with correlations.
+class CompiledMatchingGraph {
+   public:
+    CompiledMatchingGraph();
+    explicit CompiledMatchingGraph(MatchingGraph graph);
+    CompiledMatchingGraph(MatchingGraph graph, SearchGraph search_graph);
+
+    const MatchingGraph& matching_graph() const;
+    const SearchGraph& search_graph() const;
+    bool has_search_graph() const;
+
+    /// Creates a new decoder for the compiled graph, with its own copy of all state that is modified during
+    /// decoding. The workspace can be used independently of (and concurrently with) the compiled graph and any other
+    /// workspaces.
+    Mwpm make_workspace() const;
+
+   private:
+    MatchingGraph _matching_graph;
+    SearchGraph _search_graph;
+};
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_COMPILED_GRAPH_H
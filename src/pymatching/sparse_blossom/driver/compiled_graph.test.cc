@@ -0,0 +1,131 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/compiled_graph.h"
+
+#include <algorithm>
+#include <gtest/gtest.h>
+
+#include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "pymatching/sparse_blossom/driver/user_graph.h"
+#include "stim.h"
+
+TEST(CompiledMatchingGraph, CloneRebasesPointersAndSharesEdges) {
+    pm::UserGraph user_graph;
+    user_graph.add_or_merge_edge(0, 1, {0}, 1.0, -1);
+    user_graph.add_or_merge_edge(1, 2, {1}, 2.0, -1);
+    user_graph.add_or_merge_boundary_edge(2, {2}, 3.0, -1);
+    user_graph.edges.add_implied_weight(0, {1, 2, 0.5});
+    user_graph.edges.add_implied_weight(1, {2, SIZE_MAX, 0.5});
+    auto graph = user_graph.to_matching_graph(pm::NUM_DISTINCT_WEIGHTS);
+    auto copy = graph.clone();
+
+    ASSERT_EQ(copy.nodes.size(), 3);
+    // The copy only has its own nodes, and views the edges of the original graph
+    ASSERT_EQ(copy.node_edges, graph.node_edges);
+    ASSERT_NE(copy.nodes.data(), graph.nodes.data());
+    ASSERT_EQ(copy.num_nodes, graph.num_nodes);
+    ASSERT_EQ(copy.num_observables, graph.num_observables);
+    ASSERT_EQ(copy.normalising_constant, graph.normalising_constant);
+    ASSERT_TRUE(copy.implied_weights_unconverted.empty());
+    ASSERT_EQ(copy.implied_weights, graph.implied_weights);
+    for (size_t i = 0; i < 3; i++) {
+        ASSERT_EQ(copy.nodes[i].neighbors.size(), graph.nodes[i].neighbors.size());
+        for (size_t j = 0; j < copy.nodes[i].neighbors.size(); j++) {
+            if (graph.nodes[i].neighbors[j] == nullptr) {
+                ASSERT_EQ(copy.nodes[i].neighbors[j], nullptr);
+            } else {
+                ASSERT_EQ(copy.nodes[i].neighbors[j] - &copy.nodes[0], graph.nodes[i].neighbors[j] - &graph.nodes[0]);
+            }
+        }
+        ASSERT_TRUE(std::ranges::equal(copy.nodes[i].neighbor_weights, graph.nodes[i].neighbor_weights));
+        ASSERT_TRUE(std::ranges::equal(copy.nodes[i].neighbor_observables, graph.nodes[i].neighbor_observables));
+    }
+
+    // Implied weights of edge (0, 1) are the weights of edge (1, 2), and of the boundary edge of 2 the edge (2, 1)
+    auto w = copy.implied_weights->of_edge(0, 0);
+    ASSERT_EQ(w.size(), 1);
+    ASSERT_EQ(w[0].node0, 1);
+    ASSERT_EQ(w[0].neighbor0, 1);
+    ASSERT_EQ(w[0].node1, 2);
+    ASSERT_EQ(w[0].neighbor1, 1);
+    auto wb = copy.implied_weights->of_edge(1, 1);
+    ASSERT_EQ(wb.size(), 1);
+    ASSERT_EQ(wb[0].node0, 2);
+    ASSERT_EQ(wb[0].neighbor0, 0);
+    ASSERT_EQ(wb[0].node1, SIZE_MAX);
+
+    // Reweighting the copy doesn't change the original graph, and only copies the weights of the edges
+    copy.reweight_for_edge(0, 1);
+    ASSERT_EQ(copy.node_edges, graph.node_edges);
+    ASSERT_EQ(copy.nodes[2].neighbor_weights[1], w[0].implied_weight);
+    ASSERT_NE(graph.nodes[2].neighbor_weights[1], w[0].implied_weight);
+    copy.undo_reweights();
+    ASSERT_TRUE(std::ranges::equal(copy.nodes[2].neighbor_weights, graph.nodes[2].neighbor_weights));
+}
+
+TEST(CompiledMatchingGraph, WorkspacesDecodeIdenticallyToMwpm) {
+    stim::CircuitGenParameters gen(5, 5, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.01;
+    gen.before_measure_flip_probability = 0.01;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 200;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+
+    auto user_graph = pm::detector_error_model_to_user_graph(dem, true, pm::NUM_DISTINCT_WEIGHTS);
+    auto mwpm = user_graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, true);
+    const auto compiled = user_graph.to_compiled_graph(pm::NUM_DISTINCT_WEIGHTS, true);
+    ASSERT_TRUE(compiled.has_search_graph());
+    auto workspace1 = compiled.make_workspace();
+    auto workspace2 = compiled.make_workspace();
+    ASSERT_NE(&workspace1.flooder.graph.nodes[0], &workspace2.flooder.graph.nodes[0]);
+
+    for (bool enable_correlations : {false, true}) {
+        for (size_t k = 0; k < num_shots; k++) {
+            std::vector<uint64_t> hits;
+            for (size_t d = 0; d < circuit.count_detectors(); d++) {
+                if (dets[d][k])
+                    hits.push_back(d);
+            }
+            pm::ExtendedMatchingResult expected(mwpm.flooder.graph.num_observables);
+            pm::decode_detection_events(
+                mwpm, hits, expected.obs_crossed.data(), expected.weight, enable_correlations);
+            for (auto* workspace : {&workspace1, &workspace2}) {
+                pm::ExtendedMatchingResult res(workspace->flooder.graph.num_observables);
+                pm::decode_detection_events(*workspace, hits, res.obs_crossed.data(), res.weight, enable_correlations);
+                ASSERT_EQ(res, expected);
+            }
+        }
+    }
+}
+
+TEST(CompiledMatchingGraph, WorkspaceWithoutSearchGraph) {
+    pm::UserGraph user_graph;
+    user_graph.add_or_merge_edge(0, 1, {0}, -1.0, -1);
+    user_graph.add_or_merge_edge(1, 2, {1}, 1.0, -1);
+    user_graph.add_or_merge_boundary_edge(2, {2}, 1.0, -1);
+    auto compiled = user_graph.to_compiled_graph(pm::NUM_DISTINCT_WEIGHTS, false);
+    ASSERT_FALSE(compiled.has_search_graph());
+    auto workspace = compiled.make_workspace();
+    ASSERT_EQ(workspace.search_flooder.graph.nodes.size(), 0);
+    // Negative weight edges are accounted for in the workspace
+    ASSERT_EQ(workspace.flooder.negative_weight_detection_events, std::vector<uint64_t>({0, 1}));
+    ASSERT_EQ(workspace.flooder.negative_weight_observables, std::vector<size_t>({0}));
+    auto res = pm::decode_detection_events_for_up_to_64_observables(workspace, {0, 1}, false);
+    auto expected = pm::decode_detection_events_for_up_to_64_observables(user_graph.get_mwpm(), {0, 1}, false);
+    ASSERT_EQ(res, expected);
+}
@@ -0,0 +1,101 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_GRAPH_VIEW_H
+#define PYMATCHING2_GRAPH_VIEW_H
+
+#include <span>
+#include <utility>
+#include <vector>
+
+#include "pymatching/sparse_blossom/driver/user_graph.h"
+
+namespace pm {
+
+/// Read-only access to the nodes and edges of a matching graph, which may either be stored explicitly (as in a
+/// UserGraph) or resolved on demand (as in a PeriodicUserGraph). Edges are identified by an index, and the neighbors of
+/// a node are given in the same form as for a UserNode.
+class GraphView {
+   public:
+    virtual ~GraphView() = default;
+    virtual size_t num_nodes() const = 0;
+    virtual size_t num_observables() const = 0;
+    virtual bool is_boundary(size_t node) const = 0;
+    /// Replaces the contents of `neighbors` with the neighbors of `node`.
+    virtual void get_neighbors(size_t node, std::vector<UserNeighbor>& neighbors) const = 0;
+    virtual double edge_weight(size_t edge_index) const = 0;
+    virtual double edge_error_probability(size_t edge_index) const = 0;
+    virtual std::span<const size_t> edge_observables(size_t edge_index) const = 0;
+    /// The nodes of the edge, where the second node is SIZE_MAX for a boundary edge.
+    virtual std::pair<size_t, size_t> edge_nodes(size_t edge_index) const = 0;
+};
+
+/// A GraphView of a UserGraph, which must not be modified while the view is in use.
+class UserGraphView : public GraphView {
+   public:
+    explicit UserGraphView(UserGraph& user_graph);
+    size_t num_nodes() const override;
+    size_t num_observables() const override;
+    bool is_boundary(size_t node) const override;
+    void get_neighbors(size_t node, std::vector<UserNeighbor>& neighbors) const override;
+    double edge_weight(size_t edge_index) const override;
+    double edge_error_probability(size_t edge_index) const override;
+    std::span<const size_t> edge_observables(size_t edge_index) const override;
+    std::pair<size_t, size_t> edge_nodes(size_t edge_index) const override;
+
+   private:
+    const UserGraph& _user_graph;
+    size_t _num_observables;
+};
+
+inline UserGraphView::UserGraphView(UserGraph& user_graph)
+    : _user_graph(user_graph), _num_observables(user_graph.get_num_observables()) {
+}
+
+inline size_t UserGraphView::num_nodes() const {
+    return _user_graph.nodes.size();
+}
+
+inline size_t UserGraphView::num_observables() const {
+    return _num_observables;
+}
+
+inline bool UserGraphView::is_boundary(size_t node) const {
+    return _user_graph.nodes[node].is_boundary;
+}
+
+inline void UserGraphView::get_neighbors(size_t node, std::vector<UserNeighbor>& neighbors) const {
+    auto& node_neighbors = _user_graph.nodes[node].neighbors;
+    neighbors.assign(node_neighbors.begin(), node_neighbors.end());
+}
+
+inline double UserGraphView::edge_weight(size_t edge_index) const {
+    return _user_graph.edges.weight[edge_index];
+}
+
+inline double UserGraphView::edge_error_probability(size_t edge_index) const {
+    return _user_graph.edges.error_probability[edge_index];
+}
+
+inline std::span<const size_t> UserGraphView::edge_observables(size_t edge_index) const {
+    return _user_graph.edges.observables(edge_index);
+}
+
+inline std::pair<size_t, size_t> UserGraphView::edge_nodes(size_t edge_index) const {
+    return {_user_graph.edges.node1[edge_index], _user_graph.edges.node2[edge_index]};
+}
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_GRAPH_VIEW_H
@@ -15,6 +15,12 @@
 #ifndef PYMATCHING2_IMPLIED_WEIGHT_UNCONVERTED_H
 #define PYMATCHING2_IMPLIED_WEIGHT_UNCONVERTED_H
 
+#include <cmath>
+#include <cstdint>
+#include <span>
+#include <utility>
+#include <vector>
+
 #include "pymatching/sparse_blossom/ints.h"
 
 namespace pm {
@@ -29,12 +35,133 @@ struct ImpliedWeightUnconverted {
     }
 };
 
-struct ImpliedWeight {
-    weight_int* edge0_ptr;
-    weight_int* edge1_ptr;
+/// An implied weight where each edge weight is given by the index of the node it belongs to, and the index of the
+/// neighbor in that node's neighbor list. The second edge weight (the reverse direction of the edge) is absent, with
+/// node and neighbor index SIZE_MAX, if the edge is a boundary edge.
+struct ImpliedWeightIndices {
+    size_t node0;
+    size_t neighbor0;
+    size_t node1;
+    size_t neighbor1;
     weight_int implied_weight;
+    bool operator==(const ImpliedWeightIndices& other) const = default;
+};
+
+/// An unconverted implied weight of a directed edge of a graph that is still being constructed. Since a boundary edge
+/// is inserted before the other neighbors of its node, the neighbor index of an edge is only known once every edge has
+/// been added. So the edge is instead given by its `position` among the non-boundary edges of `node`, in the order
+/// they were added, or by SIZE_MAX if it is the boundary edge of `node`.
+struct DirectedImpliedWeightUnconverted {
+    size_t node;
+    size_t position;
+    ImpliedWeightUnconverted implied_weight;
+    bool operator==(const DirectedImpliedWeightUnconverted& other) const = default;
+};
+
+/// Appends the implied weights `implied_weights` of both directions of the edge from `u` to `v` (or of the boundary
+/// edge of `u`, if `v` is SIZE_MAX) to `implied_weights_unconverted`. Must be called before the edge is added to
+/// `nodes`.
+template <typename Node>
+void add_implied_weights_unconverted(
+    const std::vector<Node>& nodes,
+    size_t u,
+    size_t v,
+    std::span<const ImpliedWeightUnconverted> implied_weights,
+    std::vector<DirectedImpliedWeightUnconverted>& implied_weights_unconverted) {
+    auto next_position = [&](size_t node) {
+        auto& neighbors = nodes[node].neighbors;
+        return neighbors.size() - (!neighbors.empty() && neighbors[0] == nullptr);
+    };
+    for (auto& w : implied_weights) {
+        if (v == SIZE_MAX) {
+            implied_weights_unconverted.push_back({u, SIZE_MAX, w});
+        } else {
+            implied_weights_unconverted.push_back({u, next_position(u), w});
+            implied_weights_unconverted.push_back({v, next_position(v), w});
+        }
+    }
+}
+
+/// The implied weights of every edge of a graph, stored in a single array indexed by directed edge (in CSR form).
+/// Since the edge weights that each implied weight applies to are given by node and neighbor indices rather than by
+/// pointers, the table doesn't depend on where the graph is stored in memory. It is shared by a MatchingGraph and a
+/// SearchGraph with the same edges (whose nodes have the same neighbors, in the same order), and by their copies.
+class ImpliedWeights {
+   public:
+    /// The directed edge from node `i` to its `j`th neighbor has index `edge_offsets[i] + j`.
+    std::vector<size_t> edge_offsets;
+    /// The implied weights of directed edge `e` are `weights[weight_offsets[e]]` up to (but excluding)
+    /// `weights[weight_offsets[e + 1]]`.
+    std::vector<size_t> weight_offsets;
+    std::vector<ImpliedWeightIndices> weights;
+
+    /// The implied weights of the edge from `node` to its `neighbor_index`th neighbor. An edge that was added to the
+    /// graph after the table was built has none.
+    std::span<ImpliedWeightIndices> of_edge(size_t node, size_t neighbor_index) {
+        auto [begin, end] = weight_range(node, neighbor_index);
+        return {weights.data() + begin, weights.data() + end};
+    }
+    std::span<const ImpliedWeightIndices> of_edge(size_t node, size_t neighbor_index) const {
+        auto [begin, end] = weight_range(node, neighbor_index);
+        return {weights.data() + begin, weights.data() + end};
+    }
+    bool operator==(const ImpliedWeights& other) const = default;
+
+   private:
+    std::pair<size_t, size_t> weight_range(size_t node, size_t neighbor_index) const {
+        if (node + 1 >= edge_offsets.size() || neighbor_index >= edge_offsets[node + 1] - edge_offsets[node])
+            return {0, 0};
+        size_t e = edge_offsets[node] + neighbor_index;
+        return {weight_offsets[e], weight_offsets[e + 1]};
+    }
 };
 
+/// Converts the implied weights `implied_weights_unconverted` of a graph with nodes `nodes`, to which every edge has
+/// been added, into an ImpliedWeights table. Each implied weight is discretised in the same way as the edge weights,
+/// where `normalising_constant` is the constant that the edge weights were multiplied by.
+template <typename Node>
+ImpliedWeights build_implied_weights(
+    std::vector<Node>& nodes,
+    const std::vector<DirectedImpliedWeightUnconverted>& implied_weights_unconverted,
+    double normalising_constant) {
+    ImpliedWeights result;
+    result.edge_offsets.reserve(nodes.size() + 1);
+    result.edge_offsets.push_back(0);
+    for (auto& node : nodes)
+        result.edge_offsets.push_back(result.edge_offsets.back() + node.neighbors.size());
+    auto edge_index = [&](const DirectedImpliedWeightUnconverted& w) {
+        auto& neighbors = nodes[w.node].neighbors;
+        if (w.position == SIZE_MAX)
+            return result.edge_offsets[w.node];
+        bool has_boundary_edge = !neighbors.empty() && neighbors[0] == nullptr;
+        return result.edge_offsets[w.node] + w.position + has_boundary_edge;
+    };
+
+    // Count the implied weights of each directed edge, then place them, keeping the order of each edge's weights
+    result.weight_offsets.assign(result.edge_offsets.back() + 1, 0);
+    for (auto& w : implied_weights_unconverted)
+        result.weight_offsets[edge_index(w) + 1]++;
+    for (size_t e = 1; e < result.weight_offsets.size(); e++)
+        result.weight_offsets[e] += result.weight_offsets[e - 1];
+    std::vector<size_t> next_index(result.weight_offsets.begin(), result.weight_offsets.end() - 1);
+    result.weights.resize(implied_weights_unconverted.size());
+    double rescaled_normalising_constant = normalising_constant / 2;
+    for (auto& w : implied_weights_unconverted) {
+        size_t i = w.implied_weight.node1;
+        size_t j = w.implied_weight.node2;
+        size_t neighbor_i = nodes[i].index_of_neighbor(j == SIZE_MAX ? nullptr : &nodes[j]);
+        size_t neighbor_j = j == SIZE_MAX ? SIZE_MAX : nodes[j].index_of_neighbor(&nodes[i]);
+        auto weight =
+            (pm::signed_weight_int)std::round(w.implied_weight.implied_weight * rescaled_normalising_constant);
+        // Extremely important!
+        // If all edge weights are even integers, then all collision events occur at integer times.
+        weight *= 2;
+        result.weights[next_index[edge_index(w)]++] = {
+            i, neighbor_i, j, neighbor_j, static_cast<pm::weight_int>(std::abs(weight))};
+    }
+    return result;
+}
+
 }  // namespace pm
 
 #endif  // PYMATCHING2_IMPLIED_WEIGHT_UNCONVERTED_H
@@ -14,6 +14,8 @@
 
 #include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
 
+#include <bit>
+
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 
 pm::ExtendedMatchingResult::ExtendedMatchingResult() : obs_crossed(), weight(0) {
@@ -55,7 +57,29 @@ void pm::fill_bit_vector_from_obs_mask(pm::obs_int obs_mask, uint8_t* obs_begin_
     if (num_observables > max_obs)
         throw std::invalid_argument("Too many observables");
     for (size_t i = 0; i < num_observables; i++)
-        *(obs_begin_ptr + i) ^= (obs_mask & ((pm::obs_int)1 << i)) >> i;
+        *(obs_begin_ptr + i) ^= (uint8_t)((obs_mask >> i) & (pm::obs_int)1);
+}
+
+void pm::fill_bit_packed_array_from_obs_mask(pm::obs_int obs_mask, uint8_t* packed_begin_ptr, size_t num_bytes) {
+    if (num_bytes > sizeof(pm::obs_int))
+        throw std::invalid_argument("Too many observables");
+    for (size_t b = 0; b < num_bytes; b++)
+        packed_begin_ptr[b] ^= (uint8_t)((obs_mask >> (8 * b)) & (pm::obs_int)0xFF);
+}
+
+void pm::append_detection_events_from_bit_packed_array(
+    const uint8_t* packed_begin_ptr, size_t num_bytes, std::vector<uint64_t>& detection_events) {
+    for (size_t word_start = 0; word_start < num_bytes; word_start += 8) {
+        // Assemble a little-endian 64-bit word (compilers turn this into a single load on little-endian machines).
+        size_t word_bytes = std::min<size_t>(8, num_bytes - word_start);
+        uint64_t word = 0;
+        for (size_t b = 0; b < word_bytes; b++)
+            word |= (uint64_t)packed_begin_ptr[word_start + b] << (8 * b);
+        while (word) {
+            detection_events.push_back((word_start << 3) + std::countr_zero(word));
+            word &= word - 1;
+        }
+    }
 }
 
 pm::obs_int pm::bit_vector_to_obs_mask(const std::vector<uint8_t>& bit_vector) {
@@ -64,8 +88,10 @@ pm::obs_int pm::bit_vector_to_obs_mask(const std::vector<uint8_t>& bit_vector) {
     if (num_observables > max_obs)
         throw std::invalid_argument("Too many observables");
     pm::obs_int obs_mask = 0;
-    for (size_t i = 0; i < num_observables; i++)
-        obs_mask ^= bit_vector[i] << i;
+    for (size_t i = 0; i < num_observables; i++) {
+        if (bit_vector[i])
+            obs_mask ^= (pm::obs_int)1 << i;
+    }
     return obs_mask;
 }
 
@@ -271,6 +297,8 @@ void pm::decode_detection_events_to_edges(
         throw std::invalid_argument(
             "Mwpm object does not contain search flooder, which is required to decode to edges.");
     }
+    // The edges on the shortest paths are marked (and then unmarked) below
+    mwpm.search_flooder.graph.unshare_edge_markers();
     process_timeline_until_completion(mwpm, detection_events);
     mwpm.flooder.match_edges.clear();
     shatter_blossoms_for_all_detection_events_and_extract_match_edges(mwpm, detection_events);
@@ -46,12 +46,24 @@ inline void ExtendedMatchingResult::reset() {
 void fill_bit_vector_from_obs_mask(pm::obs_int obs_mask, uint8_t* obs_begin_ptr, size_t num_observables);
 obs_int bit_vector_to_obs_mask(const std::vector<uint8_t>& bit_vector);
 
+/// XORs the observable mask `obs_mask` into the `num_bytes` bytes starting at `packed_begin_ptr`, bit-packed in
+/// little-endian order (so that observable `k` is bit `k % 8` of byte `k / 8`).
+void fill_bit_packed_array_from_obs_mask(pm::obs_int obs_mask, uint8_t* packed_begin_ptr, size_t num_bytes);
+
+/// Appends the index of each set bit in the `num_bytes` bytes starting at `packed_begin_ptr` to `detection_events`,
+/// in increasing order, where the bits are packed in little-endian order (bit `k` is bit `k % 8` of byte `k / 8`).
+/// The bytes are scanned 64 bits at a time, so that sparse shots are cheap to convert.
+void append_detection_events_from_bit_packed_array(
+    const uint8_t* packed_begin_ptr, size_t num_bytes, std::vector<uint64_t>& detection_events);
+
 Mwpm detector_error_model_to_mwpm(
     const stim::DetectorErrorModel& detector_error_model,
     pm::weight_int num_distinct_weights,
     bool ensure_search_flooder_included = false,
     bool enable_correlations = false);
 
+/// Decodes detection events into an observable mask and solution weight. Only valid for graphs with at most
+/// `sizeof(pm::obs_int) * 8` observables (64, unless compiled with a larger `PYMATCHING_OBS_INT_BITS`).
 MatchingResult decode_detection_events_for_up_to_64_observables(
     pm::Mwpm& mwpm, const std::vector<uint64_t>& detection_events, bool edge_correlations);
 
@@ -15,6 +15,7 @@
 #include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
 
 #include "pymatching/perf/util.perf.h"
+#include "pymatching/sparse_blossom/driver/sliding_window.h"
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 #include "stim.h"
 
@@ -460,6 +461,39 @@ BENCHMARK(Decode_surface_r21_d21_p1000_to_edges_with_correlations) {
         .show_rate("shots", (double)shots.size());
 }
 
+BENCHMARK(Decode_surface_r21_d21_p1000_with_correlations) {
+    size_t rounds = 21;
+    auto data = generate_data(21, rounds, 0.001, 256, true);
+    auto &dem = data.first;
+    const auto &shots = data.second;
+
+    size_t num_buckets = pm::NUM_DISTINCT_WEIGHTS;
+    auto mwpm = pm::detector_error_model_to_mwpm(
+        dem, num_buckets, /*ensure_search_flooder_included=*/true, /*enable_correlations=*/true);
+
+    size_t num_dets = 0;
+    for (const auto &shot : shots) {
+        num_dets += shot.hits.size();
+    }
+    size_t num_mistakes = 0;
+    benchmark_go([&]() {
+        for (const auto &shot : shots) {
+            auto res =
+                pm::decode_detection_events_for_up_to_64_observables(mwpm, shot.hits, /*enable_correlations=*/true);
+            if (shot.obs_mask_as_u64() != res.obs_mask) {
+                num_mistakes++;
+            }
+        }
+    })
+        .goal_millis(30)
+        .show_rate("dets", (double)num_dets)
+        .show_rate("layers", (double)rounds * (double)shots.size())
+        .show_rate("shots", (double)shots.size());
+    if (num_mistakes == shots.size()) {
+        std::cerr << "data dependence";
+    }
+}
+
 BENCHMARK(Decode_surface_r21_d21_p10000) {
     size_t rounds = 21;
     auto data = generate_data(21, rounds, 0.0001, 512);
@@ -584,6 +618,39 @@ BENCHMARK(Decode_surface_r21_d21_p10000_to_edges_with_correlations) {
         .show_rate("shots", (double)shots.size());
 }
 
+BENCHMARK(Decode_surface_r21_d21_p10000_with_correlations) {
+    size_t rounds = 21;
+    auto data = generate_data(21, rounds, 0.0001, 512, true);
+    auto &dem = data.first;
+    const auto &shots = data.second;
+
+    size_t num_buckets = pm::NUM_DISTINCT_WEIGHTS;
+    auto mwpm = pm::detector_error_model_to_mwpm(
+        dem, num_buckets, /*ensure_search_flooder_included=*/true, /*enable_correlations=*/true);
+
+    size_t num_dets = 0;
+    for (const auto &shot : shots) {
+        num_dets += shot.hits.size();
+    }
+    size_t num_mistakes = 0;
+    benchmark_go([&]() {
+        for (const auto &shot : shots) {
+            auto res =
+                pm::decode_detection_events_for_up_to_64_observables(mwpm, shot.hits, /*enable_correlations=*/true);
+            if (shot.obs_mask_as_u64() != res.obs_mask) {
+                num_mistakes++;
+            }
+        }
+    })
+        .goal_millis(4.8)
+        .show_rate("dets", (double)num_dets)
+        .show_rate("layers", (double)rounds * (double)shots.size())
+        .show_rate("shots", (double)shots.size());
+    if (num_mistakes == shots.size()) {
+        std::cerr << "data dependence";
+    }
+}
+
 BENCHMARK(Decode_surface_r21_d21_p100000) {
     size_t rounds = 21;
     auto data = generate_data(21, rounds, 0.00001, 512);
@@ -707,3 +774,88 @@ BENCHMARK(Decode_surface_r21_d21_p100000_to_edges_with_correlations) {
         .show_rate("layers", (double)rounds * (double)shots.size())
         .show_rate("shots", (double)shots.size());
 }
+
+/// Decodes the same shots (of a distance 5 surface code memory experiment with `rounds` rounds) using the parallel
+/// window decoder with `num_threads` threads, or the full graph if `num_threads` is 0, so that the benchmarks for
+/// different numbers of threads show how the decoder scales. The shots are decoded one at a time (with the windows of
+/// each shot decoded concurrently), or as a batch (with whole shots decoded concurrently) if `batch` is true.
+void benchmark_parallel_window_decoding(size_t rounds, size_t num_threads, bool batch, size_t goal_micros) {
+    auto data = generate_data(5, rounds, 0.001, 8);
+    const auto &dem = data.first;
+    const auto &shots = data.second;
+
+    auto user_graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    std::set<uint64_t> detectors;
+    for (uint64_t d = 0; d < dem.count_detectors(); d++)
+        detectors.insert(d);
+    std::vector<double> detector_times(user_graph.get_num_nodes(), 0);
+    for (const auto &[d, coords] : dem.get_detector_coordinates(detectors))
+        detector_times[d] = coords.back();
+    pm::UserGraphView view(user_graph);
+    std::unique_ptr<pm::ParallelWindowDecoder> decoder;
+    if (num_threads > 0)
+        decoder = std::make_unique<pm::ParallelWindowDecoder>(view, detector_times, 50, 10, num_threads);
+    auto &mwpm = user_graph.get_mwpm();
+
+    size_t num_dets = 0;
+    for (const auto &shot : shots) {
+        num_dets += shot.hits.size();
+    }
+    std::vector<uint8_t> obs(1);
+    std::vector<uint8_t> batch_obs(shots.size());
+    std::vector<double> batch_weights(shots.size());
+    auto get_detection_events = [&](size_t i, std::vector<uint64_t> &detection_events) {
+        detection_events.insert(detection_events.end(), shots[i].hits.begin(), shots[i].hits.end());
+    };
+    benchmark_go([&]() {
+        if (batch) {
+            std::fill(batch_obs.begin(), batch_obs.end(), 0);
+            decoder->decode_batch(shots.size(), get_detection_events, batch_obs.data(), batch_weights.data());
+            return;
+        }
+        for (const auto &shot : shots) {
+            obs[0] = 0;
+            if (decoder) {
+                decoder->decode(shot.hits, obs.data());
+            } else {
+                pm::decode_detection_events_for_up_to_64_observables(mwpm, shot.hits, false);
+            }
+        }
+    })
+        .goal_micros(goal_micros)
+        .show_rate("dets", (double)num_dets)
+        .show_rate("layers", (double)rounds * (double)shots.size())
+        .show_rate("shots", (double)shots.size());
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000) {
+    benchmark_parallel_window_decoding(1000, 0, false, 1000);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_1_thread) {
+    benchmark_parallel_window_decoding(1000, 1, false, 2300);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_2_threads) {
+    benchmark_parallel_window_decoding(1000, 2, false, 1300);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_4_threads) {
+    benchmark_parallel_window_decoding(1000, 4, false, 800);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_8_threads) {
+    benchmark_parallel_window_decoding(1000, 8, false, 500);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_batch_2_threads) {
+    benchmark_parallel_window_decoding(1000, 2, true, 1200);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_batch_4_threads) {
+    benchmark_parallel_window_decoding(1000, 4, true, 600);
+}
+
+BENCHMARK(Decode_surface_r1000_d5_p1000_parallel_window_batch_8_threads) {
+    benchmark_parallel_window_decoding(1000, 8, true, 300);
+}
@@ -14,6 +14,7 @@
 
 #include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
 
+#include <algorithm>
 #include <fstream>
 
 #include "gtest/gtest.h"
@@ -182,6 +183,29 @@ bool previous_weights_equal(const pm::PreviousWeight& prev1, const pm::PreviousW
     return (*prev1.ptr == *prev2.ptr) && (prev1.val == prev2.val);
 }
 
+// Two tables of implied weights are equal if their offsets and implied weights (including the node and neighbor indices
+// of the edges they apply to) are equal, and the current weights of the edges they apply to are equal
+template <typename Node>
+bool implied_weights_equal(
+    const std::vector<Node>& nodes1,
+    const pm::ImpliedWeights& implied_weights1,
+    const std::vector<Node>& nodes2,
+    const pm::ImpliedWeights& implied_weights2) {
+    if (implied_weights1 != implied_weights2) {
+        return false;
+    }
+    for (auto& w : implied_weights1.weights) {
+        if (nodes1[w.node0].neighbor_weights[w.neighbor0] != nodes2[w.node0].neighbor_weights[w.neighbor0]) {
+            return false;
+        }
+        if ((w.node1 != SIZE_MAX) &&
+            (nodes1[w.node1].neighbor_weights[w.neighbor1] != nodes2[w.node1].neighbor_weights[w.neighbor1])) {
+            return false;
+        }
+    }
+    return true;
+}
+
 bool graph_structure_equal(const pm::MatchingGraph& graph1, const pm::MatchingGraph& graph2) {
     if ((graph1.negative_weight_detection_events_set != graph2.negative_weight_detection_events_set) ||
         (graph1.negative_weight_observables_set != graph2.negative_weight_observables_set) ||
@@ -190,7 +214,7 @@ bool graph_structure_equal(const pm::MatchingGraph& graph1, const pm::MatchingGr
         (graph1.num_nodes != graph2.num_nodes) || (graph1.num_observables != graph2.num_observables) ||
         (graph1.normalising_constant != graph2.normalising_constant) ||
         (graph1.previous_weights.size() != graph2.previous_weights.size()) ||
-        (graph1.edges_to_implied_weights_unconverted != graph2.edges_to_implied_weights_unconverted) ||
+        (graph1.implied_weights_unconverted != graph2.implied_weights_unconverted) ||
         (graph1.loaded_from_dem_without_correlations != graph2.loaded_from_dem_without_correlations)) {
         return false;
     }
@@ -206,8 +230,7 @@ bool graph_structure_equal(const pm::MatchingGraph& graph1, const pm::MatchingGr
     }
     for (size_t i = 0; i < graph1.nodes.size(); i++) {
         if ((graph1.nodes[i].neighbors.size() != graph2.nodes[i].neighbors.size()) ||
-            (graph1.nodes[i].neighbor_weights != graph2.nodes[i].neighbor_weights) ||
-            (graph1.nodes[i].neighbor_implied_weights.size() != graph2.nodes[i].neighbor_implied_weights.size())) {
+            !std::ranges::equal(graph1.nodes[i].neighbor_weights, graph2.nodes[i].neighbor_weights)) {
             return false;
         }
         for (size_t j = 0; j < graph1.nodes[i].neighbors.size(); j++) {
@@ -220,38 +243,14 @@ bool graph_structure_equal(const pm::MatchingGraph& graph1, const pm::MatchingGr
                 return false;
             }
         }
-        for (size_t j = 0; j < graph1.nodes[i].neighbor_implied_weights.size(); j++) {
-            if (graph1.nodes[i].neighbor_implied_weights[j].size() !=
-                graph2.nodes[i].neighbor_implied_weights[j].size()) {
-                return false;
-            }
-            for (size_t k = 0; k < graph1.nodes[i].neighbor_implied_weights[j].size(); k++) {
-                if (*graph1.nodes[i].neighbor_implied_weights[j][k].edge0_ptr !=
-                    *graph2.nodes[i].neighbor_implied_weights[j][k].edge0_ptr) {
-                    return false;
-                }
-                if (graph1.nodes[i].neighbor_implied_weights[j][k].implied_weight !=
-                    graph2.nodes[i].neighbor_implied_weights[j][k].implied_weight) {
-                    return false;
-                }
-                if ((graph1.nodes[i].neighbor_implied_weights[j][k].edge1_ptr == nullptr) &&
-                    (graph2.nodes[i].neighbor_implied_weights[j][k].edge1_ptr == nullptr)) {
-                    continue;
-                }
-                if (*graph1.nodes[i].neighbor_implied_weights[j][k].edge1_ptr !=
-                    *graph2.nodes[i].neighbor_implied_weights[j][k].edge1_ptr) {
-                    return false;
-                }
-            }
-        }
     }
-    return true;
+    return implied_weights_equal(graph1.nodes, *graph1.implied_weights, graph2.nodes, *graph2.implied_weights);
 }
 
 bool graph_structure_equal(const pm::SearchGraph& graph1, const pm::SearchGraph& graph2) {
     if ((graph1.num_nodes != graph2.num_nodes) ||
         (graph1.negative_weight_edges != graph2.negative_weight_edges) ||
-        (graph1.edges_to_implied_weights_unconverted != graph2.edges_to_implied_weights_unconverted) ||
+        (graph1.implied_weights_unconverted != graph2.implied_weights_unconverted) ||
         (graph1.previous_weights.size() != graph2.previous_weights.size())) {
         return false;
     }
@@ -267,8 +266,7 @@ bool graph_structure_equal(const pm::SearchGraph& graph1, const pm::SearchGraph&
     }
     for (size_t i = 0; i < graph1.nodes.size(); i++) {
         if ((graph1.nodes[i].neighbors.size() != graph2.nodes[i].neighbors.size()) ||
-            (graph1.nodes[i].neighbor_weights != graph2.nodes[i].neighbor_weights) ||
-            (graph1.nodes[i].neighbor_implied_weights.size() != graph2.nodes[i].neighbor_implied_weights.size())) {
+            !std::ranges::equal(graph1.nodes[i].neighbor_weights, graph2.nodes[i].neighbor_weights)) {
             return false;
         }
         for (size_t j = 0; j < graph1.nodes[i].neighbors.size(); j++) {
@@ -281,35 +279,8 @@ bool graph_structure_equal(const pm::SearchGraph& graph1, const pm::SearchGraph&
                 return false;
             }
         }
-        for (size_t j = 0; j < graph1.nodes[i].neighbor_implied_weights.size(); j++) {
-            if (graph1.nodes[i].neighbor_implied_weights[j].size() !=
-                graph2.nodes[i].neighbor_implied_weights[j].size()) {
-                return false;
-            }
-            for (size_t k = 0; k < graph1.nodes[i].neighbor_implied_weights[j].size(); k++) {
-                if (*graph1.nodes[i].neighbor_implied_weights[j][k].edge0_ptr !=
-                    *graph2.nodes[i].neighbor_implied_weights[j][k].edge0_ptr) {
-                    std::cout << *graph1.nodes[i].neighbor_implied_weights[j][k].edge0_ptr << std::endl;
-                    std::cout << *graph2.nodes[i].neighbor_implied_weights[j][k].edge0_ptr << std::endl;
-                    std::cout << graph1.nodes[i].neighbor_implied_weights[j][k].implied_weight << std::endl;
-                    return false;
-                }
-                if (graph1.nodes[i].neighbor_implied_weights[j][k].implied_weight !=
-                    graph2.nodes[i].neighbor_implied_weights[j][k].implied_weight) {
-                    return false;
-                }
-                if ((graph1.nodes[i].neighbor_implied_weights[j][k].edge1_ptr == nullptr) &&
-                    (graph2.nodes[i].neighbor_implied_weights[j][k].edge1_ptr == nullptr)) {
-                    continue;
-                }
-                if (*graph1.nodes[i].neighbor_implied_weights[j][k].edge1_ptr !=
-                    *graph2.nodes[i].neighbor_implied_weights[j][k].edge1_ptr) {
-                    return false;
-                }
-            }
-        }
     }
-    return true;
+    return implied_weights_equal(graph1.nodes, *graph1.implied_weights, graph2.nodes, *graph2.implied_weights);
 }
 
 TEST(MwpmCorrelatedDecoding, BetterLogicalErrorRateThanUncorrelated) {
@@ -436,7 +407,7 @@ TEST(MwpmDecoding, DecodeToMatchEdges) {
             break;
         pm::decode_detection_events_to_match_edges(mwpm, sparse_shot.hits);
         auto& match_edges = mwpm.flooder.match_edges;
-        uint64_t obs_mask = 0;
+        pm::obs_int obs_mask = 0;
         std::vector<uint64_t> dets;
         for (auto& e : match_edges) {
             obs_mask ^= e.obs_mask;
@@ -554,17 +525,41 @@ TEST(MwpmDecoding, BitVectorToObsMask) {
     ASSERT_EQ(pm::bit_vector_to_obs_mask({0, 1, 0, 0, 0, 0, 1, 1, 0, 0}), 194);
 }
 
+TEST(MwpmDecoding, FillBitPackedArrayFromObsMask) {
+    std::vector<uint8_t> packed = {0, 0, 1};
+    pm::fill_bit_packed_array_from_obs_mask((pm::obs_int)648 ^ ((pm::obs_int)1 << 17), packed.data(), 3);
+    ASSERT_EQ(packed, std::vector<uint8_t>({136, 2, 3}));
+    ASSERT_THROW(
+        pm::fill_bit_packed_array_from_obs_mask(0, packed.data(), sizeof(pm::obs_int) + 1), std::invalid_argument);
+}
+
+TEST(MwpmDecoding, AppendDetectionEventsFromBitPackedArray) {
+    for (size_t num_bytes : {0, 1, 7, 8, 9, 16, 23, 40}) {
+        std::vector<uint8_t> packed(num_bytes);
+        std::vector<uint64_t> expected = {1000};
+        for (size_t k = 0; k < num_bytes * 8; k++) {
+            if (k % 3 == 0 || k % 11 == 0 || k + 1 == num_bytes * 8) {
+                packed[k >> 3] |= 1 << (k & 7);
+                expected.push_back(k);
+            }
+        }
+        std::vector<uint64_t> detection_events = {1000};
+        pm::append_detection_events_from_bit_packed_array(packed.data(), num_bytes, detection_events);
+        ASSERT_EQ(detection_events, expected);
+    }
+}
+
 TEST(MwpmDecoding, HandleAllNegativeWeights) {
     for (size_t num_nodes : {50, 80}) {
         auto mwpm = pm::Mwpm(
             pm::GraphFlooder(pm::MatchingGraph(num_nodes, num_nodes)), pm::SearchFlooder(pm::SearchGraph(num_nodes)));
         auto& g = mwpm.flooder.graph;
         for (size_t i = 0; i < num_nodes; i++)
-            g.add_edge(i, (i + 1) % num_nodes, -2, {i}, {});
+            g.add_edge(i, (i + 1) % num_nodes, -2, std::vector<size_t>{i}, {});
 
         if (num_nodes > sizeof(pm::obs_int) * 8) {
             for (size_t i = 0; i < num_nodes; i++)
-                mwpm.search_flooder.graph.add_edge(i, (i + 1) % num_nodes, -2, {i}, {});
+                mwpm.search_flooder.graph.add_edge(i, (i + 1) % num_nodes, -2, std::vector<size_t>{i}, {});
         }
 
         mwpm.flooder.sync_negative_weight_observables_and_detection_events();
@@ -602,21 +597,21 @@ TEST(MwpmDecoding, HandleSomeNegativeWeights) {
             pm::GraphFlooder(pm::MatchingGraph(num_nodes, max_obs + 1)), pm::SearchFlooder(pm::SearchGraph(num_nodes)));
 
         auto& g = mwpm.flooder.graph;
-        g.add_boundary_edge(0, -4, {max_obs}, {});
+        g.add_boundary_edge(0, -4, std::vector<size_t>{max_obs}, {});
         for (size_t i = 0; i < 7; i += 2)
-            g.add_edge(i, i + 1, 2, {i + 1}, {});
+            g.add_edge(i, i + 1, 2, std::vector<size_t>{i + 1}, {});
         for (size_t i = 1; i < 7; i += 2)
-            g.add_edge(i, i + 1, -4, {i + 1}, {});
-        g.add_boundary_edge(7, 2, {num_nodes}, {});
+            g.add_edge(i, i + 1, -4, std::vector<size_t>{i + 1}, {});
+        g.add_boundary_edge(7, 2, std::vector<size_t>{num_nodes}, {});
 
         if (max_obs > sizeof(pm::obs_int) * 8) {
             auto& h = mwpm.search_flooder.graph;
-            h.add_boundary_edge(0, -4, {max_obs}, {});
+            h.add_boundary_edge(0, -4, std::vector<size_t>{max_obs}, {});
             for (size_t i = 0; i < 7; i += 2)
-                h.add_edge(i, i + 1, 2, {i + 1}, {});
+                h.add_edge(i, i + 1, 2, std::vector<size_t>{i + 1}, {});
             for (size_t i = 1; i < 7; i += 2)
-                h.add_edge(i, i + 1, -4, {i + 1}, {});
-            h.add_boundary_edge(7, 2, {num_nodes}, {});
+                h.add_edge(i, i + 1, -4, std::vector<size_t>{i + 1}, {});
+            h.add_boundary_edge(7, 2, std::vector<size_t>{num_nodes}, {});
         }
 
         mwpm.flooder.sync_negative_weight_observables_and_detection_events();
@@ -725,7 +720,7 @@ TEST(MwpmDecoding, NoValidSolutionForLineGraph) {
     auto mwpm = pm::Mwpm(pm::GraphFlooder(pm::MatchingGraph(num_nodes, num_nodes)));
     auto& g = mwpm.flooder.graph;
     for (size_t i = 0; i < num_nodes; i++)
-        g.add_edge(i, (i + 1) % num_nodes, 2, {i}, {});
+        g.add_edge(i, (i + 1) % num_nodes, 2, std::vector<size_t>{i}, {});
     pm::ExtendedMatchingResult res(num_nodes);
     EXPECT_THROW(
         pm::decode_detection_events(mwpm, {0, 2, 3}, res.obs_crossed.data(), res.weight, /*enable_correlations=*/false);
@@ -15,15 +15,191 @@
 #include "pymatching/sparse_blossom/driver/namespaced_main.h"
 
 #include <chrono>
+#include <cmath>
 #include <cstring>
 #include <iostream>
+#include <map>
 #include <vector>
 
 #include "pymatching/sparse_blossom/diagram/animation_main.h"
 #include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "pymatching/sparse_blossom/driver/parallel.h"
+#include "pymatching/sparse_blossom/driver/serialization.h"
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 #include "stim.h"
 
+namespace {
+
+/// A chunk of consecutive shots, read from the input and decoded together by one thread.
+struct ShotChunk {
+    /// The shots in the chunk. Only the first `num_shots` are valid (the vector is reused between chunks).
+    std::vector<stim::SparseShot> shots;
+    size_t num_shots = 0;
+    /// The predicted observables for each shot, with `num_observables` bytes per shot.
+    std::vector<uint8_t> predictions;
+    /// The number of shots in the chunk for which the predicted observables were wrong.
+    size_t num_mistakes = 0;
+    /// The time taken to decode each shot, in nanoseconds (only recorded if decoding statistics are requested).
+    std::vector<uint64_t> decode_nanoseconds;
+};
+
+/// Reads up to `chunk_size` shots into `chunk`, returning false if there were no shots left to read. If `obs_reader`
+/// is not null, then the observables of each shot are read from it, rather than from `reader`.
+bool read_shot_chunk(
+    stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH> &reader,
+    stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH> *obs_reader,
+    size_t chunk_size,
+    ShotChunk &chunk) {
+    chunk.num_shots = 0;
+    stim::SparseShot obs_shot;
+    while (chunk.num_shots < chunk_size) {
+        if (chunk.shots.size() == chunk.num_shots)
+            chunk.shots.emplace_back();
+        auto &shot = chunk.shots[chunk.num_shots];
+        shot.clear();
+        if (!reader.start_and_read_entire_record(shot))
+            break;
+        if (obs_reader != nullptr) {
+            obs_shot.clear();
+            if (!obs_reader->start_and_read_entire_record(obs_shot)) {
+                throw std::invalid_argument("Obs data ended before shot data ended.");
+            }
+            shot.obs_mask = obs_shot.obs_mask;
+        }
+        chunk.num_shots++;
+    }
+    return chunk.num_shots > 0;
+}
+
+/// Accumulates statistics about the time taken to decode each shot. The memory used is independent of the number of
+/// shots: decoding times are counted in logarithmically spaced buckets (each 1% wider than the last), so the
+/// percentiles are accurate to within 1%.
+struct DecodingStats {
+    struct DetectionEventsBin {
+        size_t num_shots = 0;
+        uint64_t total_nanoseconds = 0;
+        uint64_t max_nanoseconds = 0;
+    };
+
+    size_t num_shots = 0;
+    uint64_t total_nanoseconds = 0;
+    uint64_t max_nanoseconds = 0;
+    std::vector<size_t> bucket_counts;
+    /// Decoding times of the shots, binned by the number of detection events in the shot.
+    std::map<size_t, DetectionEventsBin> detection_events_bins;
+
+    static size_t bucket_of(uint64_t nanoseconds) {
+        if (nanoseconds <= 1)
+            return 0;
+        return (size_t)std::ceil(std::log((double)nanoseconds) / std::log(1.01));
+    }
+
+    void add_shot(size_t num_detection_events, uint64_t nanoseconds) {
+        num_shots++;
+        total_nanoseconds += nanoseconds;
+        max_nanoseconds = std::max(max_nanoseconds, nanoseconds);
+        size_t b = bucket_of(nanoseconds);
+        if (b >= bucket_counts.size())
+            bucket_counts.resize(b + 1, 0);
+        bucket_counts[b]++;
+        auto &bin = detection_events_bins[num_detection_events];
+        bin.num_shots++;
+        bin.total_nanoseconds += nanoseconds;
+        bin.max_nanoseconds = std::max(bin.max_nanoseconds, nanoseconds);
+    }
+
+    /// The decoding time in microseconds that a fraction `p` of shots took at most to decode.
+    double percentile_micros(double p) const {
+        size_t target = std::max<size_t>(1, (size_t)std::ceil(p * (double)num_shots));
+        size_t cumulative = 0;
+        for (size_t b = 0; b < bucket_counts.size(); b++) {
+            cumulative += bucket_counts[b];
+            if (cumulative >= target)
+                return std::min(std::pow(1.01, (double)b), (double)max_nanoseconds) / 1000;
+        }
+        return (double)max_nanoseconds / 1000;
+    }
+
+    void write_json(FILE *out, size_t num_mistakes, size_t num_threads, double total_seconds) const {
+        double mean_micros = num_shots ? (double)total_nanoseconds / (double)num_shots / 1000 : 0;
+        fprintf(out, "{\n");
+        fprintf(out, "  \"num_shots\": %zu,\n", num_shots);
+        fprintf(out, "  \"num_mistakes\": %zu,\n", num_mistakes);
+        fprintf(out, "  \"num_threads\": %zu,\n", num_threads);
+        fprintf(out, "  \"total_seconds\": %.9g,\n", total_seconds);
+        fprintf(out, "  \"shots_per_second\": %.9g,\n", total_seconds > 0 ? (double)num_shots / total_seconds : 0);
+        fprintf(out, "  \"decode_time_us\": {\n");
+        fprintf(out, "    \"mean\": %.9g,\n", mean_micros);
+        fprintf(out, "    \"p50\": %.9g,\n", percentile_micros(0.5));
+        fprintf(out, "    \"p90\": %.9g,\n", percentile_micros(0.9));
+        fprintf(out, "    \"p99\": %.9g,\n", percentile_micros(0.99));
+        fprintf(out, "    \"max\": %.9g\n", (double)max_nanoseconds / 1000);
+        fprintf(out, "  },\n");
+        fprintf(out, "  \"detection_events_histogram\": [");
+        bool first = true;
+        for (const auto &[num_detection_events, bin] : detection_events_bins) {
+            fprintf(
+                out,
+                "%s\n    {\"num_detection_events\": %zu, \"num_shots\": %zu, \"mean_decode_time_us\": %.9g, "
+                "\"max_decode_time_us\": %.9g}",
+                first ? "" : ",",
+                num_detection_events,
+                bin.num_shots,
+                (double)bin.total_nanoseconds / (double)bin.num_shots / 1000,
+                (double)bin.max_nanoseconds / 1000);
+            first = false;
+        }
+        fprintf(out, "%s]\n}\n", first ? "" : "\n  ");
+    }
+};
+
+/// The compiled graph to decode with, loaded either from a detector error model (given by `--dem`) or from a file
+/// written by `Matching.save` in the Python API (given by `--compiled_dem`).
+struct DecodingGraph {
+    pm::CompiledMatchingGraph compiled_graph;
+    size_t num_detectors;
+    size_t num_observables;
+};
+
+DecodingGraph load_decoding_graph(int argc, const char **argv, bool enable_correlations) {
+    const char *compiled_dem_path = stim::find_argument("--compiled_dem", argc, argv);
+    if (compiled_dem_path == nullptr) {
+        FILE *dem_file = stim::find_open_file_argument("--dem", nullptr, "r", argc, argv);
+        stim::DetectorErrorModel dem = stim::DetectorErrorModel::from_file(dem_file);
+        fclose(dem_file);
+        pm::weight_int num_buckets = pm::NUM_DISTINCT_WEIGHTS;
+        auto user_graph = pm::detector_error_model_to_user_graph(dem, enable_correlations, num_buckets);
+        return {
+            user_graph.to_compiled_graph(num_buckets, /*ensure_search_graph_included=*/enable_correlations),
+            dem.count_detectors(),
+            dem.count_observables()};
+    }
+    if (stim::find_argument("--dem", argc, argv) != nullptr) {
+        throw std::invalid_argument("Only one of --dem and --compiled_dem can be specified.");
+    }
+    auto compiled_graph = pm::load_compiled_graph_file(compiled_dem_path);
+    if (enable_correlations && (compiled_graph.matching_graph().loaded_from_dem_without_correlations ||
+                                !compiled_graph.has_search_graph())) {
+        throw std::invalid_argument(
+            "--enable_correlations requires a --compiled_dem file saved from a graph loaded with "
+            "enable_correlations=True.");
+    }
+    size_t num_detectors = compiled_graph.matching_graph().nodes.size();
+    size_t num_observables = compiled_graph.matching_graph().num_observables;
+    return {std::move(compiled_graph), num_detectors, num_observables};
+}
+
+/// Creates an independent decoder for each of `num_threads` threads.
+std::vector<pm::Mwpm> make_decoders_for_threads(const pm::CompiledMatchingGraph &compiled_graph, size_t num_threads) {
+    std::vector<pm::Mwpm> mwpms;
+    mwpms.reserve(num_threads);
+    for (size_t k = 0; k < num_threads; k++)
+        mwpms.push_back(compiled_graph.make_workspace());
+    return mwpms;
+}
+
+}  // namespace
+
 int main_predict(int argc, const char **argv) {
     stim::check_for_unknown_arguments(
         {
@@ -33,7 +209,10 @@ int main_predict(int argc, const char **argv) {
             "--out",
             "--out_format",
             "--dem",
+            "--compiled_dem",
             "--enable_correlations",
+            "--threads",
+            "--chunk_size",
         },
         {},
         "predict",
@@ -42,41 +221,69 @@ int main_predict(int argc, const char **argv) {
 
     FILE *shots_in = stim::find_open_file_argument("--in", stdin, "rb", argc, argv);
     FILE *predictions_out = stim::find_open_file_argument("--out", stdout, "wb", argc, argv);
-    FILE *dem_file = stim::find_open_file_argument("--dem", nullptr, "r", argc, argv);
     stim::FileFormatData shots_in_format =
         stim::find_enum_argument("--in_format", "b8", stim::format_name_to_enum_map(), argc, argv);
     stim::FileFormatData predictions_out_format =
         stim::find_enum_argument("--out_format", "01", stim::format_name_to_enum_map(), argc, argv);
     bool append_obs = stim::find_bool_argument("--in_includes_appended_observables", argc, argv);
     bool enable_correlations = stim::find_bool_argument("--enable_correlations", argc, argv);
+    size_t num_threads = (size_t)stim::find_int64_argument("--threads", 1, 1, 1 << 16, argc, argv);
+    size_t chunk_size = (size_t)stim::find_int64_argument("--chunk_size", 1024, 1, INT64_MAX, argc, argv);
 
-    stim::DetectorErrorModel dem = stim::DetectorErrorModel::from_file(dem_file);
-    fclose(dem_file);
-
-    size_t num_obs = dem.count_observables();
+    auto graph = load_decoding_graph(argc, argv, enable_correlations);
+    size_t num_obs = graph.num_observables;
     auto reader = stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH>::make(
-        shots_in, shots_in_format.id, 0, dem.count_detectors(), append_obs * num_obs);
+        shots_in, shots_in_format.id, 0, graph.num_detectors, append_obs * num_obs);
     auto writer = stim::MeasureRecordWriter::make(predictions_out, predictions_out_format.id);
     writer->begin_result_type('L');
 
-    pm::weight_int num_buckets = pm::NUM_DISTINCT_WEIGHTS;
-    auto mwpm = pm::detector_error_model_to_mwpm(
-        dem,
-        num_buckets,
-        /*ensure_search_flooder_included=*/enable_correlations,
-        /*enable_correlations=*/enable_correlations);
-
-    stim::SparseShot sparse_shot;
-    sparse_shot.clear();
-    pm::ExtendedMatchingResult res(mwpm.flooder.graph.num_observables);
-    while (reader->start_and_read_entire_record(sparse_shot)) {
-        pm::decode_detection_events(mwpm, sparse_shot.hits, res.obs_crossed.data(), res.weight, enable_correlations);
-        for (size_t k = 0; k < num_obs; k++) {
-            writer->write_bit(res.obs_crossed[k]);
-        }
-        writer->write_end();
+    if (num_threads == 1) {
+        auto mwpm = graph.compiled_graph.make_workspace();
+        stim::SparseShot sparse_shot;
         sparse_shot.clear();
-        res.reset();
+        pm::ExtendedMatchingResult res(mwpm.flooder.graph.num_observables);
+        while (reader->start_and_read_entire_record(sparse_shot)) {
+            pm::decode_detection_events(
+                mwpm, sparse_shot.hits, res.obs_crossed.data(), res.weight, enable_correlations);
+            for (size_t k = 0; k < num_obs; k++) {
+                writer->write_bit(res.obs_crossed[k]);
+            }
+            writer->write_end();
+            sparse_shot.clear();
+            res.reset();
+        }
+    } else {
+        // Shots are read in chunks on one thread, decoded in parallel by `num_threads` threads (each with its own
+        // decoder), and written out in order. At most two chunks per thread are held in memory at once.
+        auto mwpms = make_decoders_for_threads(graph.compiled_graph, num_threads);
+        size_t num_graph_obs = mwpms[0].flooder.graph.num_observables;
+        pm::run_ordered_pipeline<ShotChunk>(
+            num_threads,
+            2 * num_threads,
+            [&](ShotChunk &chunk) {
+                return read_shot_chunk(*reader, nullptr, chunk_size, chunk);
+            },
+            [&](size_t thread_index, ShotChunk &chunk) {
+                auto &mwpm = mwpms[thread_index];
+                chunk.predictions.assign(chunk.num_shots * num_graph_obs, 0);
+                pm::total_weight_int weight = 0;
+                for (size_t i = 0; i < chunk.num_shots; i++) {
+                    pm::decode_detection_events(
+                        mwpm,
+                        chunk.shots[i].hits,
+                        chunk.predictions.data() + i * num_graph_obs,
+                        weight,
+                        enable_correlations);
+                }
+            },
+            [&](ShotChunk &chunk) {
+                for (size_t i = 0; i < chunk.num_shots; i++) {
+                    for (size_t k = 0; k < num_obs; k++) {
+                        writer->write_bit(chunk.predictions[i * num_graph_obs + k]);
+                    }
+                    writer->write_end();
+                }
+            });
     }
     if (predictions_out != stdout) {
         fclose(predictions_out);
@@ -98,8 +305,12 @@ int main_count_mistakes(int argc, const char **argv) {
             "--obs_in_format",
             "--out",
             "--dem",
+            "--compiled_dem",
             "--time",
             "--enable_correlations",
+            "--threads",
+            "--chunk_size",
+            "--stats_out",
         },
         {},
         "count_mistakes",
@@ -109,7 +320,6 @@ int main_count_mistakes(int argc, const char **argv) {
     FILE *shots_in = stim::find_open_file_argument("--in", stdin, "rb", argc, argv);
     FILE *obs_in = stim::find_open_file_argument("--obs_in", stdin, "rb", argc, argv);
     FILE *stats_out = stim::find_open_file_argument("--out", stdout, "wb", argc, argv);
-    FILE *dem_file = stim::find_open_file_argument("--dem", nullptr, "r", argc, argv);
     stim::FileFormatData shots_in_format =
         stim::find_enum_argument("--in_format", "01", stim::format_name_to_enum_map(), argc, argv);
     stim::FileFormatData obs_in_format =
@@ -118,49 +328,69 @@ int main_count_mistakes(int argc, const char **argv) {
     bool enable_correlations = stim::find_bool_argument("--enable_correlations", argc, argv);
 
     bool time = stim::find_bool_argument("--time", argc, argv);
+    size_t num_threads = (size_t)stim::find_int64_argument("--threads", 1, 1, 1 << 16, argc, argv);
+    size_t chunk_size = (size_t)stim::find_int64_argument("--chunk_size", 1024, 1, INT64_MAX, argc, argv);
+    const char *stats_out_path = stim::find_argument("--stats_out", argc, argv);
     if (!append_obs && obs_in == nullptr) {
         throw std::invalid_argument("Must specify --in_includes_appended_observables or --obs_in.");
     }
 
-    stim::DetectorErrorModel dem = stim::DetectorErrorModel::from_file(dem_file);
-    fclose(dem_file);
-
-    size_t num_obs = dem.count_observables();
+    auto graph = load_decoding_graph(argc, argv, enable_correlations);
+    size_t num_obs = graph.num_observables;
     std::unique_ptr<stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH>> obs_reader;
     if (obs_in != stdin) {
         obs_reader = stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH>::make(obs_in, obs_in_format.id, 0, 0, num_obs);
     }
     auto reader = stim::MeasureRecordReader<stim::MAX_BITWORD_WIDTH>::make(
-        shots_in, shots_in_format.id, 0, dem.count_detectors(), append_obs * num_obs);
+        shots_in, shots_in_format.id, 0, graph.num_detectors, append_obs * num_obs);
 
-    pm::weight_int num_buckets = pm::NUM_DISTINCT_WEIGHTS;
-    auto mwpm = pm::detector_error_model_to_mwpm(
-        dem,
-        num_buckets,
-        /*ensure_search_flooder_included=*/enable_correlations,
-        /*enable_correlations=*/enable_correlations);
+    auto mwpms = make_decoders_for_threads(graph.compiled_graph, num_threads);
 
-    stim::SparseShot sparse_shot;
-    stim::SparseShot obs_shot;
     size_t num_mistakes = 0;
     size_t num_shots = 0;
+    // Each shot is only timed individually if the statistics are to be written
+    bool collect_stats = stats_out_path != nullptr;
+    DecodingStats stats;
     auto start = std::chrono::steady_clock::now();
-    while (reader->start_and_read_entire_record(sparse_shot)) {
-        if (obs_reader == nullptr) {
-            obs_shot.obs_mask = sparse_shot.obs_mask;
-        } else {
-            if (!obs_reader->start_and_read_entire_record(obs_shot)) {
-                throw std::invalid_argument("Obs data ended before shot data ended.");
+    // Shots are read in chunks on one thread and decoded in parallel by `num_threads` threads. At most two chunks per
+    // thread are held in memory at once.
+    pm::run_ordered_pipeline<ShotChunk>(
+        num_threads,
+        2 * num_threads,
+        [&](ShotChunk &chunk) {
+            return read_shot_chunk(*reader, obs_reader.get(), chunk_size, chunk);
+        },
+        [&](size_t thread_index, ShotChunk &chunk) {
+            auto &mwpm = mwpms[thread_index];
+            chunk.num_mistakes = 0;
+            chunk.decode_nanoseconds.resize(collect_stats ? chunk.num_shots : 0);
+            for (size_t i = 0; i < chunk.num_shots; i++) {
+                auto &shot = chunk.shots[i];
+                pm::MatchingResult res;
+                if (collect_stats) {
+                    auto shot_start = std::chrono::steady_clock::now();
+                    res = pm::decode_detection_events_for_up_to_64_observables(mwpm, shot.hits, enable_correlations);
+                    auto shot_end = std::chrono::steady_clock::now();
+                    chunk.decode_nanoseconds[i] =
+                        std::chrono::duration_cast<std::chrono::nanoseconds>(shot_end - shot_start).count();
+                } else {
+                    res = pm::decode_detection_events_for_up_to_64_observables(mwpm, shot.hits, enable_correlations);
+                }
+                if (shot.obs_mask_as_u64() != res.obs_mask) {
+                    chunk.num_mistakes++;
+                }
             }
-        }
-        auto res = pm::decode_detection_events_for_up_to_64_observables(mwpm, sparse_shot.hits, enable_correlations);
-        if (obs_shot.obs_mask_as_u64() != res.obs_mask) {
-            num_mistakes++;
-        }
-        sparse_shot.clear();
-        obs_shot.clear();
-        num_shots++;
-    }
+        },
+        [&](ShotChunk &chunk) {
+            num_mistakes += chunk.num_mistakes;
+            num_shots += chunk.num_shots;
+            if (collect_stats) {
+                for (size_t i = 0; i < chunk.num_shots; i++)
+                    stats.add_shot(chunk.shots[i].hits.size(), chunk.decode_nanoseconds[i]);
+            }
+        });
+    auto end = std::chrono::steady_clock::now();
+
     fprintf(stats_out, "%zu / %zu\n", num_mistakes, num_shots);
     if (stats_out != stdout) {
         fclose(stats_out);
@@ -169,12 +399,19 @@ int main_count_mistakes(int argc, const char **argv) {
         fclose(shots_in);
     }
 
-    auto end = std::chrono::steady_clock::now();
     auto microseconds = (double)std::chrono::duration_cast<std::chrono::microseconds>(end - start).count();
     if (time) {
         std::cerr << "Total decoding time: " << (int)microseconds << "us\n";
         std::cerr << "Decoding time per shot: " << (microseconds / num_shots) << "us\n";
     }
+    if (stats_out_path != nullptr) {
+        FILE *json_out = fopen(stats_out_path, "w");
+        if (json_out == nullptr) {
+            throw std::invalid_argument("Failed to open '" + std::string(stats_out_path) + "'");
+        }
+        stats.write_json(json_out, num_mistakes, num_threads, microseconds / 1e6);
+        fclose(json_out);
+    }
 
     return EXIT_SUCCESS;
 }
@@ -201,10 +438,11 @@ int pm::main(int argc, const char **argv) {
 
     std::stringstream ss;
     ss << "Unrecognized command. Available commands are:\n";
-    ss << "    pymatching predict --dem file [--in file] [--out file] [--in_format 01|b8|...] [--out_format 01|b8|...] "
-          "[--in_includes_appended_observables]\n";
-    ss << "    pymatching count_mistakes --dem file [--in file] [--out file] [--in_format 01|b8|...] [--out_format "
-          "01|B8|...] [--in_includes_appended_observables] [--obs_in] [--obs_in_format]\n";
+    ss << "    pymatching predict --dem file|--compiled_dem file [--in file] [--out file] [--in_format 01|b8|...] [--out_format 01|b8|...] "
+          "[--in_includes_appended_observables] [--enable_correlations] [--threads #] [--chunk_size #]\n";
+    ss << "    pymatching count_mistakes --dem file|--compiled_dem file [--in file] [--out file] [--in_format 01|b8|...] [--out_format "
+          "01|B8|...] [--in_includes_appended_observables] [--obs_in] [--obs_in_format] [--enable_correlations] "
+          "[--time] [--threads #] [--chunk_size #] [--stats_out file]\n";
     ss << "    pymatching animate "
           "--dets_in <file> "
           "--dets_in_format 01|b8|... "
@@ -15,6 +15,7 @@
 #include "pymatching/sparse_blossom/driver/namespaced_main.h"
 
 #include "gtest/gtest.h"
+#include "pymatching/sparse_blossom/driver/serialization.h"
 
 struct RaiiTempNamedFile {
     int descriptor;
@@ -96,6 +97,43 @@ shot L1
 )stdout");
 }
 
+TEST(Main, predict_threads) {
+    RaiiTempNamedFile dem;
+    FILE *f = fopen(dem.path.c_str(), "w");
+    fprintf(f, "%s", R"DEM(
+        error(0.1) D0 L0
+        error(0.1) D0 D1 L1
+        error(0.1) D1 L2
+    )DEM");
+    fclose(f);
+    std::string input;
+    std::string expected;
+    const char *shots[] = {"shot\n", "shot D0\n", "shot D1\n", "shot D0 D1\n"};
+    const char *predictions[] = {"shot\n", "shot L0\n", "shot L2\n", "shot L1\n"};
+    for (size_t k = 0; k < 101; k++) {
+        input += shots[(k * k) % 4];
+        expected += predictions[(k * k) % 4];
+    }
+    for (const char *num_threads : {"2", "3"}) {
+        for (const char *chunk_size : {"1", "7", "1000"}) {
+            auto stdout = result_of_running_main(
+                {"predict",
+                 "--dem",
+                 dem.path,
+                 "--in_format",
+                 "dets",
+                 "--out_format",
+                 "dets",
+                 "--threads",
+                 num_threads,
+                 "--chunk_size",
+                 chunk_size},
+                input);
+            ASSERT_EQ(stdout, expected);
+        }
+    }
+}
+
 TEST(Main, count_mistakes) {
     RaiiTempNamedFile dem;
     FILE *f = fopen(dem.path.c_str(), "w");
@@ -120,3 +158,91 @@ shot D1 L2
 shot D0 D1 L1)stdin");
     ASSERT_EQ(stdout_text, "1 / 4\n");
 }
+
+TEST(Main, count_mistakes_threads_and_stats_out) {
+    RaiiTempNamedFile dem;
+    FILE *f = fopen(dem.path.c_str(), "w");
+    fprintf(f, "%s", R"DEM(
+        error(0.1) D0 L0
+        error(0.1) D0 D1 L1
+        error(0.1) D1 L2
+    )DEM");
+    fclose(f);
+    std::string input;
+    const char *shots[] = {"shot L0\n", "shot D0 L0\n", "shot D1 L2\n", "shot D0 D1 L1\n"};
+    for (size_t k = 0; k < 100; k++) {
+        input += shots[k % 4];
+    }
+    for (const char *num_threads : {"1", "2", "3"}) {
+        RaiiTempNamedFile stats;
+        auto stdout_text = result_of_running_main(
+            {"count_mistakes",
+             "--dem",
+             dem.path,
+             "--in_format",
+             "dets",
+             "--in_includes_appended_observables",
+             "--threads",
+             num_threads,
+             "--chunk_size",
+             "7",
+             "--stats_out",
+             stats.path},
+            input);
+        ASSERT_EQ(stdout_text, "25 / 100\n");
+
+        f = fopen(stats.path.c_str(), "r");
+        ASSERT_NE(f, nullptr);
+        std::string json;
+        for (int c = getc(f); c != EOF; c = getc(f)) {
+            json.push_back((char)c);
+        }
+        fclose(f);
+        ASSERT_NE(json.find("\"num_shots\": 100,"), std::string::npos);
+        ASSERT_NE(json.find("\"num_mistakes\": 25,"), std::string::npos);
+        ASSERT_NE(json.find("\"num_threads\": " + std::string(num_threads) + ","), std::string::npos);
+        for (const char *key : {"\"shots_per_second\"", "\"p50\"", "\"p90\"", "\"p99\"", "\"max\""}) {
+            ASSERT_NE(json.find(key), std::string::npos) << key;
+        }
+        ASSERT_NE(json.find("{\"num_detection_events\": 0, \"num_shots\": 25,"), std::string::npos);
+        ASSERT_NE(json.find("{\"num_detection_events\": 1, \"num_shots\": 50,"), std::string::npos);
+        ASSERT_NE(json.find("{\"num_detection_events\": 2, \"num_shots\": 25,"), std::string::npos);
+    }
+}
+
+TEST(Main, predict_and_count_mistakes_with_compiled_dem) {
+    auto dem = stim::DetectorErrorModel(R"DEM(
+        error(0.1) D0 L0
+        error(0.1) D0 D1 L1
+        error(0.1) D1 L2
+    )DEM");
+    auto user_graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    RaiiTempNamedFile compiled_dem;
+    FILE *f = fopen(compiled_dem.path.c_str(), "wb");
+    auto data = pm::serialize_user_graph(user_graph, true);
+    fwrite(data.data(), 1, data.size(), f);
+    fclose(f);
+
+    ASSERT_EQ(
+        result_of_running_main(
+            {"predict", "--compiled_dem", compiled_dem.path, "--in_format", "dets", "--out_format", "dets"},
+            "shot\nshot D0\nshot D1\nshot D0 D1\n"),
+        "shot\nshot L0\nshot L2\nshot L1\n");
+    ASSERT_EQ(
+        result_of_running_main(
+            {"count_mistakes",
+             "--compiled_dem",
+             compiled_dem.path,
+             "--in_format",
+             "dets",
+             "--in_includes_appended_observables",
+             "--threads",
+             "2"},
+            "shot L0\nshot D0 L0\nshot D1 L2\nshot D0 D1 L1\n"),
+        "1 / 4\n");
+    // The compiled graph was saved without correlations
+    ASSERT_THROW(
+        result_of_running_main(
+            {"predict", "--compiled_dem", compiled_dem.path, "--in_format", "dets", "--enable_correlations"}, "shot\n"),
+        std::invalid_argument);
+}
@@ -0,0 +1,314 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_PARALLEL_H
+#define PYMATCHING2_PARALLEL_H
+
+#include <algorithm>
+#include <condition_variable>
+#include <exception>
+#include <mutex>
+#include <thread>
+#include <vector>
+
+namespace pm {
+
+/// Splits the items `[0, num_items)` into at most `num_threads` contiguous blocks of near-equal size,
+/// and calls `func(thread_index, block_begin, block_end)` once for each block. The blocks are processed
+/// concurrently, each on its own thread, and the call returns once every block has been processed.
+/// The first block is processed on the calling thread. If any call to `func` throws, the first exception
+/// thrown is rethrown on the calling thread after all threads have been joined.
+template <typename Func>
+void parallel_for_blocks(size_t num_items, size_t num_threads, const Func& func) {
+    num_threads = std::max<size_t>(1, std::min(num_threads, num_items));
+    if (num_threads == 1) {
+        func((size_t)0, (size_t)0, num_items);
+        return;
+    }
+
+    std::vector<std::exception_ptr> errors(num_threads);
+    auto run_block = [&](size_t thread_index) {
+        size_t block_begin = num_items * thread_index / num_threads;
+        size_t block_end = num_items * (thread_index + 1) / num_threads;
+        try {
+            func(thread_index, block_begin, block_end);
+        } catch (...) {
+            errors[thread_index] = std::current_exception();
+        }
+    };
+
+    std::vector<std::thread> threads;
+    threads.reserve(num_threads - 1);
+    for (size_t t = 1; t < num_threads; t++)
+        threads.emplace_back(run_block, t);
+    run_block(0);
+    for (auto& t : threads)
+        t.join();
+
+    for (auto& e : errors) {
+        if (e)
+            std::rethrow_exception(e);
+    }
+}
+
+/// A pool of threads that runs jobs in the same way as `parallel_for_blocks`, but which starts its threads once and
+/// reuses them for every job, rather than creating and joining threads for each job. This matters when each job is
+/// small, e.g. decoding the windows of a single shot, where creating the threads can take longer than the job itself.
+/// The pool has `num_threads - 1` threads of its own, and the thread that runs a job processes its first block.
+class ThreadPool {
+   public:
+    explicit ThreadPool(size_t num_threads) : _num_threads(std::max<size_t>(num_threads, 1)) {
+        _threads.reserve(_num_threads - 1);
+        for (size_t t = 1; t < _num_threads; t++)
+            _threads.emplace_back([this, t]() {
+                worker_loop(t);
+            });
+    }
+    ThreadPool(const ThreadPool&) = delete;
+    ThreadPool& operator=(const ThreadPool&) = delete;
+    ~ThreadPool() {
+        {
+            std::lock_guard<std::mutex> lock(_mutex);
+            _stopping = true;
+        }
+        _job_started.notify_all();
+        for (auto& t : _threads)
+            t.join();
+    }
+
+    size_t num_threads() const {
+        return _num_threads;
+    }
+
+    /// Equivalent to `parallel_for_blocks(num_items, num_threads(), func)`, using the threads of the pool. Jobs must
+    /// not be run concurrently on the same pool.
+    template <typename Func>
+    void for_blocks(size_t num_items, const Func& func) {
+        size_t num_blocks = std::max<size_t>(1, std::min(_num_threads, num_items));
+        if (num_blocks == 1) {
+            func((size_t)0, (size_t)0, num_items);
+            return;
+        }
+
+        _errors.assign(num_blocks, nullptr);
+        auto run_block = [&](size_t block_index) {
+            size_t block_begin = num_items * block_index / num_blocks;
+            size_t block_end = num_items * (block_index + 1) / num_blocks;
+            try {
+                func(block_index, block_begin, block_end);
+            } catch (...) {
+                _errors[block_index] = std::current_exception();
+            }
+        };
+        using RunBlock = decltype(run_block);
+        {
+            std::lock_guard<std::mutex> lock(_mutex);
+            _job = &run_block;
+            _run_job_block = [](const void* job, size_t block_index) {
+                (*static_cast<const RunBlock*>(job))(block_index);
+            };
+            _num_blocks = num_blocks;
+            _num_blocks_pending = num_blocks - 1;
+            _job_number++;
+        }
+        _job_started.notify_all();
+        run_block(0);
+        {
+            std::unique_lock<std::mutex> lock(_mutex);
+            _job_finished.wait(lock, [&] {
+                return _num_blocks_pending == 0;
+            });
+            _job = nullptr;
+        }
+
+        for (auto& e : _errors) {
+            if (e)
+                std::rethrow_exception(e);
+        }
+    }
+
+   private:
+    size_t _num_threads;
+    std::vector<std::thread> _threads;
+    std::mutex _mutex;
+    std::condition_variable _job_started;
+    std::condition_variable _job_finished;
+    /// The job being run, and a function that runs one of its blocks
+    const void* _job = nullptr;
+    void (*_run_job_block)(const void*, size_t) = nullptr;
+    size_t _job_number = 0;
+    size_t _num_blocks = 0;
+    size_t _num_blocks_pending = 0;
+    bool _stopping = false;
+    std::vector<std::exception_ptr> _errors;
+
+    void worker_loop(size_t thread_index) {
+        size_t last_job_number = 0;
+        std::unique_lock<std::mutex> lock(_mutex);
+        while (true) {
+            _job_started.wait(lock, [&] {
+                return _stopping || _job_number != last_job_number;
+            });
+            if (_stopping)
+                return;
+            last_job_number = _job_number;
+            // A job with fewer blocks than threads leaves the last threads idle
+            if (thread_index >= _num_blocks)
+                continue;
+            const void* job = _job;
+            auto run_job_block = _run_job_block;
+            lock.unlock();
+            run_job_block(job, thread_index);
+            lock.lock();
+            if (--_num_blocks_pending == 0)
+                _job_finished.notify_one();
+        }
+    }
+};
+
+/// Runs a pipeline that reads chunks of work, processes them in parallel, and writes the results in the order the
+/// chunks were read, while keeping at most `max_chunks_in_flight` chunks in memory at any one time. This is used to
+/// stream through inputs that are too large (or arrive too slowly, e.g. from a pipe) to be decoded in one batch.
+///
+/// The three stages run concurrently:
+///     - `read_chunk(chunk)` is called repeatedly on a single reader thread. It should fill `chunk` (a previously
+///         used `Chunk` may be passed in, so that its buffers can be reused) and return true, or return false once
+///         the input is exhausted.
+///     - `process_chunk(thread_index, chunk)` is called on one of `num_threads` worker threads, where
+///         `thread_index` identifies the worker (so that each worker can use its own decoder).
+///     - `write_chunk(chunk)` is called on the calling thread, once for each chunk, in the order that the chunks
+///         were read.
+///
+/// If any stage throws, the pipeline is stopped and the first exception thrown is rethrown on the calling thread.
+template <typename Chunk, typename ReadFunc, typename ProcessFunc, typename WriteFunc>
+void run_ordered_pipeline(
+    size_t num_threads,
+    size_t max_chunks_in_flight,
+    const ReadFunc& read_chunk,
+    const ProcessFunc& process_chunk,
+    const WriteFunc& write_chunk) {
+    num_threads = std::max<size_t>(num_threads, 1);
+    max_chunks_in_flight = std::max<size_t>(max_chunks_in_flight, 1);
+
+    // Chunk number `c` is stored in slot `c % max_chunks_in_flight`, which is free once chunk
+    // `c - max_chunks_in_flight` has been written.
+    std::vector<Chunk> slots(max_chunks_in_flight);
+    std::vector<bool> processed(max_chunks_in_flight, false);
+    std::mutex mutex;
+    std::condition_variable cv;
+    size_t num_read = 0;
+    size_t num_claimed = 0;
+    size_t num_written = 0;
+    bool done_reading = false;
+    bool aborted = false;
+    std::exception_ptr error;
+
+    auto abort_with_current_exception = [&]() {
+        std::lock_guard<std::mutex> lock(mutex);
+        if (!aborted) {
+            aborted = true;
+            error = std::current_exception();
+        }
+        cv.notify_all();
+    };
+
+    auto reader = [&]() {
+        try {
+            while (true) {
+                size_t c;
+                {
+                    std::unique_lock<std::mutex> lock(mutex);
+                    cv.wait(lock, [&] {
+                        return aborted || num_read < num_written + max_chunks_in_flight;
+                    });
+                    if (aborted)
+                        return;
+                    c = num_read;
+                }
+                bool has_chunk = read_chunk(slots[c % max_chunks_in_flight]);
+                std::lock_guard<std::mutex> lock(mutex);
+                if (has_chunk) {
+                    processed[c % max_chunks_in_flight] = false;
+                    num_read++;
+                } else {
+                    done_reading = true;
+                }
+                cv.notify_all();
+                if (!has_chunk)
+                    return;
+            }
+        } catch (...) {
+            abort_with_current_exception();
+        }
+    };
+
+    auto worker = [&](size_t thread_index) {
+        try {
+            while (true) {
+                size_t c;
+                {
+                    std::unique_lock<std::mutex> lock(mutex);
+                    cv.wait(lock, [&] {
+                        return aborted || num_claimed < num_read || done_reading;
+                    });
+                    if (aborted || num_claimed == num_read)
+                        return;
+                    c = num_claimed++;
+                }
+                process_chunk(thread_index, slots[c % max_chunks_in_flight]);
+                std::lock_guard<std::mutex> lock(mutex);
+                processed[c % max_chunks_in_flight] = true;
+                cv.notify_all();
+            }
+        } catch (...) {
+            abort_with_current_exception();
+        }
+    };
+
+    std::vector<std::thread> threads;
+    threads.emplace_back(reader);
+    for (size_t t = 0; t < num_threads; t++)
+        threads.emplace_back(worker, t);
+
+    try {
+        while (true) {
+            size_t c;
+            {
+                std::unique_lock<std::mutex> lock(mutex);
+                cv.wait(lock, [&] {
+                    return aborted || (num_written < num_read && processed[num_written % max_chunks_in_flight]) ||
+                           (done_reading && num_written == num_read);
+                });
+                if (aborted || num_written == num_read)
+                    break;
+                c = num_written;
+            }
+            write_chunk(slots[c % max_chunks_in_flight]);
+            std::lock_guard<std::mutex> lock(mutex);
+            num_written++;
+            cv.notify_all();
+        }
+    } catch (...) {
+        abort_with_current_exception();
+    }
+
+    for (auto& t : threads)
+        t.join();
+    if (error)
+        std::rethrow_exception(error);
+}
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_PARALLEL_H
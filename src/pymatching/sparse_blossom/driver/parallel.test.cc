@@ -0,0 +1,174 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/parallel.h"
+
+#include <chrono>
+#include <gtest/gtest.h>
+#include <mutex>
+#include <stdexcept>
+#include <utility>
+
+TEST(Parallel, ParallelForBlocksCoversAllItemsOnce) {
+    for (size_t num_items : {0, 1, 7, 100}) {
+        for (size_t num_threads : {1, 2, 3, 16}) {
+            std::vector<size_t> visits(num_items, 0);
+            std::vector<size_t> thread_of_item(num_items, SIZE_MAX);
+            pm::parallel_for_blocks(num_items, num_threads, [&](size_t thread_index, size_t begin, size_t end) {
+                ASSERT_LE(begin, end);
+                for (size_t i = begin; i < end; i++) {
+                    visits[i]++;
+                    thread_of_item[i] = thread_index;
+                }
+            });
+            for (size_t i = 0; i < num_items; i++) {
+                ASSERT_EQ(visits[i], 1);
+                ASSERT_LT(thread_of_item[i], num_threads);
+                if (i > 0)
+                    ASSERT_LE(thread_of_item[i - 1], thread_of_item[i]);
+            }
+        }
+    }
+}
+
+TEST(Parallel, ParallelForBlocksRethrows) {
+    ASSERT_THROW(
+        {
+            pm::parallel_for_blocks(10, 4, [](size_t thread_index, size_t begin, size_t end) {
+                if (thread_index == 2)
+                    throw std::invalid_argument("error in worker");
+            });
+        },
+        std::invalid_argument);
+}
+
+TEST(Parallel, ThreadPoolReusesThreadsForEachJob) {
+    for (size_t num_threads : {1, 2, 3, 16}) {
+        pm::ThreadPool pool(num_threads);
+        ASSERT_EQ(pool.num_threads(), num_threads);
+        auto calling_thread = std::this_thread::get_id();
+        for (size_t job = 0; job < 50; job++) {
+            size_t num_items = job % 7 == 0 ? 0 : job;
+            std::vector<size_t> visits(num_items, 0);
+            std::vector<size_t> thread_of_item(num_items, SIZE_MAX);
+            pool.for_blocks(num_items, [&](size_t thread_index, size_t begin, size_t end) {
+                ASSERT_LE(begin, end);
+                for (size_t i = begin; i < end; i++) {
+                    visits[i]++;
+                    thread_of_item[i] = thread_index;
+                }
+                // The first block is processed by the thread that runs the job
+                if (thread_index == 0)
+                    ASSERT_EQ(std::this_thread::get_id(), calling_thread);
+            });
+            for (size_t i = 0; i < num_items; i++) {
+                ASSERT_EQ(visits[i], 1);
+                ASSERT_LT(thread_of_item[i], std::min(num_threads, num_items));
+                if (i > 0)
+                    ASSERT_LE(thread_of_item[i - 1], thread_of_item[i]);
+            }
+        }
+    }
+}
+
+TEST(Parallel, ThreadPoolRethrows) {
+    pm::ThreadPool pool(4);
+    ASSERT_THROW(
+        {
+            pool.for_blocks(10, [](size_t thread_index, size_t begin, size_t end) {
+                if (thread_index == 2)
+                    throw std::invalid_argument("error in worker");
+            });
+        },
+        std::invalid_argument);
+    // The pool can still be used after a job throws
+    size_t num_visited = 0;
+    std::mutex mutex;
+    pool.for_blocks(10, [&](size_t thread_index, size_t begin, size_t end) {
+        std::lock_guard<std::mutex> lock(mutex);
+        num_visited += end - begin;
+    });
+    ASSERT_EQ(num_visited, 10);
+}
+
+TEST(Parallel, RunOrderedPipelineWritesInOrder) {
+    for (size_t num_threads : {1, 2, 5}) {
+        for (size_t max_chunks_in_flight : {1, 3, 16}) {
+            size_t num_chunks = 100;
+            size_t next_chunk = 0;
+            std::vector<size_t> written;
+            std::vector<size_t> threads_used(num_threads, 0);
+            pm::run_ordered_pipeline<std::pair<size_t, size_t>>(
+                num_threads,
+                max_chunks_in_flight,
+                [&](std::pair<size_t, size_t> &chunk) {
+                    if (next_chunk == num_chunks)
+                        return false;
+                    chunk.first = next_chunk++;
+                    return true;
+                },
+                [&](size_t thread_index, std::pair<size_t, size_t> &chunk) {
+                    ASSERT_LT(thread_index, num_threads);
+                    // Take longer to process earlier chunks, so that chunks finish out of order
+                    std::this_thread::sleep_for(std::chrono::microseconds(50 * ((num_chunks - chunk.first) % 7)));
+                    chunk.second = chunk.first * chunk.first;
+                },
+                [&](std::pair<size_t, size_t> &chunk) {
+                    ASSERT_EQ(chunk.second, chunk.first * chunk.first);
+                    written.push_back(chunk.first);
+                });
+            ASSERT_EQ(written.size(), num_chunks);
+            for (size_t i = 0; i < num_chunks; i++)
+                ASSERT_EQ(written[i], i);
+        }
+    }
+}
+
+TEST(Parallel, RunOrderedPipelineRethrows) {
+    size_t next_chunk = 0;
+    auto read = [&](size_t &chunk) {
+        chunk = next_chunk++;
+        return chunk < 50;
+    };
+    auto write = [](size_t &chunk) {
+    };
+    ASSERT_THROW(
+        {
+            pm::run_ordered_pipeline<size_t>(
+                3,
+                4,
+                read,
+                [](size_t thread_index, size_t &chunk) {
+                    if (chunk == 20)
+                        throw std::invalid_argument("error in worker");
+                },
+                write);
+        },
+        std::invalid_argument);
+    next_chunk = 0;
+    ASSERT_THROW(
+        {
+            pm::run_ordered_pipeline<size_t>(
+                3,
+                4,
+                read,
+                [](size_t thread_index, size_t &chunk) {
+                },
+                [](size_t &chunk) {
+                    if (chunk == 30)
+                        throw std::invalid_argument("error in writer");
+                });
+        },
+        std::invalid_argument);
+}
@@ -0,0 +1,229 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/periodic_graph.h"
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <set>
+#include <tuple>
+
+namespace {
+
+/// Returns a copy of `detector_error_model` in which the top-level REPEAT block at `instruction_index` is repeated
+/// `repetitions` times.
+stim::DetectorErrorModel with_repetitions(
+    const stim::DetectorErrorModel& detector_error_model, size_t instruction_index, uint64_t repetitions) {
+    stim::DetectorErrorModel result;
+    for (size_t i = 0; i < detector_error_model.instructions.size(); i++) {
+        auto& instruction = detector_error_model.instructions[i];
+        if (instruction.type == stim::DemInstructionType::DEM_REPEAT_BLOCK) {
+            result.append_repeat_block(
+                i == instruction_index ? repetitions : instruction.repeat_block_rep_count(),
+                instruction.repeat_block_body(detector_error_model),
+                instruction.tag);
+        } else {
+            result.append_dem_instruction(instruction);
+        }
+    }
+    return result;
+}
+
+/// The neighbors of `node`, each given as (neighbor, weight, error probability, observables) and sorted, where each
+/// neighbor that is not in the first `num_fixed_nodes` nodes (or the boundary) is translated by `shift`.
+std::vector<std::tuple<size_t, double, double, std::vector<size_t>>> translated_neighbors(
+    pm::UserGraph& graph, size_t node, size_t num_fixed_nodes, size_t shift) {
+    std::vector<std::tuple<size_t, double, double, std::vector<size_t>>> result;
+    for (auto& neighbor : graph.nodes[node].neighbors) {
+        size_t n = neighbor.node;
+        if (n != SIZE_MAX && n >= num_fixed_nodes)
+            n += shift;
+        auto observables = graph.edges.observables(neighbor.edge_index);
+        result.emplace_back(
+            n,
+            graph.edges.weight[neighbor.edge_index],
+            graph.edges.error_probability[neighbor.edge_index],
+            std::vector<size_t>(observables.begin(), observables.end()));
+    }
+    std::sort(result.begin(), result.end());
+    return result;
+}
+
+/// Checks that `larger` (the graph with one more repetition, whose middle repetition is `middle_repetition`) is
+/// `smaller` with an extra repetition inserted after its middle repetition: every node of `larger` after the middle
+/// repetition has the same neighborhood as the node one repetition earlier in `smaller`, translated by a repetition.
+bool is_inserted_repetition(
+    pm::UserGraph& smaller,
+    pm::UserGraph& larger,
+    size_t num_prefix_nodes,
+    size_t nodes_per_repetition,
+    size_t middle_repetition) {
+    if (larger.nodes.size() != smaller.nodes.size() + nodes_per_repetition)
+        return false;
+    size_t num_unshifted_nodes = num_prefix_nodes + (middle_repetition + 1) * nodes_per_repetition;
+    for (size_t node = 0; node < larger.nodes.size(); node++) {
+        bool is_shifted = node >= num_unshifted_nodes;
+        size_t smaller_node = is_shifted ? node - nodes_per_repetition : node;
+        if (larger.nodes[node].is_boundary != smaller.nodes[smaller_node].is_boundary)
+            return false;
+        auto expected =
+            translated_neighbors(smaller, smaller_node, num_prefix_nodes, is_shifted ? nodes_per_repetition : 0);
+        if (translated_neighbors(larger, node, 0, 0) != expected)
+            return false;
+    }
+    return true;
+}
+
+}  // namespace
+
+pm::PeriodicUserGraph::PeriodicUserGraph(const stim::DetectorErrorModel& detector_error_model)
+    : num_prefix_nodes(0), nodes_per_repetition(0), num_repetitions(0), num_compact_repetitions(0) {
+    // Find the longest top-level REPEAT block that declares detectors
+    size_t block_index = SIZE_MAX;
+    uint64_t detector_shift = 0;
+    for (size_t i = 0; i < detector_error_model.instructions.size(); i++) {
+        auto& instruction = detector_error_model.instructions[i];
+        if (instruction.type == stim::DemInstructionType::DEM_SHIFT_DETECTORS) {
+            detector_shift += instruction.target_data[0].data;
+        } else if (instruction.type == stim::DemInstructionType::DEM_REPEAT_BLOCK) {
+            uint64_t repetitions = instruction.repeat_block_rep_count();
+            uint64_t body_shift = instruction.repeat_block_body(detector_error_model).total_detector_shift();
+            if (body_shift > 0 && repetitions > num_repetitions) {
+                block_index = i;
+                num_prefix_nodes = detector_shift;
+                nodes_per_repetition = body_shift;
+                num_repetitions = repetitions;
+            }
+            detector_shift += repetitions * body_shift;
+        }
+    }
+
+    _num_nodes = detector_error_model.count_detectors();
+    std::vector<double> coord_shift;
+    bool is_compact = false;
+    for (size_t m = 1; block_index != SIZE_MAX && 2 * m + 2 < num_repetitions; m *= 2) {
+        auto compact_model = with_repetitions(detector_error_model, block_index, 2 * m + 1);
+        auto larger_model = with_repetitions(detector_error_model, block_index, 2 * m + 2);
+        auto compact = detector_error_model_to_user_graph(compact_model, false, NUM_DISTINCT_WEIGHTS);
+        auto larger = detector_error_model_to_user_graph(larger_model, false, NUM_DISTINCT_WEIGHTS);
+        if (compact.nodes.size() + (num_repetitions - 2 * m - 1) * nodes_per_repetition == _num_nodes &&
+            is_inserted_repetition(compact, larger, num_prefix_nodes, nodes_per_repetition, m)) {
+            compact_graph = std::move(compact);
+            num_compact_repetitions = 2 * m + 1;
+            coord_shift = detector_error_model.instructions[block_index]
+                              .repeat_block_body(detector_error_model)
+                              .final_detector_and_coord_shift()
+                              .second;
+            is_compact = true;
+            break;
+        }
+    }
+    if (!is_compact) {
+        // Fall back to the graph of the whole model, which is its own (only) repetition
+        compact_graph = detector_error_model_to_user_graph(detector_error_model, false, NUM_DISTINCT_WEIGHTS);
+        num_prefix_nodes = 0;
+        nodes_per_repetition = 0;
+        num_repetitions = 1;
+        num_compact_repetitions = 1;
+    }
+    _num_observables = compact_graph.get_num_observables();
+
+    // The detector coordinates of the compact model, and how much their last coordinate increases per repetition
+    auto compact_model = is_compact ? with_repetitions(detector_error_model, block_index, num_compact_repetitions)
+                                    : detector_error_model;
+    std::set<uint64_t> detectors;
+    for (uint64_t d = 0; d < compact_graph.nodes.size(); d++)
+        detectors.insert(d);
+    _compact_times.assign(compact_graph.nodes.size(), std::numeric_limits<double>::quiet_NaN());
+    _compact_time_shifts.assign(compact_graph.nodes.size(), 0);
+    for (auto& [d, coords] : compact_model.get_detector_coordinates(detectors)) {
+        if (coords.empty())
+            continue;
+        _compact_times[d] = coords.back();
+        if (d >= num_prefix_nodes && coords.size() <= coord_shift.size())
+            _compact_time_shifts[d] = coord_shift[coords.size() - 1];
+    }
+}
+
+std::pair<size_t, size_t> pm::PeriodicUserGraph::to_compact_node(size_t node) const {
+    if (nodes_per_repetition == 0 || node < num_prefix_nodes)
+        return {node, 0};
+    size_t repetition = (node - num_prefix_nodes) / nodes_per_repetition;
+    size_t middle_repetition = num_compact_repetitions / 2;
+    size_t max_shift = num_repetitions - num_compact_repetitions;
+    if (repetition < middle_repetition)
+        return {node, 0};
+    if (repetition >= num_repetitions - middle_repetition)
+        return {node - max_shift * nodes_per_repetition, max_shift};
+    size_t shift = repetition - middle_repetition;
+    return {node - shift * nodes_per_repetition, shift};
+}
+
+size_t pm::PeriodicUserGraph::from_compact_node(size_t compact_node, size_t shift) const {
+    if (compact_node == SIZE_MAX || compact_node < num_prefix_nodes)
+        return compact_node;
+    return compact_node + shift * nodes_per_repetition;
+}
+
+size_t pm::PeriodicUserGraph::num_nodes() const {
+    return _num_nodes;
+}
+
+size_t pm::PeriodicUserGraph::num_observables() const {
+    return _num_observables;
+}
+
+bool pm::PeriodicUserGraph::is_boundary(size_t node) const {
+    return compact_graph.nodes[to_compact_node(node).first].is_boundary;
+}
+
+void pm::PeriodicUserGraph::get_neighbors(size_t node, std::vector<UserNeighbor>& neighbors) const {
+    auto [compact_node, shift] = to_compact_node(node);
+    size_t edge_shift = shift * compact_graph.edges.size();
+    neighbors.clear();
+    for (auto& neighbor : compact_graph.nodes[compact_node].neighbors)
+        neighbors.push_back({neighbor.edge_index + edge_shift, from_compact_node(neighbor.node, shift)});
+}
+
+double pm::PeriodicUserGraph::edge_weight(size_t edge_index) const {
+    return compact_graph.edges.weight[edge_index % compact_graph.edges.size()];
+}
+
+double pm::PeriodicUserGraph::edge_error_probability(size_t edge_index) const {
+    return compact_graph.edges.error_probability[edge_index % compact_graph.edges.size()];
+}
+
+std::span<const size_t> pm::PeriodicUserGraph::edge_observables(size_t edge_index) const {
+    return compact_graph.edges.observables(edge_index % compact_graph.edges.size());
+}
+
+std::pair<size_t, size_t> pm::PeriodicUserGraph::edge_nodes(size_t edge_index) const {
+    size_t compact_edge = edge_index % compact_graph.edges.size();
+    size_t shift = edge_index / compact_graph.edges.size();
+    return {
+        from_compact_node(compact_graph.edges.node1[compact_edge], shift),
+        from_compact_node(compact_graph.edges.node2[compact_edge], shift)};
+}
+
+std::vector<double> pm::PeriodicUserGraph::detector_times() const {
+    std::vector<double> times(_num_nodes);
+    for (size_t node = 0; node < _num_nodes; node++) {
+        auto [compact_node, shift] = to_compact_node(node);
+        if (std::isnan(_compact_times[compact_node]))
+            throw std::invalid_argument("Detector " + std::to_string(node) + " has no coordinates.");
+        times[node] = _compact_times[compact_node] + (double)shift * _compact_time_shifts[compact_node];
+    }
+    return times;
+}
@@ -0,0 +1,82 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_PERIODIC_GRAPH_H
+#define PYMATCHING2_PERIODIC_GRAPH_H
+
+#include <utility>
+#include <vector>
+
+#include "pymatching/sparse_blossom/driver/graph_view.h"
+#include "stim.h"
+
+namespace pm {
+
+/// The matching graph of a detector error model, stored compactly when the model contains a long REPEAT block (as in
+/// a memory experiment with many rounds).
+///
+/// Rather than flattening the whole model, the graph is built for a compact copy of the model in which its longest
+/// top-level REPEAT block is repeated only `num_compact_repetitions = 2m + 1` times. The first `m` and last `m`
+/// repetitions of the full model are the first and last `m` repetitions of the compact graph, and every repetition in
+/// between is a translated copy of the middle repetition of the compact graph. Neighbors, weights and observables of
+/// the full graph are then resolved by offset arithmetic on detector and edge indices, so the memory used and the time
+/// taken to load the graph scale with the size of a repetition rather than with the number of repetitions.
+///
+/// `m` is chosen by checking that inserting an extra repetition into the compact model only translates the
+/// neighborhoods of the later detectors. If the model has no REPEAT block, or the block is not periodic in this sense
+/// (or has too few repetitions to benefit), the compact graph is the graph of the whole model.
+///
+/// Edge `e + k * compact_graph.edges.size()` of the full graph is edge `e` of the compact graph translated by `k`
+/// repetitions (so an edge between two repetitions may have a different index when reached from each of its nodes).
+/// Correlations (`enable_correlations`) are not supported.
+class PeriodicUserGraph : public GraphView {
+   public:
+    UserGraph compact_graph;
+    /// The number of detectors before the REPEAT block.
+    size_t num_prefix_nodes;
+    /// The number of detectors in each repetition of the REPEAT block (zero if there is no block).
+    size_t nodes_per_repetition;
+    size_t num_repetitions;
+    size_t num_compact_repetitions;
+
+    explicit PeriodicUserGraph(const stim::DetectorErrorModel& detector_error_model);
+    size_t num_nodes() const override;
+    size_t num_observables() const override;
+    bool is_boundary(size_t node) const override;
+    void get_neighbors(size_t node, std::vector<UserNeighbor>& neighbors) const override;
+    double edge_weight(size_t edge_index) const override;
+    double edge_error_probability(size_t edge_index) const override;
+    std::span<const size_t> edge_observables(size_t edge_index) const override;
+    std::pair<size_t, size_t> edge_nodes(size_t edge_index) const override;
+
+    /// Returns the node of the compact graph that `node` is a translated copy of, and the number of repetitions it is
+    /// translated by.
+    std::pair<size_t, size_t> to_compact_node(size_t node) const;
+    /// The inverse of `to_compact_node`, which maps SIZE_MAX (the boundary) to itself.
+    size_t from_compact_node(size_t compact_node, size_t shift) const;
+    /// The last coordinate of each detector (e.g. the round in which it is measured), for use as the detector times of
+    /// a window decoder. Throws std::invalid_argument if a detector has no coordinates.
+    std::vector<double> detector_times() const;
+
+   private:
+    size_t _num_nodes;
+    size_t _num_observables;
+    /// The last coordinate of each compact detector (NaN if it has none), and how much it increases per repetition.
+    std::vector<double> _compact_times;
+    std::vector<double> _compact_time_shifts;
+};
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_PERIODIC_GRAPH_H
@@ -0,0 +1,127 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/periodic_graph.h"
+
+#include <gtest/gtest.h>
+
+#include "pymatching/sparse_blossom/driver/sliding_window.h"
+
+namespace {
+
+stim::DetectorErrorModel memory_experiment_dem(size_t rounds, stim::Circuit* circuit_out = nullptr) {
+    stim::CircuitGenParameters gen(rounds, 3, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.002;
+    gen.before_measure_flip_probability = 0.002;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    if (circuit_out != nullptr)
+        *circuit_out = circuit;
+    return stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+}
+
+/// The neighbors of `node` in `graph`, given as sorted (neighbor, weight, observables) tuples.
+std::vector<std::tuple<size_t, double, std::vector<size_t>>> sorted_neighbors(const pm::GraphView& graph, size_t node) {
+    std::vector<pm::UserNeighbor> neighbors;
+    graph.get_neighbors(node, neighbors);
+    std::vector<std::tuple<size_t, double, std::vector<size_t>>> result;
+    for (auto& neighbor : neighbors) {
+        auto observables = graph.edge_observables(neighbor.edge_index);
+        result.emplace_back(
+            neighbor.node,
+            graph.edge_weight(neighbor.edge_index),
+            std::vector<size_t>(observables.begin(), observables.end()));
+    }
+    std::sort(result.begin(), result.end());
+    return result;
+}
+
+}  // namespace
+
+TEST(PeriodicUserGraph, MatchesFullGraphOfMemoryExperiment) {
+    auto dem = memory_experiment_dem(300);
+    pm::PeriodicUserGraph graph(dem);
+    ASSERT_EQ(graph.num_nodes(), dem.count_detectors());
+    ASSERT_EQ(graph.num_observables(), 1);
+    ASSERT_GT(graph.num_repetitions, 100);
+    ASSERT_LT(graph.num_compact_repetitions, 10);
+    ASSERT_LT(graph.compact_graph.nodes.size(), 100);
+
+    auto full_graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    pm::UserGraphView full_view(full_graph);
+    std::set<uint64_t> detectors;
+    for (size_t node = 0; node < graph.num_nodes(); node++) {
+        ASSERT_EQ(graph.is_boundary(node), full_view.is_boundary(node));
+        ASSERT_EQ(sorted_neighbors(graph, node), sorted_neighbors(full_view, node));
+        auto [compact_node, shift] = graph.to_compact_node(node);
+        ASSERT_EQ(graph.from_compact_node(compact_node, shift), node);
+        std::vector<pm::UserNeighbor> neighbors;
+        graph.get_neighbors(node, neighbors);
+        for (auto& neighbor : neighbors) {
+            auto [node1, node2] = graph.edge_nodes(neighbor.edge_index);
+            ASSERT_TRUE((node1 == node && node2 == neighbor.node) || (node1 == neighbor.node && node2 == node));
+        }
+        detectors.insert(node);
+    }
+
+    auto times = graph.detector_times();
+    for (auto& [d, coords] : dem.get_detector_coordinates(detectors))
+        ASSERT_EQ(times[d], coords.back());
+}
+
+TEST(PeriodicUserGraph, FallsBackToFullGraph) {
+    // A model without a REPEAT block
+    stim::DetectorErrorModel dem("error(0.1) D0\nerror(0.1) D0 D1\nerror(0.1) D1 L0\ndetector(0, 5) D0\n");
+    pm::PeriodicUserGraph graph(dem);
+    ASSERT_EQ(graph.num_compact_repetitions, 1);
+    ASSERT_EQ(graph.num_nodes(), 2);
+    ASSERT_EQ(graph.compact_graph.nodes.size(), 2);
+    ASSERT_EQ(graph.to_compact_node(1), std::make_pair((size_t)1, (size_t)0));
+    ASSERT_THROW(graph.detector_times(), std::invalid_argument);
+
+    // A REPEAT block with too few repetitions to be worth compacting
+    auto short_dem = memory_experiment_dem(4);
+    pm::PeriodicUserGraph short_graph(short_dem);
+    ASSERT_EQ(short_graph.num_compact_repetitions, 1);
+    ASSERT_EQ(short_graph.compact_graph.nodes.size(), short_dem.count_detectors());
+}
+
+TEST(PeriodicUserGraph, SlidingWindowDecodingMatchesFullGraph) {
+    stim::Circuit circuit;
+    auto dem = memory_experiment_dem(60, &circuit);
+    pm::PeriodicUserGraph graph(dem);
+    ASSERT_LT(graph.num_compact_repetitions, graph.num_repetitions);
+    auto full_graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    pm::UserGraphView full_view(full_graph);
+
+    auto times = graph.detector_times();
+    pm::SlidingWindowDecoder periodic_decoder(graph, times, 3, 5);
+    pm::SlidingWindowDecoder full_decoder(full_view, times, 3, 5);
+    ASSERT_EQ(periodic_decoder.windows.size(), full_decoder.windows.size());
+    ASSERT_EQ(periodic_decoder.decoders.size(), full_decoder.decoders.size());
+
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 100;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+    for (size_t k = 0; k < num_shots; k++) {
+        std::vector<uint64_t> hits;
+        for (size_t d = 0; d < circuit.count_detectors(); d++) {
+            if (dets[d][k])
+                hits.push_back(d);
+        }
+        std::vector<uint8_t> obs(1, 0), expected_obs(1, 0);
+        ASSERT_EQ(periodic_decoder.decode(hits, obs.data()), full_decoder.decode(hits, expected_obs.data()));
+        ASSERT_EQ(obs, expected_obs);
+    }
+}
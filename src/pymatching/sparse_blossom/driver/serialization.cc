@@ -0,0 +1,688 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/serialization.h"
+
+#include <algorithm>
+#include <cmath>
+#include <cstring>
+#include <fstream>
+#include <iterator>
+#include <optional>
+#include <type_traits>
+
+namespace {
+
+const char MAGIC[8] = {'P', 'M', 'G', 'R', 'A', 'P', 'H', '\0'};
+const uint64_t HAS_COMPILED_GRAPH = 1;
+const uint64_t HAS_SEARCH_GRAPH = 2;
+
+/// Appends values and arrays to a byte string, padding after each so that the next starts at a multiple of 8 bytes.
+struct BinaryWriter {
+    std::string out;
+
+    template <typename T>
+    void write_array(const T* data, size_t num_values) {
+        static_assert(std::is_trivially_copyable<T>::value);
+        out.append(reinterpret_cast<const char*>(data), num_values * sizeof(T));
+        out.append((8 - out.size() % 8) % 8, '\0');
+    }
+    /// Appends an array of `num_values` values, where value `i` is `get_value(i)`, without building it in a
+    /// temporary buffer first.
+    template <typename T, typename GetValue>
+    void write_array_from(size_t num_values, const GetValue& get_value) {
+        static_assert(std::is_trivially_copyable<T>::value);
+        size_t begin = out.size();
+        out.resize(begin + (num_values * sizeof(T) + 7) / 8 * 8);
+        char* ptr = out.data() + begin;
+        for (size_t i = 0; i < num_values; i++, ptr += sizeof(T)) {
+            T value = get_value(i);
+            std::memcpy(ptr, &value, sizeof(T));
+        }
+    }
+    template <typename T>
+    void write_vector(const std::vector<T>& values) {
+        write_array(values.data(), values.size());
+    }
+    void write_u64(uint64_t value) {
+        write_array(&value, 1);
+    }
+    void write_f64(double value) {
+        write_array(&value, 1);
+    }
+};
+
+/// An array of values stored in the data being read by a BinaryReader. Values are copied out when they are accessed,
+/// so the data doesn't need to be aligned.
+template <typename T>
+struct ArrayView {
+    const uint8_t* begin;
+    size_t num_values;
+
+    T operator[](size_t i) const {
+        T value;
+        std::memcpy(&value, begin + i * sizeof(T), sizeof(T));
+        return value;
+    }
+    size_t size() const {
+        return num_values;
+    }
+    T back() const {
+        return (*this)[num_values - 1];
+    }
+};
+
+/// Reads the values and arrays written by a BinaryWriter, checking that they are within the bounds of the data.
+/// Values are copied out rather than accessed in place, so the data doesn't need to be aligned.
+struct BinaryReader {
+    const uint8_t* data;
+    size_t num_bytes;
+    size_t pos;
+
+    BinaryReader(const uint8_t* data, size_t num_bytes) : data(data), num_bytes(num_bytes), pos(0) {
+    }
+
+    template <typename T>
+    const uint8_t* take_array(size_t num_values) {
+        if (num_values > (num_bytes - pos) / sizeof(T))
+            throw std::invalid_argument("The serialized matching graph is truncated or corrupted.");
+        const uint8_t* begin = data + pos;
+        pos += num_values * sizeof(T);
+        pos = std::min(pos + (8 - pos % 8) % 8, num_bytes);
+        return begin;
+    }
+    template <typename T>
+    void read_array(T* out, size_t num_values) {
+        static_assert(std::is_trivially_copyable<T>::value);
+        const uint8_t* begin = take_array<T>(num_values);
+        if (num_values)
+            std::memcpy(out, begin, num_values * sizeof(T));
+    }
+    template <typename T>
+    std::vector<T> read_vector(size_t num_values) {
+        static_assert(std::is_trivially_copyable<T>::value);
+        const uint8_t* begin = take_array<T>(num_values);
+        std::vector<T> values(num_values);
+        if (num_values)
+            std::memcpy(values.data(), begin, num_values * sizeof(T));
+        return values;
+    }
+    template <typename T>
+    ArrayView<T> read_view(size_t num_values) {
+        static_assert(std::is_trivially_copyable<T>::value);
+        return {take_array<T>(num_values), num_values};
+    }
+    uint64_t read_u64() {
+        uint64_t value;
+        read_array(&value, 1);
+        return value;
+    }
+    double read_f64() {
+        double value;
+        read_array(&value, 1);
+        return value;
+    }
+    void skip(size_t num_bytes_to_skip) {
+        take_array<uint8_t>(num_bytes_to_skip);
+    }
+};
+
+/// Node indices in the user graph section are stored using 4 bytes each when the graph has fewer than UINT32_MAX
+/// nodes (with UINT32_MAX standing for SIZE_MAX, i.e. the boundary), and 8 bytes each otherwise.
+template <typename GetNode>
+void write_node_indices(BinaryWriter& writer, bool narrow, size_t num_values, const GetNode& get) {
+    if (narrow) {
+        writer.write_array_from<uint32_t>(num_values, [&](size_t i) {
+            size_t node = get(i);
+            return node == SIZE_MAX ? UINT32_MAX : (uint32_t)node;
+        });
+    } else {
+        writer.write_array_from<uint64_t>(num_values, get);
+    }
+}
+
+struct NodeIndicesView {
+    ArrayView<uint32_t> narrow_indices;
+    ArrayView<uint64_t> wide_indices;
+    bool narrow;
+
+    size_t operator[](size_t i) const {
+        if (narrow) {
+            uint32_t node = narrow_indices[i];
+            return node == UINT32_MAX ? SIZE_MAX : node;
+        }
+        return wide_indices[i];
+    }
+};
+
+NodeIndicesView read_node_indices(BinaryReader& reader, bool narrow, size_t num_values) {
+    if (narrow)
+        return {reader.read_view<uint32_t>(num_values), {nullptr, 0}, true};
+    return {{nullptr, 0}, reader.read_view<uint64_t>(num_values), false};
+}
+
+[[noreturn]] void throw_corrupted() {
+    throw std::invalid_argument("The serialized matching graph is truncated or corrupted.");
+}
+
+template <typename Offsets>
+void check_offsets(const Offsets& offsets, size_t num_values) {
+    if (offsets.size() == 0 || offsets[0] != 0 || offsets.back() != num_values)
+        throw_corrupted();
+    for (size_t i = 1; i < offsets.size(); i++) {
+        if (offsets[i] < offsets[i - 1])
+            throw_corrupted();
+    }
+}
+
+void write_header(BinaryWriter& writer, uint64_t flags) {
+    writer.write_array(MAGIC, sizeof(MAGIC));
+    writer.write_u64(pm::SERIALIZATION_FORMAT_VERSION);
+    writer.write_u64(sizeof(pm::obs_int) * 8);
+    writer.write_u64(flags);
+}
+
+uint64_t read_header(BinaryReader& reader) {
+    char magic[sizeof(MAGIC)];
+    if (reader.num_bytes < sizeof(MAGIC))
+        throw std::invalid_argument("The data is not a matching graph serialized by PyMatching.");
+    reader.read_array(magic, sizeof(MAGIC));
+    if (std::memcmp(magic, MAGIC, sizeof(MAGIC)) != 0)
+        throw std::invalid_argument("The data is not a matching graph serialized by PyMatching.");
+    uint64_t version = reader.read_u64();
+    if (version != pm::SERIALIZATION_FORMAT_VERSION)
+        throw std::invalid_argument(
+            "The matching graph was serialized with format version " + std::to_string(version) +
+            ", but this version of PyMatching only supports format version " +
+            std::to_string(pm::SERIALIZATION_FORMAT_VERSION) + ".");
+    uint64_t obs_int_bits = reader.read_u64();
+    if (obs_int_bits != sizeof(pm::obs_int) * 8)
+        throw std::invalid_argument(
+            "The matching graph was serialized by a build of PyMatching with " + std::to_string(obs_int_bits) +
+            "-bit observable masks, but this build uses " + std::to_string(sizeof(pm::obs_int) * 8) +
+            "-bit observable masks.");
+    return reader.read_u64();
+}
+
+void write_user_graph(BinaryWriter& writer, const pm::UserGraph& user_graph, size_t num_observables) {
+    const pm::UserEdges& edges = user_graph.edges;
+    size_t num_edges = edges.size();
+    std::vector<uint64_t> observables_offsets{0}, implied_offsets{0};
+    observables_offsets.reserve(num_edges + 1);
+    implied_offsets.reserve(num_edges + 1);
+    for (size_t i = 0; i < num_edges; i++) {
+        observables_offsets.push_back(observables_offsets.back() + edges.observables(i).size());
+        implied_offsets.push_back(implied_offsets.back() + edges.implied_weights(i).size());
+    }
+    size_t num_implied = implied_offsets.back();
+    writer.out.reserve(
+        writer.out.size() + 8 * (8 + user_graph.boundary_nodes.size() + 6 * num_edges + observables_offsets.back()) +
+        24 * num_implied);
+
+    bool narrow = user_graph.nodes.size() < UINT32_MAX;
+    writer.write_u64(user_graph.nodes.size());
+    writer.write_u64(num_observables);
+    writer.write_u64(user_graph.loaded_from_dem_without_correlations);
+    writer.write_u64(user_graph.boundary_nodes.size());
+    writer.write_vector(std::vector<uint64_t>(user_graph.boundary_nodes.begin(), user_graph.boundary_nodes.end()));
+    writer.write_u64(num_edges);
+    write_node_indices(writer, narrow, num_edges, [&](size_t i) {
+        return edges.node1[i];
+    });
+    write_node_indices(writer, narrow, num_edges, [&](size_t i) {
+        return edges.node2[i];
+    });
+    writer.write_vector(edges.weight);
+    writer.write_vector(edges.error_probability);
+    writer.write_vector(observables_offsets);
+    std::vector<uint64_t> observables;
+    observables.reserve(observables_offsets.back());
+    for (size_t i = 0; i < num_edges; i++) {
+        auto edge_observables = edges.observables(i);
+        observables.insert(observables.end(), edge_observables.begin(), edge_observables.end());
+    }
+    writer.write_vector(observables);
+    writer.write_vector(implied_offsets);
+
+    // The implied weights are written in edge order, as three arrays of node1, node2 and weight
+    std::vector<const pm::ImpliedWeightUnconverted*> implied;
+    implied.reserve(num_implied);
+    for (size_t i = 0; i < num_edges; i++) {
+        for (auto& w : edges.implied_weights(i))
+            implied.push_back(&w);
+    }
+    write_node_indices(writer, narrow, num_implied, [&](size_t k) {
+        return implied[k]->node1;
+    });
+    write_node_indices(writer, narrow, num_implied, [&](size_t k) {
+        return implied[k]->node2;
+    });
+    writer.write_array_from<double>(num_implied, [&](size_t k) {
+        return implied[k]->implied_weight;
+    });
+}
+
+pm::UserGraph read_user_graph(BinaryReader& reader, uint64_t flags) {
+    uint64_t num_nodes = reader.read_u64();
+    // The compiled graph has an offset for each node, so a corrupted number of nodes can be detected before the nodes
+    // are allocated
+    if ((flags & HAS_COMPILED_GRAPH) && num_nodes > reader.num_bytes / sizeof(uint64_t))
+        throw_corrupted();
+    uint64_t num_observables = reader.read_u64();
+    bool loaded_from_dem_without_correlations = reader.read_u64();
+    auto boundary = reader.read_view<uint64_t>(reader.read_u64());
+    bool narrow = num_nodes < UINT32_MAX;
+    uint64_t num_edges = reader.read_u64();
+    auto node1 = read_node_indices(reader, narrow, num_edges);
+    auto node2 = read_node_indices(reader, narrow, num_edges);
+    auto weights = reader.read_view<double>(num_edges);
+    auto error_probabilities = reader.read_view<double>(num_edges);
+    auto observables_offsets = reader.read_view<uint64_t>(num_edges + 1);
+    check_offsets(observables_offsets, observables_offsets.back());
+    auto observables = reader.read_view<uint64_t>(observables_offsets.back());
+    auto implied_offsets = reader.read_view<uint64_t>(num_edges + 1);
+    check_offsets(implied_offsets, implied_offsets.back());
+    auto implied_node1 = read_node_indices(reader, narrow, implied_offsets.back());
+    auto implied_node2 = read_node_indices(reader, narrow, implied_offsets.back());
+    auto implied_weights = reader.read_view<double>(implied_offsets.back());
+
+    for (size_t i = 0; i < num_edges; i++) {
+        if (node1[i] >= num_nodes || (node2[i] >= num_nodes && node2[i] != SIZE_MAX))
+            throw_corrupted();
+    }
+    for (size_t k = 0; k < observables.size(); k++) {
+        if (observables[k] >= num_observables)
+            throw_corrupted();
+    }
+    std::set<size_t> boundary_nodes;
+    for (size_t i = 0; i < boundary.size(); i++) {
+        if (boundary[i] >= num_nodes)
+            throw_corrupted();
+        boundary_nodes.insert(boundary[i]);
+    }
+
+    pm::UserGraph user_graph(num_nodes, num_observables);
+    user_graph.loaded_from_dem_without_correlations = loaded_from_dem_without_correlations;
+    user_graph.edges.reserve(num_edges);
+    std::vector<size_t> edge_observables;
+    std::vector<pm::ImpliedWeightUnconverted> edge_implied_weights;
+    for (size_t i = 0; i < num_edges; i++) {
+        edge_observables.clear();
+        for (size_t k = observables_offsets[i]; k < observables_offsets[i + 1]; k++)
+            edge_observables.push_back(observables[k]);
+        if (node2[i] == SIZE_MAX) {
+            user_graph.add_or_merge_boundary_edge(
+                node1[i], edge_observables, weights[i], error_probabilities[i], pm::DISALLOW);
+        } else {
+            user_graph.add_or_merge_edge(
+                node1[i], node2[i], edge_observables, weights[i], error_probabilities[i], pm::DISALLOW);
+        }
+        edge_implied_weights.clear();
+        for (size_t k = implied_offsets[i]; k < implied_offsets[i + 1]; k++)
+            edge_implied_weights.push_back({implied_node1[k], implied_node2[k], implied_weights[k]});
+        user_graph.edges.set_implied_weights(user_graph.edges.size() - 1, edge_implied_weights);
+    }
+    user_graph.set_boundary(boundary_nodes);
+    return user_graph;
+}
+
+/// Writes the neighbors (as node indices, with SIZE_MAX for the boundary), discretised weights and implied weights
+/// (as node and neighbor indices) of each node in CSR form.
+template <typename Node>
+void write_weighted_adjacency(
+    BinaryWriter& writer, const std::vector<Node>& nodes, const pm::ImpliedWeights* implied_weights) {
+    std::vector<uint64_t> offsets{0}, neighbors, implied_offsets{0};
+    std::vector<uint64_t> implied_node0, implied_neighbor0, implied_node1, implied_neighbor1;
+    std::vector<pm::weight_int> weights, implied_weights_out;
+    for (size_t i = 0; i < nodes.size(); i++) {
+        auto& node = nodes[i];
+        for (size_t j = 0; j < node.neighbors.size(); j++) {
+            neighbors.push_back(node.neighbors[j] == nullptr ? SIZE_MAX : node.neighbors[j] - nodes.data());
+            weights.push_back(node.neighbor_weights[j]);
+            if (implied_weights != nullptr) {
+                for (auto& w : implied_weights->of_edge(i, j)) {
+                    implied_node0.push_back(w.node0);
+                    implied_neighbor0.push_back(w.neighbor0);
+                    implied_node1.push_back(w.node1);
+                    implied_neighbor1.push_back(w.neighbor1);
+                    implied_weights_out.push_back(w.implied_weight);
+                }
+            }
+            implied_offsets.push_back(implied_node0.size());
+        }
+        offsets.push_back(neighbors.size());
+    }
+
+    writer.write_u64(nodes.size());
+    writer.write_vector(offsets);
+    writer.write_vector(neighbors);
+    writer.write_vector(weights);
+    writer.write_vector(implied_offsets);
+    writer.write_vector(implied_node0);
+    writer.write_vector(implied_neighbor0);
+    writer.write_vector(implied_node1);
+    writer.write_vector(implied_neighbor1);
+    writer.write_vector(implied_weights_out);
+}
+
+/// Whether `weight` could be the discretised weight of an edge: the decoder requires edge weights to be even (so that
+/// all collisions occur at integer times) and at most the largest weight that edges are discretised to.
+bool is_discretised_weight(pm::weight_int weight) {
+    return weight % 2 == 0 && weight <= 2 * pm::MAX_USER_EDGE_WEIGHT;
+}
+
+/// Reads the output of `write_weighted_adjacency` into the `node_edges` of `graph`, which must have the number of
+/// nodes that was written, and into `implied_weights`. The caller must read the rest of the edges and then update
+/// the views of the nodes. Checks that each edge is also an edge (with the same weight) of its other node, that
+/// boundary edges come first, and that all weights are discretised weights, since the decoder assumes this without
+/// checking.
+template <typename Graph>
+void read_weighted_adjacency(BinaryReader& reader, Graph& graph, pm::ImpliedWeights& implied_weights) {
+    size_t num_nodes = graph.nodes.size();
+    if (reader.read_u64() != num_nodes)
+        throw_corrupted();
+    auto offsets = reader.read_vector<uint64_t>(num_nodes + 1);
+    check_offsets(offsets, offsets.back());
+    size_t num_neighbors = offsets.back();
+    auto neighbors = reader.read_vector<uint64_t>(num_neighbors);
+    auto weights = reader.read_vector<pm::weight_int>(num_neighbors);
+    auto implied_offsets = reader.read_vector<uint64_t>(num_neighbors + 1);
+    check_offsets(implied_offsets, implied_offsets.back());
+    size_t num_implied = implied_offsets.back();
+    auto implied_node0 = reader.read_vector<uint64_t>(num_implied);
+    auto implied_neighbor0 = reader.read_vector<uint64_t>(num_implied);
+    auto implied_node1 = reader.read_vector<uint64_t>(num_implied);
+    auto implied_neighbor1 = reader.read_vector<uint64_t>(num_implied);
+    auto implied_weight_values = reader.read_vector<pm::weight_int>(num_implied);
+
+    auto& edges = *graph.node_edges;
+    for (size_t i = 0; i < num_nodes; i++) {
+        for (size_t j = offsets[i]; j < offsets[i + 1]; j++) {
+            // The flooders assume that a boundary edge is a node's first edge
+            bool is_boundary = neighbors[j] == SIZE_MAX;
+            if ((is_boundary && j != offsets[i]) || (!is_boundary && neighbors[j] >= num_nodes))
+                throw_corrupted();
+            if (!is_discretised_weight(weights[j]))
+                throw_corrupted();
+        }
+        edges.neighbors[i].assign(neighbors.begin() + offsets[i], neighbors.begin() + offsets[i + 1]);
+        edges.weights[i].assign(weights.begin() + offsets[i], weights.begin() + offsets[i + 1]);
+    }
+    for (size_t i = 0; i < num_nodes; i++) {
+        for (size_t j = 0; j < edges.neighbors[i].size(); j++) {
+            size_t neighbor = edges.neighbors[i][j];
+            if (neighbor == SIZE_MAX)
+                continue;
+            auto& reverse_neighbors = edges.neighbors[neighbor];
+            auto reverse = std::find(reverse_neighbors.begin(), reverse_neighbors.end(), i);
+            if (reverse == reverse_neighbors.end() ||
+                edges.weights[neighbor][reverse - reverse_neighbors.begin()] != edges.weights[i][j])
+                throw_corrupted();
+        }
+    }
+
+    auto check_edge = [&](uint64_t node, uint64_t neighbor) {
+        if (node >= num_nodes || neighbor >= edges.neighbors[node].size())
+            throw_corrupted();
+    };
+    implied_weights.edge_offsets.assign(offsets.begin(), offsets.end());
+    implied_weights.weight_offsets.assign(implied_offsets.begin(), implied_offsets.end());
+    implied_weights.weights.reserve(num_implied);
+    for (size_t k = 0; k < num_implied; k++) {
+        check_edge(implied_node0[k], implied_neighbor0[k]);
+        if (implied_node1[k] != SIZE_MAX)
+            check_edge(implied_node1[k], implied_neighbor1[k]);
+        if (!is_discretised_weight(implied_weight_values[k]))
+            throw_corrupted();
+        implied_weights.weights.push_back(
+            {implied_node0[k],
+             implied_neighbor0[k],
+             implied_node1[k],
+             implied_node1[k] == SIZE_MAX ? SIZE_MAX : implied_neighbor1[k],
+             implied_weight_values[k]});
+    }
+}
+
+void write_matching_graph(BinaryWriter& writer, const pm::MatchingGraph& graph) {
+    writer.write_u64(graph.num_nodes);
+    writer.write_u64(graph.num_observables);
+    writer.write_f64(graph.normalising_constant);
+    writer.write_u64((uint64_t)graph.negative_weight_sum);
+    writer.write_u64(graph.loaded_from_dem_without_correlations);
+    writer.write_u64(graph.negative_weight_detection_events_set.size());
+    writer.write_vector(std::vector<uint64_t>(
+        graph.negative_weight_detection_events_set.begin(), graph.negative_weight_detection_events_set.end()));
+    writer.write_u64(graph.negative_weight_observables_set.size());
+    writer.write_vector(std::vector<uint64_t>(
+        graph.negative_weight_observables_set.begin(), graph.negative_weight_observables_set.end()));
+    std::vector<uint8_t> is_boundary(graph.is_user_graph_boundary_node.begin(), graph.is_user_graph_boundary_node.end());
+    writer.write_u64(is_boundary.size());
+    writer.write_vector(is_boundary);
+
+    write_weighted_adjacency(writer, graph.nodes, graph.implied_weights.get());
+    std::vector<pm::obs_int> observables;
+    for (auto& node : graph.nodes)
+        observables.insert(observables.end(), node.neighbor_observables.begin(), node.neighbor_observables.end());
+    writer.write_vector(observables);
+}
+
+/// Reads the output of `write_matching_graph`, checking that it is consistent with the `num_nodes` and
+/// `num_observables` of the user graph section.
+pm::MatchingGraph read_matching_graph(BinaryReader& reader, size_t num_nodes, size_t num_observables) {
+    if (reader.read_u64() != num_nodes || reader.read_u64() != num_observables)
+        throw_corrupted();
+    double normalising_constant = reader.read_f64();
+    if (!(normalising_constant > 0) || std::isinf(normalising_constant))
+        throw_corrupted();
+    pm::MatchingGraph graph(num_nodes, num_observables, normalising_constant);
+    graph.negative_weight_sum = (pm::total_weight_int)reader.read_u64();
+    graph.loaded_from_dem_without_correlations = reader.read_u64();
+    auto negative_weight_detection_events = reader.read_vector<uint64_t>(reader.read_u64());
+    graph.negative_weight_detection_events_set.insert(
+        negative_weight_detection_events.begin(), negative_weight_detection_events.end());
+    auto negative_weight_observables = reader.read_vector<uint64_t>(reader.read_u64());
+    graph.negative_weight_observables_set.insert(negative_weight_observables.begin(), negative_weight_observables.end());
+    auto is_boundary = reader.read_vector<uint8_t>(reader.read_u64());
+    graph.is_user_graph_boundary_node.assign(is_boundary.begin(), is_boundary.end());
+    for (auto d : negative_weight_detection_events) {
+        if (d >= num_nodes)
+            throw_corrupted();
+    }
+    for (auto obs : negative_weight_observables) {
+        if (obs >= num_observables)
+            throw_corrupted();
+    }
+    if (!is_boundary.empty() && is_boundary.size() != num_nodes)
+        throw_corrupted();
+
+    graph.implied_weights = std::make_shared<pm::ImpliedWeights>();
+    read_weighted_adjacency(reader, graph, *graph.implied_weights);
+    auto& offsets = graph.implied_weights->edge_offsets;
+    auto observables = reader.read_vector<pm::obs_int>(offsets.back());
+    for (size_t i = 0; i < num_nodes; i++)
+        graph.node_edges->observables[i].assign(observables.begin() + offsets[i], observables.begin() + offsets[i + 1]);
+    graph.update_edge_views();
+    return graph;
+}
+
+void write_search_graph(BinaryWriter& writer, const pm::SearchGraph& graph) {
+    writer.write_u64(graph.num_nodes);
+    std::vector<uint64_t> negative_weight_edges;
+    for (auto& [u, v] : graph.negative_weight_edges) {
+        negative_weight_edges.push_back(u);
+        negative_weight_edges.push_back(v);
+    }
+    writer.write_u64(graph.negative_weight_edges.size());
+    writer.write_vector(negative_weight_edges);
+
+    write_weighted_adjacency(writer, graph.nodes, graph.implied_weights.get());
+    std::vector<uint8_t> markers;
+    std::vector<uint64_t> observables, observables_offsets{0};
+    for (auto& node : graph.nodes) {
+        for (auto marker : node.neighbor_markers)
+            markers.push_back(marker & pm::WEIGHT_SIGN);
+        for (auto& edge_observables : node.neighbor_observable_indices) {
+            observables.insert(observables.end(), edge_observables.begin(), edge_observables.end());
+            observables_offsets.push_back(observables.size());
+        }
+    }
+    writer.write_vector(markers);
+    writer.write_vector(observables_offsets);
+    writer.write_vector(observables);
+}
+
+/// Reads the output of `write_search_graph`, checking that it is consistent with the `num_nodes` and
+/// `num_observables` of the user graph section.
+pm::SearchGraph read_search_graph(BinaryReader& reader, size_t num_nodes, size_t num_observables) {
+    pm::SearchGraph graph(num_nodes);
+    if (reader.read_u64() != num_nodes)
+        throw_corrupted();
+    size_t num_negative_weight_edges = reader.read_u64();
+    auto negative_weight_edges = reader.read_vector<uint64_t>(
+        num_negative_weight_edges > SIZE_MAX / 2 ? SIZE_MAX : 2 * num_negative_weight_edges);
+    for (size_t i = 0; i < num_negative_weight_edges; i++) {
+        size_t u = negative_weight_edges[2 * i], v = negative_weight_edges[2 * i + 1];
+        if (u >= num_nodes || (v >= num_nodes && v != SIZE_MAX))
+            throw_corrupted();
+        graph.negative_weight_edges.push_back({u, v});
+    }
+
+    graph.implied_weights = std::make_shared<pm::ImpliedWeights>();
+    read_weighted_adjacency(reader, graph, *graph.implied_weights);
+    auto& offsets = graph.implied_weights->edge_offsets;
+    size_t num_neighbors = offsets.back();
+    auto markers = reader.read_vector<uint8_t>(num_neighbors);
+    auto observables_offsets = reader.read_vector<uint64_t>(num_neighbors + 1);
+    check_offsets(observables_offsets, observables_offsets.back());
+    auto observables = reader.read_vector<uint64_t>(observables_offsets.back());
+    for (auto marker : markers) {
+        if (marker & ~pm::WEIGHT_SIGN)
+            throw_corrupted();
+    }
+    for (auto obs : observables) {
+        if (obs >= num_observables)
+            throw_corrupted();
+    }
+    auto& edges = *graph.node_edges;
+    for (size_t i = 0; i < num_nodes; i++) {
+        edges.markers[i].assign(markers.begin() + offsets[i], markers.begin() + offsets[i + 1]);
+        edges.observable_indices[i].reserve(offsets[i + 1] - offsets[i]);
+        for (size_t e = offsets[i]; e < offsets[i + 1]; e++)
+            edges.observable_indices[i].emplace_back(
+                observables.begin() + observables_offsets[e], observables.begin() + observables_offsets[e + 1]);
+    }
+    graph.update_edge_views();
+    return graph;
+}
+
+/// The graphs in the compiled graph section, which are absent if they weren't included when serializing.
+struct CompiledGraphSection {
+    std::optional<pm::MatchingGraph> matching_graph;
+    std::optional<pm::SearchGraph> search_graph;
+};
+
+CompiledGraphSection read_compiled_graph(
+    BinaryReader& reader, uint64_t flags, size_t num_nodes, size_t num_observables) {
+    CompiledGraphSection result;
+    if (flags & HAS_COMPILED_GRAPH) {
+        result.matching_graph.emplace(read_matching_graph(reader, num_nodes, num_observables));
+        if (flags & HAS_SEARCH_GRAPH) {
+            result.search_graph.emplace(read_search_graph(reader, num_nodes, num_observables));
+            // The graphs of a compiled UserGraph share their implied weights
+            auto& implied_weights = result.matching_graph->implied_weights;
+            if (*result.search_graph->implied_weights == *implied_weights)
+                result.search_graph->implied_weights = implied_weights;
+        }
+    }
+    return result;
+}
+
+}  // namespace
+
+std::string pm::serialize_user_graph(pm::UserGraph& user_graph, bool include_compiled_graph) {
+    BinaryWriter writer;
+    const pm::Mwpm* mwpm = nullptr;
+    uint64_t flags = 0;
+    if (include_compiled_graph) {
+        // Include the search graph if it is needed for correlated matching, so that it doesn't need to be
+        // compiled again when the graph is loaded.
+        bool has_implied_weights = false;
+        for (size_t i = 0; i < user_graph.edges.size(); i++)
+            has_implied_weights |= !user_graph.edges.implied_weights(i).empty();
+        mwpm = has_implied_weights ? &user_graph.get_mwpm_with_search_graph() : &user_graph.get_mwpm();
+        flags |= HAS_COMPILED_GRAPH;
+        if (mwpm->search_flooder.graph.nodes.size() == mwpm->flooder.graph.nodes.size())
+            flags |= HAS_SEARCH_GRAPH;
+    }
+    write_header(writer, flags);
+
+    // The user graph section is prefixed with its size, so that it can be skipped when only the compiled graph is
+    // needed.
+    writer.write_u64(0);
+    size_t user_graph_begin = writer.out.size();
+    write_user_graph(writer, user_graph, user_graph.get_num_observables());
+    uint64_t user_graph_num_bytes = writer.out.size() - user_graph_begin;
+    std::memcpy(writer.out.data() + user_graph_begin - sizeof(uint64_t), &user_graph_num_bytes, sizeof(uint64_t));
+
+    if (mwpm != nullptr) {
+        write_matching_graph(writer, mwpm->flooder.graph);
+        if (flags & HAS_SEARCH_GRAPH)
+            write_search_graph(writer, mwpm->search_flooder.graph);
+    }
+    return writer.out;
+}
+
+pm::UserGraph pm::deserialize_user_graph(const uint8_t* data, size_t num_bytes) {
+    BinaryReader reader(data, num_bytes);
+    uint64_t flags = read_header(reader);
+    uint64_t user_graph_num_bytes = reader.read_u64();
+    size_t user_graph_end = reader.pos + user_graph_num_bytes;
+    auto user_graph = read_user_graph(reader, flags);
+    if (reader.pos != user_graph_end)
+        throw_corrupted();
+
+    auto graphs = read_compiled_graph(reader, flags, user_graph.get_num_nodes(), user_graph.get_num_observables());
+    if (graphs.search_graph) {
+        user_graph.set_mwpm(pm::Mwpm(
+            pm::GraphFlooder(std::move(*graphs.matching_graph)), pm::SearchFlooder(std::move(*graphs.search_graph))));
+    } else if (graphs.matching_graph) {
+        user_graph.set_mwpm(pm::Mwpm(pm::GraphFlooder(std::move(*graphs.matching_graph))));
+    }
+    return user_graph;
+}
+
+pm::CompiledMatchingGraph pm::deserialize_compiled_graph(const uint8_t* data, size_t num_bytes) {
+    BinaryReader reader(data, num_bytes);
+    uint64_t flags = read_header(reader);
+    if (!(flags & HAS_COMPILED_GRAPH))
+        throw std::invalid_argument("The serialized matching graph does not include a compiled graph.");
+    uint64_t user_graph_num_bytes = reader.read_u64();
+    // The numbers of nodes and observables are the first values in the user graph section
+    uint64_t num_nodes = reader.read_u64();
+    uint64_t num_observables = reader.read_u64();
+    reader.skip(user_graph_num_bytes - std::min<uint64_t>(user_graph_num_bytes, 2 * sizeof(uint64_t)));
+
+    auto graphs = read_compiled_graph(reader, flags, num_nodes, num_observables);
+    if (graphs.search_graph)
+        return pm::CompiledMatchingGraph(std::move(*graphs.matching_graph), std::move(*graphs.search_graph));
+    return pm::CompiledMatchingGraph(std::move(*graphs.matching_graph));
+}
+
+pm::CompiledMatchingGraph pm::load_compiled_graph_file(const char* path) {
+    std::ifstream file(path, std::ios::binary);
+    if (!file)
+        throw std::invalid_argument("Failed to open '" + std::string(path) + "'");
+    std::vector<uint8_t> data((std::istreambuf_iterator<char>(file)), std::istreambuf_iterator<char>());
+    return pm::deserialize_compiled_graph(data.data(), data.size());
+}
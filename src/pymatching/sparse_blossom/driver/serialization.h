@@ -0,0 +1,60 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_SERIALIZATION_H
+#define PYMATCHING2_SERIALIZATION_H
+
+#include <cstdint>
+#include <string>
+
+#include "pymatching/sparse_blossom/driver/compiled_graph.h"
+#include "pymatching/sparse_blossom/driver/user_graph.h"
+
+namespace pm {
+
+/// The version of the binary format written by `serialize_user_graph`. It is incremented whenever the format changes,
+/// and files with a different version are rejected when they are read.
+const uint64_t SERIALIZATION_FORMAT_VERSION = 1;
+
+/// Encodes `user_graph` in PyMatching's flat, versioned binary format.
+///
+/// The encoding starts with a header (a magic string, the format version and the width of `pm::obs_int`), followed
+/// by the edges of the user graph. If `include_compiled_graph` is true, this is followed by the discretised matching
+/// graph that the decoder uses (and the search graph, if the decoder needs one), stored as flat arrays: the CSR
+/// adjacency of each node, the discretised weights, the observable masks, the normalising constant, the negative-weight
+/// data and the implied weights used for correlated matching (as node and neighbor indices). This allows a decoder to
+/// be loaded without re-parsing a detector error model or re-discretising the graph.
+///
+/// All values are stored in native byte order, and every array starts at an offset that is a multiple of 8 bytes.
+std::string serialize_user_graph(UserGraph& user_graph, bool include_compiled_graph);
+
+/// Decodes a UserGraph from the output of `serialize_user_graph`. If the encoding includes the compiled graph, it is
+/// used as the decoder of the returned UserGraph (until the graph is next modified), rather than being recompiled.
+///
+/// Throws std::invalid_argument if the encoding is truncated or corrupted. As well as being bounds-checked, the
+/// compiled graph is checked for the properties that the decoder relies on without checking: its numbers of nodes and
+/// observables match the user graph, every node and observable index is in range, the adjacency is symmetric with
+/// boundary edges first, and all weights are even and at most twice `MAX_USER_EDGE_WEIGHT`.
+UserGraph deserialize_user_graph(const uint8_t* data, size_t num_bytes);
+
+/// Decodes only the compiled graph from the output of `serialize_user_graph`, skipping over the user graph edges.
+/// Throws std::invalid_argument if the encoding does not include the compiled graph.
+CompiledMatchingGraph deserialize_compiled_graph(const uint8_t* data, size_t num_bytes);
+
+/// Reads the file at `path`, written by `Matching.save`, and decodes the compiled graph stored in it.
+CompiledMatchingGraph load_compiled_graph_file(const char* path);
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_SERIALIZATION_H
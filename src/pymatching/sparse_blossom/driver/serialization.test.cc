@@ -0,0 +1,200 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/serialization.h"
+
+#include <algorithm>
+#include <gtest/gtest.h>
+
+#include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "stim.h"
+
+namespace {
+
+const uint8_t* as_bytes(const std::string& data) {
+    return reinterpret_cast<const uint8_t*>(data.data());
+}
+
+}  // namespace
+
+TEST(Serialization, UserGraphRoundTrip) {
+    pm::UserGraph user_graph(5, 4);
+    user_graph.add_or_merge_edge(0, 1, {0}, 1.5, 0.1);
+    user_graph.add_or_merge_edge(1, 2, {1, 3}, -2.0, -1);
+    user_graph.add_or_merge_boundary_edge(2, {2}, 3.0, 0.2);
+    user_graph.edges.add_implied_weight(0, {1, 2, 0.5});
+    user_graph.set_boundary({4});
+    user_graph.loaded_from_dem_without_correlations = true;
+
+    auto data = pm::serialize_user_graph(user_graph, false);
+    ASSERT_EQ(data.size() % 8, 0);
+    auto loaded = pm::deserialize_user_graph(as_bytes(data), data.size());
+    ASSERT_EQ(loaded.get_num_nodes(), 5);
+    ASSERT_EQ(loaded.get_num_observables(), 4);
+    ASSERT_EQ(loaded.get_boundary(), std::set<size_t>({4}));
+    ASSERT_TRUE(loaded.loaded_from_dem_without_correlations);
+    ASSERT_FALSE(loaded.all_edges_have_error_probabilities());
+    ASSERT_EQ(loaded.get_num_edges(), 3);
+    for (size_t i = 0; i < loaded.edges.size(); i++) {
+        auto e = loaded.edges[i];
+        auto expected = user_graph.edges[i];
+        ASSERT_EQ(e.node1, expected.node1);
+        ASSERT_EQ(e.node2, expected.node2);
+        ASSERT_EQ(e.observable_indices, expected.observable_indices);
+        ASSERT_EQ(e.weight, expected.weight);
+        ASSERT_EQ(e.error_probability, expected.error_probability);
+        ASSERT_EQ(e.implied_weights_for_other_edges, expected.implied_weights_for_other_edges);
+    }
+    ASSERT_TRUE(loaded.has_edge(1, 0));
+    ASSERT_TRUE(loaded.has_boundary_edge(2));
+    ASSERT_THROW(pm::deserialize_compiled_graph(as_bytes(data), data.size()), std::invalid_argument);
+}
+
+TEST(Serialization, CompiledGraphDecodesIdentically) {
+    stim::CircuitGenParameters gen(5, 5, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.01;
+    gen.before_measure_flip_probability = 0.01;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 200;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+
+    for (bool enable_correlations : {false, true}) {
+        auto user_graph = pm::detector_error_model_to_user_graph(dem, enable_correlations, pm::NUM_DISTINCT_WEIGHTS);
+        auto data = pm::serialize_user_graph(user_graph, true);
+        auto loaded = pm::deserialize_user_graph(as_bytes(data), data.size());
+        auto compiled = pm::deserialize_compiled_graph(as_bytes(data), data.size());
+        ASSERT_EQ(compiled.has_search_graph(), enable_correlations);
+        auto workspace = compiled.make_workspace();
+
+        auto& expected_mwpm = user_graph.get_mwpm();
+        auto& loaded_mwpm = loaded.get_mwpm();
+        ASSERT_EQ(loaded_mwpm.flooder.graph.normalising_constant, expected_mwpm.flooder.graph.normalising_constant);
+        ASSERT_EQ(
+            loaded_mwpm.flooder.graph.is_user_graph_boundary_node,
+            expected_mwpm.flooder.graph.is_user_graph_boundary_node);
+        for (size_t i = 0; i < expected_mwpm.flooder.graph.nodes.size(); i++) {
+            auto& expected_node = expected_mwpm.flooder.graph.nodes[i];
+            auto& loaded_node = loaded_mwpm.flooder.graph.nodes[i];
+            ASSERT_TRUE(std::ranges::equal(loaded_node.neighbor_weights, expected_node.neighbor_weights));
+            ASSERT_TRUE(std::ranges::equal(loaded_node.neighbor_observables, expected_node.neighbor_observables));
+        }
+
+        for (size_t k = 0; k < num_shots; k++) {
+            std::vector<uint64_t> hits;
+            for (size_t d = 0; d < circuit.count_detectors(); d++) {
+                if (dets[d][k])
+                    hits.push_back(d);
+            }
+            pm::ExtendedMatchingResult expected(expected_mwpm.flooder.graph.num_observables);
+            pm::decode_detection_events(
+                expected_mwpm, hits, expected.obs_crossed.data(), expected.weight, enable_correlations);
+            for (auto* mwpm : {&loaded_mwpm, &workspace}) {
+                pm::ExtendedMatchingResult res(mwpm->flooder.graph.num_observables);
+                pm::decode_detection_events(*mwpm, hits, res.obs_crossed.data(), res.weight, enable_correlations);
+                ASSERT_EQ(res, expected);
+            }
+        }
+    }
+}
+
+TEST(Serialization, NegativeWeightsAndSearchGraph) {
+    pm::UserGraph user_graph;
+    user_graph.add_or_merge_edge(0, 1, {0}, -1.0, -1);
+    user_graph.add_or_merge_edge(1, 2, {1}, 1.0, -1);
+    user_graph.add_or_merge_boundary_edge(2, {2}, -1.0, -1);
+    user_graph.get_mwpm_with_search_graph();
+    auto data = pm::serialize_user_graph(user_graph, true);
+    auto compiled = pm::deserialize_compiled_graph(as_bytes(data), data.size());
+    ASSERT_TRUE(compiled.has_search_graph());
+    std::vector<std::pair<size_t, size_t>> expected_negative_weight_edges = {{0, 1}, {2, SIZE_MAX}};
+    ASSERT_EQ(compiled.search_graph().negative_weight_edges, expected_negative_weight_edges);
+    ASSERT_EQ(compiled.search_graph().nodes[2].neighbor_observable_indices[0], std::vector<size_t>({2}));
+
+    auto workspace = compiled.make_workspace();
+    ASSERT_EQ(workspace.flooder.negative_weight_sum, user_graph.get_mwpm().flooder.negative_weight_sum);
+    ASSERT_EQ(workspace.flooder.negative_weight_detection_events, std::vector<uint64_t>({0, 1, 2}));
+    ASSERT_EQ(workspace.flooder.negative_weight_observables, std::vector<size_t>({0, 2}));
+    for (auto dets : std::vector<std::vector<uint64_t>>{{}, {0, 1}, {1}, {0, 2}}) {
+        auto res = pm::decode_detection_events_for_up_to_64_observables(workspace, dets, false);
+        auto expected = pm::decode_detection_events_for_up_to_64_observables(user_graph.get_mwpm(), dets, false);
+        ASSERT_EQ(res, expected);
+        std::vector<int64_t> edges, expected_edges;
+        pm::decode_detection_events_to_edges(workspace, dets, edges);
+        pm::decode_detection_events_to_edges(user_graph.get_mwpm(), dets, expected_edges);
+        ASSERT_EQ(edges, expected_edges);
+    }
+}
+
+TEST(Serialization, RejectsInvalidData) {
+    pm::UserGraph user_graph;
+    user_graph.add_or_merge_edge(0, 1, {0}, 1.0, -1);
+    auto data = pm::serialize_user_graph(user_graph, true);
+
+    ASSERT_THROW(pm::deserialize_user_graph(as_bytes(data), 5), std::invalid_argument);
+    for (size_t n : {(size_t)0, (size_t)16, data.size() - 8}) {
+        ASSERT_THROW(pm::deserialize_user_graph(as_bytes(data), n), std::invalid_argument);
+        ASSERT_THROW(pm::deserialize_compiled_graph(as_bytes(data), n), std::invalid_argument);
+    }
+    auto bad_magic = data;
+    bad_magic[0] = 'X';
+    ASSERT_THROW(pm::deserialize_user_graph(as_bytes(bad_magic), bad_magic.size()), std::invalid_argument);
+    auto bad_version = data;
+    bad_version[8] = 99;
+    ASSERT_THROW(pm::deserialize_user_graph(as_bytes(bad_version), bad_version.size()), std::invalid_argument);
+    ASSERT_THROW(pm::load_compiled_graph_file("/this/file/does/not/exist"), std::invalid_argument);
+}
+
+TEST(Serialization, CorruptedDataIsRejectedOrDecodes) {
+    stim::CircuitGenParameters gen(3, 3, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.01;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 3;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+    std::vector<std::vector<uint64_t>> shots(num_shots);
+    for (size_t k = 0; k < num_shots; k++) {
+        for (size_t d = 0; d < circuit.count_detectors(); d++) {
+            if (dets[d][k])
+                shots[k].push_back(d);
+        }
+    }
+
+    // Flipping any bit of the data must either be detected when loading, or give a graph that can be decoded
+    for (bool enable_correlations : {false, true}) {
+        auto user_graph = pm::detector_error_model_to_user_graph(dem, enable_correlations, pm::NUM_DISTINCT_WEIGHTS);
+        auto data = pm::serialize_user_graph(user_graph, true);
+        for (size_t i = 0; i < data.size(); i++) {
+            for (uint8_t flip : {0x01, 0x80}) {
+                auto corrupted = data;
+                corrupted[i] ^= flip;
+                try {
+                    auto loaded = pm::deserialize_user_graph(as_bytes(corrupted), corrupted.size());
+                    auto& mwpm = enable_correlations ? loaded.get_mwpm_with_search_graph() : loaded.get_mwpm();
+                    pm::ExtendedMatchingResult res(mwpm.flooder.graph.num_observables);
+                    for (auto& shot : shots) {
+                        res.reset();
+                        pm::decode_detection_events(
+                            mwpm, shot, res.obs_crossed.data(), res.weight, enable_correlations);
+                    }
+                } catch (const std::invalid_argument&) {
+                }
+            }
+        }
+    }
+}
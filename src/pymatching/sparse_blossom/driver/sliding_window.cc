@@ -0,0 +1,473 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/sliding_window.h"
+
+#include <algorithm>
+#include <cmath>
+#include <limits>
+#include <string>
+#include <unordered_map>
+
+#include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "pymatching/sparse_blossom/driver/parallel.h"
+#include "pymatching/sparse_blossom/driver/serialization.h"
+
+namespace {
+
+constexpr double INF = std::numeric_limits<double>::infinity();
+
+/// Checks the arguments shared by the window decoders, and returns the non-boundary nodes sorted by time (and then by
+/// index).
+std::vector<size_t> nodes_sorted_by_time(
+    const pm::GraphView& graph,
+    const std::vector<double>& detector_times,
+    double commit_duration,
+    double buffer_duration) {
+    if (detector_times.size() != graph.num_nodes())
+        throw std::invalid_argument(
+            "Expected " + std::to_string(graph.num_nodes()) + " detector times (one for each node), but got " +
+            std::to_string(detector_times.size()) + ".");
+    if (!(commit_duration > 0 && std::isfinite(commit_duration)) || !(buffer_duration >= 0))
+        throw std::invalid_argument(
+            "The commit duration must be positive and finite, and the buffer duration must be non-negative.");
+    std::vector<size_t> sorted_nodes;
+    for (size_t i = 0; i < graph.num_nodes(); i++) {
+        if (graph.is_boundary(i))
+            continue;
+        if (!std::isfinite(detector_times[i]))
+            throw std::invalid_argument("The time of node " + std::to_string(i) + " is not finite.");
+        sorted_nodes.push_back(i);
+    }
+    std::stable_sort(sorted_nodes.begin(), sorted_nodes.end(), [&](size_t a, size_t b) {
+        return detector_times[a] < detector_times[b];
+    });
+    return sorted_nodes;
+}
+
+/// Sets the nodes of `window` to the nodes of `sorted_nodes` with a time in `[window.start_time, window.end_time)`.
+void set_window_nodes(
+    pm::DecodingWindow& window, const std::vector<size_t>& sorted_nodes, const std::vector<double>& detector_times) {
+    auto by_time = [&](size_t node, double time) {
+        return detector_times[node] < time;
+    };
+    auto begin = std::lower_bound(sorted_nodes.begin(), sorted_nodes.end(), window.start_time, by_time);
+    auto end = std::lower_bound(begin, sorted_nodes.end(), window.end_time, by_time);
+    window.nodes.assign(begin, end);
+}
+
+/// Returns the subgraph of `graph` induced by the nodes of `window`, and fills in the boundary edges of `window`.
+/// Edges to nodes before (or after) the window become boundary edges if `open_past` (or `open_future`) is true, and
+/// are otherwise removed. `local_indices` must map every node to SIZE_MAX, and is restored before returning.
+pm::UserGraph make_window_graph(
+    const pm::GraphView& graph,
+    const std::vector<double>& detector_times,
+    pm::DecodingWindow& window,
+    std::vector<size_t>& local_indices,
+    bool open_past,
+    bool open_future) {
+    for (size_t i = 0; i < window.nodes.size(); i++)
+        local_indices[window.nodes[i]] = i;
+
+    pm::UserGraph window_graph(window.nodes.size(), graph.num_observables());
+    window.boundary_edges.assign(window.nodes.size(), SIZE_MAX);
+    std::vector<size_t> observables;
+    auto add_edge = [&](size_t i, size_t j, size_t edge_index) {
+        auto edge_observables = graph.edge_observables(edge_index);
+        observables.assign(edge_observables.begin(), edge_observables.end());
+        double weight = graph.edge_weight(edge_index);
+        double error_probability = graph.edge_error_probability(edge_index);
+        if (j == SIZE_MAX) {
+            window_graph.add_or_merge_boundary_edge(i, observables, weight, error_probability);
+        } else {
+            window_graph.add_or_merge_edge(i, j, observables, weight, error_probability);
+        }
+    };
+    std::vector<pm::UserNeighbor> neighbors;
+    for (size_t i = 0; i < window.nodes.size(); i++) {
+        size_t& boundary_edge = window.boundary_edges[i];
+        graph.get_neighbors(window.nodes[i], neighbors);
+        for (auto& neighbor : neighbors) {
+            size_t v = neighbor.node;
+            bool is_boundary = v == SIZE_MAX || graph.is_boundary(v);
+            if (!is_boundary && local_indices[v] != SIZE_MAX) {
+                if (i < local_indices[v])
+                    add_edge(i, local_indices[v], neighbor.edge_index);
+            } else if (is_boundary || (detector_times[v] < window.start_time ? open_past : open_future)) {
+                // Detection events can be matched to detectors beyond an open side of the window, so edges to them
+                // become boundary edges
+                if (boundary_edge == SIZE_MAX ||
+                    graph.edge_weight(neighbor.edge_index) < graph.edge_weight(boundary_edge))
+                    boundary_edge = neighbor.edge_index;
+            }
+        }
+        if (boundary_edge != SIZE_MAX)
+            add_edge(i, SIZE_MAX, boundary_edge);
+    }
+    for (auto node : window.nodes)
+        local_indices[node] = SIZE_MAX;
+    return window_graph;
+}
+
+/// Returns the index in `graph` of the edge from node `u` to node `v` (or to the boundary, if `v` is -1) of `window`.
+size_t graph_edge_index(
+    const pm::GraphView& graph,
+    const pm::DecodingWindow& window,
+    int64_t u,
+    int64_t v,
+    std::vector<pm::UserNeighbor>& neighbors) {
+    if (v == -1)
+        return window.boundary_edges[u];
+    graph.get_neighbors(window.nodes[u], neighbors);
+    for (auto& neighbor : neighbors) {
+        if (neighbor.node == window.nodes[v])
+            return neighbor.edge_index;
+    }
+    throw std::invalid_argument("Edge not found in the graph.");
+}
+
+/// Decodes `window` using `mwpm` (which must be a decoder for its subgraph) given the detection events in `syndrome`,
+/// and appends the edges of the solution that it commits to `committed_edges`.
+void decode_window(
+    pm::Mwpm& mwpm,
+    const pm::GraphView& graph,
+    const std::vector<double>& detector_times,
+    const pm::DecodingWindow& window,
+    const std::vector<uint8_t>& syndrome,
+    std::vector<uint64_t>& window_detection_events,
+    std::vector<int64_t>& window_edges,
+    std::vector<pm::UserNeighbor>& neighbors,
+    std::vector<size_t>& committed_edges) {
+    window_detection_events.clear();
+    for (size_t i = 0; i < window.nodes.size(); i++) {
+        if (syndrome[window.nodes[i]])
+            window_detection_events.push_back(i);
+    }
+    if (window_detection_events.empty() && mwpm.flooder.negative_weight_sum == 0)
+        return;
+    window_edges.clear();
+    pm::decode_detection_events_to_edges(mwpm, window_detection_events, window_edges);
+    auto is_committed = [&](int64_t local_node) {
+        double t = detector_times[window.nodes[local_node]];
+        return t >= window.commit_start_time && t < window.commit_end_time;
+    };
+    for (size_t k = 0; k < window_edges.size(); k += 2) {
+        int64_t u = window_edges[k];
+        int64_t v = window_edges[k + 1];
+        if (is_committed(u) || (v != -1 && is_committed(v)))
+            committed_edges.push_back(graph_edge_index(graph, window, u, v, neighbors));
+    }
+}
+
+void check_detection_events(const pm::GraphView& graph, const std::vector<uint64_t>& detection_events) {
+    for (auto d : detection_events) {
+        if (d >= graph.num_nodes())
+            throw std::invalid_argument(
+                "Detection event index " + std::to_string(d) + " is larger than the number of nodes.");
+        if (graph.is_boundary(d))
+            throw std::invalid_argument(
+                "Detection event index " + std::to_string(d) +
+                " is a boundary node, which cannot have a detection event.");
+    }
+}
+
+}  // namespace
+
+pm::SlidingWindowDecoder::SlidingWindowDecoder(
+    const pm::GraphView& graph, std::vector<double> detector_times, double commit_duration, double buffer_duration)
+    : _graph(graph), _detector_times(std::move(detector_times)), _syndrome(graph.num_nodes(), 0) {
+    auto sorted_nodes = nodes_sorted_by_time(graph, _detector_times, commit_duration, buffer_duration);
+    if (sorted_nodes.empty())
+        return;
+    double first_time = _detector_times[sorted_nodes.front()];
+    double last_time = _detector_times[sorted_nodes.back()];
+
+    std::vector<size_t> local_indices(graph.num_nodes(), SIZE_MAX);
+    std::unordered_map<std::string, size_t> decoder_indices;
+    for (size_t k = 0; first_time + (double)k * commit_duration <= last_time; k++) {
+        DecodingWindow window;
+        window.start_time = first_time + (double)k * commit_duration;
+        window.commit_start_time = -INF;
+        window.commit_end_time = window.start_time + commit_duration;
+        window.end_time = window.commit_end_time + buffer_duration;
+        bool is_last = window.end_time > last_time;
+        if (is_last) {
+            // The last window contains (and commits) every remaining detector
+            window.end_time = INF;
+            window.commit_end_time = INF;
+        }
+        set_window_nodes(window, sorted_nodes, _detector_times);
+        if (window.nodes.empty() || _detector_times[window.nodes.front()] >= window.commit_end_time)
+            continue;
+        auto window_graph = make_window_graph(graph, _detector_times, window, local_indices, false, true);
+
+        // Windows with the same subgraph share a decoder
+        auto key = pm::serialize_user_graph(window_graph, false);
+        auto it = decoder_indices.find(key);
+        if (it == decoder_indices.end()) {
+            it = decoder_indices.emplace(std::move(key), decoders.size()).first;
+            decoders.push_back(window_graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, true));
+        }
+        window.decoder_index = it->second;
+        windows.push_back(std::move(window));
+        if (is_last)
+            break;
+    }
+}
+
+void pm::SlidingWindowDecoder::flip_detection_event(size_t node) {
+    if (node == SIZE_MAX || _graph.is_boundary(node))
+        return;
+    _syndrome[node] ^= 1;
+    _touched_nodes.push_back(node);
+}
+
+double pm::SlidingWindowDecoder::decode(const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed) {
+    check_detection_events(_graph, detection_events);
+    for (auto d : detection_events)
+        flip_detection_event(d);
+
+    double weight = 0;
+    try {
+        for (auto& window : windows) {
+            _committed_edges.clear();
+            decode_window(
+                decoders[window.decoder_index],
+                _graph,
+                _detector_times,
+                window,
+                _syndrome,
+                _window_detection_events,
+                _window_edges,
+                _neighbors,
+                _committed_edges);
+            // Committing an edge carries forward the detection event at its far end if it leaves the window
+            for (auto e : _committed_edges) {
+                for (auto obs : _graph.edge_observables(e))
+                    obs_crossed[obs] ^= 1;
+                weight += _graph.edge_weight(e);
+                auto [node1, node2] = _graph.edge_nodes(e);
+                flip_detection_event(node1);
+                flip_detection_event(node2);
+            }
+        }
+    } catch (...) {
+        for (auto node : _touched_nodes)
+            _syndrome[node] = 0;
+        _touched_nodes.clear();
+        throw;
+    }
+    for (auto node : _touched_nodes)
+        _syndrome[node] = 0;
+    _touched_nodes.clear();
+    return weight;
+}
+
+pm::ParallelWindowDecoder::ParallelWindowDecoder(
+    const pm::GraphView& graph,
+    std::vector<double> detector_times,
+    double commit_duration,
+    double buffer_duration,
+    size_t num_threads)
+    : num_first_layer_windows(0),
+      _graph(graph),
+      _detector_times(std::move(detector_times)) {
+    auto sorted_nodes = nodes_sorted_by_time(graph, _detector_times, commit_duration, buffer_duration);
+    if (num_threads < 1)
+        throw std::invalid_argument("`num_threads` must be at least 1.");
+    if (sorted_nodes.empty()) {
+        start_workers(num_threads);
+        return;
+    }
+    double first_time = _detector_times[sorted_nodes.front()];
+    double last_time = _detector_times[sorted_nodes.back()];
+
+    // The first layer has a window for each commit slab, and the second layer has a window for each gap slab
+    std::vector<DecodingWindow> gap_windows;
+    std::vector<uint8_t> in_commit_slab(graph.num_nodes(), 0);
+    for (size_t k = 0;; k++) {
+        double commit_start_time = first_time + (double)k * (commit_duration + buffer_duration);
+        DecodingWindow window;
+        window.start_time = k == 0 ? -INF : commit_start_time - buffer_duration;
+        window.commit_start_time = k == 0 ? -INF : commit_start_time;
+        window.commit_end_time = commit_start_time + commit_duration;
+        window.end_time = window.commit_end_time + buffer_duration;
+        bool is_last = window.end_time > last_time;
+        if (is_last) {
+            // The last window contains (and commits) every remaining detector
+            window.end_time = INF;
+            window.commit_end_time = INF;
+        }
+        set_window_nodes(window, sorted_nodes, _detector_times);
+        for (auto node : window.nodes) {
+            double t = _detector_times[node];
+            if (t >= window.commit_start_time && t < window.commit_end_time)
+                in_commit_slab[node] = 1;
+        }
+        windows.push_back(std::move(window));
+        if (is_last)
+            break;
+
+        DecodingWindow gap_window;
+        gap_window.start_time = windows.back().commit_end_time;
+        gap_window.end_time = gap_window.start_time + buffer_duration;
+        gap_window.commit_start_time = -INF;
+        gap_window.commit_end_time = INF;
+        set_window_nodes(gap_window, sorted_nodes, _detector_times);
+        gap_windows.push_back(std::move(gap_window));
+    }
+
+    // Check that the edges committed by each window can only affect the windows of the next layer
+    std::vector<UserNeighbor> neighbors;
+    auto check_neighbors = [&](const DecodingWindow& window, size_t u, bool is_gap_window) {
+        graph.get_neighbors(u, neighbors);
+        for (auto& neighbor : neighbors) {
+            size_t v = neighbor.node;
+            if (v == SIZE_MAX || graph.is_boundary(v) || (is_gap_window && in_commit_slab[v]))
+                continue;
+            if (_detector_times[v] >= window.start_time && _detector_times[v] < window.end_time)
+                continue;
+            throw std::invalid_argument(
+                "The edge between nodes " + std::to_string(u) + " and " + std::to_string(v) +
+                (is_gap_window ? " crosses a commit slab, so the commit duration must be longer."
+                               : " is longer than the buffer duration, which must be at least the time spanned by "
+                                 "any edge."));
+        }
+    };
+    for (auto& window : windows) {
+        for (auto u : window.nodes) {
+            if (in_commit_slab[u])
+                check_neighbors(window, u, false);
+        }
+    }
+    for (auto& window : gap_windows) {
+        for (auto u : window.nodes)
+            check_neighbors(window, u, true);
+    }
+
+    // Remove empty windows, then compile the subgraph of each window (sharing the compiled graphs of identical windows)
+    auto is_empty = [](const DecodingWindow& window) {
+        return window.nodes.empty();
+    };
+    windows.erase(std::remove_if(windows.begin(), windows.end(), is_empty), windows.end());
+    num_first_layer_windows = windows.size();
+    for (auto& window : gap_windows) {
+        if (!is_empty(window))
+            windows.push_back(std::move(window));
+    }
+    std::vector<size_t> local_indices(graph.num_nodes(), SIZE_MAX);
+    std::unordered_map<std::string, size_t> decoder_indices;
+    for (size_t i = 0; i < windows.size(); i++) {
+        bool is_open = i < num_first_layer_windows;
+        auto window_graph = make_window_graph(graph, _detector_times, windows[i], local_indices, is_open, is_open);
+        auto key = pm::serialize_user_graph(window_graph, false);
+        auto it = decoder_indices.find(key);
+        if (it == decoder_indices.end()) {
+            it = decoder_indices.emplace(std::move(key), compiled_graphs.size()).first;
+            compiled_graphs.push_back(window_graph.to_compiled_graph(pm::NUM_DISTINCT_WEIGHTS, true));
+        }
+        windows[i].decoder_index = it->second;
+    }
+
+    start_workers(num_threads);
+}
+
+void pm::ParallelWindowDecoder::start_workers(size_t num_threads) {
+    _workers.resize(std::min(num_threads, std::max<size_t>(windows.size(), 1)));
+    for (auto& worker : _workers)
+        worker.decoders.resize(compiled_graphs.size());
+    _shots.resize(_workers.size());
+    for (auto& shot : _shots) {
+        shot.syndrome.assign(_graph.num_nodes(), 0);
+        shot.committed_edges.resize(windows.size());
+    }
+    _pool = std::make_unique<pm::ThreadPool>(_workers.size());
+}
+
+void pm::ParallelWindowDecoder::flip_detection_event(Shot& shot, size_t node) {
+    if (node == SIZE_MAX || _graph.is_boundary(node))
+        return;
+    shot.syndrome[node] ^= 1;
+    shot.touched_nodes.push_back(node);
+}
+
+void pm::ParallelWindowDecoder::decode_window_of_shot(Worker& worker, Shot& shot, size_t window_index) {
+    auto& window = windows[window_index];
+    auto& decoder = worker.decoders[window.decoder_index];
+    if (!decoder)
+        decoder = std::make_unique<pm::Mwpm>(compiled_graphs[window.decoder_index].make_workspace());
+    shot.committed_edges[window_index].clear();
+    decode_window(
+        *decoder,
+        _graph,
+        _detector_times,
+        window,
+        shot.syndrome,
+        worker.window_detection_events,
+        worker.window_edges,
+        worker.neighbors,
+        shot.committed_edges[window_index]);
+}
+
+double pm::ParallelWindowDecoder::decode_layer(
+    Shot& shot, size_t windows_begin, size_t windows_end, uint8_t* obs_crossed, Worker* worker) {
+    // The windows of a layer only read the syndrome while they are being decoded, and their edges are committed after
+    if (worker != nullptr) {
+        for (size_t i = windows_begin; i < windows_end; i++)
+            decode_window_of_shot(*worker, shot, i);
+    } else if (windows_begin != windows_end) {
+        _pool->for_blocks(windows_end - windows_begin, [&](size_t thread_index, size_t begin, size_t end) {
+            for (size_t i = windows_begin + begin; i < windows_begin + end; i++)
+                decode_window_of_shot(_workers[thread_index], shot, i);
+        });
+    }
+    double weight = 0;
+    for (size_t i = windows_begin; i < windows_end; i++) {
+        for (auto e : shot.committed_edges[i]) {
+            for (auto obs : _graph.edge_observables(e))
+                obs_crossed[obs] ^= 1;
+            weight += _graph.edge_weight(e);
+            auto [node1, node2] = _graph.edge_nodes(e);
+            flip_detection_event(shot, node1);
+            flip_detection_event(shot, node2);
+        }
+    }
+    return weight;
+}
+
+double pm::ParallelWindowDecoder::decode_shot(
+    Shot& shot, const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed, Worker* worker) {
+    check_detection_events(_graph, detection_events);
+    for (auto d : detection_events)
+        flip_detection_event(shot, d);
+
+    double weight = 0;
+    try {
+        weight += decode_layer(shot, 0, num_first_layer_windows, obs_crossed, worker);
+        weight += decode_layer(shot, num_first_layer_windows, windows.size(), obs_crossed, worker);
+    } catch (...) {
+        for (auto node : shot.touched_nodes)
+            shot.syndrome[node] = 0;
+        shot.touched_nodes.clear();
+        throw;
+    }
+    for (auto node : shot.touched_nodes)
+        shot.syndrome[node] = 0;
+    shot.touched_nodes.clear();
+    return weight;
+}
+
+double pm::ParallelWindowDecoder::decode(const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed) {
+    return decode_shot(_shots[0], detection_events, obs_crossed, nullptr);
+}
@@ -0,0 +1,193 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_SLIDING_WINDOW_H
+#define PYMATCHING2_SLIDING_WINDOW_H
+
+#include <memory>
+#include <vector>
+
+#include "pymatching/sparse_blossom/driver/graph_view.h"
+#include "pymatching/sparse_blossom/driver/parallel.h"
+
+namespace pm {
+
+/// The detectors of a graph with a time coordinate in `[start_time, end_time)`, which are decoded together using the
+/// subgraph that they induce.
+struct DecodingWindow {
+    double start_time;
+    double end_time;
+    /// Edges of the solution in the window with a detector in `[commit_start_time, commit_end_time)` are committed.
+    double commit_start_time;
+    double commit_end_time;
+    /// The index in the graph of each node of the window, sorted by time (and then by index).
+    std::vector<size_t> nodes;
+    /// The index of the edge used as the boundary edge of each node of the window, or SIZE_MAX if it has none. This is
+    /// either an edge to the boundary, or an edge to a detector outside an open side of the window (whichever is
+    /// lightest).
+    std::vector<size_t> boundary_edges;
+    /// The index of the decoder of the window, which is shared by windows that have identical subgraphs.
+    size_t decoder_index;
+};
+
+/// Decodes a graph whose detectors each have a time coordinate (such as the graph of a memory experiment with many
+/// rounds) using a sequence of overlapping windows, rather than decoding the whole graph at once.
+///
+/// Each window contains the detectors in a commit region of duration `commit_duration`, followed by a buffer region
+/// of duration `buffer_duration`, and starts where the commit region of the previous window ended. Edges from the
+/// window to later detectors are treated as boundary edges, while edges to earlier (already committed) detectors are
+/// removed. After a window is decoded, the edges of its solution that start in its commit region are committed: they
+/// are added to the prediction, and the detection events at their ends are flipped, so that detection events are
+/// carried forward into the next window where a committed edge crosses into it. The last window commits every edge.
+///
+/// Windows with identical subgraphs (e.g. the windows in the middle of a memory experiment) share a single decoder,
+/// so the memory used by the decoders is bounded by the window size rather than by the number of rounds.
+class SlidingWindowDecoder {
+   public:
+    std::vector<DecodingWindow> windows;
+    std::vector<Mwpm> decoders;
+
+    /// `detector_times[i]` is the time coordinate of node `i` of `graph` (the time of boundary nodes is ignored).
+    /// `graph` must outlive the decoder.
+    SlidingWindowDecoder(
+        const GraphView& graph,
+        std::vector<double> detector_times,
+        double commit_duration,
+        double buffer_duration);
+    /// Decodes a shot with the given detection events, XORing the observables predicted to have been flipped into
+    /// `obs_crossed` (which must have one element per observable), and returns the total weight of the committed edges.
+    double decode(const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed);
+
+   private:
+    const GraphView& _graph;
+    std::vector<double> _detector_times;
+    /// The detection events that have not yet been resolved by committed edges, and the nodes they have been set at
+    std::vector<uint8_t> _syndrome;
+    std::vector<size_t> _touched_nodes;
+    std::vector<uint64_t> _window_detection_events;
+    std::vector<int64_t> _window_edges;
+    std::vector<UserNeighbor> _neighbors;
+    std::vector<size_t> _committed_edges;
+
+    void flip_detection_event(size_t node);
+};
+
+/// Decodes a graph whose detectors each have a time coordinate using two layers of windows, where the windows in
+/// each layer are decoded concurrently on a pool of threads (the "sandwich" parallel window decoder).
+///
+/// The time-like graph is split into alternating slabs: commit slabs of duration `commit_duration`, separated by gap
+/// slabs of duration `buffer_duration`. Each window of the first layer contains a commit slab together with the gap
+/// slab on either side of it, and is open on both sides (edges leaving the window are treated as boundary edges).
+/// The edges of its solution that touch its commit slab are committed, flipping the detection events at their ends
+/// in the gaps. Each window of the second layer then contains a single gap slab, is closed on both sides (the
+/// neighbouring commit slabs have been resolved), and commits every edge of its solution.
+///
+/// Since the windows of each layer share no committed detectors, they can be decoded independently. This requires
+/// that no edge spans more than the duration of a gap slab, or crosses a commit slab. Since the windows of the second
+/// layer are closed, their detection events must be able to be matched within the gap slab (e.g. to a spatial
+/// boundary, as in a surface code memory experiment).
+class ParallelWindowDecoder {
+   public:
+    /// The windows of the first layer (each containing a commit slab), followed by the windows of the second layer
+    /// (each containing a gap slab).
+    std::vector<DecodingWindow> windows;
+    size_t num_first_layer_windows;
+    /// The compiled graph of each distinct window subgraph, from which each thread creates its own decoders.
+    std::vector<CompiledMatchingGraph> compiled_graphs;
+
+    ParallelWindowDecoder(
+        const GraphView& graph,
+        std::vector<double> detector_times,
+        double commit_duration,
+        double buffer_duration,
+        size_t num_threads);
+    /// Decodes a shot as for `SlidingWindowDecoder::decode`, decoding the windows of each layer concurrently.
+    double decode(const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed);
+    /// Decodes `num_shots` shots, where `get_detection_events(shot_index, detection_events)` appends the detection
+    /// events of shot `shot_index` to `detection_events`, and must be safe to call concurrently. The observables
+    /// predicted for shot `i` are XORed into `obs_crossed + i * num_observables`, and its weight is written to
+    /// `weights[i]`. If there are at least as many shots as threads, each thread decodes a block of whole shots (the
+    /// windows of each shot in turn), so that the threads only need to be synchronized once for the batch, rather than
+    /// for every layer of every shot. The results are the same as those of `decode`.
+    template <typename GetDetectionEvents>
+    void decode_batch(
+        size_t num_shots, const GetDetectionEvents& get_detection_events, uint8_t* obs_crossed, double* weights);
+
+   private:
+    /// The state used by a single thread, including its own decoder for each compiled graph (created on first use).
+    struct Worker {
+        std::vector<std::unique_ptr<Mwpm>> decoders;
+        std::vector<uint64_t> window_detection_events;
+        std::vector<int64_t> window_edges;
+        std::vector<UserNeighbor> neighbors;
+    };
+    /// The state of a shot while it is being decoded: the detection events that have not yet been resolved by
+    /// committed edges (and the nodes they have been set at), and the edges committed by each window, which are
+    /// applied once every window in the layer has been decoded.
+    struct Shot {
+        std::vector<uint8_t> syndrome;
+        std::vector<size_t> touched_nodes;
+        std::vector<std::vector<size_t>> committed_edges;
+    };
+
+    const GraphView& _graph;
+    std::vector<double> _detector_times;
+    std::vector<Worker> _workers;
+    /// The shot being decoded by each worker while decoding a batch of whole shots on each thread. The first is also
+    /// used by `decode`.
+    std::vector<Shot> _shots;
+    /// The threads of the workers, which are started once and reused, since starting threads for each layer of each
+    /// shot can take longer than decoding it.
+    std::unique_ptr<ThreadPool> _pool;
+
+    void start_workers(size_t num_threads);
+    /// Decodes a shot as for `decode`. The windows of each layer are decoded by `worker` alone if it is not nullptr,
+    /// and otherwise concurrently by all the workers.
+    double decode_shot(
+        Shot& shot, const std::vector<uint64_t>& detection_events, uint8_t* obs_crossed, Worker* worker);
+    /// Decodes the windows `[windows_begin, windows_end)` of `shot` (as for `decode_shot`), then commits their edges,
+    /// returning the total weight of the committed edges.
+    double decode_layer(Shot& shot, size_t windows_begin, size_t windows_end, uint8_t* obs_crossed, Worker* worker);
+    void decode_window_of_shot(Worker& worker, Shot& shot, size_t window_index);
+    void flip_detection_event(Shot& shot, size_t node);
+};
+
+template <typename GetDetectionEvents>
+void ParallelWindowDecoder::decode_batch(
+    size_t num_shots, const GetDetectionEvents& get_detection_events, uint8_t* obs_crossed, double* weights) {
+    size_t num_observables = _graph.num_observables();
+    // With fewer shots than threads, the threads are better used to decode the windows of each shot
+    if (num_shots < _workers.size()) {
+        std::vector<uint64_t> detection_events;
+        for (size_t i = 0; i < num_shots; i++) {
+            detection_events.clear();
+            get_detection_events(i, detection_events);
+            weights[i] = decode(detection_events, obs_crossed + num_observables * i);
+        }
+        return;
+    }
+    _pool->for_blocks(num_shots, [&](size_t thread_index, size_t begin, size_t end) {
+        std::vector<uint64_t> detection_events;
+        for (size_t i = begin; i < end; i++) {
+            detection_events.clear();
+            get_detection_events(i, detection_events);
+            weights[i] = decode_shot(
+                _shots[thread_index], detection_events, obs_crossed + num_observables * i, &_workers[thread_index]);
+        }
+    });
+}
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_SLIDING_WINDOW_H
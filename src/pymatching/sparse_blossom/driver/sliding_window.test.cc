@@ -0,0 +1,242 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/driver/sliding_window.h"
+
+#include <gtest/gtest.h>
+
+#include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "stim.h"
+
+namespace {
+
+std::vector<double> detector_times(const stim::DetectorErrorModel& dem) {
+    std::set<uint64_t> detectors;
+    for (uint64_t d = 0; d < dem.count_detectors(); d++)
+        detectors.insert(d);
+    std::vector<double> times(dem.count_detectors(), 0);
+    for (auto& [d, coords] : dem.get_detector_coordinates(detectors))
+        times[d] = coords.back();
+    return times;
+}
+
+}  // namespace
+
+TEST(SlidingWindow, TimeLikeChain) {
+    // A chain of detectors 0 - 1 - ... - 9 with detector i at time i, and an edge from detector 9 to the boundary.
+    pm::UserGraph graph(10, 1);
+    std::vector<double> times;
+    for (size_t i = 0; i < 10; i++) {
+        times.push_back((double)i);
+        if (i + 1 < 10)
+            graph.add_or_merge_edge(i, i + 1, {}, 1.0, -1);
+    }
+    graph.add_or_merge_boundary_edge(9, {0}, 1.0, -1);
+    pm::UserGraphView view(graph);
+
+    pm::SlidingWindowDecoder decoder(view, times, 2, 3);
+    ASSERT_EQ(decoder.windows.size(), 4);
+    ASSERT_EQ(decoder.windows[0].nodes, std::vector<size_t>({0, 1, 2, 3, 4}));
+    ASSERT_EQ(decoder.windows[0].boundary_edges, std::vector<size_t>({SIZE_MAX, SIZE_MAX, SIZE_MAX, SIZE_MAX, 4}));
+    ASSERT_EQ(decoder.windows[1].nodes, std::vector<size_t>({2, 3, 4, 5, 6}));
+    ASSERT_EQ(decoder.windows[3].nodes, std::vector<size_t>({6, 7, 8, 9}));
+    ASSERT_EQ(decoder.windows[3].commit_end_time, std::numeric_limits<double>::infinity());
+    // The first three windows are identical chains with a boundary edge at the end
+    ASSERT_EQ(decoder.decoders.size(), 2);
+    ASSERT_EQ(decoder.windows[2].decoder_index, decoder.windows[0].decoder_index);
+
+    std::vector<uint8_t> obs(1, 0);
+    // Detection events far from each other are each matched forwards, through every window, to the boundary
+    double weight = decoder.decode({0}, obs.data());
+    ASSERT_EQ(weight, 10.0);
+    ASSERT_EQ(obs[0], 1);
+    obs[0] = 0;
+    weight = decoder.decode({1, 3}, obs.data());
+    ASSERT_EQ(weight, 2.0);
+    ASSERT_EQ(obs[0], 0);
+    weight = decoder.decode({}, obs.data());
+    ASSERT_EQ(weight, 0.0);
+
+    ASSERT_THROW(decoder.decode({10}, obs.data()), std::invalid_argument);
+    ASSERT_THROW(pm::SlidingWindowDecoder(view, {0, 1}, 2, 3), std::invalid_argument);
+    ASSERT_THROW(pm::SlidingWindowDecoder(view, times, 0, 3), std::invalid_argument);
+    ASSERT_THROW(pm::SlidingWindowDecoder(view, times, 2, -1), std::invalid_argument);
+}
+
+TEST(SlidingWindow, MatchesGlobalDecoderOnMemoryExperiment) {
+    stim::CircuitGenParameters gen(30, 3, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.002;
+    gen.before_measure_flip_probability = 0.002;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    auto graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    auto times = detector_times(dem);
+    pm::UserGraphView view(graph);
+
+    pm::SlidingWindowDecoder decoder(view, times, 3, 6);
+    ASSERT_GT(decoder.windows.size(), 5);
+    ASSERT_LT(decoder.decoders.size(), decoder.windows.size());
+
+    // With a buffer longer than the experiment, there is one window containing the whole graph
+    pm::SlidingWindowDecoder single_window(view, times, 3, 100);
+    ASSERT_EQ(single_window.windows.size(), 1);
+
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 200;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+    auto& mwpm = graph.get_mwpm();
+    size_t num_agreeing = 0;
+    for (size_t k = 0; k < num_shots; k++) {
+        std::vector<uint64_t> hits;
+        for (size_t d = 0; d < circuit.count_detectors(); d++) {
+            if (dets[d][k])
+                hits.push_back(d);
+        }
+        auto expected = pm::decode_detection_events_for_up_to_64_observables(mwpm, hits, false);
+        std::vector<uint8_t> obs(1, 0);
+        single_window.decode(hits, obs.data());
+        ASSERT_EQ(obs[0], expected.obs_mask);
+        obs[0] = 0;
+        decoder.decode(hits, obs.data());
+        num_agreeing += obs[0] == expected.obs_mask;
+    }
+    ASSERT_GT(num_agreeing, num_shots * 9 / 10);
+}
+
+TEST(ParallelWindow, TimeLikeChain) {
+    // A chain of detectors 0 - 1 - ... - 9 with detector i at time i, where every detector has a boundary edge.
+    pm::UserGraph graph(10, 1);
+    std::vector<double> times;
+    for (size_t i = 0; i < 10; i++) {
+        times.push_back((double)i);
+        if (i + 1 < 10)
+            graph.add_or_merge_edge(i, i + 1, {}, 1.0, -1);
+    }
+    for (size_t i = 0; i < 10; i++)
+        graph.add_or_merge_boundary_edge(i, {0}, 2.5, -1);
+    pm::UserGraphView view(graph);
+
+    // Commit slabs [0, 2), [4, 6) and [8, inf), separated by gap slabs [2, 4) and [6, 8)
+    pm::ParallelWindowDecoder decoder(view, times, 2, 2, 2);
+    ASSERT_EQ(decoder.num_first_layer_windows, 3);
+    ASSERT_EQ(decoder.windows.size(), 5);
+    ASSERT_EQ(decoder.windows[0].nodes, std::vector<size_t>({0, 1, 2, 3}));
+    ASSERT_EQ(decoder.windows[1].nodes, std::vector<size_t>({2, 3, 4, 5, 6, 7}));
+    ASSERT_EQ(decoder.windows[1].boundary_edges, std::vector<size_t>({1, 12, 13, 14, 15, 7}));
+    ASSERT_EQ(decoder.windows[2].nodes, std::vector<size_t>({6, 7, 8, 9}));
+    ASSERT_EQ(decoder.windows[3].nodes, std::vector<size_t>({2, 3}));
+    ASSERT_EQ(decoder.windows[3].boundary_edges, std::vector<size_t>({11, 12}));
+    ASSERT_EQ(decoder.windows[4].nodes, std::vector<size_t>({6, 7}));
+    // The two gap windows are identical
+    ASSERT_EQ(decoder.compiled_graphs.size(), 4);
+    ASSERT_EQ(decoder.windows[3].decoder_index, decoder.windows[4].decoder_index);
+
+    std::vector<uint8_t> obs(1, 0);
+    ASSERT_EQ(decoder.decode({0}, obs.data()), 2.5);
+    ASSERT_EQ(obs[0], 1);
+    obs[0] = 0;
+    ASSERT_EQ(decoder.decode({1, 8}, obs.data()), 5.0);
+    ASSERT_EQ(obs[0], 0);
+    // The edges 3-4 and 4-5 are committed by the second window, leaving detection events at 2 and 3 in the first gap
+    ASSERT_EQ(decoder.decode({2, 5}, obs.data()), 3.0);
+    ASSERT_EQ(obs[0], 0);
+    ASSERT_THROW(decoder.decode({10}, obs.data()), std::invalid_argument);
+
+    // Edges must not be longer than the buffer
+    graph.add_or_merge_edge(1, 4, {}, 1.0, -1);
+    ASSERT_THROW(pm::ParallelWindowDecoder(view, times, 2, 2, 2), std::invalid_argument);
+    pm::ParallelWindowDecoder(view, times, 2, 3, 2);
+    ASSERT_THROW(pm::ParallelWindowDecoder(view, times, 2, 3, 0), std::invalid_argument);
+}
+
+TEST(ParallelWindow, MatchesGlobalDecoderOnMemoryExperiment) {
+    stim::CircuitGenParameters gen(40, 3, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.002;
+    gen.before_measure_flip_probability = 0.002;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    auto graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    auto times = detector_times(dem);
+    pm::UserGraphView view(graph);
+
+    pm::ParallelWindowDecoder single_threaded(view, times, 4, 4, 1);
+    pm::ParallelWindowDecoder multi_threaded(view, times, 4, 4, 4);
+    ASSERT_GT(multi_threaded.num_first_layer_windows, 3);
+    ASSERT_LT(multi_threaded.compiled_graphs.size(), multi_threaded.windows.size());
+
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 200;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+    auto& mwpm = graph.get_mwpm();
+    size_t num_agreeing = 0;
+    for (size_t k = 0; k < num_shots; k++) {
+        std::vector<uint64_t> hits;
+        for (size_t d = 0; d < circuit.count_detectors(); d++) {
+            if (dets[d][k])
+                hits.push_back(d);
+        }
+        auto expected = pm::decode_detection_events_for_up_to_64_observables(mwpm, hits, false);
+        std::vector<uint8_t> obs(1, 0), obs_multi_threaded(1, 0);
+        double weight = single_threaded.decode(hits, obs.data());
+        ASSERT_EQ(multi_threaded.decode(hits, obs_multi_threaded.data()), weight);
+        ASSERT_EQ(obs_multi_threaded, obs);
+        ASSERT_GE(weight, (double)expected.weight / mwpm.flooder.graph.normalising_constant - 1e-6);
+        num_agreeing += obs[0] == expected.obs_mask;
+    }
+    ASSERT_GT(num_agreeing, num_shots * 9 / 10);
+}
+
+TEST(ParallelWindow, DecodeBatchMatchesDecode) {
+    stim::CircuitGenParameters gen(30, 3, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.003;
+    gen.before_measure_flip_probability = 0.003;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    auto graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    auto times = detector_times(dem);
+    pm::UserGraphView view(graph);
+
+    std::mt19937_64 rng(0);  // NOLINT(cert-msc51-cpp)
+    size_t num_shots = 50;
+    auto dets_obs = stim::sample_batch_detection_events<stim::MAX_BITWORD_WIDTH>(circuit, num_shots, rng);
+    auto& dets = dets_obs.first;
+    std::vector<std::vector<uint64_t>> shots(num_shots);
+    for (size_t k = 0; k < num_shots; k++) {
+        for (size_t d = 0; d < circuit.count_detectors(); d++) {
+            if (dets[d][k])
+                shots[k].push_back(d);
+        }
+    }
+    auto get_detection_events = [&](size_t k, std::vector<uint64_t>& detection_events) {
+        detection_events.insert(detection_events.end(), shots[k].begin(), shots[k].end());
+    };
+
+    pm::ParallelWindowDecoder reference(view, times, 4, 4, 1);
+    for (size_t num_threads : {1, 3, 4}) {
+        pm::ParallelWindowDecoder decoder(view, times, 4, 4, num_threads);
+        // Both with more shots than threads (decoding whole shots on each thread), and with fewer (decoding windows)
+        for (size_t batch_size : {num_shots, (size_t)2}) {
+            std::vector<uint8_t> obs(batch_size, 0);
+            std::vector<double> weights(batch_size, -1);
+            decoder.decode_batch(batch_size, get_detection_events, obs.data(), weights.data());
+            for (size_t k = 0; k < batch_size; k++) {
+                std::vector<uint8_t> expected_obs(1, 0);
+                ASSERT_EQ(weights[k], reference.decode(shots[k], expected_obs.data()));
+                ASSERT_EQ(obs[k], expected_obs[0]);
+            }
+        }
+    }
+}
@@ -14,6 +14,8 @@
 
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 
+#include <charconv>
+
 #include "pymatching/rand/rand_gen.h"
 #include "pymatching/sparse_blossom/driver/implied_weights.h"
 
@@ -41,13 +43,7 @@ pm::UserNode::UserNode() : is_boundary(false) {
 
 size_t pm::UserNode::index_of_neighbor(size_t node) const {
     auto it = std::find_if(neighbors.begin(), neighbors.end(), [&](const UserNeighbor& neighbor) {
-        if (neighbor.pos == 0) {
-            return neighbor.edge_it->node1 == node;
-        } else if (neighbor.pos == 1) {
-            return neighbor.edge_it->node2 == node;
-        } else {
-            throw std::runtime_error("`neighbor.pos` should be 0 or 1, but got: " + std::to_string(neighbor.pos));
-        }
+        return neighbor.node == node;
     });
     if (it == neighbors.end())
         return SIZE_MAX;
@@ -55,6 +51,127 @@ size_t pm::UserNode::index_of_neighbor(size_t node) const {
     return it - neighbors.begin();
 }
 
+void pm::UserEdges::reserve(size_t num_edges) {
+    node1.reserve(num_edges);
+    node2.reserve(num_edges);
+    weight.reserve(num_edges);
+    error_probability.reserve(num_edges);
+    _observables_offset.reserve(num_edges);
+    _num_observables.reserve(num_edges);
+    _implied_weights_offset.reserve(num_edges);
+    _num_implied_weights.reserve(num_edges);
+}
+
+size_t pm::UserEdges::push_back(
+    size_t edge_node1,
+    size_t edge_node2,
+    std::span<const size_t> observables,
+    double edge_weight,
+    double edge_error_probability) {
+    node1.push_back(edge_node1);
+    node2.push_back(edge_node2);
+    weight.push_back(edge_weight);
+    error_probability.push_back(edge_error_probability);
+    _observables_offset.push_back(_observables.size());
+    _num_observables.push_back((uint32_t)observables.size());
+    _observables.insert(_observables.end(), observables.begin(), observables.end());
+    _implied_weights_offset.push_back(_implied_weights.size());
+    _num_implied_weights.push_back(0);
+    return node1.size() - 1;
+}
+
+namespace {
+
+/// Rebuilds `pool` so that it holds only the ranges of the edges (given by `offsets` and `sizes`), in edge order.
+template <typename T>
+void compact_pool(std::vector<T>& pool, std::vector<size_t>& offsets, const std::vector<uint32_t>& sizes) {
+    std::vector<T> compacted;
+    compacted.reserve(pool.size());
+    for (size_t i = 0; i < offsets.size(); i++) {
+        size_t offset = compacted.size();
+        compacted.insert(compacted.end(), pool.begin() + offsets[i], pool.begin() + offsets[i] + sizes[i]);
+        offsets[i] = offset;
+    }
+    pool = std::move(compacted);
+}
+
+/// Resizes the range of `pool` used by edge `edge_index` (given by `offsets` and `sizes`) to `new_size`, keeping its
+/// contents. The range is resized in place if it shrinks or is at the end of the pool, and is otherwise moved to the
+/// end of the pool. `num_unused` counts the elements of the pool that are no longer in any range, and the pool is
+/// compacted once they are more than half of it, so that merging or growing edges cannot fragment it without limit.
+template <typename T>
+void resize_pool_range(
+    std::vector<T>& pool,
+    std::vector<size_t>& offsets,
+    std::vector<uint32_t>& sizes,
+    size_t& num_unused,
+    size_t edge_index,
+    size_t new_size) {
+    size_t& offset = offsets[edge_index];
+    uint32_t& size = sizes[edge_index];
+    if (offset + size == pool.size()) {
+        pool.resize(offset + new_size);
+    } else if (new_size <= size) {
+        num_unused += size - new_size;
+    } else {
+        size_t new_offset = pool.size();
+        pool.resize(new_offset + new_size);
+        std::copy_n(pool.begin() + offset, size, pool.begin() + new_offset);
+        num_unused += size;
+        offset = new_offset;
+    }
+    size = (uint32_t)new_size;
+    if (num_unused > pool.size() / 2) {
+        compact_pool(pool, offsets, sizes);
+        num_unused = 0;
+    }
+}
+
+}  // namespace
+
+void pm::UserEdges::set_observables(size_t edge_index, std::span<const size_t> observables) {
+    resize_pool_range(
+        _observables, _observables_offset, _num_observables, _num_unused_observables, edge_index, observables.size());
+    std::copy(observables.begin(), observables.end(), _observables.begin() + _observables_offset[edge_index]);
+}
+
+void pm::UserEdges::set_implied_weights(
+    size_t edge_index, std::span<const ImpliedWeightUnconverted> implied_weights) {
+    resize_pool_range(
+        _implied_weights,
+        _implied_weights_offset,
+        _num_implied_weights,
+        _num_unused_implied_weights,
+        edge_index,
+        implied_weights.size());
+    std::copy(
+        implied_weights.begin(), implied_weights.end(), _implied_weights.begin() + _implied_weights_offset[edge_index]);
+}
+
+void pm::UserEdges::add_implied_weight(size_t edge_index, const ImpliedWeightUnconverted& implied_weight) {
+    size_t size = _num_implied_weights[edge_index];
+    resize_pool_range(
+        _implied_weights,
+        _implied_weights_offset,
+        _num_implied_weights,
+        _num_unused_implied_weights,
+        edge_index,
+        size + 1);
+    _implied_weights[_implied_weights_offset[edge_index] + size] = implied_weight;
+}
+
+pm::UserEdge pm::UserEdges::operator[](size_t edge_index) const {
+    auto edge_observables = observables(edge_index);
+    auto edge_implied_weights = implied_weights(edge_index);
+    return {
+        node1[edge_index],
+        node2[edge_index],
+        {edge_observables.begin(), edge_observables.end()},
+        weight[edge_index],
+        error_probability[edge_index],
+        {edge_implied_weights.begin(), edge_implied_weights.end()}};
+}
+
 bool is_valid_probability(double p) {
     return (p >= 0 && p <= 1);
 }
@@ -66,16 +183,16 @@ void pm::UserGraph::merge_edge_or_boundary_edge(
     double parallel_weight,
     double parallel_error_probability,
     pm::MERGE_STRATEGY merge_strategy) {
-    auto& neighbor = nodes[node].neighbors[neighbor_index];
+    size_t edge_index = nodes[node].neighbors[neighbor_index].edge_index;
+    double& weight = edges.weight[edge_index];
+    double& error_probability = edges.error_probability[edge_index];
     if (merge_strategy == DISALLOW) {
         throw std::invalid_argument(
-            "Edge (" + std::to_string(neighbor.edge_it->node1) + ", " + std::to_string(neighbor.edge_it->node2) +
+            "Edge (" + std::to_string(edges.node1[edge_index]) + ", " + std::to_string(edges.node2[edge_index]) +
             ") already exists in the graph. "
             "Parallel edges not permitted with the provided `disallow` `merge_strategy`. Please provide a "
             "different `merge_strategy`.");
-    } else if (
-        merge_strategy == KEEP_ORIGINAL ||
-        (merge_strategy == SMALLEST_WEIGHT && parallel_weight >= neighbor.edge_it->weight)) {
+    } else if (merge_strategy == KEEP_ORIGINAL || (merge_strategy == SMALLEST_WEIGHT && parallel_weight >= weight)) {
         return;
     } else {
         double new_weight, new_error_probability;
@@ -85,24 +202,23 @@ void pm::UserGraph::merge_edge_or_boundary_edge(
             new_error_probability = parallel_error_probability;
             use_new_observables = true;
         } else if (merge_strategy == INDEPENDENT) {
-            new_weight = pm::merge_weights(parallel_weight, neighbor.edge_it->weight);
+            new_weight = pm::merge_weights(parallel_weight, weight);
             new_error_probability = -1;
-            if (is_valid_probability(neighbor.edge_it->error_probability) &&
-                is_valid_probability(parallel_error_probability))
-                new_error_probability = parallel_error_probability * (1 - neighbor.edge_it->error_probability) +
-                                        neighbor.edge_it->error_probability * (1 - parallel_error_probability);
+            if (is_valid_probability(error_probability) && is_valid_probability(parallel_error_probability))
+                new_error_probability = parallel_error_probability * (1 - error_probability) +
+                                        error_probability * (1 - parallel_error_probability);
             // We do not need to update the observables. If they do not match up, then the code has distance 2.
             use_new_observables = false;
         } else {
             throw std::invalid_argument("Merge strategy not recognised.");
         }
-        // Update the existing edge weight and probability in the adjacency list of `node`
-        neighbor.edge_it->weight = new_weight;
-        neighbor.edge_it->error_probability = new_error_probability;
+        record_edge_update(edge_index, false, weight);
+        // Update the existing edge weight and probability
+        weight = new_weight;
+        error_probability = new_error_probability;
         if (use_new_observables)
-            neighbor.edge_it->observable_indices = parallel_observables;
+            edges.set_observables(edge_index, parallel_observables);
 
-        _mwpm_needs_updating = true;
         if (new_error_probability < 0 || new_error_probability > 1)
             _all_edges_have_error_probabilities = false;
     }
@@ -122,17 +238,16 @@ void pm::UserGraph::add_or_merge_edge(
     size_t idx = nodes[node1].index_of_neighbor(node2);
 
     if (idx == SIZE_MAX) {
-        pm::UserEdge edge = {node1, node2, observables, weight, error_probability};
-        edges.push_back(edge);
-        nodes[node1].neighbors.push_back({std::prev(edges.end()), 1});
+        size_t edge_index = edges.push_back(node1, node2, observables, weight, error_probability);
+        nodes[node1].neighbors.push_back({edge_index, node2});
         if (node1 != node2)
-            nodes[node2].neighbors.push_back({std::prev(edges.end()), 0});
+            nodes[node2].neighbors.push_back({edge_index, node1});
 
         for (auto& obs : observables) {
             if (obs + 1 > _num_observables)
                 _num_observables = obs + 1;
         }
-        _mwpm_needs_updating = true;
+        record_edge_update(edge_index, true, weight);
         if (error_probability < 0 || error_probability > 1)
             _all_edges_have_error_probabilities = false;
     } else {
@@ -152,15 +267,14 @@ void pm::UserGraph::add_or_merge_boundary_edge(
     size_t idx = nodes[node].index_of_neighbor(SIZE_MAX);
 
     if (idx == SIZE_MAX) {
-        pm::UserEdge edge = {node, SIZE_MAX, observables, weight, error_probability};
-        edges.push_back(edge);
-        nodes[node].neighbors.push_back({std::prev(edges.end()), 1});
+        size_t edge_index = edges.push_back(node, SIZE_MAX, observables, weight, error_probability);
+        nodes[node].neighbors.push_back({edge_index, SIZE_MAX});
 
         for (auto& obs : observables) {
             if (obs + 1 > _num_observables)
                 _num_observables = obs + 1;
         }
-        _mwpm_needs_updating = true;
+        record_edge_update(edge_index, true, weight);
         if (error_probability < 0 || error_probability > 1)
             _all_edges_have_error_probabilities = false;
     } else {
@@ -182,7 +296,13 @@ pm::UserGraph::UserGraph(size_t num_nodes, size_t num_observables)
     nodes.resize(num_nodes);
 }
 
+std::mutex& pm::UserGraph::get_mutex() const {
+    return *_mutex;
+}
+
 void pm::UserGraph::set_boundary(const std::set<size_t>& boundary) {
+    if (boundary == boundary_nodes)
+        return;
     for (auto& n : boundary_nodes)
         nodes[n].is_boundary = false;
     boundary_nodes = boundary;
@@ -216,30 +336,310 @@ bool pm::UserGraph::is_boundary_node(size_t node_id) {
 
 void pm::UserGraph::update_mwpm() {
     _mwpm = to_mwpm(pm::NUM_DISTINCT_WEIGHTS, false);
+    _worker_mwpms.clear();
+    _edge_updates.clear();
+    _all_edge_weights_changed = false;
+    _mwpm_needs_updating = false;
+}
+
+void pm::UserGraph::set_mwpm(pm::Mwpm mwpm) {
+    _mwpm = std::move(mwpm);
+    _mwpm.flooder.sync_negative_weight_observables_and_detection_events();
+    _worker_mwpms.clear();
+    _edge_updates.clear();
+    _all_edge_weights_changed = false;
     _mwpm_needs_updating = false;
 }
 
 pm::Mwpm& pm::UserGraph::get_mwpm() {
+    if ((!_edge_updates.empty() || _all_edge_weights_changed) && !patch_mwpm())
+        _mwpm_needs_updating = true;
     if (_mwpm_needs_updating)
         update_mwpm();
     return _mwpm;
 }
 
+void pm::UserGraph::record_edge_update(size_t edge_index, bool is_new_edge, double previous_weight) {
+    if (_mwpm_needs_updating || _all_edge_weights_changed)
+        return;
+    // Once more updates have been made than there are edges, it is cheaper to recompile the graph
+    if (_edge_updates.size() >= edges.size()) {
+        _edge_updates.clear();
+        _mwpm_needs_updating = true;
+        return;
+    }
+    _edge_updates.push_back({edge_index, is_new_edge, previous_weight});
+}
+
+namespace {
+
+/// Sets the weight of the edge from `u` to `v` (or to the boundary, if `v` is SIZE_MAX) in `graph`, and calls
+/// `update_neighbor(node, i)` for the `i`th neighbor of each end of the edge, to update its other properties. If the
+/// edge is not already in the graph, it is added with `observables` instead.
+template <typename Graph, typename UpdateNeighbor>
+void set_compiled_edge(
+    Graph& graph,
+    size_t u,
+    size_t v,
+    pm::weight_int weight,
+    std::span<const size_t> observables,
+    const UpdateNeighbor& update_neighbor) {
+    graph.unshare_edges();
+    auto& neighbors = graph.nodes[u].neighbors;
+    auto it = std::find(neighbors.begin(), neighbors.end(), v == SIZE_MAX ? nullptr : &graph.nodes[v]);
+    if (it == neighbors.end()) {
+        if (v == SIZE_MAX) {
+            graph.add_boundary_edge(u, weight, observables);
+        } else {
+            graph.add_edge(u, v, weight, observables);
+        }
+        return;
+    }
+    size_t i = it - neighbors.begin();
+    graph.nodes[u].neighbor_weights[i] = weight;
+    update_neighbor(graph.nodes[u], i);
+    if (v != SIZE_MAX) {
+        size_t j = graph.nodes[v].index_of_neighbor(&graph.nodes[u]);
+        graph.nodes[v].neighbor_weights[j] = weight;
+        update_neighbor(graph.nodes[v], j);
+    }
+}
+
+template <typename Graph>
+bool has_compiled_edge(Graph& graph, size_t u, size_t v) {
+    auto& neighbors = graph.nodes[u].neighbors;
+    return std::find(neighbors.begin(), neighbors.end(), v == SIZE_MAX ? nullptr : &graph.nodes[v]) !=
+           neighbors.end();
+}
+
+/// Sets the discretised weights of the converted implied weights `implied_weights` of an edge to those of the
+/// unconverted implied weights `rules` of the same edge (which are converted in order).
+template <typename Discretize>
+void set_implied_weights(
+    std::span<pm::ImpliedWeightIndices> implied_weights,
+    std::span<const pm::ImpliedWeightUnconverted> rules,
+    const Discretize& discretize) {
+    for (size_t k = 0; k < implied_weights.size(); k++)
+        implied_weights[k].implied_weight = (pm::weight_int)std::abs(discretize(rules[k].implied_weight));
+}
+
+}  // namespace
+
+bool pm::UserGraph::patch_mwpm() {
+    auto& graph = _mwpm.flooder.graph;
+    if (_mwpm_needs_updating || graph.nodes.size() != nodes.size() || graph.num_observables != _num_observables)
+        return false;
+    // The normalising constant depends on every edge weight, so if it has changed every discretised weight in the
+    // compiled graph is out of date, and can only be patched if every edge is being updated anyway
+    double normalising_constant = get_edge_weight_normalising_constant(pm::NUM_DISTINCT_WEIGHTS);
+    bool rescale = normalising_constant * 2 != graph.normalising_constant;
+    if (rescale && !_all_edge_weights_changed)
+        return false;
+    // The negative weight edges of the compiled graph aren't tracked edge by edge, so none of them can be updated
+    if (_all_edge_weights_changed && graph.negative_weight_sum != 0)
+        return false;
+    auto discretize = [&](double weight) {
+        return 2 * (pm::signed_weight_int)round(weight * normalising_constant);
+    };
+
+    size_t num_updates = _all_edge_weights_changed ? edges.size() : _edge_updates.size();
+    auto updated_edge = [&](size_t k) {
+        return _all_edge_weights_changed ? k : _edge_updates[k].edge_index;
+    };
+    bool checked_implied_weights = false;
+    for (size_t k = 0; k < num_updates; k++) {
+        size_t e = updated_edge(k);
+        size_t u = edges.node1[e];
+        size_t v = edges.node2[e];
+        if (is_boundary_node(u) || (v != SIZE_MAX && is_boundary_node(v)))
+            return false;
+        if (v == SIZE_MAX && !boundary_nodes.empty()) {
+            // Edges from `u` to a boundary node are merged with its boundary edge when the graph is compiled
+            for (auto& neighbor : nodes[u].neighbors) {
+                if (neighbor.node != SIZE_MAX && is_boundary_node(neighbor.node))
+                    return false;
+            }
+        }
+        if (discretize(edges.weight[e]) < 0)
+            return false;
+        bool is_new_edge;
+        if (_all_edge_weights_changed) {
+            is_new_edge = u != v && !has_compiled_edge(graph, u, v);
+        } else {
+            auto& update = _edge_updates[k];
+            if (!update.is_new_edge && discretize(update.previous_weight) < 0)
+                return false;
+            is_new_edge = update.is_new_edge;
+        }
+        if (is_new_edge && !checked_implied_weights) {
+            for (size_t i = 0; i < edges.size(); i++) {
+                if (!edges.implied_weights(i).empty())
+                    return false;
+            }
+            checked_implied_weights = true;
+        }
+    }
+
+    // The worker decoders share the edges of `_mwpm`, so are recreated from it (cheaply) after it is patched, rather
+    // than each being given its own patched copy of the edges
+    _worker_mwpms.clear();
+    for (size_t k = 0; k < num_updates; k++) {
+        size_t e = updated_edge(k);
+        size_t u = edges.node1[e];
+        size_t v = edges.node2[e];
+        // Self-loops with non-negative weights are not included in the compiled graph
+        if (u == v)
+            continue;
+        auto observables = edges.observables(e);
+        pm::obs_int obs_mask = 0;
+        if (_num_observables <= sizeof(pm::obs_int) * 8) {
+            for (auto obs : observables)
+                obs_mask ^= (pm::obs_int)1 << obs;
+        }
+        auto weight = (pm::weight_int)discretize(edges.weight[e]);
+        auto implied_weights = edges.implied_weights(e);
+        set_compiled_edge(graph, u, v, weight, observables, [&](pm::DetectorNode& node, size_t i) {
+            node.neighbor_observables[i] = obs_mask;
+            if (rescale)
+                set_implied_weights(
+                    graph.implied_weights->of_edge(&node - graph.nodes.data(), i), implied_weights, discretize);
+        });
+        auto& search_graph = _mwpm.search_flooder.graph;
+        if (search_graph.nodes.size() == nodes.size()) {
+            // The implied weights of the search graph only need rescaling if they aren't shared with the graph
+            bool rescale_search_graph = rescale && search_graph.implied_weights != graph.implied_weights;
+            set_compiled_edge(search_graph, u, v, weight, observables, [&](pm::SearchDetectorNode& node, size_t i) {
+                node.neighbor_observable_indices[i].assign(observables.begin(), observables.end());
+                if (rescale_search_graph)
+                    set_implied_weights(
+                        search_graph.implied_weights->of_edge(&node - search_graph.nodes.data(), i),
+                        implied_weights,
+                        discretize);
+            });
+        }
+    }
+    if (rescale)
+        graph.normalising_constant = normalising_constant * 2;
+    _edge_updates.clear();
+    _all_edge_weights_changed = false;
+    return true;
+}
+
+void pm::UserGraph::set_edge_weights(std::span<const double> weights) {
+    if (weights.size() != edges.size())
+        throw std::invalid_argument(
+            "Expected " + std::to_string(edges.size()) + " edge weights (one for each edge), but got " +
+            std::to_string(weights.size()) + ".");
+    for (auto w : weights) {
+        if (!(std::abs(w) <= pm::MAX_USER_EDGE_WEIGHT))
+            throw std::invalid_argument(
+                "Edge weights must not be NaN, and must have an absolute value of at most " +
+                std::to_string(pm::MAX_USER_EDGE_WEIGHT) + ".");
+    }
+    std::copy(weights.begin(), weights.end(), edges.weight.begin());
+    mark_all_edge_weights_changed();
+}
+
+void pm::UserGraph::set_error_probabilities(std::span<const double> error_probabilities) {
+    if (error_probabilities.size() != edges.size())
+        throw std::invalid_argument(
+            "Expected " + std::to_string(edges.size()) + " error probabilities (one for each edge), but got " +
+            std::to_string(error_probabilities.size()) + ".");
+    for (auto p : error_probabilities) {
+        if (!(p > 0 && p < 1) || std::abs(pm::to_weight_for_correlations(p)) > pm::MAX_USER_EDGE_WEIGHT)
+            throw std::invalid_argument("Error probabilities must be greater than 0 and less than 1.");
+    }
+    for (size_t i = 0; i < edges.size(); i++) {
+        edges.error_probability[i] = error_probabilities[i];
+        edges.weight[i] = pm::to_weight_for_correlations(error_probabilities[i]);
+    }
+    _all_edges_have_error_probabilities = true;
+    mark_all_edge_weights_changed();
+}
+
+void pm::UserGraph::check_edge_weight_override(size_t edge_index, double weight) {
+    if (edge_index >= edges.size())
+        throw std::invalid_argument(
+            "Edge index " + std::to_string(edge_index) + " is out of range for a graph with " +
+            std::to_string(edges.size()) + " edges.");
+    double normalising_constant = _mwpm.flooder.graph.normalising_constant;
+    if (round(edges.weight[edge_index] * normalising_constant / 2) < 0)
+        throw std::invalid_argument(
+            "Edge " + std::to_string(edge_index) + " has a negative weight, so its weight cannot be overridden.");
+    if (!(weight >= 0))
+        throw std::invalid_argument(
+            "Weight overrides must be non-negative (and not NaN), but got " + std::to_string(weight) + ".");
+}
+
+namespace {
+
+/// Sets the weight of the edge from `u` to `v` (or to the boundary, if `v` is SIZE_MAX) in `graph`, if it is in the
+/// graph, recording its previous weight in `graph.previous_weights`.
+template <typename Graph>
+void override_compiled_edge_weight(Graph& graph, size_t u, size_t v, pm::weight_int weight) {
+    graph.unshare_edge_weights();
+    auto& u_node = graph.nodes[u];
+    auto it = std::find(u_node.neighbors.begin(), u_node.neighbors.end(), v == SIZE_MAX ? nullptr : &graph.nodes[v]);
+    if (it == u_node.neighbors.end())
+        return;
+    auto* weight_ptr = &u_node.neighbor_weights[it - u_node.neighbors.begin()];
+    graph.previous_weights.emplace_back(weight_ptr, *weight_ptr);
+    *weight_ptr = weight;
+    if (v != SIZE_MAX) {
+        auto& v_node = graph.nodes[v];
+        auto jt = std::find(v_node.neighbors.begin(), v_node.neighbors.end(), &u_node);
+        weight_ptr = &v_node.neighbor_weights[jt - v_node.neighbors.begin()];
+        graph.previous_weights.emplace_back(weight_ptr, *weight_ptr);
+        *weight_ptr = weight;
+    }
+}
+
+}  // namespace
+
+void pm::UserGraph::override_edge_weight(pm::Mwpm& mwpm, size_t edge_index, double weight) const {
+    size_t u = edges.node1[edge_index];
+    size_t v = edges.node2[edge_index];
+    // Edges to boundary nodes are compiled as boundary edges
+    if (v != SIZE_MAX && nodes[v].is_boundary)
+        v = SIZE_MAX;
+    if (nodes[u].is_boundary) {
+        u = v;
+        v = SIZE_MAX;
+    }
+    if (u == SIZE_MAX || u == v)
+        return;
+    // Weights that are too large to be discretised with the normalising constant are clamped to the largest weight
+    // that can be
+    double discretized =
+        std::min(round(weight * mwpm.flooder.graph.normalising_constant / 2), (double)pm::MAX_USER_EDGE_WEIGHT);
+    auto w = (pm::weight_int)(2 * (pm::signed_weight_int)discretized);
+    override_compiled_edge_weight(mwpm.flooder.graph, u, v, w);
+    if (mwpm.search_flooder.graph.nodes.size() == mwpm.flooder.graph.nodes.size())
+        override_compiled_edge_weight(mwpm.search_flooder.graph, u, v, w);
+}
+
+void pm::UserGraph::mark_all_edge_weights_changed() {
+    if (_mwpm_needs_updating)
+        return;
+    _edge_updates.clear();
+    _all_edge_weights_changed = true;
+}
+
 void pm::UserGraph::add_noise(uint8_t* error_arr, uint8_t* syndrome_arr) const {
     if (!_all_edges_have_error_probabilities)
         return;
 
-    for (auto& e : edges) {
-        auto p = e.error_probability;
+    for (size_t i = 0; i < edges.size(); i++) {
+        auto p = edges.error_probability[i];
         if (rand_float(0.0, 1.0) < p) {
             // Flip the observables
-            for (auto& obs : e.observable_indices) {
+            for (auto& obs : edges.observables(i)) {
                 *(error_arr + obs) ^= 1;
             }
             // Flip the syndrome bits
-            *(syndrome_arr + e.node1) ^= 1;
-            if (e.node2 != SIZE_MAX)
-                *(syndrome_arr + e.node2) ^= 1;
+            *(syndrome_arr + edges.node1[i]) ^= 1;
+            if (edges.node2[i] != SIZE_MAX)
+                *(syndrome_arr + edges.node2[i]) ^= 1;
         }
     }
 
@@ -257,9 +657,9 @@ bool pm::UserGraph::all_edges_have_error_probabilities() {
 
 double pm::UserGraph::max_abs_weight() {
     double max_abs_weight = 0;
-    for (auto& e : edges) {
-        if (std::abs(e.weight) > max_abs_weight) {
-            max_abs_weight = std::abs(e.weight);
+    for (auto w : edges.weight) {
+        if (std::abs(w) > max_abs_weight) {
+            max_abs_weight = std::abs(w);
         }
     }
     return max_abs_weight;
@@ -273,14 +673,14 @@ pm::MatchingGraph pm::UserGraph::to_matching_graph(pm::weight_int num_distinct_w
         [&](size_t u,
             size_t v,
             pm::signed_weight_int weight,
-            const std::vector<size_t>& observables,
-            const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+            std::span<const size_t> observables,
+            std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
             matching_graph.add_edge(u, v, weight, observables, implied_weights_for_other_edges);
         },
         [&](size_t u,
             pm::signed_weight_int weight,
-            const std::vector<size_t>& observables,
-            const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+            std::span<const size_t> observables,
+            std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
             matching_graph.add_boundary_edge(u, weight, observables, implied_weights_for_other_edges);
         });
 
@@ -296,35 +696,43 @@ pm::MatchingGraph pm::UserGraph::to_matching_graph(pm::weight_int num_distinct_w
     return matching_graph;
 }
 
-pm::SearchGraph pm::UserGraph::to_search_graph(pm::weight_int num_distinct_weights) {
+pm::SearchGraph pm::UserGraph::to_search_graph(
+    pm::weight_int num_distinct_weights, std::shared_ptr<ImpliedWeights> implied_weights) {
     /// Identical to to_matching_graph but for constructing a pm::SearchGraph
     pm::SearchGraph search_graph(nodes.size());
+    const std::span<const ImpliedWeightUnconverted> no_implied_weights;
 
     double normalizing_constant = to_matching_or_search_graph_helper(
         num_distinct_weights,
         [&](size_t u,
             size_t v,
             pm::signed_weight_int weight,
-            const std::vector<size_t>& observables,
-            const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
-            search_graph.add_edge(u, v, weight, observables, implied_weights_for_other_edges);
+            std::span<const size_t> observables,
+            std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
+            search_graph.add_edge(
+                u, v, weight, observables, implied_weights ? no_implied_weights : implied_weights_for_other_edges);
         },
         [&](size_t u,
             pm::signed_weight_int weight,
-            const std::vector<size_t>& observables,
-            const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
-            search_graph.add_boundary_edge(u, weight, observables, implied_weights_for_other_edges);
+            std::span<const size_t> observables,
+            std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
+            search_graph.add_boundary_edge(
+                u, weight, observables, implied_weights ? no_implied_weights : implied_weights_for_other_edges);
         });
 
-    search_graph.convert_implied_weights(normalizing_constant);
+    if (implied_weights) {
+        search_graph.implied_weights = std::move(implied_weights);
+    } else {
+        search_graph.convert_implied_weights(normalizing_constant);
+    }
     return search_graph;
 }
 
 pm::Mwpm pm::UserGraph::to_mwpm(pm::weight_int num_distinct_weights, bool ensure_search_graph_included) {
     if (_num_observables > sizeof(pm::obs_int) * 8 || ensure_search_graph_included) {
-        auto mwpm = pm::Mwpm(
-            pm::GraphFlooder(to_matching_graph(num_distinct_weights)),
-            pm::SearchFlooder(to_search_graph(num_distinct_weights)));
+        auto matching_graph = to_matching_graph(num_distinct_weights);
+        auto search_graph = to_search_graph(num_distinct_weights, matching_graph.implied_weights);
+        auto mwpm = pm::Mwpm(pm::GraphFlooder(std::move(matching_graph)), pm::SearchFlooder(std::move(search_graph)));
         mwpm.flooder.sync_negative_weight_observables_and_detection_events();
         mwpm.flooder.graph.loaded_from_dem_without_correlations = loaded_from_dem_without_correlations;
         return mwpm;
@@ -336,16 +744,60 @@ pm::Mwpm pm::UserGraph::to_mwpm(pm::weight_int num_distinct_weights, bool ensure
     }
 }
 
+pm::CompiledMatchingGraph pm::UserGraph::to_compiled_graph(
+    pm::weight_int num_distinct_weights, bool ensure_search_graph_included) {
+    auto matching_graph = to_matching_graph(num_distinct_weights);
+    matching_graph.loaded_from_dem_without_correlations = loaded_from_dem_without_correlations;
+    if (_num_observables > sizeof(pm::obs_int) * 8 || ensure_search_graph_included) {
+        auto search_graph = to_search_graph(num_distinct_weights, matching_graph.implied_weights);
+        return pm::CompiledMatchingGraph(std::move(matching_graph), std::move(search_graph));
+    } else {
+        return pm::CompiledMatchingGraph(std::move(matching_graph));
+    }
+}
+
 pm::Mwpm& pm::UserGraph::get_mwpm_with_search_graph() {
+    if ((!_edge_updates.empty() || _all_edge_weights_changed) && !patch_mwpm())
+        _mwpm_needs_updating = true;
     if (!_mwpm_needs_updating && _mwpm.flooder.graph.nodes.size() == _mwpm.search_flooder.graph.nodes.size()) {
         return _mwpm;
     } else {
         _mwpm = to_mwpm(pm::NUM_DISTINCT_WEIGHTS, true);
+        _worker_mwpms.clear();
+        _edge_updates.clear();
+        _all_edge_weights_changed = false;
         _mwpm_needs_updating = false;
         return _mwpm;
     }
 }
 
+std::vector<pm::Mwpm*> pm::UserGraph::get_mwpms_for_workers(size_t num_workers, bool ensure_search_graph_included) {
+    std::vector<pm::Mwpm*> mwpms;
+    if (num_workers == 0)
+        return mwpms;
+    mwpms.push_back(ensure_search_graph_included ? &get_mwpm_with_search_graph() : &get_mwpm());
+    bool has_search_graph = _mwpm.search_flooder.graph.nodes.size() == _mwpm.flooder.graph.nodes.size();
+    if (!_worker_mwpms.empty()) {
+        auto& w = _worker_mwpms.front();
+        if ((w.search_flooder.graph.nodes.size() == w.flooder.graph.nodes.size()) != has_search_graph)
+            _worker_mwpms.clear();
+    }
+    // Each additional worker is a cheap clone of `_mwpm`, which shares its edges
+    _worker_mwpms.reserve(num_workers - 1);
+    while (_worker_mwpms.size() < num_workers - 1) {
+        auto& graph = _mwpm.flooder.graph;
+        auto& search_graph = _mwpm.search_flooder.graph;
+        auto worker = has_search_graph
+                          ? pm::Mwpm(pm::GraphFlooder(graph.clone()), pm::SearchFlooder(search_graph.clone()))
+                          : pm::Mwpm(pm::GraphFlooder(graph.clone()));
+        worker.flooder.sync_negative_weight_observables_and_detection_events();
+        _worker_mwpms.push_back(std::move(worker));
+    }
+    for (size_t i = 0; i < num_workers - 1; i++)
+        mwpms.push_back(&_worker_mwpms[i]);
+    return mwpms;
+}
+
 void pm::UserGraph::handle_dem_instruction(
     double p, const std::vector<size_t>& detectors, const std::vector<size_t>& observables) {
     if (detectors.size() == 2) {
@@ -410,7 +862,7 @@ bool pm::UserGraph::get_edge_or_boundary_edge_weight(size_t node1, size_t node2,
     if (neighbor_idx == SIZE_MAX) {
         return false;
     }
-    weight_out = nodes[node1].neighbors[neighbor_idx].edge_it->weight;
+    weight_out = edges.weight[nodes[node1].neighbors[neighbor_idx].edge_index];
     return true;
 }
 
@@ -422,15 +874,16 @@ void pm::UserGraph::set_min_num_observables(size_t num_observables) {
 double pm::UserGraph::get_edge_weight_normalising_constant(size_t max_num_distinct_weights) {
     double max_abs_weight = 0;
     bool all_integral_weight = true;
-    for (auto& e : edges) {
-        if (std::abs(e.weight) > max_abs_weight)
-            max_abs_weight = std::abs(e.weight);
+    for (size_t i = 0; i < edges.size(); i++) {
+        double weight = edges.weight[i];
+        if (std::abs(weight) > max_abs_weight)
+            max_abs_weight = std::abs(weight);
 
-        if (round(e.weight) != e.weight) {
+        if (round(weight) != weight) {
             all_integral_weight = false;
         }
 
-        for (auto implied : e.implied_weights_for_other_edges) {
+        for (auto implied : edges.implied_weights(i)) {
             if (std::abs(implied.implied_weight) > max_abs_weight) {
                 max_abs_weight = std::abs(implied.implied_weight);
             }
@@ -466,28 +919,155 @@ double pm::UserGraph::get_edge_weight_normalising_constant(size_t max_num_distin
     }
 }
 
-void pm::add_decomposed_error_to_joint_probabilities(
-    DecomposedDemError& error,
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>>& joint_probabilites) {
-    if (error.components.size() > 1) {
-        for (size_t k0 = 0; k0 < error.components.size(); k0++) {
-            for (size_t k1 = k0 + 1; k1 < error.components.size(); k1++) {
-                auto& c0 = error.components[k0];
-                auto& c1 = error.components[k1];
-                std::pair<size_t, size_t> e0 = std::minmax(c0.node1, c0.node2);
-                std::pair<size_t, size_t> e1 = std::minmax(c1.node1, c1.node2);
-                double& p01 = joint_probabilites[e0][e1];
-                double& p10 = joint_probabilites[e1][e0];
-                p01 = bernoulli_xor(p01, error.probability);
-                p10 = bernoulli_xor(p10, error.probability);
+size_t pm::JointProbabilities::edge_index(std::pair<size_t, size_t> edge) {
+    auto [it, inserted] = _edge_indices.try_emplace(edge, _edges.size());
+    if (inserted) {
+        _edges.push_back(edge);
+        _marginal_probabilities.push_back(0);
+    }
+    return it->second;
+}
+
+void pm::JointProbabilities::add(
+    std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge, double probability) {
+    size_t e0 = edge_index(edge);
+    size_t e1 = edge_index(other_edge);
+    if (e0 == e1) {
+        double& p = _marginal_probabilities[e0];
+        p = bernoulli_xor(p, probability);
+    } else {
+        _contributions.push_back({e0, e1, probability});
+    }
+}
+
+void pm::JointProbabilities::add_error(std::span<const UserEdge> components, double probability) {
+    _component_edge_indices.clear();
+    for (auto& c : components)
+        _component_edge_indices.push_back(edge_index(std::minmax(c.node1, c.node2)));
+    if (components.size() > 1) {
+        for (size_t k0 = 0; k0 < components.size(); k0++) {
+            for (size_t k1 = k0 + 1; k1 < components.size(); k1++) {
+                size_t e0 = _component_edge_indices[k0];
+                size_t e1 = _component_edge_indices[k1];
+                if (e0 == e1) {
+                    // Both contributions are to the marginal probability
+                    double& p = _marginal_probabilities[e0];
+                    p = bernoulli_xor(bernoulli_xor(p, probability), probability);
+                } else {
+                    _contributions.push_back({e0, e1, probability});
+                    _contributions.push_back({e1, e0, probability});
+                }
             }
         }
     }
+    for (size_t e : _component_edge_indices) {
+        double& p = _marginal_probabilities[e];
+        p = bernoulli_xor(p, probability);
+    }
+}
 
-    for (auto& e : error.components) {
-        double& p = joint_probabilites[std::minmax(e.node1, e.node2)][std::minmax(e.node1, e.node2)];
-        p = bernoulli_xor(p, error.probability);
+void pm::JointProbabilities::finalize() {
+    // Group the contributions by edge, with a (stable) counting sort. Contributions to pairs combined by a previous
+    // call come first, followed by the new contributions in the order they were added, so they are combined in the
+    // same order as they would be by accumulating them one at a time.
+    std::vector<size_t> offsets(_edges.size() + 1, 0);
+    for (auto& entry : _entries) {
+        if (entry.edge != entry.other_edge)
+            offsets[_edge_indices.at(entry.edge) + 1]++;
+    }
+    for (auto& c : _contributions)
+        offsets[c.edge + 1]++;
+    for (size_t i = 0; i < _edges.size(); i++)
+        offsets[i + 1] += offsets[i];
+    std::vector<Contribution> grouped(offsets.back());
+    std::vector<size_t> next = offsets;
+    for (auto& entry : _entries) {
+        if (entry.edge != entry.other_edge) {
+            size_t e0 = _edge_indices.at(entry.edge);
+            grouped[next[e0]++] = {e0, _edge_indices.at(entry.other_edge), entry.probability};
+        }
+    }
+    for (auto& c : _contributions)
+        grouped[next[c.edge]++] = c;
+    _contributions = {};
+    next = {};
+
+    // Sort the (few) contributions of each edge by the other edge, and combine the contributions to each pair
+    auto by_other_edge = [&](const Contribution& a, const Contribution& b) {
+        return _edges[a.other_edge] < _edges[b.other_edge];
+    };
+    _entries.clear();
+    _entries.reserve(grouped.size() + _edges.size());
+    _entries_offset.assign(_edges.size() + 1, 0);
+    for (size_t i = 0; i < _edges.size(); i++) {
+        _entries_offset[i] = _entries.size();
+        auto begin = grouped.begin() + offsets[i];
+        auto end = grouped.begin() + offsets[i + 1];
+        if (end - begin <= 16) {
+            // An insertion sort, which is stable, and avoids allocating a buffer for each of the (usually few)
+            // contributions of an edge
+            for (auto it = begin + (begin != end); it < end; ++it) {
+                for (auto j = it; j != begin && by_other_edge(*j, *(j - 1)); --j)
+                    std::iter_swap(j, j - 1);
+            }
+        } else {
+            std::stable_sort(begin, end, by_other_edge);
+        }
+        bool has_marginal = false;
+        for (auto it = begin; it != end; ++it) {
+            if (!has_marginal && _edges[i] < _edges[it->other_edge]) {
+                if (_marginal_probabilities[i] != 0)
+                    _entries.push_back({_edges[i], _edges[i], _marginal_probabilities[i]});
+                has_marginal = true;
+            }
+            if (_entries.size() > _entries_offset[i] && _entries.back().other_edge == _edges[it->other_edge]) {
+                double& p = _entries.back().probability;
+                p = bernoulli_xor(p, it->probability);
+            } else {
+                _entries.push_back({_edges[i], _edges[it->other_edge], it->probability});
+            }
+        }
+        if (!has_marginal && _marginal_probabilities[i] != 0)
+            _entries.push_back({_edges[i], _edges[i], _marginal_probabilities[i]});
     }
+    _entries_offset[_edges.size()] = _entries.size();
+}
+
+bool pm::JointProbabilities::empty() const {
+    return _edges.empty();
+}
+
+size_t pm::JointProbabilities::num_edges() const {
+    return _edges.size();
+}
+
+std::span<const pm::JointProbabilities::Entry> pm::JointProbabilities::entries(std::pair<size_t, size_t> edge) const {
+    auto it = _edge_indices.find(edge);
+    if (it == _edge_indices.end() || it->second + 1 >= _entries_offset.size())
+        return {};
+    size_t begin = _entries_offset[it->second];
+    return {_entries.data() + begin, _entries_offset[it->second + 1] - begin};
+}
+
+double pm::JointProbabilities::get(std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge) const {
+    auto edge_entries = entries(edge);
+    auto it = std::lower_bound(
+        edge_entries.begin(), edge_entries.end(), other_edge, [](const Entry& a, std::pair<size_t, size_t> b) {
+            return a.other_edge < b;
+        });
+    return it != edge_entries.end() && it->other_edge == other_edge ? it->probability : 0;
+}
+
+bool pm::JointProbabilities::contains(std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge) const {
+    auto edge_entries = entries(edge);
+    return std::any_of(edge_entries.begin(), edge_entries.end(), [&](const Entry& e) {
+        return e.other_edge == other_edge;
+    });
+}
+
+void pm::add_decomposed_error_to_joint_probabilities(
+    DecomposedDemError& error, JointProbabilities& joint_probabilites) {
+    joint_probabilites.add_error(error.components, error.probability);
 }
 
 pm::UserGraph pm::detector_error_model_to_user_graph(
@@ -495,7 +1075,7 @@ pm::UserGraph pm::detector_error_model_to_user_graph(
     const bool enable_correlations,
     pm::weight_int num_distinct_weights) {
     pm::UserGraph user_graph(detector_error_model.count_detectors(), detector_error_model.count_observables());
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilites;
+    pm::JointProbabilities joint_probabilites;
     if (enable_correlations) {
         pm::iter_dem_instructions_include_correlations(
             detector_error_model,
@@ -516,30 +1096,65 @@ pm::UserGraph pm::detector_error_model_to_user_graph(
     return user_graph;
 }
 
-void pm::UserGraph::populate_implied_edge_weights(
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>>& joint_probabilites) {
-    for (auto& edge : edges) {
-        std::pair<size_t, size_t> current_edge_nodes = std::minmax(edge.node1, edge.node2);
-        auto it = joint_probabilites.find(current_edge_nodes);
-        if (it != joint_probabilites.end()) {
-            const auto& pf = *it;
-            std::pair<size_t, size_t> causal_edge = pf.first;
-            double marginal_probability = pf.second.at(causal_edge);
-            if (marginal_probability == 0)
-                continue;
-
-            for (const auto& affected_edge_and_probability : pf.second) {
-                std::pair<size_t, size_t> affected_edge = affected_edge_and_probability.first;
-                if (affected_edge != causal_edge) {
-                    // Since edge weights are computed as std::log((1-p)/p), a probability of more than 0.5 for an
-                    // error, would lead to a negatively weighted error. We do not support this (yet), and use a
-                    // minimum of 0.5 as an implied probability for an edge to be reweighted.
-                    double implied_probability_for_other_edge =
-                        std::min(0.5, affected_edge_and_probability.second / marginal_probability);
-                    double w = pm::to_weight_for_correlations(implied_probability_for_other_edge);
-                    ImpliedWeightUnconverted implied{affected_edge.first, affected_edge.second, w};
-                    edge.implied_weights_for_other_edges.push_back(implied);
-                }
+std::vector<std::pair<size_t, size_t>> pm::detector_error_model_erasure_edges(
+    const stim::DetectorErrorModel& detector_error_model, const pm::UserGraph& user_graph) {
+    const std::string_view erasure_tag_prefix = "erasure:";
+    std::vector<std::pair<size_t, size_t>> erasure_edges;
+    std::vector<size_t> dets;
+    detector_error_model.iter_flatten_error_instructions([&](const stim::DemInstruction& instruction) {
+        if (!instruction.tag.starts_with(erasure_tag_prefix) || instruction.arg_data[0] == 0)
+            return;
+        auto erasure_str = instruction.tag.substr(erasure_tag_prefix.size());
+        size_t erasure = 0;
+        auto [end, ec] = std::from_chars(erasure_str.data(), erasure_str.data() + erasure_str.size(), erasure);
+        if (ec != std::errc() || end != erasure_str.data() + erasure_str.size() || erasure_str.empty())
+            throw std::invalid_argument(
+                "Expected an erasure tag of the form `erasure:<non-negative integer>`, but got `" +
+                std::string(instruction.tag) + "`.");
+        auto add_component = [&]() {
+            if (dets.size() == 1 || dets.size() == 2) {
+                size_t node2 = dets.size() == 2 ? dets[1] : SIZE_MAX;
+                size_t i = dets[0] < user_graph.nodes.size() ? user_graph.nodes[dets[0]].index_of_neighbor(node2)
+                                                              : SIZE_MAX;
+                if (i == SIZE_MAX)
+                    throw std::invalid_argument(
+                        "The erasure error `" + instruction.str() + "` is not an edge in the matching graph.");
+                erasure_edges.push_back({erasure, user_graph.nodes[dets[0]].neighbors[i].edge_index});
+            }
+            dets.clear();
+        };
+        for (auto& target : instruction.target_data) {
+            if (target.is_relative_detector_id()) {
+                dets.push_back(target.val());
+            } else if (target.is_separator()) {
+                add_component();
+            }
+        }
+        add_component();
+    });
+    return erasure_edges;
+}
+
+void pm::UserGraph::populate_implied_edge_weights(const JointProbabilities& joint_probabilites) {
+    for (size_t i = 0; i < edges.size(); i++) {
+        std::pair<size_t, size_t> causal_edge = std::minmax(edges.node1[i], edges.node2[i]);
+        auto entries = joint_probabilites.entries(causal_edge);
+        if (entries.empty())
+            continue;
+        double marginal_probability = joint_probabilites.get(causal_edge, causal_edge);
+        if (marginal_probability == 0)
+            continue;
+
+        for (const auto& entry : entries) {
+            std::pair<size_t, size_t> affected_edge = entry.other_edge;
+            if (affected_edge != causal_edge) {
+                // Since edge weights are computed as std::log((1-p)/p), a probability of more than 0.5 for an
+                // error, would lead to a negatively weighted error. We do not support this (yet), and use a
+                // minimum of 0.5 as an implied probability for an edge to be reweighted.
+                double implied_probability_for_other_edge = std::min(0.5, entry.probability / marginal_probability);
+                double w = pm::to_weight_for_correlations(implied_probability_for_other_edge);
+                ImpliedWeightUnconverted implied{affected_edge.first, affected_edge.second, w};
+                edges.add_implied_weight(i, implied);
             }
         }
     }
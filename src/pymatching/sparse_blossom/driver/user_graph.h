@@ -16,11 +16,15 @@
 #define PYMATCHING2_USER_GRAPH_H
 
 #include <cmath>
-#include <list>
+#include <memory>
+#include <mutex>
 #include <set>
+#include <span>
 #include <stdexcept>
+#include <unordered_map>
 #include <vector>
 
+#include "pymatching/sparse_blossom/driver/compiled_graph.h"
 #include "pymatching/sparse_blossom/driver/implied_weights.h"
 #include "pymatching/sparse_blossom/flooder/graph.h"
 #include "pymatching/sparse_blossom/ints.h"
@@ -41,9 +45,60 @@ struct UserEdge {
     std::vector<ImpliedWeightUnconverted> implied_weights_for_other_edges;
 };
 
+/// The edges of a UserGraph, stored as a struct of arrays so that adding an edge does not require any heap
+/// allocations of its own. Edge `i` connects `node1[i]` and `node2[i]` (which is SIZE_MAX for a boundary edge). The
+/// observables and implied weights of all the edges are stored in two shared pools, with each edge referring to a
+/// contiguous range of each pool. Ranges that are replaced by larger ones are left unused until more than half of a
+/// pool is unused, when the pool is compacted.
+class UserEdges {
+   public:
+    std::vector<size_t> node1;
+    std::vector<size_t> node2;
+    std::vector<double> weight;             /// The weight of each edge
+    std::vector<double> error_probability;  /// The error probability of each edge
+
+    size_t size() const {
+        return node1.size();
+    }
+    bool empty() const {
+        return node1.empty();
+    }
+    void reserve(size_t num_edges);
+    /// Appends an edge with no implied weights, and returns its index.
+    size_t push_back(
+        size_t node1, size_t node2, std::span<const size_t> observables, double weight, double error_probability);
+    /// The indices of the observables crossed along edge `edge_index`.
+    std::span<const size_t> observables(size_t edge_index) const {
+        return {_observables.data() + _observables_offset[edge_index], _num_observables[edge_index]};
+    }
+    /// The weights that the edges given by the implied weights are set to if edge `edge_index` is in the matching
+    /// (used for correlated matching).
+    std::span<const ImpliedWeightUnconverted> implied_weights(size_t edge_index) const {
+        return {_implied_weights.data() + _implied_weights_offset[edge_index], _num_implied_weights[edge_index]};
+    }
+    /// Replaces the observables of edge `edge_index`. `observables` must not refer to memory owned by this object.
+    void set_observables(size_t edge_index, std::span<const size_t> observables);
+    /// Replaces the implied weights of edge `edge_index`. `implied_weights` must not refer to memory owned by this
+    /// object.
+    void set_implied_weights(size_t edge_index, std::span<const ImpliedWeightUnconverted> implied_weights);
+    void add_implied_weight(size_t edge_index, const ImpliedWeightUnconverted& implied_weight);
+    /// Returns a copy of edge `edge_index`.
+    UserEdge operator[](size_t edge_index) const;
+
+   private:
+    std::vector<size_t> _observables_offset;
+    std::vector<uint32_t> _num_observables;
+    std::vector<size_t> _observables;
+    std::vector<size_t> _implied_weights_offset;
+    std::vector<uint32_t> _num_implied_weights;
+    std::vector<ImpliedWeightUnconverted> _implied_weights;
+    size_t _num_unused_observables = 0;
+    size_t _num_unused_implied_weights = 0;
+};
+
 struct UserNeighbor {
-    std::list<UserEdge>::iterator edge_it;
-    uint8_t pos{};  // The position of the neighboring node in the edge (either 0 if node1, or 1 if node2)
+    size_t edge_index;  /// The index of the edge in `UserGraph::edges`
+    size_t node;        /// The index of the neighboring node, or SIZE_MAX if the edge is a boundary edge
 };
 
 class UserNode {
@@ -58,10 +113,69 @@ const pm::weight_int MAX_USER_EDGE_WEIGHT = NUM_DISTINCT_WEIGHTS - 1;
 
 enum MERGE_STRATEGY : uint8_t { DISALLOW, INDEPENDENT, SMALLEST_WEIGHT, KEEP_ORIGINAL, REPLACE };
 
+/// The joint probabilities of pairs of edges, where each edge is given by its sorted pair of nodes (with SIZE_MAX for
+/// the boundary), and the joint probability of an edge with itself is its marginal probability.
+///
+/// Each distinct edge is assigned an index when it is first added. Marginal probabilities are accumulated directly,
+/// while contributions to the joint probabilities of two distinct edges are appended to a flat list of index pairs.
+/// `finalize` then groups the contributions by edge with a counting sort, and combines the contributions to each pair
+/// in a single pass, giving a flat table of the entries of each edge. This avoids building a node-based map of maps
+/// while loading a large detector error model.
+class JointProbabilities {
+   public:
+    struct Entry {
+        std::pair<size_t, size_t> edge;
+        std::pair<size_t, size_t> other_edge;
+        double probability;
+    };
+
+    /// XORs an independent error with probability `probability` into the joint probability of `edge` and
+    /// `other_edge`.
+    void add(std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge, double probability);
+    /// XORs an independent error with probability `probability`, which causes each of the edges `components`, into
+    /// the joint probability of every pair of its components and the marginal probability of each component.
+    void add_error(std::span<const UserEdge> components, double probability);
+    /// Combines the contributions added so far. Must be called after adding contributions, before querying.
+    void finalize();
+    bool empty() const;
+    /// The number of distinct edges with a marginal or joint probability.
+    size_t num_edges() const;
+    /// The joint probability of `edge` and `other_edge`, which is zero if no error affects both.
+    double get(std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge) const;
+    bool contains(std::pair<size_t, size_t> edge, std::pair<size_t, size_t> other_edge) const;
+    /// The entries for `edge` (including its marginal probability, if non-zero), sorted by `other_edge`.
+    std::span<const Entry> entries(std::pair<size_t, size_t> edge) const;
+
+   private:
+    struct EdgeHash {
+        size_t operator()(const std::pair<size_t, size_t>& edge) const {
+            return std::hash<size_t>{}(edge.first * 0x9E3779B97F4A7C15ULL ^ edge.second);
+        }
+    };
+    struct Contribution {
+        size_t edge;
+        size_t other_edge;
+        double probability;
+    };
+
+    std::unordered_map<std::pair<size_t, size_t>, size_t, EdgeHash> _edge_indices;
+    std::vector<std::pair<size_t, size_t>> _edges;
+    /// The marginal probability of each edge, which is accumulated directly, and the contributions to the joint
+    /// probabilities of pairs of distinct edges.
+    std::vector<double> _marginal_probabilities;
+    std::vector<Contribution> _contributions;
+    std::vector<size_t> _component_edge_indices;
+    /// The entries of edge `i` are `_entries[_entries_offset[i]:_entries_offset[i + 1]]`.
+    std::vector<size_t> _entries_offset;
+    std::vector<Entry> _entries;
+
+    size_t edge_index(std::pair<size_t, size_t> edge);
+};
+
 class UserGraph {
    public:
     std::vector<UserNode> nodes;
-    std::list<UserEdge> edges;
+    UserEdges edges;
     std::set<size_t> boundary_nodes;
     bool loaded_from_dem_without_correlations = false;
 
@@ -114,23 +228,80 @@ class UserGraph {
         const EdgeCallable& edge_func,
         const BoundaryEdgeCallable& boundary_edge_func);
     pm::MatchingGraph to_matching_graph(pm::weight_int num_distinct_weights);
-    pm::SearchGraph to_search_graph(pm::weight_int num_distinct_weights);
+    /// If `implied_weights` is given (the implied weights of a MatchingGraph compiled from this graph), the search
+    /// graph shares them rather than converting its own.
+    pm::SearchGraph to_search_graph(
+        pm::weight_int num_distinct_weights, std::shared_ptr<ImpliedWeights> implied_weights = nullptr);
     pm::Mwpm to_mwpm(pm::weight_int num_distinct_weights, bool ensure_search_graph_included);
+    pm::CompiledMatchingGraph to_compiled_graph(pm::weight_int num_distinct_weights, bool ensure_search_graph_included);
     void update_mwpm();
+    /// Uses `mwpm` as the decoder for this graph until the graph is next modified, rather than compiling the decoder
+    /// from the edges of the graph. `mwpm` must have been compiled from an identical graph (e.g. by a UserGraph that
+    /// was serialized and then deserialized).
+    void set_mwpm(Mwpm mwpm);
     Mwpm& get_mwpm();
     Mwpm& get_mwpm_with_search_graph();
+    /// Returns `num_workers` independent decoders for this graph, to be used concurrently from different
+    /// threads. The first is the decoder returned by `get_mwpm` (or `get_mwpm_with_search_graph`), and the others are
+    /// clones of it, which share its edges rather than copying them (see `MatchingGraph::clone`).
+    std::vector<Mwpm*> get_mwpms_for_workers(size_t num_workers, bool ensure_search_graph_included);
+    /// Sets the weight of the edge `edges[i]` to `weights[i]`, for each edge. The compiled decoder is rescaled in place
+    /// when it is next used, rather than being recompiled, unless the graph has boundary nodes or negative weights.
+    void set_edge_weights(std::span<const double> weights);
+    /// Sets the error probability of the edge `edges[i]` to `error_probabilities[i]`, and its weight to the
+    /// corresponding log-likelihood ratio log((1-p)/p), for each edge. The compiled decoder is updated as for
+    /// `set_edge_weights`. Any implied weights (used for correlated matching) are left unchanged.
+    void set_error_probabilities(std::span<const double> error_probabilities);
+    /// Checks that the weight of the edge `edges[edge_index]` can be overridden with `weight` in the decoder returned
+    /// by `get_mwpm` (using `override_edge_weight`), throwing std::invalid_argument if not. The decoder must be up to
+    /// date. Edges with a negative weight cannot be overridden, and nor can an edge be given a negative weight.
+    /// Weights that are larger than the decoder can represent are allowed, and are clamped by `override_edge_weight`.
+    void check_edge_weight_override(size_t edge_index, double weight);
+    /// Sets the weight of the edge `edges[edge_index]` to `weight` in `mwpm`, one of the decoders returned by
+    /// `get_mwpms_for_workers`, until its reweights are undone by `undo_reweights` (which restores the weight recorded
+    /// in `previous_weights`). The override must have been checked using `check_edge_weight_override`. If `weight` is
+    /// too large to be discretised using the normalising constant of the decoder, it is clamped to the largest weight
+    /// that can be (that of the edge with the largest absolute weight in the graph). Edges that are not in the decoder
+    /// (self-loops, and edges between two boundary nodes) are ignored. Does not modify this graph, so can be called
+    /// concurrently for different decoders.
+    void override_edge_weight(pm::Mwpm& mwpm, size_t edge_index, double weight) const;
     void handle_dem_instruction(double p, const std::vector<size_t>& detectors, const std::vector<size_t>& observables);
     void handle_dem_instruction_include_correlations(
         double p, const std::vector<size_t>& detectors, const std::vector<size_t>& observables);
     void get_nodes_on_shortest_path_from_source(size_t src, size_t dst, std::vector<size_t>& out_nodes);
-    void populate_implied_edge_weights(
-        std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>>& joint_probabilites);
+    void populate_implied_edge_weights(const JointProbabilities& joint_probabilites);
+    /// A mutex for the graph and its decoders. The graph is not safe to use from several threads at once, since even
+    /// decoding modifies the decoders (and may compile them), so callers that share a graph between threads (such as
+    /// the Python bindings) must hold this mutex for the duration of each call that uses it.
+    std::mutex& get_mutex() const;
 
    private:
+    /// An edge that has been added or changed since `_mwpm` was compiled.
+    struct EdgeUpdate {
+        size_t edge_index;
+        bool is_new_edge;
+        double previous_weight;  /// The weight of the edge when `_mwpm` was compiled (if it is not a new edge)
+    };
+
     pm::Mwpm _mwpm;
+    std::vector<pm::Mwpm> _worker_mwpms;
+    /// Held by pointer so that the graph can still be moved
+    std::unique_ptr<std::mutex> _mutex = std::make_unique<std::mutex>();
     size_t _num_observables;
     bool _mwpm_needs_updating;
     bool _all_edges_have_error_probabilities;
+    std::vector<EdgeUpdate> _edge_updates;
+    /// True if the weight of every edge has changed since `_mwpm` was compiled, in which case `_edge_updates` is empty
+    bool _all_edge_weights_changed = false;
+
+    void record_edge_update(size_t edge_index, bool is_new_edge, double previous_weight);
+    void mark_all_edge_weights_changed();
+    /// Applies `_edge_updates` (or every edge, if `_all_edge_weights_changed`) to `_mwpm` and the worker decoders in
+    /// place, rather than recompiling them. Returns false, without modifying the decoders, if an update cannot be
+    /// applied as a patch: if it changes the normalising constant (unless every edge is updated), the number of nodes
+    /// or observables, involves a boundary node or a negative weight, or adds an edge to a graph that has implied
+    /// weights (which point into the adjacency lists of the compiled graph).
+    bool patch_mwpm();
 };
 
 double to_weight_for_correlations(double probability);
@@ -142,19 +313,25 @@ inline double UserGraph::iter_discretized_edges(
     const BoundaryEdgeCallable& boundary_edge_func) {
     double normalising_constant = get_edge_weight_normalising_constant(num_distinct_weights);
 
-    for (auto& e : edges) {
-        pm::signed_weight_int w = (pm::signed_weight_int)round(e.weight * normalising_constant);
+    for (size_t i = 0; i < edges.size(); i++) {
+        size_t node1 = edges.node1[i];
+        size_t node2 = edges.node2[i];
+        pm::signed_weight_int w = (pm::signed_weight_int)round(edges.weight[i] * normalising_constant);
         // Extremely important!
         // If all edge weights are even integers, then all collision events occur at integer times.
         w *= 2;
-        bool node1_boundary = is_boundary_node(e.node1);
-        bool node2_boundary = is_boundary_node(e.node2);
-        if (node2_boundary && !node1_boundary) {
-            boundary_edge_func(e.node1, w, e.observable_indices, e.implied_weights_for_other_edges);
-        } else if (node1_boundary && !node2_boundary) {
-            boundary_edge_func(e.node2, w, e.observable_indices, e.implied_weights_for_other_edges);
-        } else if (!node1_boundary) {
-            edge_func(e.node1, e.node2, w, e.observable_indices, e.implied_weights_for_other_edges);
+        bool node1_boundary = is_boundary_node(node1);
+        bool node2_boundary = is_boundary_node(node2);
+        if (node1_boundary && node2_boundary)
+            continue;
+        auto observables = edges.observables(i);
+        auto implied_weights = edges.implied_weights(i);
+        if (node2_boundary) {
+            boundary_edge_func(node1, w, observables, implied_weights);
+        } else if (node1_boundary) {
+            boundary_edge_func(node2, w, observables, implied_weights);
+        } else {
+            edge_func(node1, node2, w, observables, implied_weights);
         }
     }
     return normalising_constant * 2;
@@ -169,16 +346,16 @@ inline double UserGraph::to_matching_or_search_graph_helper(
     // that parallel boundary edges with negative edge weights can be handled correctly
     std::vector<bool> has_boundary_edge(nodes.size(), false);
     std::vector<pm::signed_weight_int> boundary_edge_weights(nodes.size());
-    std::vector<std::vector<size_t>> boundary_edge_observables(nodes.size());
-    std::vector<std::vector<ImpliedWeightUnconverted>> boundary_edge_implied_weights_unconverted(nodes.size());
+    std::vector<std::span<const size_t>> boundary_edge_observables(nodes.size());
+    std::vector<std::span<const ImpliedWeightUnconverted>> boundary_edge_implied_weights_unconverted(nodes.size());
 
     double normalising_constant = iter_discretized_edges(
         num_distinct_weights,
         edge_func,
         [&](size_t u,
             pm::signed_weight_int weight,
-            const std::vector<size_t>& observables,
-            const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+            std::span<const size_t> observables,
+            std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
             // For parallel boundary edges, keep the boundary edge with the smaller weight
             if (!has_boundary_edge[u] || boundary_edge_weights[u] > weight) {
                 boundary_edge_weights[u] = weight;
@@ -205,6 +382,13 @@ UserGraph detector_error_model_to_user_graph(
     bool enable_correlations,
     pm::weight_int num_distinct_weights);
 
+/// Returns a pair `(erasure, edge_index)` for each edge `user_graph.edges[edge_index]` caused by an error (or a
+/// component of a decomposed error) in `detector_error_model` that is tagged `erasure:<erasure>`. For example, the
+/// edges of `error[erasure:3](0.1) D0 D1 ^ D2` are both caused by erasure 3. Errors with other tags, or with
+/// probability zero, are ignored. Throws std::invalid_argument if an edge is not in `user_graph`.
+std::vector<std::pair<size_t, size_t>> detector_error_model_erasure_edges(
+    const stim::DetectorErrorModel& detector_error_model, const UserGraph& user_graph);
+
 /// Computes the weight of an edge resulting from merging edges with weight `a' and weight `b', assuming each edge
 /// weight is a log-likelihood ratio log((1-p)/p) associated with the probability p of an error occurring on the
 /// edge, and that the error mechanisms associated with the two edges being merged are independent.
@@ -259,19 +443,19 @@ struct DecomposedDemError {
     bool operator!=(const DecomposedDemError& other) const;
 };
 
-void add_decomposed_error_to_joint_probabilities(
-    DecomposedDemError& error,
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>>& joint_probabilites);
+void add_decomposed_error_to_joint_probabilities(DecomposedDemError& error, JointProbabilities& joint_probabilites);
 
 template <typename Handler>
 void iter_dem_instructions_include_correlations(
     const stim::DetectorErrorModel& detector_error_model,
     const Handler& handle_dem_error,
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>>& joint_probabilites,
+    JointProbabilities& joint_probabilites,
     bool include_decomposed_error_components_in_edge_weights = true) {
+    // Reused for every instruction, to avoid allocating new buffers for each error
+    pm::DecomposedDemError decomposed_err;
+    std::vector<size_t> dets;
     detector_error_model.iter_flatten_error_instructions([&](const stim::DemInstruction& instruction) {
         double p = instruction.arg_data[0];
-        pm::DecomposedDemError decomposed_err;
         decomposed_err.probability = p;
         if (p > 0.5) {
             throw ::std::invalid_argument(
@@ -281,7 +465,7 @@ void iter_dem_instructions_include_correlations(
             // Ignore errors with no error probability.
             return;
         }
-        decomposed_err.components = {};
+        decomposed_err.components.clear();
         decomposed_err.components.push_back({});
         UserEdge* component = &decomposed_err.components.back();
         // Mark component as empty to begin with.
@@ -347,16 +531,17 @@ void iter_dem_instructions_include_correlations(
         // the graph if it is not a component in a decomposed error with more than one component
         if (include_decomposed_error_components_in_edge_weights || decomposed_err.components.size() == 1) {
             for (pm::UserEdge& component : decomposed_err.components) {
-                if (component.node2 == SIZE_MAX) {
-                    handle_dem_error(p, {component.node1}, component.observable_indices);
-                } else {
-                    handle_dem_error(p, {component.node1, component.node2}, component.observable_indices);
-                }
+                dets.clear();
+                dets.push_back(component.node1);
+                if (component.node2 != SIZE_MAX)
+                    dets.push_back(component.node2);
+                handle_dem_error(p, dets, component.observable_indices);
             }
         }
 
         add_decomposed_error_to_joint_probabilities(decomposed_err, joint_probabilites);
     });
+    joint_probabilites.finalize();
 }
 
 }  // namespace pm
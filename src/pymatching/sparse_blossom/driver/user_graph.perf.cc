@@ -13,6 +13,7 @@
 // limitations under the License.
 
 #include "mwpm_decoding.h"
+#include "pymatching/sparse_blossom/driver/user_graph.h"
 #include "pymatching/perf/util.perf.h"
 
 stim::DetectorErrorModel generate_dem(size_t distance, size_t rounds, double noise, bool decompose_errors = false) {
@@ -79,3 +80,120 @@ BENCHMARK(Load_dem_r21_d21_p100_correlations) {
         .goal_millis(280)
         .show_rate("loads", (double)num_loads);
 }
+
+BENCHMARK(Make_workspace_r21_d21_p100_correlations) {
+    auto dem = generate_dem(21, 21, 0.01, true);
+    size_t num_buckets = 1024;
+    auto user_graph = pm::detector_error_model_to_user_graph(dem, /*enable_correlations=*/true, num_buckets);
+    auto compiled_graph = user_graph.to_compiled_graph(num_buckets, /*ensure_search_graph_included=*/false);
+    size_t num_workspaces = 10;
+    benchmark_go([&]() {
+        for (size_t i = 0; i < num_workspaces; i++) {
+            auto mwpm = compiled_graph.make_workspace();
+        }
+    })
+        .goal_millis(40)
+        .show_rate("workspaces", (double)num_workspaces);
+}
+
+BENCHMARK(Load_user_graph_r21_d21_p100) {
+    auto dem = generate_dem(21, 21, 0.01);
+    size_t num_loads = 10;
+    size_t num_edges = 0;
+    benchmark_go([&]() {
+        for (size_t i = 0; i < num_loads; i++) {
+            auto user_graph = pm::detector_error_model_to_user_graph(
+                dem, /*enable_correlations=*/false, pm::NUM_DISTINCT_WEIGHTS);
+            num_edges += user_graph.get_num_edges();
+        }
+    })
+        .goal_millis(300)
+        .show_rate("loads", (double)num_loads);
+    if (num_edges == 0) {
+        std::cerr << "data dependence";
+    }
+}
+
+BENCHMARK(User_graph_to_mwpm_r21_d21_p100) {
+    auto dem = generate_dem(21, 21, 0.01);
+    auto user_graph = pm::detector_error_model_to_user_graph(
+        dem, /*enable_correlations=*/false, pm::NUM_DISTINCT_WEIGHTS);
+    size_t num_conversions = 10;
+    benchmark_go([&]() {
+        for (size_t i = 0; i < num_conversions; i++) {
+            auto mwpm = user_graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, /*ensure_search_graph_included=*/false);
+        }
+    })
+        .goal_millis(250)
+        .show_rate("conversions", (double)num_conversions);
+}
+
+BENCHMARK(User_graph_to_mwpm_r21_d21_p100_correlations) {
+    auto dem = generate_dem(21, 21, 0.01, true);
+    auto user_graph = pm::detector_error_model_to_user_graph(
+        dem, /*enable_correlations=*/true, pm::NUM_DISTINCT_WEIGHTS);
+    size_t num_conversions = 10;
+    benchmark_go([&]() {
+        for (size_t i = 0; i < num_conversions; i++) {
+            auto mwpm = user_graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, /*ensure_search_graph_included=*/true);
+        }
+    })
+        .goal_millis(2000)
+        .show_rate("conversions", (double)num_conversions);
+}
+
+BENCHMARK(User_graph_edit_weights_and_get_mwpm_r21_d21_p100) {
+    auto dem = generate_dem(21, 21, 0.01);
+    auto user_graph = pm::detector_error_model_to_user_graph(
+        dem, /*enable_correlations=*/false, pm::NUM_DISTINCT_WEIGHTS);
+    user_graph.get_mwpm();
+    // Edit edges with weights well below the maximum, so that the normalising constant doesn't change
+    double max_abs_weight = user_graph.max_abs_weight();
+    std::vector<size_t> edited_edges;
+    for (size_t i = 0; i < user_graph.edges.size() && edited_edges.size() < 100; i++) {
+        if (user_graph.edges.weight[i] > 0 && user_graph.edges.weight[i] < max_abs_weight / 2)
+            edited_edges.push_back(i);
+    }
+    size_t num_edits = 10;
+    std::vector<size_t> observables;
+    benchmark_go([&]() {
+        for (size_t k = 0; k < num_edits; k++) {
+            double scale = k % 2 == 0 ? 1.1 : 1 / 1.1;
+            for (auto i : edited_edges) {
+                auto edge_observables = user_graph.edges.observables(i);
+                observables.assign(edge_observables.begin(), edge_observables.end());
+                double weight = user_graph.edges.weight[i] * scale;
+                size_t node1 = user_graph.edges.node1[i];
+                size_t node2 = user_graph.edges.node2[i];
+                if (node2 == SIZE_MAX) {
+                    user_graph.add_or_merge_boundary_edge(node1, observables, weight, -1, pm::REPLACE);
+                } else {
+                    user_graph.add_or_merge_edge(node1, node2, observables, weight, -1, pm::REPLACE);
+                }
+            }
+            user_graph.get_mwpm();
+        }
+    })
+        .goal_millis(5)
+        .show_rate("edits", (double)num_edits);
+}
+
+BENCHMARK(User_graph_set_error_probabilities_and_get_mwpm_r21_d21_p100) {
+    auto dem = generate_dem(21, 21, 0.01);
+    auto user_graph = pm::detector_error_model_to_user_graph(
+        dem, /*enable_correlations=*/false, pm::NUM_DISTINCT_WEIGHTS);
+    user_graph.get_mwpm();
+    std::vector<double> error_probabilities = user_graph.edges.error_probability;
+    size_t num_rescales = 10;
+    benchmark_go([&]() {
+        for (size_t k = 0; k < num_rescales; k++) {
+            double scale = k % 2 == 0 ? 1.1 : 1 / 1.1;
+            for (auto& p : error_probabilities)
+                p *= scale;
+            user_graph.set_error_probabilities(error_probabilities);
+            user_graph.get_mwpm();
+        }
+    })
+        .goal_millis(100)
+        .show_rate("rescales", (double)num_rescales);
+}
@@ -14,8 +14,16 @@
 
 #include "pymatching/sparse_blossom/driver/user_graph.pybind.h"
 
+#include <algorithm>
+#include <mutex>
+#include <type_traits>
+
 #include "pybind11/pybind11.h"
 #include "pymatching/sparse_blossom/driver/mwpm_decoding.h"
+#include "pymatching/sparse_blossom/driver/parallel.h"
+#include "pymatching/sparse_blossom/driver/periodic_graph.h"
+#include "pymatching/sparse_blossom/driver/serialization.h"
+#include "pymatching/sparse_blossom/driver/sliding_window.h"
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 #include "stim.h"
 
@@ -69,6 +77,36 @@ py::class_<pm::UserGraph> pm_pybind::pybind_user_graph(py::module &m) {
     return g;
 }
 
+/// Locks the mutex of `self` (see `pm::UserGraph::get_mutex`) until the returned lock is destroyed. Every method of
+/// the graph's Python class holds this lock, so that calls made on the same graph from different Python threads are
+/// serialized, even though the GIL is released while decoding. The GIL is also released while waiting for the lock,
+/// since the thread holding the lock may need the GIL to finish its call.
+std::unique_lock<std::mutex> lock_user_graph(const pm::UserGraph &self) {
+    std::unique_lock<std::mutex> lock(self.get_mutex(), std::try_to_lock);
+    if (!lock.owns_lock()) {
+        py::gil_scoped_release release;
+        lock.lock();
+    }
+    return lock;
+}
+
+/// Wraps a method of pm::UserGraph, so that it is called while holding the lock of the graph.
+template <typename Result, typename... Args>
+auto locked(Result (pm::UserGraph::*method)(Args...)) {
+    return [method](pm::UserGraph &self, Args... args) -> Result {
+        auto lock = lock_user_graph(self);
+        return (self.*method)(std::forward<Args>(args)...);
+    };
+}
+
+template <typename Result, typename... Args>
+auto locked(Result (pm::UserGraph::*method)(Args...) const) {
+    return [method](const pm::UserGraph &self, Args... args) -> Result {
+        auto lock = lock_user_graph(self);
+        return (self.*method)(std::forward<Args>(args)...);
+    };
+}
+
 pm::MERGE_STRATEGY merge_strategy_from_string(const std::string &merge_strategy) {
     static std::unordered_map<std::string, pm::MERGE_STRATEGY> const table = {
         {"disallow", pm::DISALLOW},
@@ -84,6 +122,305 @@ pm::MERGE_STRATEGY merge_strategy_from_string(const std::string &merge_strategy)
     }
 }
 
+/// Adds (or merges) the edges `(nodes1[i], nodes2[i])` to `self`, or the boundary edges `(nodes1[i], boundary)` if
+/// `nodes2` is nullptr. The fault ids of edge `i` are `observables_indices[observables_indptr[i]:observables_indptr[i+1]]`.
+/// Edges with an absolute weight greater than `pm::MAX_USER_EDGE_WEIGHT` are not added, and a single warning is raised
+/// giving the number of edges that were skipped. The edges are added in order, so if an edge cannot be merged (e.g.
+/// using the "disallow" merge strategy), the edges before it will have been added when the exception is thrown.
+void add_edges_from_arrays(
+    pm::UserGraph &self,
+    const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &nodes1,
+    const py::array_t<int64_t, py::array::c_style | py::array::forcecast> *nodes2,
+    const py::array_t<double, py::array::c_style | py::array::forcecast> &weights,
+    const py::array_t<double, py::array::c_style | py::array::forcecast> &error_probabilities,
+    const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indptr,
+    const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indices,
+    const std::string &merge_strategy) {
+    auto merge_strategy_enum = merge_strategy_from_string(merge_strategy);
+    for (auto *arr : {&nodes1, nodes2, &observables_indptr, &observables_indices}) {
+        if (arr != nullptr && arr->ndim() != 1)
+            throw std::invalid_argument("Node and fault id arrays must be 1-dimensional.");
+    }
+    if (weights.ndim() != 1 || error_probabilities.ndim() != 1)
+        throw std::invalid_argument("`weights` and `error_probabilities` must be 1-dimensional.");
+    size_t num_edges = nodes1.size();
+    if (nodes2 != nullptr && (size_t)nodes2->size() != num_edges)
+        throw std::invalid_argument(
+            "The size of `node2` (" + std::to_string(nodes2->size()) + ") must match the size of `node1` (" +
+            std::to_string(num_edges) + ").");
+    if ((size_t)weights.size() != num_edges)
+        throw std::invalid_argument(
+            "The size of the `weights` array (" + std::to_string(weights.size()) +
+            ") must match the number of edges (" + std::to_string(num_edges) + ").");
+    if ((size_t)error_probabilities.size() != num_edges)
+        throw std::invalid_argument(
+            "The size of the `error_probabilities` array (" + std::to_string(error_probabilities.size()) +
+            ") must match the number of edges (" + std::to_string(num_edges) + ").");
+    if ((size_t)observables_indptr.size() != num_edges + 1)
+        throw std::invalid_argument(
+            "The size of `fault_ids_indptr` (" + std::to_string(observables_indptr.size()) +
+            ") must be 1 larger than the number of edges (" + std::to_string(num_edges) + ").");
+
+    const int64_t *n1 = nodes1.data();
+    const int64_t *n2 = nodes2 == nullptr ? nullptr : nodes2->data();
+    const double *w = weights.data();
+    const double *p = error_probabilities.data();
+    const int64_t *indptr = observables_indptr.data();
+    const int64_t *indices = observables_indices.data();
+    size_t num_indices = observables_indices.size();
+
+    // Validate all the edges before adding any of them
+    for (size_t i = 0; i < num_edges; i++) {
+        if (n1[i] < 0 || (n2 != nullptr && n2[i] < 0))
+            throw std::invalid_argument("Node indices must be non-negative.");
+        if (indptr[i] < 0 || indptr[i] > indptr[i + 1] || (size_t)indptr[i + 1] > num_indices)
+            throw std::invalid_argument(
+                "`fault_ids_indptr` must be non-decreasing, start at a non-negative value and not exceed the size "
+                "of `fault_ids_indices`.");
+    }
+    for (size_t k = 0; k < num_indices; k++) {
+        if (indices[k] < 0)
+            throw std::invalid_argument("Fault ids must be non-negative.");
+    }
+
+    size_t num_skipped = 0;
+    {
+        py::gil_scoped_release release;
+        std::vector<size_t> observables;
+        for (size_t i = 0; i < num_edges; i++) {
+            if (std::abs(w[i]) > pm::MAX_USER_EDGE_WEIGHT) {
+                num_skipped++;
+                continue;
+            }
+            observables.assign(indices + indptr[i], indices + indptr[i + 1]);
+            if (n2 == nullptr) {
+                self.add_or_merge_boundary_edge(n1[i], observables, w[i], p[i], merge_strategy_enum);
+            } else {
+                self.add_or_merge_edge(n1[i], n2[i], observables, w[i], p[i], merge_strategy_enum);
+            }
+        }
+    }
+    if (num_skipped > 0) {
+        auto warnings = pybind11::module::import("warnings");
+        warnings.attr("warn")(
+            std::to_string(num_skipped) + " edge(s) have weights exceeding the maximum edge weight " +
+            std::to_string(pm::MAX_USER_EDGE_WEIGHT) + " and have not been added to the matching graph.");
+    }
+}
+
+/// Per-shot edge weight overrides, in compressed sparse row format: in shot `i`, the weight of edge `edges[k]` is
+/// overridden with `weights[k]`, for each `k` from `indptr[i]` to `indptr[i + 1] - 1`.
+struct EdgeWeightOverrides {
+    py::array_t<int64_t, py::array::c_style | py::array::forcecast> indptr;
+    py::array_t<int64_t, py::array::c_style | py::array::forcecast> edges;
+    py::array_t<double, py::array::c_style | py::array::forcecast> weights;
+};
+
+/// Converts `weight_overrides`, a tuple `(shot_indptr, edge_indices, weights)`, to EdgeWeightOverrides for a batch of
+/// `num_shots` shots, checking that the arrays have consistent shapes. If `erasures` is true, `weight_overrides` is
+/// instead a tuple `(shot_indptr, edge_indices)` of erased edges, which are overridden with a weight of zero.
+EdgeWeightOverrides to_edge_weight_overrides(const py::object &weight_overrides, size_t num_shots, bool erasures) {
+    auto t = weight_overrides.cast<py::tuple>();
+    if (t.size() != (erasures ? 2 : 3))
+        throw std::invalid_argument(
+            erasures ? "`erasures` must be a tuple `(shot_indptr, edge_indices)`."
+                     : "`weight_overrides` must be a tuple `(shot_indptr, edge_indices, weights)`.");
+    EdgeWeightOverrides overrides{
+        t[0].cast<decltype(EdgeWeightOverrides::indptr)>(), t[1].cast<decltype(EdgeWeightOverrides::edges)>(), {}};
+    if (erasures) {
+        overrides.weights = decltype(EdgeWeightOverrides::weights)(overrides.edges.size());
+        std::fill_n(overrides.weights.mutable_data(), overrides.weights.size(), 0.0);
+    } else {
+        overrides.weights = t[2].cast<decltype(EdgeWeightOverrides::weights)>();
+    }
+    if (overrides.indptr.ndim() != 1 || overrides.edges.ndim() != 1 || overrides.weights.ndim() != 1)
+        throw std::invalid_argument("The arrays in `weight_overrides` and `erasures` must all be one-dimensional.");
+    if ((size_t)overrides.indptr.size() != num_shots + 1)
+        throw std::invalid_argument(
+            "`shot_indptr` must have num_shots + 1 = " + std::to_string(num_shots + 1) + " elements, but has " +
+            std::to_string(overrides.indptr.size()) + ".");
+    if (overrides.edges.size() != overrides.weights.size())
+        throw std::invalid_argument("`edge_indices` and `weights` must have the same size.");
+    auto ptr = overrides.indptr.unchecked<1>();
+    if (ptr(0) != 0 || ptr(num_shots) != overrides.edges.size())
+        throw std::invalid_argument(
+            "`shot_indptr` must start at 0 and end at " + std::to_string(overrides.edges.size()) +
+            " (the size of `edge_indices`).");
+    for (size_t k = 1; k <= num_shots; k++) {
+        if (ptr(k) < ptr(k - 1))
+            throw std::invalid_argument("`shot_indptr` must be non-decreasing.");
+    }
+    return overrides;
+}
+
+/// Checks that the edges in `edges` can have their weights overridden with `weights` in the decoder of `graph`.
+void check_edge_weight_overrides(pm::UserGraph &graph, const int64_t *edges, const double *weights, size_t size) {
+    for (size_t k = 0; k < size; k++) {
+        if (edges[k] < 0)
+            throw std::invalid_argument(
+                "Edge indices must be non-negative, but found " + std::to_string(edges[k]) + ".");
+        graph.check_edge_weight_override(edges[k], weights[k]);
+    }
+}
+
+/// Undoes any reweighting of a decoder (e.g. by `UserGraph::override_edge_weight`) when it goes out of scope, so that
+/// the weights of the decoder are restored even if decoding fails.
+struct UndoReweightsOnExit {
+    pm::Mwpm &mwpm;
+    ~UndoReweightsOnExit() {
+        mwpm.flooder.graph.undo_reweights();
+        mwpm.search_flooder.graph.undo_reweights();
+    }
+};
+
+/// Decodes `num_shots` shots, where `get_detection_events(shot_index, detection_events)` appends the detection events
+/// of shot `shot_index` to `detection_events`, and returns a tuple `(predictions, weights)`. The shots are split into
+/// `num_threads` contiguous blocks, each decoded with the GIL released on its own thread, using its own decoder.
+/// `get_detection_events` must therefore be safe to call concurrently, and must not use the Python API. The edge
+/// weights given for each shot by each of `weight_overrides` (in order) are used in place of those of the graph while
+/// decoding the shot, and are then restored.
+template <typename GetDetectionEvents>
+py::tuple decode_batch_of_shots(
+    pm::UserGraph &self,
+    size_t num_shots,
+    bool bit_packed_predictions,
+    bool enable_correlations,
+    int num_threads,
+    const GetDetectionEvents &get_detection_events,
+    const std::vector<EdgeWeightOverrides> &weight_overrides = {}) {
+    if (num_threads < 1)
+        throw std::invalid_argument("`num_threads` must be at least 1.");
+
+    // Reserve all-zeros predictions array
+    size_t num_observable_bytes =
+        bit_packed_predictions ? (self.get_num_observables() + 7) >> 3 : self.get_num_observables();
+    py::array_t<uint8_t> predictions = py::array_t<uint8_t>(num_shots * num_observable_bytes);
+    predictions[py::make_tuple(py::ellipsis())] = 0;  // Initialise to 0
+    py::buffer_info buff = predictions.request();
+    uint8_t *predictions_ptr = (uint8_t *)buff.ptr;
+
+    // Reserve weights array
+    py::array_t<double> weights = py::array_t<double>(num_shots);
+    auto ws = weights.mutable_unchecked<1>();
+
+    // Each thread decodes a contiguous block of shots using its own decoder
+    size_t num_workers = std::min((size_t)num_threads, std::max<size_t>(num_shots, 1));
+    auto mwpms = self.get_mwpms_for_workers(num_workers, enable_correlations);
+    size_t num_observables = self.get_num_observables();
+    for (auto &overrides : weight_overrides)
+        check_edge_weight_overrides(self, overrides.edges.data(), overrides.weights.data(), overrides.edges.size());
+
+    auto decode_shots = [&](size_t thread_index, size_t shots_begin, size_t shots_end) {
+        auto &mwpm = *mwpms[thread_index];
+        std::vector<uint64_t> detection_events;
+
+        // Vector used to extract predicted observables when decoding if bit_packed_predictions is true and there are
+        // too many observables to fit in an observable mask
+        std::vector<uint8_t> temp_predictions;
+        if (bit_packed_predictions && num_observables > sizeof(pm::obs_int) * 8)
+            temp_predictions.resize(num_observables);
+
+        // Iterate over the shots, getting detection events and decoding
+        for (size_t i = shots_begin; i < shots_end; i++) {
+            get_detection_events(i, detection_events);
+            // Correlated decoding undoes the overrides along with its own reweighting, making this a no-op
+            UndoReweightsOnExit undo_overrides{mwpm};
+            for (auto &overrides : weight_overrides) {
+                auto indptr = overrides.indptr.data();
+                for (int64_t k = indptr[i]; k < indptr[i + 1]; k++)
+                    self.override_edge_weight(mwpm, overrides.edges.data()[k], overrides.weights.data()[k]);
+            }
+            pm::total_weight_int solution_weight = 0;
+            if (bit_packed_predictions && num_observables <= sizeof(pm::obs_int) * 8) {
+                // Write the observable mask straight into the packed predictions
+                auto res = pm::decode_detection_events_for_up_to_64_observables(
+                    mwpm, detection_events, enable_correlations);
+                pm::fill_bit_packed_array_from_obs_mask(
+                    res.obs_mask, predictions_ptr + (num_observable_bytes * i), num_observable_bytes);
+                solution_weight = res.weight;
+            } else if (bit_packed_predictions) {
+                std::fill(temp_predictions.begin(), temp_predictions.end(), 0);
+                pm::decode_detection_events(
+                    mwpm, detection_events, temp_predictions.data(), solution_weight, enable_correlations);
+                // bitpack the predictions
+                for (size_t k = 0; k < temp_predictions.size(); k++) {
+                    size_t arr_idx = k >> 3;
+                    *(predictions_ptr + (num_observable_bytes * i) + arr_idx) ^= (temp_predictions[k] << (k % 8));
+                }
+            } else {
+                pm::decode_detection_events(
+                    mwpm,
+                    detection_events,
+                    predictions_ptr + (num_observable_bytes * i),
+                    solution_weight,
+                    enable_correlations);
+            }
+            ws(i) = (double)solution_weight / mwpm.flooder.graph.normalising_constant;
+            detection_events.clear();
+        }
+    };
+
+    // The GIL is released while decoding, so that other Python threads (e.g. one producing the next batch
+    // of shots for `Matching.decode_stream`) can run concurrently.
+    {
+        py::gil_scoped_release release;
+        pm::parallel_for_blocks(num_shots, num_workers, decode_shots);
+    }
+    predictions.resize({(py::ssize_t)num_shots, (py::ssize_t)num_observable_bytes});
+    return py::make_tuple(predictions, weights);
+}
+
+void check_window_decoding_arguments(
+    pm::UserGraph &self,
+    const py::array_t<uint8_t> &shots,
+    const py::array_t<double, py::array::c_style | py::array::forcecast> &detector_times) {
+    if (shots.ndim() != 2)
+        throw std::invalid_argument("`shots` array should have two dimensions, not " + std::to_string(shots.ndim()));
+    if (shots.shape(1) < self.get_num_detectors() || shots.shape(1) > self.get_num_nodes())
+        throw std::invalid_argument(
+            "`shots` array should have at least " + std::to_string(self.get_num_detectors()) +
+            " columns (the number of detectors), and no more than " + std::to_string(self.get_num_nodes()) +
+            " columns (the number of nodes), but instead has " + std::to_string(shots.shape(1)) + " columns");
+    if (detector_times.ndim() != 1)
+        throw std::invalid_argument("`detector_times` must be a one-dimensional array.");
+}
+
+/// Decodes each shot (a row of `shots`) using a window decoder (a `pm::SlidingWindowDecoder`, which decodes them in
+/// turn, or a `pm::ParallelWindowDecoder`, which decodes them across its threads), and returns a tuple of the
+/// predictions and the weights.
+template <typename WindowDecoder>
+py::tuple decode_batch_with_window_decoder(
+    size_t num_observables, const py::array_t<uint8_t> &shots, WindowDecoder &decoder) {
+    size_t num_shots = shots.shape(0);
+    py::array_t<uint8_t> predictions = py::array_t<uint8_t>(num_shots * num_observables);
+    predictions[py::make_tuple(py::ellipsis())] = 0;
+    uint8_t *predictions_ptr = (uint8_t *)predictions.request().ptr;
+    py::array_t<double> weights = py::array_t<double>(num_shots);
+    auto ws = weights.mutable_unchecked<1>();
+    auto s = shots.unchecked<2>();
+    {
+        py::gil_scoped_release release;
+        auto get_detection_events = [&](size_t i, std::vector<uint64_t> &detection_events) {
+            for (py::ssize_t j = 0; j < s.shape(1); j++) {
+                if (s(i, j))
+                    detection_events.push_back(j);
+            }
+        };
+        if constexpr (std::is_same_v<WindowDecoder, pm::ParallelWindowDecoder>) {
+            decoder.decode_batch(num_shots, get_detection_events, predictions_ptr, ws.mutable_data(0));
+        } else {
+            std::vector<uint64_t> detection_events;
+            for (size_t i = 0; i < num_shots; i++) {
+                detection_events.clear();
+                get_detection_events(i, detection_events);
+                ws(i) = decoder.decode(detection_events, predictions_ptr + num_observables * i);
+            }
+        }
+    }
+    predictions.resize({(py::ssize_t)num_shots, (py::ssize_t)num_observables});
+    return py::make_tuple(predictions, weights);
+}
+
 void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGraph> &g) {
     g.def(py::init<>());
     g.def(py::init<size_t>(), "num_nodes"_a);
@@ -97,6 +434,7 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
            double weight,
            double error_probability,
            const std::string &merge_strategy) {
+            auto lock = lock_user_graph(self);
             // Using signed integer (int64_t) instead of size_t for the python API, since it can be useful to
             // return -1 as the virtual boundary when inspecting the graph.
             if (node1 < 0 || node2 < 0)
@@ -128,6 +466,7 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
            double weight,
            double error_probability,
            const std::string &merge_strategy) {
+            auto lock = lock_user_graph(self);
             // Using signed integer (int64_t) instead of size_t for the python API, since it can be useful to
             // return -1 as the virtual boundary when inspecting the graph.
             if (node < 0)
@@ -150,15 +489,99 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
         "weight"_a,
         "error_probability"_a,
         "merge_strategy"_a);
-    g.def("set_boundary", &pm::UserGraph::set_boundary, "boundary"_a);
-    g.def("get_boundary", &pm::UserGraph::get_boundary);
-    g.def("get_num_observables", &pm::UserGraph::get_num_observables);
-    g.def("set_min_num_observables", &pm::UserGraph::set_min_num_observables, "num_observables"_a);
-    g.def("get_num_nodes", &pm::UserGraph::get_num_nodes);
-    g.def("get_num_edges", &pm::UserGraph::get_num_edges);
-    g.def("get_num_detectors", &pm::UserGraph::get_num_detectors);
-    g.def("all_edges_have_error_probabilities", &pm::UserGraph::all_edges_have_error_probabilities);
+    g.def(
+        "add_edges",
+        [](pm::UserGraph &self,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &nodes1,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &nodes2,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indptr,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indices,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &weights,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &error_probabilities,
+           const std::string &merge_strategy) {
+            auto lock = lock_user_graph(self);
+            add_edges_from_arrays(
+                self,
+                nodes1,
+                &nodes2,
+                weights,
+                error_probabilities,
+                observables_indptr,
+                observables_indices,
+                merge_strategy);
+        },
+        "node1"_a,
+        "node2"_a,
+        "observables_indptr"_a,
+        "observables_indices"_a,
+        "weights"_a,
+        "error_probabilities"_a,
+        "merge_strategy"_a);
+    g.def(
+        "add_boundary_edges",
+        [](pm::UserGraph &self,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &nodes,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indptr,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &observables_indices,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &weights,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &error_probabilities,
+           const std::string &merge_strategy) {
+            auto lock = lock_user_graph(self);
+            add_edges_from_arrays(
+                self,
+                nodes,
+                nullptr,
+                weights,
+                error_probabilities,
+                observables_indptr,
+                observables_indices,
+                merge_strategy);
+        },
+        "nodes"_a,
+        "observables_indptr"_a,
+        "observables_indices"_a,
+        "weights"_a,
+        "error_probabilities"_a,
+        "merge_strategy"_a);
+    g.def("set_boundary", locked(&pm::UserGraph::set_boundary), "boundary"_a);
+    g.def("get_boundary", locked(&pm::UserGraph::get_boundary));
+    g.def("get_num_observables", locked(&pm::UserGraph::get_num_observables));
+    g.def("set_min_num_observables", locked(&pm::UserGraph::set_min_num_observables), "num_observables"_a);
+    g.def("get_num_nodes", locked(&pm::UserGraph::get_num_nodes));
+    g.def("get_num_edges", locked(&pm::UserGraph::get_num_edges));
+    g.def("get_num_detectors", locked(&pm::UserGraph::get_num_detectors));
+    g.def("all_edges_have_error_probabilities", locked(&pm::UserGraph::all_edges_have_error_probabilities));
+    g.def(
+        "serialize",
+        [](pm::UserGraph &self, bool include_compiled_graph) {
+            auto lock = lock_user_graph(self);
+            std::string data;
+            {
+                py::gil_scoped_release release;
+                data = pm::serialize_user_graph(self, include_compiled_graph);
+            }
+            return py::bytes(data);
+        },
+        "include_compiled_graph"_a = true);
+    g.def(py::pickle(
+        [](pm::UserGraph &self) {
+            auto lock = lock_user_graph(self);
+            // Only the user graph is pickled, since the decoder is much larger, and is cheap to compile in the
+            // process that unpickles the graph
+            std::string data;
+            {
+                py::gil_scoped_release release;
+                data = pm::serialize_user_graph(self, false);
+            }
+            return py::bytes(data);
+        },
+        [](const py::bytes &state) {
+            std::string_view data = state;
+            py::gil_scoped_release release;
+            return pm::deserialize_user_graph((const uint8_t *)data.data(), data.size());
+        }));
     g.def("add_noise", [](pm::UserGraph &self) {
+        auto lock = lock_user_graph(self);
         auto error_vec = new std::vector<uint8_t>(self.get_num_observables(), 0);
         auto syndrome_vec = new std::vector<uint8_t>(self.get_num_nodes(), 0);
         self.add_noise(error_vec->data(), syndrome_vec->data());
@@ -178,13 +601,25 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
     });
     g.def(
         "decode",
-        [](pm::UserGraph &self, const py::array_t<uint64_t> &detection_events, bool enable_correlations) {
+        [](pm::UserGraph &self,
+           const py::array_t<uint64_t> &detection_events,
+           bool enable_correlations,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &erased_edges) {
+            auto lock = lock_user_graph(self);
             std::vector<uint64_t> detection_events_vec(
                 detection_events.data(), detection_events.data() + detection_events.size());
             auto &mwpm = enable_correlations ? self.get_mwpm_with_search_graph() : self.get_mwpm();
+            std::vector<double> erased_weights(erased_edges.size(), 0.0);
+            check_edge_weight_overrides(self, erased_edges.data(), erased_weights.data(), erased_edges.size());
             auto obs_crossed = new std::vector<uint8_t>(self.get_num_observables(), 0);
             pm::total_weight_int weight = 0;
-            pm::decode_detection_events(mwpm, detection_events_vec, obs_crossed->data(), weight, enable_correlations);
+            {
+                UndoReweightsOnExit undo_erasures{mwpm};
+                for (py::ssize_t k = 0; k < erased_edges.size(); k++)
+                    self.override_edge_weight(mwpm, erased_edges.data()[k], 0);
+                pm::decode_detection_events(
+                    mwpm, detection_events_vec, obs_crossed->data(), weight, enable_correlations);
+            }
             double rescaled_weight = (double)weight / mwpm.flooder.graph.normalising_constant;
 
             auto err_capsule = py::capsule(obs_crossed, [](void *x) {
@@ -196,10 +631,12 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
             return res;
         },
         "detection_events"_a,
-        "enable_correlations"_a = false);
+        "enable_correlations"_a = false,
+        "erased_edges"_a = py::array_t<int64_t>(0));
     g.def(
         "decode_to_edges_array",
         [](pm::UserGraph &self, const py::array_t<uint64_t> &detection_events, bool enable_correlations) {
+            auto lock = lock_user_graph(self);
             auto &mwpm = self.get_mwpm_with_search_graph();
             std::vector<uint64_t> detection_events_vec(
                 detection_events.data(), detection_events.data() + detection_events.size());
@@ -220,6 +657,7 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
     g.def(
         "decode_to_matched_detection_events_array",
         [](pm::UserGraph &self, const py::array_t<uint64_t> &detection_events) {
+            auto lock = lock_user_graph(self);
             auto &mwpm = self.get_mwpm();
             std::vector<uint64_t> detection_events_vec(
                 detection_events.data(), detection_events.data() + detection_events.size());
@@ -250,7 +688,11 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
            const py::array_t<uint8_t> &shots,
            bool bit_packed_shots,
            bool bit_packed_predictions,
-           bool enable_correlations) {
+           bool enable_correlations,
+           int num_threads,
+           const py::object &weight_overrides,
+           const py::object &erasures) {
+            auto lock = lock_user_graph(self);
             if (shots.ndim() != 2)
                 throw std::invalid_argument(
                     "`shots` array should have two dimensions, not " + std::to_string(shots.ndim()));
@@ -273,74 +715,160 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
                         std::to_string(shots.shape(1)) + " columns");
             }
 
-            // Reserve all-zeros predictions array
-            size_t num_observable_bytes =
-                bit_packed_predictions ? (self.get_num_observables() + 7) >> 3 : self.get_num_observables();
-            py::array_t<uint8_t> predictions = py::array_t<uint8_t>(shots.shape(0) * num_observable_bytes);
-            predictions[py::make_tuple(py::ellipsis())] = 0;  // Initialise to 0
-            py::buffer_info buff = predictions.request();
-            uint8_t *predictions_ptr = (uint8_t *)buff.ptr;
-
-            // Reserve weights array
-            py::array_t<double> weights = py::array_t<double>(shots.shape(0));
-            auto ws = weights.mutable_unchecked<1>();
-
-            auto &mwpm = enable_correlations ? self.get_mwpm_with_search_graph() : self.get_mwpm();
-            std::vector<uint64_t> detection_events;
-
-            // Vector used to extract predicted observables when decoding if bit_packed_predictions is true
-            std::vector<uint8_t> temp_predictions;
-            if (bit_packed_predictions)
-                temp_predictions.resize(self.get_num_observables());
-
-            // Iterate over the shots, getting detection events and decoding
             auto s = shots.unchecked<2>();
-            for (py::ssize_t i = 0; i < s.shape(0); i++) {
-                if (bit_packed_shots) {
-                    for (py::ssize_t j = 0; j < s.shape(1); j++) {
-                        size_t bit_offset = j << 3;
-                        for (size_t r = 0; r < 8; r++) {
-                            if (s(i, j) & (1 << r))
-                                detection_events.push_back(bit_offset + r);
+            // Rows with contiguous bytes can be scanned for detection events a 64-bit word at a time
+            bool contiguous_rows = shots.shape(1) <= 1 || shots.strides(1) == 1;
+            std::vector<EdgeWeightOverrides> overrides;
+            if (!weight_overrides.is_none())
+                overrides.push_back(to_edge_weight_overrides(weight_overrides, shots.shape(0), false));
+            if (!erasures.is_none())
+                overrides.push_back(to_edge_weight_overrides(erasures, shots.shape(0), true));
+            return decode_batch_of_shots(
+                self,
+                shots.shape(0),
+                bit_packed_predictions,
+                enable_correlations,
+                num_threads,
+                [&](size_t i, std::vector<uint64_t> &detection_events) {
+                    if (bit_packed_shots && contiguous_rows) {
+                        if (s.shape(1) > 0)
+                            pm::append_detection_events_from_bit_packed_array(
+                                &s(i, 0), s.shape(1), detection_events);
+                    } else if (bit_packed_shots) {
+                        for (py::ssize_t j = 0; j < s.shape(1); j++) {
+                            size_t bit_offset = j << 3;
+                            for (size_t r = 0; r < 8; r++) {
+                                if (s(i, j) & (1 << r))
+                                    detection_events.push_back(bit_offset + r);
+                            }
+                        }
+                    } else {
+                        for (py::ssize_t j = 0; j < s.shape(1); j++) {
+                            if (s(i, j))
+                                detection_events.push_back(j);
                         }
                     }
-                } else {
-                    for (py::ssize_t j = 0; j < s.shape(1); j++) {
-                        if (s(i, j))
-                            detection_events.push_back(j);
-                    }
-                }
-                pm::total_weight_int solution_weight = 0;
-                if (bit_packed_predictions) {
-                    std::fill(temp_predictions.begin(), temp_predictions.end(), 0);
-                    pm::decode_detection_events(
-                        mwpm, detection_events, temp_predictions.data(), solution_weight, enable_correlations);
-                    // bitpack the predictions
-                    for (size_t k = 0; k < temp_predictions.size(); k++) {
-                        size_t arr_idx = k >> 3;
-                        *(predictions_ptr + (num_observable_bytes * i) + arr_idx) ^= (temp_predictions[k] << (k % 8));
-                    }
-                } else {
-                    pm::decode_detection_events(
-                        mwpm,
-                        detection_events,
-                        predictions_ptr + (num_observable_bytes * i),
-                        solution_weight,
-                        enable_correlations);
-                }
-                ws(i) = (double)solution_weight / mwpm.flooder.graph.normalising_constant;
-                detection_events.clear();
-            }
-            predictions.resize({(py::ssize_t)shots.shape(0), (py::ssize_t)num_observable_bytes});
-            return py::make_tuple(predictions, weights);
+                },
+                overrides);
         },
         "shots"_a,
         "bit_packed_shots"_a = false,
         "bit_packed_predictions"_a = false,
-        "enable_correlations"_a = false);
+        "enable_correlations"_a = false,
+        "num_threads"_a = 1,
+        "weight_overrides"_a = py::none(),
+        "erasures"_a = py::none());
+    g.def(
+        "decode_batch_sparse",
+        [](pm::UserGraph &self,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &indices,
+           const py::array_t<int64_t, py::array::c_style | py::array::forcecast> &indptr,
+           bool bit_packed_predictions,
+           bool enable_correlations,
+           int num_threads) {
+            auto lock = lock_user_graph(self);
+            if (indices.ndim() != 1 || indptr.ndim() != 1)
+                throw std::invalid_argument("`indices` and `indptr` must both be one-dimensional arrays.");
+            if (indptr.size() < 1)
+                throw std::invalid_argument("`indptr` must have at least one element.");
+            auto ind = indices.unchecked<1>();
+            auto ptr = indptr.unchecked<1>();
+            if (ptr(0) < 0 || ptr(indptr.size() - 1) > indices.size())
+                throw std::invalid_argument(
+                    "The elements of `indptr` must be between 0 and " + std::to_string(indices.size()) +
+                    " (the size of `indices`).");
+            for (py::ssize_t k = 1; k < indptr.size(); k++) {
+                if (ptr(k) < ptr(k - 1))
+                    throw std::invalid_argument("`indptr` must be non-decreasing.");
+            }
+            for (py::ssize_t k = ptr(0); k < ptr(indptr.size() - 1); k++) {
+                if (ind(k) < 0)
+                    throw std::invalid_argument(
+                        "Detection event indices must be non-negative, but found " + std::to_string(ind(k)) + ".");
+            }
+            return decode_batch_of_shots(
+                self,
+                indptr.size() - 1,
+                bit_packed_predictions,
+                enable_correlations,
+                num_threads,
+                [&](size_t i, std::vector<uint64_t> &detection_events) {
+                    detection_events.insert(
+                        detection_events.end(), ind.data(ptr(i)), ind.data(ptr(i)) + (ptr(i + 1) - ptr(i)));
+                    // Detection events given more than once cancel out in pairs, as they would for the XOR of
+                    // syndromes. This only costs a linear scan when the events are already sorted and distinct.
+                    if (std::adjacent_find(
+                            detection_events.begin(), detection_events.end(), std::greater_equal<>()) !=
+                        detection_events.end()) {
+                        std::sort(detection_events.begin(), detection_events.end());
+                        size_t n = 0;
+                        for (size_t k = 0; k < detection_events.size(); k++) {
+                            if (n > 0 && detection_events[n - 1] == detection_events[k]) {
+                                n--;
+                            } else {
+                                detection_events[n++] = detection_events[k];
+                            }
+                        }
+                        detection_events.resize(n);
+                    }
+                });
+        },
+        "indices"_a,
+        "indptr"_a,
+        "bit_packed_predictions"_a = false,
+        "enable_correlations"_a = false,
+        "num_threads"_a = 1);
+    g.def(
+        "decode_batch_sliding_window",
+        [](pm::UserGraph &self,
+           const py::array_t<uint8_t> &shots,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &detector_times,
+           double commit_duration,
+           double buffer_duration) {
+            auto lock = lock_user_graph(self);
+            check_window_decoding_arguments(self, shots, detector_times);
+            pm::UserGraphView view(self);
+            pm::SlidingWindowDecoder decoder(
+                view,
+                std::vector<double>(detector_times.data(), detector_times.data() + detector_times.size()),
+                commit_duration,
+                buffer_duration);
+            return decode_batch_with_window_decoder(self.get_num_observables(), shots, decoder);
+        },
+        "shots"_a,
+        "detector_times"_a,
+        "commit_duration"_a,
+        "buffer_duration"_a);
+    g.def(
+        "decode_batch_parallel_window",
+        [](pm::UserGraph &self,
+           const py::array_t<uint8_t> &shots,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &detector_times,
+           double commit_duration,
+           double buffer_duration,
+           int num_threads) {
+            auto lock = lock_user_graph(self);
+            check_window_decoding_arguments(self, shots, detector_times);
+            if (num_threads < 1)
+                throw std::invalid_argument("`num_threads` must be at least 1.");
+            pm::UserGraphView view(self);
+            pm::ParallelWindowDecoder decoder(
+                view,
+                std::vector<double>(detector_times.data(), detector_times.data() + detector_times.size()),
+                commit_duration,
+                buffer_duration,
+                num_threads);
+            return decode_batch_with_window_decoder(self.get_num_observables(), shots, decoder);
+        },
+        "shots"_a,
+        "detector_times"_a,
+        "commit_duration"_a,
+        "buffer_duration"_a,
+        "num_threads"_a = 1);
     g.def(
         "decode_to_matched_detection_events_dict",
         [](pm::UserGraph &self, const py::array_t<uint64_t> &detection_events) {
+            auto lock = lock_user_graph(self);
             auto &mwpm = self.get_mwpm();
             std::vector<uint64_t> detection_events_vec(
                 detection_events.data(), detection_events.data() + detection_events.size());
@@ -362,32 +890,135 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
         },
         "detection_events"_a);
     g.def("get_edges", [](const pm::UserGraph &self) {
+        auto lock = lock_user_graph(self);
         py::list edges;
 
-        for (auto &e : self.edges) {
+        for (size_t i = 0; i < self.edges.size(); i++) {
             double p;
-            if (e.error_probability < 0 || e.error_probability > 1) {
+            double error_probability = self.edges.error_probability[i];
+            if (error_probability < 0 || error_probability > 1) {
                 p = -1.0;
             } else {
-                p = e.error_probability;
+                p = error_probability;
             }
-            std::set<size_t> observables_set(e.observable_indices.begin(), e.observable_indices.end());
-            py::dict attrs("fault_ids"_a = observables_set, "weight"_a = e.weight, "error_probability"_a = p);
-            if (e.node2 == SIZE_MAX) {
-                py::tuple edge_props = py::make_tuple(e.node1, py::none(), attrs);
+            auto observables = self.edges.observables(i);
+            std::set<size_t> observables_set(observables.begin(), observables.end());
+            py::dict attrs(
+                "fault_ids"_a = observables_set, "weight"_a = self.edges.weight[i], "error_probability"_a = p);
+            if (self.edges.node2[i] == SIZE_MAX) {
+                py::tuple edge_props = py::make_tuple(self.edges.node1[i], py::none(), attrs);
                 edges.append(edge_props);
             } else {
-                py::tuple edge_props = py::make_tuple(e.node1, e.node2, attrs);
+                py::tuple edge_props = py::make_tuple(self.edges.node1[i], self.edges.node2[i], attrs);
                 edges.append(edge_props);
             }
         }
         return edges;
     });
-    g.def("has_edge", &pm::UserGraph::has_edge, "node1"_a, "node2"_a);
-    g.def("has_boundary_edge", &pm::UserGraph::has_boundary_edge, "node"_a);
+    g.def("get_edges_array", [](const pm::UserGraph &self) {
+        auto lock = lock_user_graph(self);
+        size_t num_edges = self.edges.size();
+        size_t num_observable_indices = 0;
+        for (size_t i = 0; i < num_edges; i++)
+            num_observable_indices += self.edges.observables(i).size();
+
+        py::array_t<int64_t> node1(num_edges);
+        py::array_t<int64_t> node2(num_edges);
+        py::array_t<double> weights(num_edges);
+        py::array_t<double> error_probabilities(num_edges);
+        py::array_t<int64_t> observables_indptr(num_edges + 1);
+        py::array_t<int64_t> observables_indices(num_observable_indices);
+        int64_t *n1 = node1.mutable_data();
+        int64_t *n2 = node2.mutable_data();
+        double *w = weights.mutable_data();
+        double *p = error_probabilities.mutable_data();
+        int64_t *indptr = observables_indptr.mutable_data();
+        int64_t *indices = observables_indices.mutable_data();
+
+        size_t k = 0;
+        indptr[0] = 0;
+        for (size_t i = 0; i < num_edges; i++) {
+            double error_probability = self.edges.error_probability[i];
+            n1[i] = (int64_t)self.edges.node1[i];
+            n2[i] = self.edges.node2[i] == SIZE_MAX ? -1 : (int64_t)self.edges.node2[i];
+            w[i] = self.edges.weight[i];
+            p[i] = (error_probability < 0 || error_probability > 1) ? -1.0 : error_probability;
+            for (auto obs : self.edges.observables(i))
+                indices[k++] = (int64_t)obs;
+            indptr[i + 1] = (int64_t)k;
+        }
+        return py::make_tuple(node1, node2, weights, error_probabilities, observables_indptr, observables_indices);
+    });
+    g.def("get_adjacency_csr", [](const pm::UserGraph &self) {
+        auto lock = lock_user_graph(self);
+        // The virtual boundary (the other end of boundary edges) is given the index `num_nodes`, and is only
+        // included in the matrix if there is at least one boundary edge.
+        size_t num_nodes = self.nodes.size();
+        size_t num_boundary_edges = 0;
+        size_t num_entries = 0;
+        for (auto &node : self.nodes) {
+            for (auto &neighbor : node.neighbors) {
+                num_boundary_edges += neighbor.node == SIZE_MAX;
+            }
+            num_entries += node.neighbors.size();
+        }
+        num_entries += num_boundary_edges;
+        size_t num_rows = num_nodes + (num_boundary_edges > 0);
+
+        py::array_t<double> data(num_entries);
+        py::array_t<int64_t> indices(num_entries);
+        py::array_t<int64_t> indptr(num_rows + 1);
+        double *d = data.mutable_data();
+        int64_t *ind = indices.mutable_data();
+        int64_t *ptr = indptr.mutable_data();
+
+        size_t k = 0;
+        ptr[0] = 0;
+        for (size_t i = 0; i < num_nodes; i++) {
+            for (auto &neighbor : self.nodes[i].neighbors) {
+                ind[k] = neighbor.node == SIZE_MAX ? (int64_t)num_nodes : (int64_t)neighbor.node;
+                d[k++] = self.edges.weight[neighbor.edge_index];
+            }
+            ptr[i + 1] = (int64_t)k;
+        }
+        if (num_boundary_edges > 0) {
+            for (size_t i = 0; i < num_nodes; i++) {
+                for (auto &neighbor : self.nodes[i].neighbors) {
+                    if (neighbor.node == SIZE_MAX) {
+                        ind[k] = (int64_t)i;
+                        d[k++] = self.edges.weight[neighbor.edge_index];
+                    }
+                }
+            }
+            ptr[num_nodes + 1] = (int64_t)k;
+        }
+        return py::make_tuple(data, indices, indptr, num_rows);
+    });
+    g.def(
+        "set_edge_weights",
+        [](pm::UserGraph &self, const py::array_t<double, py::array::c_style | py::array::forcecast> &weights) {
+            auto lock = lock_user_graph(self);
+            if (weights.ndim() != 1)
+                throw std::invalid_argument("`weights` must be 1-dimensional.");
+            self.set_edge_weights({weights.data(), (size_t)weights.size()});
+        },
+        "weights"_a);
+    g.def(
+        "set_error_probabilities",
+        [](pm::UserGraph &self,
+           const py::array_t<double, py::array::c_style | py::array::forcecast> &error_probabilities) {
+            auto lock = lock_user_graph(self);
+            if (error_probabilities.ndim() != 1)
+                throw std::invalid_argument("`error_probabilities` must be 1-dimensional.");
+            self.set_error_probabilities({error_probabilities.data(), (size_t)error_probabilities.size()});
+        },
+        "error_probabilities"_a);
+    g.def("has_edge", locked(&pm::UserGraph::has_edge), "node1"_a, "node2"_a);
+    g.def("has_boundary_edge", locked(&pm::UserGraph::has_boundary_edge), "node"_a);
     g.def(
         "get_edge_data",
         [](const pm::UserGraph &self, size_t node1, size_t node2) {
+            auto lock = lock_user_graph(self);
             if (node1 >= self.nodes.size())
                 throw std::invalid_argument("node1 (" + std::to_string(node1) + ") not in graph");
             size_t idx = self.nodes[node1].index_of_neighbor(node2);
@@ -395,12 +1026,12 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
                 throw std::invalid_argument(
                     "Edge (" + std::to_string(node1) + ", " + std::to_string(node2) + ") not in graph.");
             auto n = self.nodes[node1].neighbors[idx];
-            std::set<size_t> observables_set(
-                n.edge_it->observable_indices.begin(), n.edge_it->observable_indices.end());
+            auto observables = self.edges.observables(n.edge_index);
+            std::set<size_t> observables_set(observables.begin(), observables.end());
             py::dict attrs(
                 "fault_ids"_a = observables_set,
-                "weight"_a = n.edge_it->weight,
-                "error_probability"_a = n.edge_it->error_probability);
+                "weight"_a = self.edges.weight[n.edge_index],
+                "error_probability"_a = self.edges.error_probability[n.edge_index]);
             return attrs;
         },
         "node1"_a,
@@ -408,21 +1039,70 @@ void pm_pybind::pybind_user_graph_methods(py::module &m, py::class_<pm::UserGrap
     g.def(
         "get_boundary_edge_data",
         [](const pm::UserGraph &self, size_t node) {
+            auto lock = lock_user_graph(self);
             if (node >= self.nodes.size())
                 throw std::invalid_argument("node (" + std::to_string(node) + ") not in graph");
             size_t idx = self.nodes[node].index_of_neighbor(SIZE_MAX);
             if (idx == SIZE_MAX)
                 throw std::invalid_argument("Boundary edge (" + std::to_string(node) + ",) not in graph.");
             auto n = self.nodes[node].neighbors[idx];
-            std::set<size_t> observables_set(
-                n.edge_it->observable_indices.begin(), n.edge_it->observable_indices.end());
+            auto observables = self.edges.observables(n.edge_index);
+            std::set<size_t> observables_set(observables.begin(), observables.end());
             py::dict attrs(
                 "fault_ids"_a = observables_set,
-                "weight"_a = n.edge_it->weight,
-                "error_probability"_a = n.edge_it->error_probability);
+                "weight"_a = self.edges.weight[n.edge_index],
+                "error_probability"_a = self.edges.error_probability[n.edge_index]);
             return attrs;
         },
         "node"_a);
+    m.def(
+        "deserialize_matching_graph",
+        [](const py::buffer &data) {
+            py::buffer_info info = data.request();
+            if (info.ndim != 1 || info.itemsize != 1 || info.strides[0] != 1)
+                throw std::invalid_argument("`data` must be a contiguous buffer of bytes.");
+            // The buffer is only read, and is kept alive by `info`, so the GIL can be released while decoding it
+            py::gil_scoped_release release;
+            return pm::deserialize_user_graph((const uint8_t *)info.ptr, (size_t)info.size);
+        },
+        "data"_a);
+    m.def(
+        "detector_error_model_erasure_edges",
+        [](const char *dem_string, const pm::UserGraph &graph) {
+            auto dem = stim::DetectorErrorModel(dem_string);
+            auto erasure_edges = pm::detector_error_model_erasure_edges(dem, graph);
+            py::array_t<int64_t> erasures(erasure_edges.size());
+            py::array_t<int64_t> edges(erasure_edges.size());
+            auto e = erasures.mutable_unchecked<1>();
+            auto ed = edges.mutable_unchecked<1>();
+            for (size_t k = 0; k < erasure_edges.size(); k++) {
+                e(k) = erasure_edges[k].first;
+                ed(k) = erasure_edges[k].second;
+            }
+            return py::make_tuple(erasures, edges);
+        },
+        "dem_string"_a,
+        "graph"_a);
+    m.def(
+        "decode_batch_sliding_window_from_detector_error_model",
+        [](const char *dem_string, const py::array_t<uint8_t> &shots, double commit_duration, double buffer_duration) {
+            auto dem = stim::DetectorErrorModel(dem_string);
+            pm::PeriodicUserGraph graph(dem);
+            if (shots.ndim() != 2)
+                throw std::invalid_argument(
+                    "`shots` array should have two dimensions, not " + std::to_string(shots.ndim()));
+            if ((size_t)shots.shape(1) != graph.num_nodes())
+                throw std::invalid_argument(
+                    "`shots` array should have " + std::to_string(graph.num_nodes()) +
+                    " columns (the number of detectors), but instead has " + std::to_string(shots.shape(1)) +
+                    " columns");
+            pm::SlidingWindowDecoder decoder(graph, graph.detector_times(), commit_duration, buffer_duration);
+            return decode_batch_with_window_decoder(graph.num_observables(), shots, decoder);
+        },
+        "dem_string"_a,
+        "shots"_a,
+        "commit_duration"_a,
+        "buffer_duration"_a);
     m.def(
         "detector_error_model_to_matching_graph",
         [](const char *dem_string, bool enable_correlations) {
@@ -14,6 +14,7 @@
 
 #include "pymatching/sparse_blossom/driver/user_graph.h"
 
+#include <algorithm>
 #include <cmath>
 #include <gtest/gtest.h>
 #include <limits>
@@ -49,18 +50,21 @@ TEST(UserGraph, ConstructGraph) {
     graph.set_boundary({3, 4});
     ASSERT_EQ(graph.get_num_observables(), 5);
     ASSERT_EQ(graph.nodes.size(), 5);
-    ASSERT_EQ(graph.nodes[0].neighbors[0].edge_it->node2, SIZE_MAX);
-    ASSERT_EQ(graph.nodes[0].neighbors[0].edge_it->weight, pm::merge_weights(4.1, 1.0));
-    ASSERT_EQ(graph.nodes[0].neighbors[0].edge_it->error_probability, 0.1 * (1 - 0.46) + 0.46 * (1 - 0.1));
-    ASSERT_EQ(graph.nodes[0].neighbors[1].edge_it->node2, 1);
-    ASSERT_EQ(graph.nodes[0].neighbors[1].edge_it->weight, pm::merge_weights(2.5, 2.1));
-    ASSERT_EQ(graph.nodes[0].neighbors[1].edge_it->error_probability, 0.4 * (1 - 0.45) + 0.45 * (1 - 0.4));
-    ASSERT_EQ(graph.nodes[1].neighbors[0].edge_it->weight, pm::merge_weights(2.5, 2.1));
-    ASSERT_EQ(graph.nodes[1].neighbors[0].edge_it->error_probability, 0.4 * (1 - 0.45) + 0.45 * (1 - 0.4));
-    ASSERT_EQ(graph.nodes[1].neighbors[1].edge_it->weight, -3.5);
-    ASSERT_EQ(graph.nodes[1].neighbors[0].edge_it->node1, 0);
-    ASSERT_EQ(graph.nodes[2].neighbors[0].edge_it->node1, 1);
-    ASSERT_EQ(graph.nodes[2].neighbors[1].edge_it->node2, 3);
+    ASSERT_EQ(graph.edges.node2[graph.nodes[0].neighbors[0].edge_index], SIZE_MAX);
+    ASSERT_EQ(graph.edges.weight[graph.nodes[0].neighbors[0].edge_index], pm::merge_weights(4.1, 1.0));
+    ASSERT_EQ(
+        graph.edges.error_probability[graph.nodes[0].neighbors[0].edge_index], 0.1 * (1 - 0.46) + 0.46 * (1 - 0.1));
+    ASSERT_EQ(graph.edges.node2[graph.nodes[0].neighbors[1].edge_index], 1);
+    ASSERT_EQ(graph.edges.weight[graph.nodes[0].neighbors[1].edge_index], pm::merge_weights(2.5, 2.1));
+    ASSERT_EQ(
+        graph.edges.error_probability[graph.nodes[0].neighbors[1].edge_index], 0.4 * (1 - 0.45) + 0.45 * (1 - 0.4));
+    ASSERT_EQ(graph.edges.weight[graph.nodes[1].neighbors[0].edge_index], pm::merge_weights(2.5, 2.1));
+    ASSERT_EQ(
+        graph.edges.error_probability[graph.nodes[1].neighbors[0].edge_index], 0.4 * (1 - 0.45) + 0.45 * (1 - 0.4));
+    ASSERT_EQ(graph.edges.weight[graph.nodes[1].neighbors[1].edge_index], -3.5);
+    ASSERT_EQ(graph.edges.node1[graph.nodes[1].neighbors[0].edge_index], 0);
+    ASSERT_EQ(graph.edges.node1[graph.nodes[2].neighbors[0].edge_index], 1);
+    ASSERT_EQ(graph.edges.node2[graph.nodes[2].neighbors[1].edge_index], 3);
     ASSERT_EQ(graph.nodes[0].index_of_neighbor(1), 1);
     ASSERT_EQ(graph.nodes[0].index_of_neighbor(SIZE_MAX), 0);
     ASSERT_EQ(graph.nodes[0].index_of_neighbor(3), SIZE_MAX);
@@ -103,6 +107,59 @@ TEST(UserGraph, ConstructGraph) {
     ASSERT_EQ(mwpm.flooder.negative_weight_observables, obs_exp_vec);
 }
 
+TEST(UserEdges, ReplaceObservablesAndImpliedWeights) {
+    pm::UserEdges edges;
+    std::vector<size_t> obs_a = {1, 2}, obs_b = {3}, obs_c = {4, 5, 6};
+    ASSERT_EQ(edges.push_back(0, 1, obs_a, 1.0, 0.1), 0);
+    ASSERT_EQ(edges.push_back(1, SIZE_MAX, obs_b, 2.0, -1), 1);
+    ASSERT_EQ(edges.size(), 2);
+
+    // Grows the observables of an edge that is not at the end of the pool
+    edges.set_observables(0, obs_c);
+    // Shrinks the observables of an edge in place
+    edges.set_observables(1, {});
+    edges.add_implied_weight(1, {0, 1, 0.5});
+    edges.add_implied_weight(0, {1, SIZE_MAX, 1.5});
+    edges.add_implied_weight(1, {0, SIZE_MAX, 2.5});
+
+    auto e0 = edges[0];
+    ASSERT_EQ(e0.node1, 0);
+    ASSERT_EQ(e0.node2, 1);
+    ASSERT_EQ(e0.observable_indices, obs_c);
+    ASSERT_EQ(e0.weight, 1.0);
+    ASSERT_EQ(e0.error_probability, 0.1);
+    ASSERT_EQ(e0.implied_weights_for_other_edges, std::vector<pm::ImpliedWeightUnconverted>({{1, SIZE_MAX, 1.5}}));
+    auto e1 = edges[1];
+    ASSERT_EQ(e1.node2, SIZE_MAX);
+    ASSERT_TRUE(e1.observable_indices.empty());
+    ASSERT_EQ(
+        e1.implied_weights_for_other_edges,
+        std::vector<pm::ImpliedWeightUnconverted>({{0, 1, 0.5}, {0, SIZE_MAX, 2.5}}));
+}
+
+TEST(UserEdges, InterleavedGrowthCompactsPools) {
+    // Growing the edges in turn moves each one to the end of the pools, so the pools are repeatedly compacted
+    pm::UserEdges edges;
+    size_t num_edges = 5;
+    for (size_t i = 0; i < num_edges; i++)
+        edges.push_back(i, i + 1, {}, 1.0, 0.1);
+    std::vector<std::vector<size_t>> expected_observables(num_edges);
+    std::vector<std::vector<pm::ImpliedWeightUnconverted>> expected_implied_weights(num_edges);
+    for (size_t k = 0; k < 100; k++) {
+        size_t i = k % num_edges;
+        expected_observables[i].push_back(k);
+        edges.set_observables(i, expected_observables[i]);
+        expected_implied_weights[i].push_back({k, SIZE_MAX, (double)k});
+        edges.add_implied_weight(i, expected_implied_weights[i].back());
+    }
+    for (size_t i = 0; i < num_edges; i++) {
+        auto e = edges[i];
+        ASSERT_EQ(e.node1, i);
+        ASSERT_EQ(e.observable_indices, expected_observables[i]);
+        ASSERT_EQ(e.implied_weights_for_other_edges, expected_implied_weights[i]);
+    }
+}
+
 TEST(UserGraph, AddNoise) {
     pm::UserGraph graph;
     graph.add_or_merge_boundary_edge(0, {0}, 1, 1);
@@ -216,7 +273,7 @@ struct TestHandler {
 TEST(IterDemInstructionsTest, EmptyDem) {
     stim::DetectorErrorModel dem;
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
     ASSERT_TRUE(handler.handled_errors.empty());
     ASSERT_TRUE(joint_probabilities.empty());
@@ -226,7 +283,7 @@ TEST(IterDemInstructionsTest, EmptyDem) {
 TEST(IterDemInstructionsTest, SingleDetectorErrorToBoundary) {
     stim::DetectorErrorModel dem("error(0.1) D0");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     // Check handler calls
@@ -235,70 +292,70 @@ TEST(IterDemInstructionsTest, SingleDetectorErrorToBoundary) {
 
     // Check joint probabilities (marginal probability in this case)
     std::pair<size_t, size_t> key = {0, SIZE_MAX};
-    ASSERT_EQ(joint_probabilities.size(), 1);
-    ASSERT_EQ(joint_probabilities[key].size(), 1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], 0.1);
+    ASSERT_EQ(joint_probabilities.num_edges(), 1);
+    ASSERT_EQ(joint_probabilities.entries(key).size(), 1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), 0.1);
 }
 
 // Test a standard error between two detectors.
 TEST(IterDemInstructionsTest, TwoDetectorError) {
     stim::DetectorErrorModel dem("error(0.25) D5 D10");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     ASSERT_EQ(handler.handled_errors.size(), 1);
     EXPECT_EQ(handler.handled_errors[0], (HandledError{0.25, 5, 10, {}}));
 
     std::pair<size_t, size_t> key = {5, 10};
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], 0.25);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), 0.25);
 }
 
 // Test a standard error between two detectors where they are not sorted in the DEM.
 TEST(IterDemInstructionsTest, TwoDetectorErrorNotSorted) {
     stim::DetectorErrorModel dem("error(0.25) D10 D5");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     ASSERT_EQ(handler.handled_errors.size(), 1);
     EXPECT_EQ(handler.handled_errors[0], (HandledError{0.25, 5, 10, {}}));
 
     std::pair<size_t, size_t> key = {5, 10};
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], 0.25);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), 0.25);
 }
 
 // Test an error that also flips a logical observable.
 TEST(IterDemInstructionsTest, ErrorWithOneObservable) {
     stim::DetectorErrorModel dem("error(0.125) D1 D2 L0");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     ASSERT_EQ(handler.handled_errors.size(), 1);
     EXPECT_EQ(handler.handled_errors[0], (HandledError{0.125, 1, 2, {0}}));
 
     std::pair<size_t, size_t> key = {1, 2};
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], 0.125);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), 0.125);
 }
 
 TEST(IterDemInstructionsTest, ErrorWithMultipleObservables) {
     stim::DetectorErrorModel dem("error(0.3) D3 D4 L1 L3");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     ASSERT_EQ(handler.handled_errors.size(), 1);
     EXPECT_EQ(handler.handled_errors[0], (HandledError{0.3, 3, 4, {1, 3}}));
 
     std::pair<size_t, size_t> key = {3, 4};
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], 0.3);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), 0.3);
 }
 
 TEST(IterDemInstructionsTest, ZeroProbabilityError) {
     stim::DetectorErrorModel dem("error(0.0) D0 D1");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
     ASSERT_TRUE(handler.handled_errors.empty());
     ASSERT_TRUE(joint_probabilities.empty());
@@ -307,7 +364,7 @@ TEST(IterDemInstructionsTest, ZeroProbabilityError) {
 TEST(IterDemInstructionsTest, ThreeDetectorErrorThrowsInvalidArgument) {
     stim::DetectorErrorModel dem("error(0.1) D0 D1 D2");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     ASSERT_THROW(
         pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities), std::invalid_argument);
 }
@@ -316,7 +373,7 @@ TEST(IterDemInstructionsTest, ThreeDetectorErrorThrowsInvalidArgument) {
 TEST(IterDemInstructionsTest, DecomposedError) {
     stim::DetectorErrorModel dem("error(0.1) D0 D1 ^ D2 D3 L0 ^ D4");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     // Check handler calls
@@ -330,24 +387,24 @@ TEST(IterDemInstructionsTest, DecomposedError) {
     std::pair<size_t, size_t> key4B = {4, SIZE_MAX};
 
     // Marginal probabilities
-    EXPECT_DOUBLE_EQ(joint_probabilities[key01][key01], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key23][key23], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key4B][key4B], 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key01, key01), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key23, key23), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key4B, key4B), 0.1);
 
     // Joint probabilities between components
-    EXPECT_DOUBLE_EQ(joint_probabilities[key01][key23], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key23][key01], 0.1);  // Symmetric
-    EXPECT_DOUBLE_EQ(joint_probabilities[key01][key4B], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key4B][key01], 0.1);  // Symmetric
-    EXPECT_DOUBLE_EQ(joint_probabilities[key23][key4B], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key4B][key23], 0.1);  // Symmetric
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key01, key23), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key23, key01), 0.1);  // Symmetric
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key01, key4B), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key4B, key01), 0.1);  // Symmetric
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key23, key4B), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key4B, key23), 0.1);  // Symmetric
 }
 
 // Test that a decomposed error with a hyperedge component throws an exception.
 TEST(IterDemInstructionsTest, DecomposedErrorWithHyperedgeThrows) {
     stim::DetectorErrorModel dem("error(0.15) D0 D1 ^ D2 D3 D4 ^ D5 D6 L2");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
 
     // Assert that the function throws std::invalid_argument when processing the DEM.
     ASSERT_THROW(
@@ -358,7 +415,7 @@ TEST(IterDemInstructionsTest, DecomposedErrorWithHyperedgeThrows) {
 TEST(IterDemInstructionsTest, DecomposedErrorWithUndetectableErrorThrows) {
     stim::DetectorErrorModel dem("error(0.15) L0 ^ D2 D4 ^ D5 D6 L2");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
 
     // Assert that the function throws std::invalid_argument when processing the DEM.
     ASSERT_THROW(
@@ -380,7 +437,7 @@ TEST(IterDemInstructionsTest, CombinedComplexDem) {
         error(0.4) D8 ^ D9 L1    # Instruction 4: Decomposed
     )DEM");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     ASSERT_EQ(handler.handled_errors.size(), 4);
@@ -396,17 +453,17 @@ TEST(IterDemInstructionsTest, CombinedComplexDem) {
     std::pair<size_t, size_t> key9B = {9, SIZE_MAX};
 
     // Marginal probabilities from each instruction
-    EXPECT_DOUBLE_EQ(joint_probabilities[key0B][key0B], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key12][key12], 0.2);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key8B][key8B], 0.4);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key9B][key9B], 0.4);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key0B, key0B), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key12, key12), 0.2);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key8B, key8B), 0.4);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key9B, key9B), 0.4);
 
     // Joint probability from the last instruction
-    EXPECT_DOUBLE_EQ(joint_probabilities[key8B][key9B], 0.4);
-    EXPECT_DOUBLE_EQ(joint_probabilities[key9B][key8B], 0.4);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key8B, key9B), 0.4);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key9B, key8B), 0.4);
 
     // Check that there are no other joint probabilities
-    EXPECT_EQ(joint_probabilities[key0B].count(key12), 0);
+    EXPECT_FALSE(joint_probabilities.contains(key0B, key12));
 }
 
 double bernoulli_xor(double p1, double p2) {
@@ -416,7 +473,7 @@ double bernoulli_xor(double p1, double p2) {
 TEST(IterDemInstructionsTest, MoreThanEightComponents) {
     stim::DetectorErrorModel dem("error(0.1) D0 ^ D1 ^ D2 ^ D3 ^ D4 ^ D5 ^ D6 ^ D7 ^ D8");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 }
 
@@ -424,14 +481,14 @@ TEST(IterDemInstructionsTest, MoreThanEightComponents) {
 TEST(IterDemInstructionsTest, MultipleErrorsOnSameEdgeCombine) {
     stim::DetectorErrorModel dem("error(0.1) D0 D1\n error(0.2) D0 D1");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     // Expected probability = 0.1*(1-0.2) + 0.2*(1-0.1) = 0.08 + 0.18 = 0.26
     double expected_p = bernoulli_xor(0.1, 0.2);
 
     std::pair<size_t, size_t> key = {0, 1};
-    EXPECT_DOUBLE_EQ(joint_probabilities[key][key], expected_p);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(key, key), expected_p);
 }
 
 // Tests how marginal and joint probabilities are combined across different decomposed error instructions.
@@ -441,7 +498,7 @@ TEST(IterDemInstructionsTest, ComplexCombinationOfErrors) {
         error(0.2) D0 ^ D2
     )DEM");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities);
 
     std::pair<size_t, size_t> k0 = {0, SIZE_MAX};
@@ -449,48 +506,73 @@ TEST(IterDemInstructionsTest, ComplexCombinationOfErrors) {
     std::pair<size_t, size_t> k2 = {2, SIZE_MAX};
 
     // Marginal probabilities
-    EXPECT_DOUBLE_EQ(joint_probabilities[k0][k0], bernoulli_xor(0.1, 0.2));  // 0.26
-    EXPECT_DOUBLE_EQ(joint_probabilities[k1][k1], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[k2][k2], 0.2);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k0, k0), bernoulli_xor(0.1, 0.2));  // 0.26
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k1, k1), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k2, k2), 0.2);
 
     // Joint probabilities
-    EXPECT_DOUBLE_EQ(joint_probabilities[k0][k1], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[k1][k0], 0.1);
-    EXPECT_DOUBLE_EQ(joint_probabilities[k0][k2], 0.2);
-    EXPECT_DOUBLE_EQ(joint_probabilities[k2][k0], 0.2);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k0, k1), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k1, k0), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k0, k2), 0.2);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k2, k0), 0.2);
 
     // No instruction connects D1 and D2, so their joint probability should be 0.
-    EXPECT_DOUBLE_EQ(joint_probabilities[k1][k2], 0.0);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get(k1, k2), 0.0);
 }
 
 // Test that an error greater than 0.5 results in a throw.
 TEST(IterDemInstructionsTest, ProbabilityGreaterThanHalfThrows) {
     stim::DetectorErrorModel dem("error(0.51) D0 D2");
     TestHandler handler;
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
+    pm::JointProbabilities joint_probabilities;
     ASSERT_THROW(
         pm::iter_dem_instructions_include_correlations(dem, handler, joint_probabilities), std::invalid_argument);
 }
 
+TEST(JointProbabilities, CombinesContributionsToEachPair) {
+    pm::JointProbabilities joint_probabilities;
+    ASSERT_TRUE(joint_probabilities.empty());
+    joint_probabilities.add({2, 3}, {0, 1}, 0.1);
+    joint_probabilities.add({0, 1}, {0, 1}, 0.1);
+    joint_probabilities.add({2, 3}, {2, 3}, 0.3);
+    joint_probabilities.add({0, 1}, {0, 1}, 0.2);
+    joint_probabilities.finalize();
+    ASSERT_EQ(joint_probabilities.num_edges(), 2);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get({0, 1}, {0, 1}), bernoulli_xor(0.1, 0.2));
+    EXPECT_DOUBLE_EQ(joint_probabilities.get({2, 3}, {0, 1}), 0.1);
+    EXPECT_DOUBLE_EQ(joint_probabilities.get({0, 1}, {2, 3}), 0.0);
+    auto entries = joint_probabilities.entries({2, 3});
+    ASSERT_EQ(entries.size(), 2);
+    ASSERT_EQ(entries[0].other_edge, std::make_pair((size_t)0, (size_t)1));
+    ASSERT_EQ(entries[1].other_edge, std::make_pair((size_t)2, (size_t)3));
+    ASSERT_TRUE(joint_probabilities.entries({4, 5}).empty());
+
+    // Contributions added after finalizing are combined with the existing ones
+    joint_probabilities.add({0, 1}, {0, 1}, 0.3);
+    joint_probabilities.finalize();
+    EXPECT_DOUBLE_EQ(joint_probabilities.get({0, 1}, {0, 1}), bernoulli_xor(bernoulli_xor(0.1, 0.2), 0.3));
+    ASSERT_EQ(joint_probabilities.entries({0, 1}).size(), 1);
+}
+
 TEST(UserGraph, PopulateImpliedEdgeWeights) {
     pm::UserGraph graph;
     graph.add_or_merge_edge(0, 1, {}, 0.0, 0.26);
     graph.add_or_merge_edge(2, 3, {}, 0.0, 0.1);
 
-    std::map<std::pair<size_t, size_t>, std::map<std::pair<size_t, size_t>, double>> joint_probabilities;
-    joint_probabilities[{0, 1}][{0, 1}] = 0.26;
-    joint_probabilities[{0, 1}][{2, 3}] = 0.1;
-    joint_probabilities[{2, 3}][{0, 1}] = 0.1;
-    joint_probabilities[{2, 3}][{2, 3}] = 0.1;
+    pm::JointProbabilities joint_probabilities;
+    joint_probabilities.add({0, 1}, {0, 1}, 0.26);
+    joint_probabilities.add({0, 1}, {2, 3}, 0.1);
+    joint_probabilities.add({2, 3}, {0, 1}, 0.1);
+    joint_probabilities.add({2, 3}, {2, 3}, 0.1);
+    joint_probabilities.finalize();
 
     graph.populate_implied_edge_weights(joint_probabilities);
 
-    auto it_01 = std::find_if(graph.edges.begin(), graph.edges.end(), [](const pm::UserEdge& edge) {
-        return edge.node1 == 0 && edge.node2 == 1;
-    });
-    ASSERT_NE(it_01, graph.edges.end());
-    ASSERT_EQ(it_01->implied_weights_for_other_edges.size(), 1);
-    const auto& implied_01 = it_01->implied_weights_for_other_edges[0];
+    size_t edge_01 = graph.nodes[0].neighbors[graph.nodes[0].index_of_neighbor(1)].edge_index;
+    ASSERT_EQ(graph.edges.node1[edge_01], 0);
+    ASSERT_EQ(graph.edges.node2[edge_01], 1);
+    ASSERT_EQ(graph.edges.implied_weights(edge_01).size(), 1);
+    const auto& implied_01 = graph.edges.implied_weights(edge_01)[0];
     ASSERT_EQ(implied_01.node1, 2);
     ASSERT_EQ(implied_01.node2, 3);
 
@@ -498,13 +580,11 @@ TEST(UserGraph, PopulateImpliedEdgeWeights) {
     double w_01 = pm::to_weight_for_correlations(p_01);
     ASSERT_EQ(implied_01.implied_weight, w_01);
 
-    auto it_23 = std::find_if(graph.edges.begin(), graph.edges.end(), [](const pm::UserEdge& edge) {
-        return edge.node1 == 2 && edge.node2 == 3;
-    });
-
-    ASSERT_NE(it_23, graph.edges.end());
-    ASSERT_EQ(it_23->implied_weights_for_other_edges.size(), 1);
-    const auto& implied_23 = it_23->implied_weights_for_other_edges[0];
+    size_t edge_23 = graph.nodes[2].neighbors[graph.nodes[2].index_of_neighbor(3)].edge_index;
+    ASSERT_EQ(graph.edges.node1[edge_23], 2);
+    ASSERT_EQ(graph.edges.node2[edge_23], 3);
+    ASSERT_EQ(graph.edges.implied_weights(edge_23).size(), 1);
+    const auto& implied_23 = graph.edges.implied_weights(edge_23)[0];
     ASSERT_EQ(implied_23.node1, 0);
     ASSERT_EQ(implied_23.node2, 1);
     ASSERT_NEAR(implied_23.implied_weight, 0.0, 0.00001);
@@ -516,11 +596,9 @@ TEST(UserGraph, ConvertImpliedWeights) {
     user_graph.add_or_merge_edge(2, 3, {}, 1.0, 0.1);
     user_graph.add_or_merge_boundary_edge(4, {}, 1.0, 0.1);
 
-    auto& edge1 = *std::find_if(user_graph.edges.begin(), user_graph.edges.end(), [](const pm::UserEdge& e) {
-        return e.node1 == 0;
-    });
-    edge1.implied_weights_for_other_edges.push_back({2, 3, 5});
-    edge1.implied_weights_for_other_edges.push_back({4, SIZE_MAX, 7});
+    ASSERT_EQ(user_graph.edges.node1[0], 0);
+    user_graph.edges.add_implied_weight(0, {2, 3, 5});
+    user_graph.edges.add_implied_weight(0, {4, SIZE_MAX, 7});
 
     pm::MatchingGraph matching_graph = user_graph.to_matching_graph(100);
 
@@ -544,16 +622,12 @@ TEST(UserGraph, ConvertImpliedWeights) {
     auto it4 = std::find(node4_neighbors.begin(), node4_neighbors.end(), nullptr);
     size_t index_of_boundary_in_4 = std::distance(node4_neighbors.begin(), it4);
 
-    auto& implied_weights = matching_graph.nodes[0].neighbor_implied_weights[index_of_1_in_0];
+    auto implied_weights = matching_graph.implied_weights->of_edge(0, index_of_1_in_0);
     ASSERT_EQ(implied_weights.size(), 2);
-    ASSERT_EQ(implied_weights[0].edge0_ptr, &matching_graph.nodes[2].neighbor_weights[index_of_3_in_2]);
-    ASSERT_EQ(implied_weights[0].edge1_ptr, &matching_graph.nodes[3].neighbor_weights[index_of_2_in_3]);
-    ASSERT_EQ(implied_weights[0].implied_weight, 10);
-    ASSERT_EQ(implied_weights[1].edge0_ptr, &matching_graph.nodes[4].neighbor_weights[index_of_boundary_in_4]);
-    ASSERT_EQ(implied_weights[1].edge1_ptr, nullptr);
-    ASSERT_EQ(implied_weights[1].implied_weight, 14);
-
-    auto& implied_weights_rev = matching_graph.nodes[1].neighbor_implied_weights[index_of_0_in_1];
+    ASSERT_EQ(implied_weights[0], (pm::ImpliedWeightIndices{2, index_of_3_in_2, 3, index_of_2_in_3, 10}));
+    ASSERT_EQ(implied_weights[1], (pm::ImpliedWeightIndices{4, index_of_boundary_in_4, SIZE_MAX, SIZE_MAX, 14}));
+
+    auto implied_weights_rev = matching_graph.implied_weights->of_edge(1, index_of_0_in_1);
     ASSERT_EQ(implied_weights_rev.size(), 2);
 }
 
@@ -565,10 +639,10 @@ TEST(UserGraph, ConvertImpliedWeights_NoRules) {
 
     pm::MatchingGraph matching_graph = user_graph.to_matching_graph(100);
 
-    for (const auto& node : matching_graph.nodes) {
-        for (const auto& implied_weights_vec : node.neighbor_implied_weights) {
-            ASSERT_TRUE(implied_weights_vec.empty());
-        }
+    ASSERT_TRUE(matching_graph.implied_weights->weights.empty());
+    for (size_t i = 0; i < matching_graph.nodes.size(); i++) {
+        for (size_t j = 0; j < matching_graph.nodes[i].neighbors.size(); j++)
+            ASSERT_TRUE(matching_graph.implied_weights->of_edge(i, j).empty());
     }
 }
 
@@ -577,17 +651,15 @@ TEST(UserGraph, ConvertImpliedWeights_EmptyRules) {
     user_graph.add_or_merge_edge(0, 1, {}, 1.0, 0.1);
     user_graph.add_or_merge_edge(2, 3, {}, 1.0, 0.1);
 
-    auto& edge = *std::find_if(user_graph.edges.begin(), user_graph.edges.end(), [](const pm::UserEdge& e) {
-        return e.node1 == 0;
-    });
-    edge.implied_weights_for_other_edges = {};
+    ASSERT_EQ(user_graph.edges.node1[0], 0);
+    user_graph.edges.set_implied_weights(0, {});
 
     pm::MatchingGraph matching_graph = user_graph.to_matching_graph(100);
 
-    for (const auto& node : matching_graph.nodes) {
-        for (const auto& implied_weights_vec : node.neighbor_implied_weights) {
-            ASSERT_TRUE(implied_weights_vec.empty());
-        }
+    ASSERT_TRUE(matching_graph.implied_weights->weights.empty());
+    for (size_t i = 0; i < matching_graph.nodes.size(); i++) {
+        for (size_t j = 0; j < matching_graph.nodes[i].neighbors.size(); j++)
+            ASSERT_TRUE(matching_graph.implied_weights->of_edge(i, j).empty());
     }
 }
 
@@ -609,4 +681,245 @@ TEST(UserGraph, GetEdgeOrBoundaryEdgeWeight) {
     ASSERT_FALSE(has_non_existent_edge);
     bool has_non_existent_edge_2 = user_graph.get_edge_or_boundary_edge_weight(10, 0, w);
     ASSERT_FALSE(has_non_existent_edge_2);
-}
\ No newline at end of file
+}
+TEST(UserGraph, GetMwpmsForWorkers) {
+    pm::UserGraph graph;
+    graph.add_or_merge_edge(0, 1, {0}, 1.0, -1);
+    graph.add_or_merge_edge(1, 2, {1}, 1.0, -1);
+    graph.add_or_merge_boundary_edge(0, {2}, 1.0, -1);
+
+    auto mwpms = graph.get_mwpms_for_workers(3, false);
+    ASSERT_EQ(mwpms.size(), 3);
+    ASSERT_EQ(mwpms[0], &graph.get_mwpm());
+    ASSERT_NE(mwpms[1], mwpms[0]);
+    ASSERT_NE(mwpms[2], mwpms[1]);
+    for (auto mwpm : mwpms) {
+        ASSERT_EQ(mwpm->flooder.graph.nodes.size(), 3);
+        ASSERT_EQ(mwpm->search_flooder.graph.nodes.size(), 0);
+        pm::ExtendedMatchingResult res(mwpm->flooder.graph.num_observables);
+        pm::decode_detection_events(*mwpm, {0, 2}, res.obs_crossed.data(), res.weight, false);
+        ASSERT_EQ(res.obs_crossed, std::vector<uint8_t>({1, 1, 0}));
+    }
+
+    // Worker decoders are reused, and rebuilt when a search graph is requested or the graph is modified
+    auto mwpms2 = graph.get_mwpms_for_workers(2, false);
+    ASSERT_EQ(mwpms2, std::vector<pm::Mwpm*>({mwpms[0], mwpms[1]}));
+    auto mwpms3 = graph.get_mwpms_for_workers(2, true);
+    for (auto mwpm : mwpms3) {
+        ASSERT_EQ(mwpm->search_flooder.graph.nodes.size(), 3);
+        // The workers only have their own nodes, and share the edges of the graph
+        ASSERT_EQ(mwpm->flooder.graph.node_edges, mwpms3[0]->flooder.graph.node_edges);
+        ASSERT_EQ(mwpm->search_flooder.graph.node_edges, mwpms3[0]->search_flooder.graph.node_edges);
+    }
+    graph.add_or_merge_edge(2, 3, {1}, 1.0, -1);
+    for (auto mwpm : graph.get_mwpms_for_workers(2, false))
+        ASSERT_EQ(mwpm->flooder.graph.nodes.size(), 4);
+}
+
+namespace {
+
+pm::ExtendedMatchingResult decode_with(pm::Mwpm& mwpm, const std::vector<uint64_t>& detection_events) {
+    pm::ExtendedMatchingResult res(mwpm.flooder.graph.num_observables);
+    pm::decode_detection_events(mwpm, detection_events, res.obs_crossed.data(), res.weight, false);
+    return res;
+}
+
+}  // namespace
+
+TEST(UserGraph, EdgeUpdatesArePatchedIntoCompiledGraph) {
+    pm::UserGraph graph;
+    for (size_t i = 0; i < 5; i++)
+        graph.add_or_merge_edge(i, i + 1, {i}, 1.0, -1);
+    graph.add_or_merge_boundary_edge(0, {6}, 2.0, -1);
+    graph.add_or_merge_boundary_edge(5, {7}, 4.5, -1);
+    graph.get_mwpms_for_workers(2, true);
+    auto* nodes = graph.get_mwpm().flooder.graph.nodes.data();
+    auto* search_nodes = graph.get_mwpm().search_flooder.graph.nodes.data();
+
+    // Changes weights and observables, and adds edges and a boundary edge, without changing the normalising constant
+    graph.add_or_merge_edge(2, 1, {1, 3}, 3.0, -1, pm::REPLACE);
+    graph.add_or_merge_edge(0, 3, {5}, 2.0, -1);
+    graph.add_or_merge_boundary_edge(3, {}, 1.5, -1);
+    graph.add_or_merge_boundary_edge(0, {6}, 0.5, -1, pm::SMALLEST_WEIGHT);
+    auto mwpms = graph.get_mwpms_for_workers(2, true);
+    ASSERT_EQ(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    ASSERT_EQ(graph.get_mwpm().search_flooder.graph.nodes.data(), search_nodes);
+
+    auto expected_mwpm = graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, true);
+    for (auto* mwpm : mwpms) {
+        for (size_t i = 0; i < expected_mwpm.flooder.graph.nodes.size(); i++) {
+            auto& expected_node = expected_mwpm.flooder.graph.nodes[i];
+            auto& node = mwpm->flooder.graph.nodes[i];
+            ASSERT_TRUE(std::ranges::equal(node.neighbor_weights, expected_node.neighbor_weights));
+            ASSERT_TRUE(std::ranges::equal(node.neighbor_observables, expected_node.neighbor_observables));
+            auto& expected_search_node = expected_mwpm.search_flooder.graph.nodes[i];
+            auto& search_node = mwpm->search_flooder.graph.nodes[i];
+            ASSERT_TRUE(std::ranges::equal(search_node.neighbor_weights, expected_search_node.neighbor_weights));
+            ASSERT_TRUE(std::ranges::equal(
+                search_node.neighbor_observable_indices, expected_search_node.neighbor_observable_indices));
+        }
+        for (auto dets : std::vector<std::vector<uint64_t>>{{0, 3}, {1, 2}, {2}, {4, 5}})
+            ASSERT_EQ(decode_with(*mwpm, dets), decode_with(expected_mwpm, dets));
+    }
+
+    // Changing the largest weight changes the normalising constant, so the graph is recompiled
+    graph.add_or_merge_edge(4, 5, {4}, 2.5, -1, pm::REPLACE);
+    ASSERT_EQ(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    graph.add_or_merge_edge(4, 5, {4}, 10.5, -1, pm::REPLACE);
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    nodes = graph.get_mwpm().flooder.graph.nodes.data();
+
+    // Negative weights and boundary nodes are not patched
+    graph.add_or_merge_edge(1, 2, {1}, -1.0, -1, pm::REPLACE);
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    nodes = graph.get_mwpm().flooder.graph.nodes.data();
+    graph.set_boundary({5});
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    nodes = graph.get_mwpm().flooder.graph.nodes.data();
+    graph.set_boundary({5});
+    ASSERT_EQ(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    graph.add_or_merge_edge(4, 5, {4}, 1.0, -1, pm::REPLACE);
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+}
+
+TEST(UserGraph, SetErrorProbabilitiesRescalesCompiledGraphInPlace) {
+    stim::CircuitGenParameters gen(5, 5, "rotated_memory_x");
+    gen.after_clifford_depolarization = 0.01;
+    stim::Circuit circuit = stim::generate_surface_code_circuit(gen).circuit;
+    auto dem = stim::ErrorAnalyzer::circuit_to_detector_error_model(circuit, true, true, false, 0, false, false);
+    auto graph = pm::detector_error_model_to_user_graph(dem, true, pm::NUM_DISTINCT_WEIGHTS);
+    auto* nodes = graph.get_mwpm_with_search_graph().flooder.graph.nodes.data();
+    double normalising_constant = graph.get_mwpm().flooder.graph.normalising_constant;
+
+    std::vector<double> error_probabilities;
+    for (size_t i = 0; i < graph.edges.size(); i++)
+        error_probabilities.push_back(0.001 + 0.1 * (double)(i % 7) / 7);
+    graph.set_error_probabilities(error_probabilities);
+    ASSERT_EQ(graph.edges.error_probability, error_probabilities);
+    ASSERT_EQ(graph.edges.weight[3], std::log((1 - error_probabilities[3]) / error_probabilities[3]));
+    auto& mwpm = graph.get_mwpm_with_search_graph();
+    ASSERT_EQ(mwpm.flooder.graph.nodes.data(), nodes);
+    ASSERT_NE(mwpm.flooder.graph.normalising_constant, normalising_constant);
+
+    auto expected = graph.to_mwpm(pm::NUM_DISTINCT_WEIGHTS, true);
+    ASSERT_EQ(mwpm.flooder.graph.normalising_constant, expected.flooder.graph.normalising_constant);
+    for (size_t i = 0; i < expected.flooder.graph.nodes.size(); i++) {
+        ASSERT_TRUE(std::ranges::equal(
+            mwpm.flooder.graph.nodes[i].neighbor_weights, expected.flooder.graph.nodes[i].neighbor_weights));
+        ASSERT_TRUE(std::ranges::equal(
+            mwpm.search_flooder.graph.nodes[i].neighbor_weights,
+            expected.search_flooder.graph.nodes[i].neighbor_weights));
+    }
+    ASSERT_GT(mwpm.flooder.graph.implied_weights->weights.size(), 0);
+    ASSERT_EQ(*mwpm.flooder.graph.implied_weights, *expected.flooder.graph.implied_weights);
+    ASSERT_EQ(*mwpm.search_flooder.graph.implied_weights, *expected.search_flooder.graph.implied_weights);
+    // Both graphs of an Mwpm share (and so are reweighted by) one table of implied weights
+    ASSERT_EQ(expected.flooder.graph.implied_weights, expected.search_flooder.graph.implied_weights);
+    ASSERT_EQ(mwpm.flooder.graph.implied_weights, mwpm.search_flooder.graph.implied_weights);
+
+    ASSERT_THROW(graph.set_edge_weights(std::vector<double>(3, 1.0)), std::invalid_argument);
+    std::vector<double> weights(graph.edges.size(), 2.0);
+    weights[0] = -1;
+    graph.set_edge_weights(weights);
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+    nodes = graph.get_mwpm().flooder.graph.nodes.data();
+    // The negative weight in the compiled graph means the next update can't be applied in place either
+    weights[0] = 1;
+    graph.set_edge_weights(weights);
+    ASSERT_NE(graph.get_mwpm().flooder.graph.nodes.data(), nodes);
+}
+
+TEST(UserGraph, OverrideEdgeWeightIsUndoneByUndoReweights) {
+    pm::UserGraph graph;
+    graph.add_or_merge_edge(0, 1, {0}, 2, -1);
+    graph.add_or_merge_edge(1, 2, {1}, 1, -1);
+    graph.add_or_merge_edge(2, 0, {2}, 2, -1);
+    graph.add_or_merge_edge(2, 3, {3}, 4, -1);
+    graph.add_or_merge_boundary_edge(4, {4}, -1, -1);
+    graph.set_boundary({3});
+    auto& mwpm = graph.get_mwpm_with_search_graph();
+    std::vector<std::vector<pm::weight_int>> weights;
+    for (auto& node : mwpm.flooder.graph.nodes)
+        weights.emplace_back(node.neighbor_weights.begin(), node.neighbor_weights.end());
+    ASSERT_EQ(decode_with(mwpm, {0, 1}).obs_crossed, std::vector<uint8_t>({1, 0, 0, 0, 0}));
+
+    graph.check_edge_weight_override(0, 4);
+    graph.override_edge_weight(mwpm, 0, 4);
+    ASSERT_EQ(mwpm.flooder.graph.nodes[0].neighbor_weights[0], 8);
+    ASSERT_EQ(mwpm.flooder.graph.nodes[1].neighbor_weights[0], 8);
+    ASSERT_EQ(mwpm.search_flooder.graph.nodes[1].neighbor_weights[0], 8);
+    ASSERT_EQ(decode_with(mwpm, {0, 1}).obs_crossed, std::vector<uint8_t>({0, 1, 1, 0, 0}));
+    // The edge to boundary node 3 is compiled as a boundary edge of node 2
+    graph.override_edge_weight(mwpm, 3, 0);
+    ASSERT_EQ(mwpm.flooder.graph.nodes[2].neighbor_weights[0], 0);
+    ASSERT_EQ(mwpm.search_flooder.graph.nodes[2].neighbor_weights[0], 0);
+
+    mwpm.flooder.graph.undo_reweights();
+    mwpm.search_flooder.graph.undo_reweights();
+    for (size_t i = 0; i < weights.size(); i++) {
+        ASSERT_TRUE(std::ranges::equal(mwpm.flooder.graph.nodes[i].neighbor_weights, weights[i]));
+        ASSERT_TRUE(std::ranges::equal(mwpm.search_flooder.graph.nodes[i].neighbor_weights, weights[i]));
+    }
+    ASSERT_EQ(decode_with(mwpm, {0, 1}).obs_crossed, std::vector<uint8_t>({1, 0, 0, 0, 0}));
+
+    ASSERT_THROW(graph.check_edge_weight_override(5, 1), std::invalid_argument);
+    ASSERT_THROW(graph.check_edge_weight_override(0, -1), std::invalid_argument);
+    ASSERT_THROW(graph.check_edge_weight_override(0, NAN), std::invalid_argument);
+    // Weights too large to be represented are clamped to the largest weight that can be
+    graph.check_edge_weight_override(0, pm::MAX_USER_EDGE_WEIGHT + 1);
+    graph.check_edge_weight_override(0, INFINITY);
+    graph.override_edge_weight(mwpm, 0, INFINITY);
+    pm::weight_int max_weight = 2 * pm::MAX_USER_EDGE_WEIGHT;
+    ASSERT_EQ(mwpm.flooder.graph.nodes[0].neighbor_weights[0], max_weight);
+    ASSERT_EQ(mwpm.search_flooder.graph.nodes[1].neighbor_weights[0], max_weight);
+    graph.override_edge_weight(mwpm, 1, 1e300);
+    ASSERT_EQ(mwpm.flooder.graph.nodes[1].neighbor_weights[1], max_weight);
+    mwpm.flooder.graph.undo_reweights();
+    mwpm.search_flooder.graph.undo_reweights();
+    // The negative weight boundary edge of node 4 is not in the compiled graph
+    ASSERT_THROW(graph.check_edge_weight_override(4, 1), std::invalid_argument);
+}
+
+TEST(UserGraph, OverrideEdgeWeightOfWorkerDoesNotChangeSharedWeights) {
+    pm::UserGraph graph;
+    graph.add_or_merge_edge(0, 1, {0}, 2, -1);
+    graph.add_or_merge_edge(1, 2, {1}, 4, -1);
+    auto mwpms = graph.get_mwpms_for_workers(2, true);
+    pm::weight_int weight = mwpms[0]->flooder.graph.nodes[0].neighbor_weights[0];
+
+    // The workers share their edges with the main decoder until a weight is overridden
+    graph.override_edge_weight(*mwpms[1], 0, 4);
+    ASSERT_EQ(mwpms[1]->flooder.graph.nodes[0].neighbor_weights[0], 2 * weight);
+    ASSERT_EQ(mwpms[1]->search_flooder.graph.nodes[0].neighbor_weights[0], 2 * weight);
+    ASSERT_EQ(mwpms[0]->flooder.graph.nodes[0].neighbor_weights[0], weight);
+    ASSERT_EQ(mwpms[0]->search_flooder.graph.nodes[0].neighbor_weights[0], weight);
+    mwpms[1]->flooder.graph.undo_reweights();
+    mwpms[1]->search_flooder.graph.undo_reweights();
+    ASSERT_EQ(mwpms[1]->flooder.graph.nodes[0].neighbor_weights[0], weight);
+}
+
+TEST(UserGraph, DetectorErrorModelErasureEdges) {
+    stim::DetectorErrorModel dem(R"DEM(
+        error[erasure:2](0.1) D0 D1 ^ D2
+        error(0.1) D1 D2
+        error[other](0.1) D0
+        error[erasure:0](0) D1
+        repeat 2 {
+            error[erasure:1](0.1) D0 L0
+            shift_detectors 1
+        }
+    )DEM");
+    auto graph = pm::detector_error_model_to_user_graph(dem, false, pm::NUM_DISTINCT_WEIGHTS);
+    auto erasure_edges = pm::detector_error_model_erasure_edges(dem, graph);
+    std::vector<std::pair<size_t, size_t>> expected = {{2, 0}, {2, 1}, {1, 3}, {1, 4}};
+    ASSERT_EQ(erasure_edges, expected);
+    ASSERT_EQ(graph.edges.node1[4], 1);
+    ASSERT_EQ(graph.edges.node2[4], SIZE_MAX);
+
+    ASSERT_THROW(
+        pm::detector_error_model_erasure_edges(stim::DetectorErrorModel("error[erasure:](0.1) D0"), graph),
+        std::invalid_argument);
+    ASSERT_THROW(
+        pm::detector_error_model_erasure_edges(stim::DetectorErrorModel("error[erasure:1](0.1) D0 D2"), graph),
+        std::invalid_argument);
+}
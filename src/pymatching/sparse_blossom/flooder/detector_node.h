@@ -16,9 +16,9 @@
 #define PYMATCHING_FILL_MATCH_DETECTOR_NODE_H
 
 #include <optional>
+#include <span>
 #include <vector>
 
-#include "pymatching/sparse_blossom/driver/implied_weights.h"
 #include "pymatching/sparse_blossom/flooder/graph_fill_region.h"
 #include "pymatching/sparse_blossom/flooder_matcher_interop/varying.h"
 #include "pymatching/sparse_blossom/tracker/queued_event_tracker.h"
@@ -63,9 +63,12 @@ class DetectorNode {
     QueuedEventTracker node_event_tracker;
 
     /// == Permanent fields used to define the structure of the graph. ==
-    std::vector<DetectorNode*> neighbors;       /// The node's neighbors.
-    std::vector<weight_int> neighbor_weights;   /// Distance crossed by the edge to each neighbor.
-    std::vector<obs_int> neighbor_observables;  /// Observables crossed by the edge to each neighbor.
+    /// The weights and observables are views of the node's edges, which are stored in `MatchingGraph::node_edges` (and
+    /// may be shared with copies of the graph), rather than in the node. The neighbors are the node's own pointers into
+    /// the nodes of its graph, derived from the neighbor indices in `node_edges`.
+    std::vector<DetectorNode*> neighbors;     /// The node's neighbors.
+    std::span<weight_int> neighbor_weights;   /// Distance crossed by the edge to each neighbor.
+    std::span<obs_int> neighbor_observables;  /// Observables crossed by the edge to each neighbor.
 
     /// After it reached this node, how much further did the owning search region grow? Also is it currently growing?
     inline VaryingCT local_radius() const {
@@ -123,8 +126,6 @@ class DetectorNode {
     ///         edge, or somewhere in between.
     std::optional<float> compute_stitch_radius_at_time_bounded_by_region_towards_neighbor(
         cumulative_time_int time, const GraphFillRegion& bounding_region, size_t neighbor_index) const;
-
-    std::vector<std::vector<ImpliedWeight>> neighbor_implied_weights;
 };
 
 }  // namespace pm
@@ -19,12 +19,11 @@
 using namespace pm;
 
 TEST(DetectorNode, IndexOfNeighber) {
-    DetectorNode d1;
-    DetectorNode d2;
-    d1.neighbors.push_back(nullptr);
-    d1.neighbors.push_back(&d2);
-    ASSERT_EQ(d1.index_of_neighbor(nullptr), 0);
-    ASSERT_EQ(d1.index_of_neighbor(&d2), 1);
+    MatchingGraph g(2, 0);
+    g.add_boundary_edge(0, 2, {});
+    g.add_edge(0, 1, 2, {});
+    ASSERT_EQ(g.nodes[0].index_of_neighbor(nullptr), 0);
+    ASSERT_EQ(g.nodes[0].index_of_neighbor(&g.nodes[1]), 1);
 }
 
 TEST(DetectorNode, compute_wrapped_radius_within_layer_at_time) {
@@ -62,8 +61,10 @@ TEST(DetectorNode, compute_stitch_radius_at_time_bounded_by_region_towards_neigh
     GraphFillRegion left;
     GraphFillRegion right;
     GraphFillRegion parent;
-    DetectorNode left_node;
-    DetectorNode right_node;
+    MatchingGraph g(2, 0);
+    g.add_edge(0, 1, 20, {});
+    DetectorNode& left_node = g.nodes[0];
+    DetectorNode& right_node = g.nodes[1];
     left_node.reached_from_source = &left_node;
     right_node.reached_from_source = &right_node;
     left_node.region_that_arrived = &left;
@@ -74,10 +75,6 @@ TEST(DetectorNode, compute_stitch_radius_at_time_bounded_by_region_towards_neigh
     left.radius = VaryingCT::frozen(5);
     right.radius = VaryingCT::frozen(5);
     parent.radius = VaryingCT::growing_value_at_time(0, 5);
-    left_node.neighbors.push_back(&right_node);
-    right_node.neighbors.push_back(&left_node);
-    left_node.neighbor_weights.push_back(20);
-    right_node.neighbor_weights.push_back(20);
     left_node.radius_of_arrival = 0;
     right_node.radius_of_arrival = 0;
 
@@ -101,8 +98,10 @@ TEST(DetectorNode, compute_stitch_radius_at_time_bounded_by_region_towards_neigh
     GraphFillRegion left;
     GraphFillRegion right;
     GraphFillRegion parent;
-    DetectorNode left_node;
-    DetectorNode right_node;
+    MatchingGraph g(2, 0);
+    g.add_edge(0, 1, 20, {});
+    DetectorNode& left_node = g.nodes[0];
+    DetectorNode& right_node = g.nodes[1];
     left_node.reached_from_source = &left_node;
     right_node.reached_from_source = &right_node;
     left_node.region_that_arrived = &left;
@@ -113,10 +112,6 @@ TEST(DetectorNode, compute_stitch_radius_at_time_bounded_by_region_towards_neigh
     left.radius = VaryingCT::frozen(5);
     right.radius = VaryingCT::frozen(8);
     parent.radius = VaryingCT::growing_value_at_time(0, 5);
-    left_node.neighbors.push_back(&right_node);
-    right_node.neighbors.push_back(&left_node);
-    left_node.neighbor_weights.push_back(20);
-    right_node.neighbor_weights.push_back(20);
     left_node.radius_of_arrival = 0;
     right_node.radius_of_arrival = 0;
 
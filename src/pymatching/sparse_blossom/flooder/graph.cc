@@ -28,8 +28,8 @@ void MatchingGraph::add_edge(
     size_t u,
     size_t v,
     signed_weight_int weight,
-    const std::vector<size_t>& observables,
-    const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+    std::span<const size_t> observables,
+    std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
     size_t larger_node = std::max(u, v);
     if (larger_node + 1 > nodes.size()) {
         throw std::invalid_argument(
@@ -58,27 +58,26 @@ void MatchingGraph::add_edge(
             obs_mask ^= (pm::obs_int)1 << obs;
     }
 
-    // all_edges_to_implied_weights_unconverted[u][v] for a node u corresponds to the edge weights conditioned by (u, v)
-    // where v is the v'th neighbour of u in nodes[u].neighbors.
+    add_implied_weights_unconverted(nodes, u, v, implied_weights_for_other_edges, implied_weights_unconverted);
 
-    nodes[u].neighbors.push_back(&(nodes[v]));
-    nodes[u].neighbor_weights.push_back(std::abs(weight));
-    nodes[u].neighbor_observables.push_back(obs_mask);
-    nodes[u].neighbor_implied_weights.push_back({});
-    edges_to_implied_weights_unconverted[u].emplace_back(implied_weights_for_other_edges);
+    unshare_edges();
+    auto& edges = *node_edges;
+    edges.neighbors[u].push_back(v);
+    edges.weights[u].push_back(std::abs(weight));
+    edges.observables[u].push_back(obs_mask);
 
-    nodes[v].neighbors.push_back(&(nodes[u]));
-    nodes[v].neighbor_weights.push_back(std::abs(weight));
-    nodes[v].neighbor_observables.push_back(obs_mask);
-    nodes[v].neighbor_implied_weights.push_back({});
-    edges_to_implied_weights_unconverted[v].emplace_back(implied_weights_for_other_edges);
+    edges.neighbors[v].push_back(u);
+    edges.weights[v].push_back(std::abs(weight));
+    edges.observables[v].push_back(obs_mask);
+    update_edge_views(u);
+    update_edge_views(v);
 }
 
 void MatchingGraph::add_boundary_edge(
     size_t u,
     signed_weight_int weight,
-    const std::vector<size_t>& observables,
-    const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+    std::span<const size_t> observables,
+    std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
     if (u >= nodes.size()) {
         throw std::invalid_argument(
             "Node " + std::to_string(u) +
@@ -103,21 +102,39 @@ void MatchingGraph::add_boundary_edge(
     if (!n.neighbors.empty() && n.neighbors[0] == nullptr) {
         throw std::invalid_argument("Max one boundary edge.");
     }
-    n.neighbors.insert(n.neighbors.begin(), 1, nullptr);
-    n.neighbor_weights.insert(n.neighbor_weights.begin(), 1, std::abs(weight));
-    n.neighbor_observables.insert(n.neighbor_observables.begin(), 1, obs_mask);
-    n.neighbor_implied_weights.insert(n.neighbor_implied_weights.begin(), 1, {});
-    edges_to_implied_weights_unconverted[u].insert(
-        edges_to_implied_weights_unconverted[u].begin(), 1, implied_weights_for_other_edges);
+    unshare_edges();
+    auto& edges = *node_edges;
+    edges.neighbors[u].insert(edges.neighbors[u].begin(), 1, SIZE_MAX);
+    edges.weights[u].insert(edges.weights[u].begin(), 1, std::abs(weight));
+    edges.observables[u].insert(edges.observables[u].begin(), 1, obs_mask);
+    update_edge_views(u);
+    add_implied_weights_unconverted(nodes, u, SIZE_MAX, implied_weights_for_other_edges, implied_weights_unconverted);
 }
 
+namespace {
+
+std::shared_ptr<MatchingGraphEdges> make_empty_edges(size_t num_nodes) {
+    auto edges = std::make_shared<MatchingGraphEdges>();
+    edges->neighbors.resize(num_nodes);
+    edges->weights.resize(num_nodes);
+    edges->observables.resize(num_nodes);
+    return edges;
+}
+
+}  // namespace
+
 MatchingGraph::MatchingGraph(size_t num_nodes, size_t num_observables)
-    : negative_weight_sum(0), num_nodes(num_nodes), num_observables(num_observables), normalising_constant(0) {
+    : node_edges(make_empty_edges(num_nodes)),
+      negative_weight_sum(0),
+      num_nodes(num_nodes),
+      num_observables(num_observables),
+      normalising_constant(0) {
     nodes.resize(num_nodes);
 }
 
 MatchingGraph::MatchingGraph(size_t num_nodes, size_t num_observables, double normalising_constant)
-    : negative_weight_sum(0),
+    : node_edges(make_empty_edges(num_nodes)),
+      negative_weight_sum(0),
       num_nodes(num_nodes),
       num_observables(num_observables),
       normalising_constant(normalising_constant) {
@@ -126,6 +143,8 @@ MatchingGraph::MatchingGraph(size_t num_nodes, size_t num_observables, double no
 
 MatchingGraph::MatchingGraph(MatchingGraph&& graph) noexcept
     : nodes(std::move(graph.nodes)),
+      node_edges(std::move(graph.node_edges)),
+      own_weights(std::move(graph.own_weights)),
       negative_weight_detection_events_set(std::move(graph.negative_weight_detection_events_set)),
       negative_weight_observables_set(std::move(graph.negative_weight_observables_set)),
       negative_weight_sum(graph.negative_weight_sum),
@@ -133,15 +152,78 @@ MatchingGraph::MatchingGraph(MatchingGraph&& graph) noexcept
       num_nodes(graph.num_nodes),
       num_observables(graph.num_observables),
       normalising_constant(graph.normalising_constant),
-      previous_weights(graph.previous_weights),
-      edges_to_implied_weights_unconverted(graph.edges_to_implied_weights_unconverted),
+      previous_weights(std::move(graph.previous_weights)),
+      implied_weights_unconverted(std::move(graph.implied_weights_unconverted)),
+      implied_weights(std::move(graph.implied_weights)),
       loaded_from_dem_without_correlations(graph.loaded_from_dem_without_correlations) {
 }
 
-MatchingGraph::MatchingGraph() : negative_weight_sum(0), num_nodes(0), num_observables(0), normalising_constant(0) {
+MatchingGraph MatchingGraph::clone() const {
+    MatchingGraph copy;
+    copy.nodes.resize(nodes.size());
+    copy.node_edges = node_edges;
+    copy.num_nodes = num_nodes;
+    copy.num_observables = num_observables;
+    copy.normalising_constant = normalising_constant;
+    copy.negative_weight_detection_events_set = negative_weight_detection_events_set;
+    copy.negative_weight_observables_set = negative_weight_observables_set;
+    copy.negative_weight_sum = negative_weight_sum;
+    copy.is_user_graph_boundary_node = is_user_graph_boundary_node;
+    copy.loaded_from_dem_without_correlations = loaded_from_dem_without_correlations;
+    copy.implied_weights = implied_weights;
+    copy.update_edge_views();
+    return copy;
+}
+
+void MatchingGraph::update_edge_views(size_t node) {
+    auto& edges = *node_edges;
+    auto& n = nodes[node];
+    auto& neighbors = edges.neighbors[node];
+    n.neighbors.resize(neighbors.size());
+    for (size_t i = 0; i < neighbors.size(); i++)
+        n.neighbors[i] = neighbors[i] == SIZE_MAX ? nullptr : &nodes[neighbors[i]];
+    n.neighbor_weights = edges.weights[node];
+    n.neighbor_observables = edges.observables[node];
+}
+
+void MatchingGraph::update_edge_views() {
+    size_t num_own_weights = 0;
+    for (size_t i = 0; i < nodes.size(); i++) {
+        update_edge_views(i);
+        if (!own_weights.empty()) {
+            nodes[i].neighbor_weights = {own_weights.data() + num_own_weights, nodes[i].neighbor_weights.size()};
+            num_own_weights += nodes[i].neighbor_weights.size();
+        }
+    }
+}
+
+void MatchingGraph::unshare_edges() {
+    bool is_shared = node_edges.use_count() > 1;
+    if (!is_shared && own_weights.empty())
+        return;
+    if (is_shared)
+        node_edges = std::make_shared<MatchingGraphEdges>(*node_edges);
+    own_weights = {};
+    update_edge_views();
 }
 
-void MatchingGraph::update_negative_weight_observables(const std::vector<size_t>& observables) {
+void MatchingGraph::unshare_edge_weights() {
+    if (!own_weights.empty() || node_edges.use_count() <= 1)
+        return;
+    for (auto& weights : node_edges->weights)
+        own_weights.insert(own_weights.end(), weights.begin(), weights.end());
+    update_edge_views();
+}
+
+MatchingGraph::MatchingGraph()
+    : node_edges(make_empty_edges(0)),
+      negative_weight_sum(0),
+      num_nodes(0),
+      num_observables(0),
+      normalising_constant(0) {
+}
+
+void MatchingGraph::update_negative_weight_observables(std::span<const size_t> observables) {
     for (auto& obs : observables) {
         auto it = negative_weight_observables_set.find(obs);
         if (it == negative_weight_observables_set.end()) {
@@ -161,46 +243,19 @@ void MatchingGraph::update_negative_weight_detection_events(size_t node_id) {
     }
 }
 
-namespace {
-
-ImpliedWeight convert_rule(
-    std::vector<DetectorNode>& nodes, const ImpliedWeightUnconverted& rule, const double normalising_constant) {
-    const size_t& i = rule.node1;
-    const size_t& j = rule.node2;
-    weight_int* weight_pointer_i =
-        &nodes[i].neighbor_weights[nodes[i].index_of_neighbor(j == SIZE_MAX ? nullptr : &nodes[j])];
-    weight_int* weight_pointer_j =
-        j == SIZE_MAX ? nullptr : &nodes[j].neighbor_weights[nodes[j].index_of_neighbor(&nodes[i])];
-
-    double rescaled_normalising_constant = normalising_constant / 2;
-    pm::signed_weight_int w = (pm::signed_weight_int)round(rule.implied_weight * rescaled_normalising_constant);
-    // Extremely important!
-    // If all edge weights are even integers, then all collision events occur at integer times.
-    w *= 2;
-
-    return ImpliedWeight{weight_pointer_i, weight_pointer_j, static_cast<pm::weight_int>(std::abs(w))};
-}
-
-}  // namespace
-
 void MatchingGraph::convert_implied_weights(double normalising_constant) {
-    for (size_t u = 0; u < nodes.size(); u++) {
-        const std::vector<std::vector<ImpliedWeightUnconverted>>& rules_for_node =
-            edges_to_implied_weights_unconverted[u];
-        for (size_t v = 0; v < nodes[u].neighbors.size(); v++) {
-            for (const auto& rule : rules_for_node[v]) {
-                ImpliedWeight converted = convert_rule(nodes, rule, normalising_constant);
-                nodes[u].neighbor_implied_weights[v].push_back(converted);
-            }
-        }
-    }
+    implied_weights = std::make_shared<ImpliedWeights>(
+        build_implied_weights(nodes, implied_weights_unconverted, normalising_constant));
+    implied_weights_unconverted = {};
 }
 
 // Reweight assuming an error has occurred on a single edge u, v. When v == -1, assumes an edge from
 // u to the boundary.
 void MatchingGraph::reweight_for_edge(const int64_t& u, const int64_t& v) {
+    if (implied_weights == nullptr)
+        return;
     size_t z = nodes[u].index_of_neighbor(v == -1 ? nullptr : &nodes[v]);
-    reweight(nodes[u].neighbor_implied_weights[z]);
+    reweight(implied_weights->of_edge(u, z));
 }
 
 void MatchingGraph::reweight_for_edges(const std::vector<int64_t>& edges) {
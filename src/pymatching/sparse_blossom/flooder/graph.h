@@ -16,7 +16,9 @@
 #define PYMATCHING2_GRAPH_H
 
 #include <map>
+#include <memory>
 #include <set>
+#include <span>
 #include <unordered_map>
 #include <vector>
 
@@ -35,11 +37,28 @@ struct PreviousWeight {
     }
 };
 
+/// The edges of each node of a MatchingGraph. The nodes only hold views of their edge weights and observables, so that
+/// the edges can be shared by a graph and its clones (which each have their own nodes) rather than copied. Each node
+/// does hold its own pointers to its neighbors (so that the flooder doesn't need to convert neighbor indices into
+/// pointers), which are derived from the neighbor indices here. The edges of each node are stored in their own
+/// arrays, so that edges can be added to the graph one at a time.
+struct MatchingGraphEdges {
+    std::vector<std::vector<size_t>> neighbors;  /// The index of each neighbor, or SIZE_MAX for the boundary.
+    std::vector<std::vector<weight_int>> weights;
+    std::vector<std::vector<obs_int>> observables;
+};
+
 /// A collection of detector nodes. It's expected that all detector nodes in the graph
 /// will only refer to other detector nodes within the same graph.
 class MatchingGraph {
    public:
     std::vector<DetectorNode> nodes;
+    /// The edges that `nodes` are views of. They are shared with the clones of the graph, so are only modified while
+    /// they are shared once the graph has its own copy of them (see `unshare_edges` and `unshare_edge_weights`).
+    std::shared_ptr<MatchingGraphEdges> node_edges;
+    /// The graph's own copy of the weights in `node_edges` (in node order), which the nodes are views of instead, if
+    /// the weights have been modified while `node_edges` was shared. Empty otherwise.
+    std::vector<weight_int> own_weights;
     /// These are the detection events that would occur if an error occurred on every edge with a negative weight
     std::set<size_t> negative_weight_detection_events_set;
     /// These are the observables that would be flipped if an error occurred on every edge with a negative weight
@@ -57,7 +76,12 @@ class MatchingGraph {
     /// 16-bit ints.
     double normalising_constant;
     std::vector<PreviousWeight> previous_weights;
-    std::map<size_t, std::vector<std::vector<pm::ImpliedWeightUnconverted>>> edges_to_implied_weights_unconverted;
+    /// The implied weights of the edges added to the graph, which are converted into `implied_weights` by
+    /// `convert_implied_weights` once every edge has been added.
+    std::vector<DirectedImpliedWeightUnconverted> implied_weights_unconverted;
+    /// The weights that the edges of the graph are lowered to by `reweight_for_edge`. This table is shared with any
+    /// SearchGraph compiled from the same UserGraph, and with copies of the graph.
+    std::shared_ptr<ImpliedWeights> implied_weights;
     // Tracks whether the MatchingGraph was loaded from a DEM without enable_correlations. This is used to
     // alert a user if they try to decode with enable_correlations=true, but forgot to load from the
     // dem with enable_correlations=true.
@@ -67,23 +91,39 @@ class MatchingGraph {
     MatchingGraph(size_t num_nodes, size_t num_observables);
     MatchingGraph(size_t num_nodes, size_t num_observables, double normalising_constant);
     MatchingGraph(MatchingGraph&& graph) noexcept;
+    /// Returns a copy of the graph with its own nodes, which shares the edges (and implied weights) of the graph rather
+    /// than copying them. Only the pointers of each node to its neighbors are created, so it takes time proportional
+    /// to the number of nodes and edges, with one allocation per node. Ephemeral matching state is not copied,
+    /// nor are the unconverted implied weights, which are only needed while the graph is being constructed. Any
+    /// reweighting of the graph must be undone before it is cloned.
+    MatchingGraph clone() const;
+    /// Points the views of the edges of `nodes[node]` at `node_edges`, and sets its pointers to its neighbors.
+    void update_edge_views(size_t node);
+    /// Points the views of the edges of every node at `node_edges` (or at `own_weights`, if it is not empty).
+    void update_edge_views();
+    /// Gives the graph its own copy of `node_edges`, if they are shared with a clone, so that edges can be added or
+    /// changed without affecting the clone. Also discards `own_weights`. There must be no reweights to undo.
+    void unshare_edges();
+    /// Gives the graph its own copy of its edge weights, if `node_edges` is shared with a clone, so that they can be
+    /// modified while decoding (and then restored) without affecting the clone.
+    void unshare_edge_weights();
     void add_edge(
         size_t u,
         size_t v,
         signed_weight_int weight,
-        const std::vector<size_t>& observables,
-        const std::vector<pm::ImpliedWeightUnconverted>& implied_weights_for_other_edges = {});
+        std::span<const size_t> observables,
+        std::span<const pm::ImpliedWeightUnconverted> implied_weights_for_other_edges = {});
     void add_boundary_edge(
         size_t u,
         signed_weight_int weight,
-        const std::vector<size_t>& observables,
-        const std::vector<pm::ImpliedWeightUnconverted>& implied_weights_for_other_edges = {});
-    void update_negative_weight_observables(const std::vector<size_t>& observables);
+        std::span<const size_t> observables,
+        std::span<const pm::ImpliedWeightUnconverted> implied_weights_for_other_edges = {});
+    void update_negative_weight_observables(std::span<const size_t> observables);
     void update_negative_weight_detection_events(size_t node_id);
     void convert_implied_weights(double normalising_constant);
 
     void undo_reweights();
-    void reweight(std::vector<ImpliedWeight>& implied_weights);
+    void reweight(std::span<const ImpliedWeightIndices> implied_weights);
     void reweight_for_edge(const int64_t& u, const int64_t& v);
     void reweight_for_edges(const std::vector<int64_t>& edges);
 };
@@ -92,25 +132,33 @@ void apply_reweights(
     std::vector<std::tuple<pm::weight_int*, pm::weight_int*, pm::weight_int>>& implied_weights,
     std::vector<PreviousWeight>& previous_weights);
 
+/// Lowers each edge weight of `nodes` that an implied weight in `implied_weights` applies to, if the implied weight
+/// is lower than the current weight, recording the previous weights in `previous_weights`.
+template <typename Node>
 inline void apply_reweights(
-    std::vector<ImpliedWeight>& implied_weights, std::vector<PreviousWeight>& previous_weights) {
-    for (auto& [edge0_ptr, edge1_ptr, new_weight] : implied_weights) {
+    std::span<const ImpliedWeightIndices> implied_weights,
+    std::vector<Node>& nodes,
+    std::vector<PreviousWeight>& previous_weights) {
+    for (auto& w : implied_weights) {
+        weight_int* edge0_ptr = &nodes[w.node0].neighbor_weights[w.neighbor0];
         // Only reweight if the new weight is lower than the current weight
-        if (new_weight < *edge0_ptr) {
+        if (w.implied_weight < *edge0_ptr) {
             previous_weights.emplace_back(edge0_ptr, *edge0_ptr);
-            *edge0_ptr = new_weight;
-            if (edge1_ptr != nullptr) {
-                // We already know new_weight < *edge1_ptr, since *edge0_ptr ==
-                // *edge1_ptr
+            *edge0_ptr = w.implied_weight;
+            if (w.node1 != SIZE_MAX) {
+                // We already know implied_weight < the weight of edge 1, since both directions of an edge have the
+                // same weight
+                weight_int* edge1_ptr = &nodes[w.node1].neighbor_weights[w.neighbor1];
                 previous_weights.emplace_back(edge1_ptr, *edge1_ptr);
-                *edge1_ptr = new_weight;
+                *edge1_ptr = w.implied_weight;
             }
         }
     }
 }
 
-inline void MatchingGraph::reweight(std::vector<ImpliedWeight>& implied_weights) {
-    apply_reweights(implied_weights, previous_weights);
+inline void MatchingGraph::reweight(std::span<const ImpliedWeightIndices> implied_weights) {
+    unshare_edge_weights();
+    apply_reweights(implied_weights, nodes, previous_weights);
 }
 
 }  // namespace pm
@@ -20,9 +20,9 @@
 
 TEST(Graph, AddEdge) {
     pm::MatchingGraph g(4, 64);
-    g.add_edge(0, 1, -2, {0}, {});
-    g.add_edge(1, 2, -3, {0, 2}, {});
-    g.add_edge(0, 3, 10, {1, 3}, {});
+    g.add_edge(0, 1, -2, std::vector<size_t>{0}, {});
+    g.add_edge(1, 2, -3, std::vector<size_t>{0, 2}, {});
+    g.add_edge(0, 3, 10, std::vector<size_t>{1, 3}, {});
     ASSERT_EQ(g.nodes[0].neighbors[0], &g.nodes[1]);
     ASSERT_EQ(g.nodes[1].neighbors[0], &g.nodes[0]);
     ASSERT_EQ(g.nodes[3].neighbors[0], &g.nodes[0]);
@@ -39,9 +39,9 @@ TEST(Graph, AddEdge) {
 
 TEST(Graph, AddBoundaryEdge) {
     pm::MatchingGraph g(6, 64);
-    g.add_edge(0, 1, 2, {0, 1}, {});
-    g.add_boundary_edge(0, -7, {2}, {});
-    g.add_boundary_edge(5, 10, {0, 1, 3}, {});
+    g.add_edge(0, 1, 2, std::vector<size_t>{0, 1}, {});
+    g.add_boundary_edge(0, -7, std::vector<size_t>{2}, {});
+    g.add_boundary_edge(5, 10, std::vector<size_t>{0, 1, 3}, {});
     ASSERT_EQ(g.nodes[0].neighbors[0], nullptr);
     ASSERT_EQ(g.nodes[0].neighbor_weights[0], 7);
     ASSERT_EQ(g.nodes[0].neighbors[1], &g.nodes[1]);
@@ -57,22 +57,17 @@ TEST(Graph, AddEdgeWithImpliedWeights) {
     std::vector<pm::ImpliedWeightUnconverted> implied_weights = {{2, 3, 5}};
     g.add_edge(0, 1, 10, {}, implied_weights);
 
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted.size(), 2);
-    ASSERT_TRUE(g.edges_to_implied_weights_unconverted.count(0));
-    ASSERT_TRUE(g.edges_to_implied_weights_unconverted.count(1));
-    ASSERT_FALSE(g.edges_to_implied_weights_unconverted.count(2));
-
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].node1, 2);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].node2, 3);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].implied_weight, 5);
-
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[1].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[1][0].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[1][0][0].node1, 2);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[1][0][0].node2, 3);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[1][0][0].implied_weight, 5);
+    // One implied weight for each direction of the edge, both the first non-boundary edge of their node
+    ASSERT_EQ(g.implied_weights_unconverted.size(), 2);
+    ASSERT_EQ(g.implied_weights_unconverted[0].node, 0);
+    ASSERT_EQ(g.implied_weights_unconverted[0].position, 0);
+    ASSERT_EQ(g.implied_weights_unconverted[1].node, 1);
+    ASSERT_EQ(g.implied_weights_unconverted[1].position, 0);
+    for (auto& w : g.implied_weights_unconverted) {
+        ASSERT_EQ(w.implied_weight.node1, 2);
+        ASSERT_EQ(w.implied_weight.node2, 3);
+        ASSERT_EQ(w.implied_weight.implied_weight, 5);
+    }
 }
 
 TEST(Graph, AddBoundaryEdgeWithImpliedWeights) {
@@ -80,12 +75,32 @@ TEST(Graph, AddBoundaryEdgeWithImpliedWeights) {
     std::vector<pm::ImpliedWeightUnconverted> implied_weights = {{1, 2, 7}};
     g.add_boundary_edge(0, 10, {}, implied_weights);
 
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted.size(), 1);
-    ASSERT_TRUE(g.edges_to_implied_weights_unconverted.count(0));
+    ASSERT_EQ(g.implied_weights_unconverted.size(), 1);
+    ASSERT_EQ(g.implied_weights_unconverted[0].node, 0);
+    ASSERT_EQ(g.implied_weights_unconverted[0].position, SIZE_MAX);
+    ASSERT_EQ(g.implied_weights_unconverted[0].implied_weight.node1, 1);
+    ASSERT_EQ(g.implied_weights_unconverted[0].implied_weight.node2, 2);
+    ASSERT_EQ(g.implied_weights_unconverted[0].implied_weight.implied_weight, 7);
+}
+
+TEST(Graph, ConvertImpliedWeightsAfterBoundaryEdge) {
+    // The boundary edge is added last but becomes the first neighbor of node 1
+    pm::MatchingGraph g(3, 64);
+    g.add_edge(0, 1, 10, {}, std::vector<pm::ImpliedWeightUnconverted>{{1, 2, 3}});
+    g.add_edge(1, 2, 10, {}, std::vector<pm::ImpliedWeightUnconverted>{{0, 1, 1}});
+    g.add_boundary_edge(1, 10, {}, std::vector<pm::ImpliedWeightUnconverted>{{0, 1, 2}});
+    g.convert_implied_weights(2.0);
 
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0].size(), 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].node1, 1);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].node2, 2);
-    ASSERT_EQ(g.edges_to_implied_weights_unconverted[0][0][0].implied_weight, 7);
+    ASSERT_TRUE(g.implied_weights_unconverted.empty());
+    ASSERT_EQ(g.nodes[1].neighbors[0], nullptr);
+    auto& table = *g.implied_weights;
+    ASSERT_EQ(table.of_edge(1, 0).size(), 1);
+    ASSERT_EQ(table.of_edge(1, 0)[0], (pm::ImpliedWeightIndices{0, 0, 1, 1, 4}));
+    ASSERT_EQ(table.of_edge(1, 1).size(), 1);
+    ASSERT_EQ(table.of_edge(1, 1)[0], (pm::ImpliedWeightIndices{1, 2, 2, 0, 6}));
+    ASSERT_EQ(table.of_edge(1, 2).size(), 1);
+    ASSERT_EQ(table.of_edge(1, 2)[0], (pm::ImpliedWeightIndices{0, 0, 1, 1, 2}));
+    ASSERT_EQ(table.of_edge(0, 0)[0], table.of_edge(1, 1)[0]);
+    ASSERT_EQ(table.of_edge(2, 0)[0], table.of_edge(1, 2)[0]);
+    ASSERT_TRUE(table.of_edge(2, 1).empty());
 }
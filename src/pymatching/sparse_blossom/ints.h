@@ -19,12 +19,29 @@
 #include <cstdint>
 
 #include "pymatching/sparse_blossom/tracker/cyclic.h"
+#include "pymatching/sparse_blossom/wide_obs_int.h"
+
+/// The number of bits in an observable mask (`pm::obs_int`). Graphs with at most this many observables are decoded by
+/// tracking observable masks in the flooder, whereas graphs with more observables fall back to extracting the path of
+/// each matched edge using the search graph, which is much slower. It can be set to a larger multiple of 64 (e.g. by
+/// configuring CMake with `-DPYMATCHING_OBS_INT_BITS=256`) to use wider masks, at the cost of some speed and memory
+/// when decoding graphs with few observables.
+#ifndef PYMATCHING_OBS_INT_BITS
+#define PYMATCHING_OBS_INT_BITS 64
+#endif
+static_assert(
+    PYMATCHING_OBS_INT_BITS >= 64 && PYMATCHING_OBS_INT_BITS % 64 == 0,
+    "PYMATCHING_OBS_INT_BITS must be a positive multiple of 64.");
 
 namespace pm {
 
 /// This type is used to store observable masks. An observable mask is a bit packed value where the
 /// bit 1<<K is set IFF the observable with index K is flipped.
+#if PYMATCHING_OBS_INT_BITS == 64
 typedef uint64_t obs_int;
+#else
+typedef WideObsInt<PYMATCHING_OBS_INT_BITS / 64> obs_int;
+#endif
 
 /// This type is used to store the weight of an edge.
 typedef uint32_t weight_int;
@@ -71,14 +71,14 @@ MwpmEvent rhr(std::vector<DetectorNode>& ns, size_t i, size_t j, obs_int obs_mas
 TEST(Mwpm, BlossomCreatedThenShattered) {
     auto mwpm = Mwpm(GraphFlooder(MatchingGraph(10, 64)));
     auto& g = mwpm.flooder.graph;
-    g.add_edge(0, 1, 10, {0}, {});
-    g.add_edge(1, 4, 20, {1}, {});
-    g.add_edge(4, 3, 20, {0, 1}, {});
-    g.add_edge(3, 2, 12, {2}, {});
-    g.add_edge(0, 2, 16, {0, 2}, {});
-    g.add_edge(4, 5, 50, {1, 2}, {});
-    g.add_edge(2, 6, 100, {0, 1, 2}, {});
-    g.add_boundary_edge(5, 36, {3}, {});
+    g.add_edge(0, 1, 10, std::vector<size_t>{0}, {});
+    g.add_edge(1, 4, 20, std::vector<size_t>{1}, {});
+    g.add_edge(4, 3, 20, std::vector<size_t>{0, 1}, {});
+    g.add_edge(3, 2, 12, std::vector<size_t>{2}, {});
+    g.add_edge(0, 2, 16, std::vector<size_t>{0, 2}, {});
+    g.add_edge(4, 5, 50, std::vector<size_t>{1, 2}, {});
+    g.add_edge(2, 6, 100, std::vector<size_t>{0, 1, 2}, {});
+    g.add_boundary_edge(5, 36, std::vector<size_t>{3}, {});
     for (size_t i = 0; i < 7; i++) {
         mwpm.create_detection_event(&mwpm.flooder.graph.nodes[i]);
     }
@@ -458,12 +458,12 @@ TEST(Mwpm, MatchingResult) {
 TEST(Mwpm, TwoRegionsGrowingThenMatching) {
     Mwpm mwpm(GraphFlooder(MatchingGraph(10, 64)));
     auto& g = mwpm.flooder.graph;
-    g.add_boundary_edge(0, 4, {0, 1}, {});
-    g.add_edge(0, 1, 100, {0, 2}, {});
-    g.add_edge(1, 2, 22, {0, 2}, {});
-    g.add_edge(2, 3, 30, {0}, {});
-    g.add_edge(3, 4, 10, {0, 3}, {});
-    g.add_boundary_edge(4, 1000, {1}, {});
+    g.add_boundary_edge(0, 4, std::vector<size_t>{0, 1}, {});
+    g.add_edge(0, 1, 100, std::vector<size_t>{0, 2}, {});
+    g.add_edge(1, 2, 22, std::vector<size_t>{0, 2}, {});
+    g.add_edge(2, 3, 30, std::vector<size_t>{0}, {});
+    g.add_edge(3, 4, 10, std::vector<size_t>{0, 3}, {});
+    g.add_boundary_edge(4, 1000, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[1]);
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[3]);
     auto e1 = mwpm.flooder.run_until_next_mwpm_notification();
@@ -487,14 +487,14 @@ TEST(Mwpm, TwoRegionsGrowingThenMatching) {
 TEST(Mwpm, RegionHittingMatchThenMatchedToOtherRegion) {
     Mwpm mwpm(GraphFlooder(MatchingGraph(10, 64)));
     auto& g = mwpm.flooder.graph;
-    g.add_boundary_edge(0, 1000, {0, 1}, {});
-    g.add_edge(0, 1, 8, {0, 2}, {});
-    g.add_edge(1, 2, 10, {0, 2}, {});
-    g.add_edge(2, 3, 2, {0}, {});
-    g.add_edge(3, 4, 4, {0, 3}, {});
-    g.add_edge(4, 5, 20, {1}, {});
-    g.add_edge(5, 6, 36, {0, 1}, {});
-    g.add_boundary_edge(6, 1000, {1}, {});
+    g.add_boundary_edge(0, 1000, std::vector<size_t>{0, 1}, {});
+    g.add_edge(0, 1, 8, std::vector<size_t>{0, 2}, {});
+    g.add_edge(1, 2, 10, std::vector<size_t>{0, 2}, {});
+    g.add_edge(2, 3, 2, std::vector<size_t>{0}, {});
+    g.add_edge(3, 4, 4, std::vector<size_t>{0, 3}, {});
+    g.add_edge(4, 5, 20, std::vector<size_t>{1}, {});
+    g.add_edge(5, 6, 36, std::vector<size_t>{0, 1}, {});
+    g.add_boundary_edge(6, 1000, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[1]);
     auto r1 = mwpm.flooder.graph.nodes[1].region_that_arrived;
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[4]);
@@ -543,10 +543,10 @@ TEST(Mwpm, RegionHittingMatchFormingBlossomThenMatchingToBoundary) {
     size_t num_nodes = 100;
     Mwpm mwpm{GraphFlooder(MatchingGraph(num_nodes, 64))};
     auto& g = mwpm.flooder.graph;
-    g.add_boundary_edge(0, 2, {0}, {});
+    g.add_boundary_edge(0, 2, std::vector<size_t>{0}, {});
     for (size_t i = 0; i < num_nodes - 1; i++)
         g.add_edge(i, i + 1, 2, obs_mask_to_set_bits(i), {});
-    g.add_boundary_edge(num_nodes - 1, 2, {1}, {});
+    g.add_boundary_edge(num_nodes - 1, 2, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[40]);
     auto r40 = mwpm.flooder.graph.nodes[40].region_that_arrived;
     mwpm.create_detection_event(&mwpm.flooder.graph.nodes[42]);
@@ -601,12 +601,12 @@ TEST(GraphFlooder, RegionGrowingToBoundary) {
     Mwpm mwpm{GraphFlooder(MatchingGraph(10, 64))};
     auto& flooder = mwpm.flooder;
     auto& g = flooder.graph;
-    g.add_boundary_edge(0, 2, {0, 1}, {});
-    g.add_edge(0, 1, 10, {0, 2}, {});
+    g.add_boundary_edge(0, 2, std::vector<size_t>{0, 1}, {});
+    g.add_edge(0, 1, 10, std::vector<size_t>{0, 2}, {});
     g.add_edge(1, 2, 21, {}, {});
-    g.add_edge(2, 3, 100, {0}, {});
-    g.add_edge(3, 4, 7, {0, 3}, {});
-    g.add_boundary_edge(4, 5, {1}, {});
+    g.add_edge(2, 3, 100, std::vector<size_t>{0}, {});
+    g.add_edge(3, 4, 7, std::vector<size_t>{0, 3}, {});
+    g.add_boundary_edge(4, 5, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&flooder.graph.nodes[2]);
     ASSERT_EQ(
         flooder.run_until_next_mwpm_notification(),
@@ -635,12 +635,12 @@ TEST(GraphFlooder, RegionHitRegion) {
     Mwpm mwpm{GraphFlooder(MatchingGraph(10, 64))};
     auto& flooder = mwpm.flooder;
     auto& g = flooder.graph;
-    g.add_boundary_edge(0, 2000, {0, 1}, {});
-    g.add_edge(0, 1, 10, {0, 2}, {});
+    g.add_boundary_edge(0, 2000, std::vector<size_t>{0, 1}, {});
+    g.add_edge(0, 1, 10, std::vector<size_t>{0, 2}, {});
     g.add_edge(1, 2, 24, {}, {});
-    g.add_edge(2, 3, 38, {0}, {});
-    g.add_edge(3, 4, 26, {0, 3}, {});
-    g.add_boundary_edge(4, 1000, {1}, {});
+    g.add_edge(2, 3, 38, std::vector<size_t>{0}, {});
+    g.add_edge(3, 4, 26, std::vector<size_t>{0, 3}, {});
+    g.add_boundary_edge(4, 1000, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&flooder.graph.nodes[2]);
     mwpm.create_detection_event(&flooder.graph.nodes[4]);
     auto e1 = flooder.run_until_next_mwpm_notification();
@@ -656,12 +656,12 @@ TEST(GraphFlooder, RegionGrowingThenFrozenThenStartShrinking) {
     Mwpm mwpm{GraphFlooder(MatchingGraph(10, 64))};
     auto& flooder = mwpm.flooder;
     auto& g = flooder.graph;
-    g.add_boundary_edge(0, 4, {0, 1}, {});
-    g.add_edge(0, 1, 10, {0, 2}, {});
+    g.add_boundary_edge(0, 4, std::vector<size_t>{0, 1}, {});
+    g.add_edge(0, 1, 10, std::vector<size_t>{0, 2}, {});
     g.add_edge(1, 2, 22, {}, {});
-    g.add_edge(2, 3, 30, {0}, {});
-    g.add_edge(3, 4, 50, {0, 3}, {});
-    g.add_boundary_edge(4, 100, {1}, {});
+    g.add_edge(2, 3, 30, std::vector<size_t>{0}, {});
+    g.add_edge(3, 4, 50, std::vector<size_t>{0, 3}, {});
+    g.add_boundary_edge(4, 100, std::vector<size_t>{1}, {});
     mwpm.create_detection_event(&flooder.graph.nodes[2]);
     auto e1 = flooder.run_until_next_mwpm_notification();
     ASSERT_EQ(
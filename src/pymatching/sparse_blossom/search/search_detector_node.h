@@ -15,7 +15,9 @@
 #ifndef PYMATCHING2_SEARCH_DETECTOR_NODE_H
 #define PYMATCHING2_SEARCH_DETECTOR_NODE_H
 
-#include "pymatching/sparse_blossom/driver/implied_weights.h"
+#include <span>
+#include <vector>
+
 #include "pymatching/sparse_blossom/tracker/queued_event_tracker.h"
 
 namespace pm {
@@ -42,13 +44,14 @@ class SearchDetectorNode {
     QueuedEventTracker node_event_tracker;
 
     /// == Permanent fields used to define the structure of the graph. ==
+    /// The weights, observables and markers are views of the node's edges, which are stored in
+    /// `SearchGraph::node_edges` (and may be shared with copies of the graph), rather than in the node. The neighbors
+    /// are the node's own pointers into the nodes of its graph, derived from the neighbor indices in `node_edges`.
     std::vector<SearchDetectorNode *> neighbors;  /// The node's neighbors.
-    std::vector<weight_int> neighbor_weights;     /// Distance crossed by the edge to each neighbor.
-    std::vector<std::vector<size_t>>
-        neighbor_observable_indices;        /// Indices of observables crossed by the edge to each neighbor.
-    std::vector<uint8_t> neighbor_markers;  /// Used to mark edges as "seen" when decoding to an edge list.
-
-    std::vector<std::vector<ImpliedWeight>> neighbor_implied_weights;
+    std::span<weight_int> neighbor_weights;      /// Distance crossed by the edge to each neighbor.
+    std::span<std::vector<size_t>>
+        neighbor_observable_indices;      /// Indices of observables crossed by the edge to each neighbor.
+    std::span<uint8_t> neighbor_markers;  /// Used to mark edges as "seen" when decoding to an edge list.
 
     size_t index_of_neighbor(SearchDetectorNode *target) const;
 
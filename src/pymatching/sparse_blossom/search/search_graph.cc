@@ -17,25 +17,106 @@
 #include <cassert>
 #include <cmath>
 
-pm::SearchGraph::SearchGraph() : num_nodes(0) {
+namespace {
+
+std::shared_ptr<pm::SearchGraphEdges> make_empty_edges(size_t num_nodes) {
+    auto edges = std::make_shared<pm::SearchGraphEdges>();
+    edges->neighbors.resize(num_nodes);
+    edges->weights.resize(num_nodes);
+    edges->observable_indices.resize(num_nodes);
+    edges->markers.resize(num_nodes);
+    return edges;
+}
+
+}  // namespace
+
+pm::SearchGraph::SearchGraph() : node_edges(make_empty_edges(0)), num_nodes(0) {
 }
 
-pm::SearchGraph::SearchGraph(size_t num_nodes) : num_nodes(num_nodes) {
+pm::SearchGraph::SearchGraph(size_t num_nodes) : node_edges(make_empty_edges(num_nodes)), num_nodes(num_nodes) {
     nodes.resize(num_nodes);
 }
 
 pm::SearchGraph::SearchGraph(pm::SearchGraph&& graph) noexcept
     : nodes(std::move(graph.nodes)),
+      node_edges(std::move(graph.node_edges)),
+      own_weights(std::move(graph.own_weights)),
+      own_markers(std::move(graph.own_markers)),
       num_nodes(graph.num_nodes),
-      negative_weight_edges(std::move(graph.negative_weight_edges)) {
+      negative_weight_edges(std::move(graph.negative_weight_edges)),
+      implied_weights_unconverted(std::move(graph.implied_weights_unconverted)),
+      implied_weights(std::move(graph.implied_weights)) {
+}
+
+pm::SearchGraph pm::SearchGraph::clone() const {
+    pm::SearchGraph copy;
+    copy.nodes.resize(nodes.size());
+    copy.node_edges = node_edges;
+    copy.num_nodes = num_nodes;
+    copy.negative_weight_edges = negative_weight_edges;
+    copy.implied_weights = implied_weights;
+    copy.update_edge_views();
+    return copy;
+}
+
+void pm::SearchGraph::update_edge_views(size_t node) {
+    auto& edges = *node_edges;
+    auto& n = nodes[node];
+    auto& neighbors = edges.neighbors[node];
+    n.neighbors.resize(neighbors.size());
+    for (size_t i = 0; i < neighbors.size(); i++)
+        n.neighbors[i] = neighbors[i] == SIZE_MAX ? nullptr : &nodes[neighbors[i]];
+    n.neighbor_weights = edges.weights[node];
+    n.neighbor_observable_indices = edges.observable_indices[node];
+    n.neighbor_markers = edges.markers[node];
+}
+
+void pm::SearchGraph::update_edge_views() {
+    size_t num_own_edges = 0;
+    for (size_t i = 0; i < nodes.size(); i++) {
+        update_edge_views(i);
+        size_t degree = nodes[i].neighbors.size();
+        if (!own_weights.empty())
+            nodes[i].neighbor_weights = {own_weights.data() + num_own_edges, degree};
+        if (!own_markers.empty())
+            nodes[i].neighbor_markers = {own_markers.data() + num_own_edges, degree};
+        num_own_edges += degree;
+    }
+}
+
+void pm::SearchGraph::unshare_edges() {
+    bool is_shared = node_edges.use_count() > 1;
+    if (!is_shared && own_weights.empty() && own_markers.empty())
+        return;
+    if (is_shared)
+        node_edges = std::make_shared<SearchGraphEdges>(*node_edges);
+    own_weights = {};
+    own_markers = {};
+    update_edge_views();
+}
+
+void pm::SearchGraph::unshare_edge_weights() {
+    if (!own_weights.empty() || node_edges.use_count() <= 1)
+        return;
+    for (auto& weights : node_edges->weights)
+        own_weights.insert(own_weights.end(), weights.begin(), weights.end());
+    update_edge_views();
+}
+
+void pm::SearchGraph::unshare_edge_markers() {
+    if (!own_markers.empty() || node_edges.use_count() <= 1)
+        return;
+    for (auto& markers : node_edges->markers)
+        own_markers.insert(own_markers.end(), markers.begin(), markers.end());
+    update_edge_views();
 }
 
 void pm::SearchGraph::add_edge(
     size_t u,
     size_t v,
     signed_weight_int weight,
-    const std::vector<size_t>& observables,
-    const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+    std::span<const size_t> observables,
+    std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
     size_t larger_node = std::max(u, v);
     if (larger_node + 1 > nodes.size()) {
         throw std::invalid_argument(
@@ -56,26 +137,28 @@ void pm::SearchGraph::add_edge(
         weight_sign = pm::WEIGHT_SIGN;
     }
 
-    nodes[u].neighbors.push_back(&(nodes[v]));
-    nodes[u].neighbor_weights.push_back(std::abs(weight));
-    nodes[u].neighbor_observable_indices.push_back(observables);
-    nodes[u].neighbor_markers.push_back(weight_sign);
-    nodes[u].neighbor_implied_weights.push_back({});
-    edges_to_implied_weights_unconverted[u].emplace_back(implied_weights_for_other_edges);
-
-    nodes[v].neighbors.push_back(&(nodes[u]));
-    nodes[v].neighbor_weights.push_back(std::abs(weight));
-    nodes[v].neighbor_observable_indices.push_back(observables);
-    nodes[v].neighbor_markers.push_back(weight_sign);
-    nodes[v].neighbor_implied_weights.push_back({});
-    edges_to_implied_weights_unconverted[v].emplace_back(implied_weights_for_other_edges);
+    add_implied_weights_unconverted(nodes, u, v, implied_weights_for_other_edges, implied_weights_unconverted);
+
+    unshare_edges();
+    auto& edges = *node_edges;
+    edges.neighbors[u].push_back(v);
+    edges.weights[u].push_back(std::abs(weight));
+    edges.observable_indices[u].emplace_back(observables.begin(), observables.end());
+    edges.markers[u].push_back(weight_sign);
+
+    edges.neighbors[v].push_back(u);
+    edges.weights[v].push_back(std::abs(weight));
+    edges.observable_indices[v].emplace_back(observables.begin(), observables.end());
+    edges.markers[v].push_back(weight_sign);
+    update_edge_views(u);
+    update_edge_views(v);
 }
 
 void pm::SearchGraph::add_boundary_edge(
     size_t u,
     signed_weight_int weight,
-    const std::vector<size_t>& observables,
-    const std::vector<ImpliedWeightUnconverted>& implied_weights_for_other_edges) {
+    std::span<const size_t> observables,
+    std::span<const ImpliedWeightUnconverted> implied_weights_for_other_edges) {
     if (u >= nodes.size()) {
         throw std::invalid_argument(
             "Node " + std::to_string(u) +
@@ -90,20 +173,23 @@ void pm::SearchGraph::add_boundary_edge(
         weight_sign = pm::WEIGHT_SIGN;
     }
 
-    nodes[u].neighbors.insert(nodes[u].neighbors.begin(), 1, nullptr);
-    nodes[u].neighbor_weights.insert(nodes[u].neighbor_weights.begin(), 1, std::abs(weight));
-    nodes[u].neighbor_observable_indices.insert(nodes[u].neighbor_observable_indices.begin(), 1, observables);
-    nodes[u].neighbor_markers.insert(nodes[u].neighbor_markers.begin(), 1, weight_sign);
-    nodes[u].neighbor_implied_weights.insert(nodes[u].neighbor_implied_weights.begin(), 1, {});
-    edges_to_implied_weights_unconverted[u].insert(
-        edges_to_implied_weights_unconverted[u].begin(), 1, implied_weights_for_other_edges);
+    unshare_edges();
+    auto& edges = *node_edges;
+    edges.neighbors[u].insert(edges.neighbors[u].begin(), 1, SIZE_MAX);
+    edges.weights[u].insert(edges.weights[u].begin(), 1, std::abs(weight));
+    edges.observable_indices[u].emplace(edges.observable_indices[u].begin(), observables.begin(), observables.end());
+    edges.markers[u].insert(edges.markers[u].begin(), 1, weight_sign);
+    update_edge_views(u);
+    add_implied_weights_unconverted(nodes, u, SIZE_MAX, implied_weights_for_other_edges, implied_weights_unconverted);
 }
 
 // Reweight assuming an error has occurred on a single edge u, v. When v == -1, assumes an edge from
 // u to the boundary.
 void pm::SearchGraph::reweight_for_edge(const int64_t& u, const int64_t& v) {
+    if (implied_weights == nullptr)
+        return;
     size_t z = nodes[u].index_of_neighbor(v == -1 ? nullptr : &nodes[v]);
-    reweight(nodes[u].neighbor_implied_weights[z]);
+    reweight(implied_weights->of_edge(u, z));
 }
 
 void pm::SearchGraph::reweight_for_edges(const std::vector<int64_t>& edges) {
@@ -124,38 +210,8 @@ void pm::SearchGraph::undo_reweights() {
     previous_weights.clear();
 }
 
-namespace {
-
-pm::ImpliedWeight convert_rule(
-    std::vector<pm::SearchDetectorNode>& nodes,
-    const pm::ImpliedWeightUnconverted& rule,
-    const double normalising_constant) {
-    const size_t& i = rule.node1;
-    const size_t& j = rule.node2;
-    pm::weight_int* weight_pointer_i =
-        &nodes[i].neighbor_weights[nodes[i].index_of_neighbor(j == SIZE_MAX ? nullptr : &nodes[j])];
-    pm::weight_int* weight_pointer_j =
-        j == SIZE_MAX ? nullptr : &nodes[j].neighbor_weights[nodes[j].index_of_neighbor(&nodes[i])];
-
-    double rescaled_normalising_constant = normalising_constant / 2;
-    pm::signed_weight_int w = (pm::signed_weight_int)round(rule.implied_weight * rescaled_normalising_constant);
-    // Extremely important!
-    // If all edge weights are even integers, then all collision events occur at integer times.
-    w *= 2;
-    return pm::ImpliedWeight{weight_pointer_i, weight_pointer_j, static_cast<pm::weight_int>(std::abs(w))};
-}
-
-}  // namespace
-
 void pm::SearchGraph::convert_implied_weights(const double normalising_constant) {
-    for (size_t u = 0; u < nodes.size(); u++) {
-        const std::vector<std::vector<ImpliedWeightUnconverted>>& rules_for_node =
-            edges_to_implied_weights_unconverted[u];
-        for (size_t v = 0; v < nodes[u].neighbors.size(); v++) {
-            for (const auto& rule : rules_for_node[v]) {
-                ImpliedWeight converted = convert_rule(nodes, rule, normalising_constant);
-                nodes[u].neighbor_implied_weights[v].push_back(converted);
-            }
-        }
-    }
+    implied_weights = std::make_shared<ImpliedWeights>(
+        build_implied_weights(nodes, implied_weights_unconverted, normalising_constant));
+    implied_weights_unconverted = {};
 }
@@ -28,39 +28,69 @@ struct SearchGraphEdge {
     size_t neighbor_index;
 };
 
+/// The edges of each node of a SearchGraph, which are shared by a graph and its clones, as for `MatchingGraphEdges`.
+struct SearchGraphEdges {
+    std::vector<std::vector<size_t>> neighbors;  /// The index of each neighbor, or SIZE_MAX for the boundary.
+    std::vector<std::vector<weight_int>> weights;
+    std::vector<std::vector<std::vector<size_t>>> observable_indices;
+    std::vector<std::vector<uint8_t>> markers;
+};
+
 class SearchGraph {
    public:
     std::vector<SearchDetectorNode> nodes;
+    /// As for `MatchingGraph`, the edges that `nodes` are views of, which are shared with clones of the graph, and the
+    /// graph's own copies of the edge weights and markers (the parts of the edges that are modified while decoding)
+    /// if they have been modified while `node_edges` was shared.
+    std::shared_ptr<SearchGraphEdges> node_edges;
+    std::vector<weight_int> own_weights;
+    std::vector<uint8_t> own_markers;
     size_t num_nodes;
     std::vector<std::pair<size_t, size_t>> negative_weight_edges;
 
     // Used to restore weights after reweighting.
     std::vector<PreviousWeight> previous_weights;
-    std::map<size_t, std::vector<std::vector<ImpliedWeightUnconverted>>> edges_to_implied_weights_unconverted;
+    /// As for `MatchingGraph`, the implied weights of the edges added to the graph before they are converted, and the
+    /// converted implied weights (which may be shared with a MatchingGraph).
+    std::vector<DirectedImpliedWeightUnconverted> implied_weights_unconverted;
+    std::shared_ptr<ImpliedWeights> implied_weights;
 
     SearchGraph();
     explicit SearchGraph(size_t num_nodes);
     SearchGraph(SearchGraph&& graph) noexcept;
+    /// Returns a copy of the graph with its own nodes, which shares the edges and implied weights of the graph. As for
+    /// `MatchingGraph::clone`, ephemeral search state and unconverted implied weights are not copied.
+    SearchGraph clone() const;
+    /// As for `MatchingGraph`, these point the views of the edges of the nodes at `node_edges` (or at `own_weights` and
+    /// `own_markers`), and give the graph its own copy of its edges before they are changed if they are shared.
+    void update_edge_views(size_t node);
+    void update_edge_views();
+    void unshare_edges();
+    void unshare_edge_weights();
+    /// Gives the graph its own copy of its edge markers, if `node_edges` is shared with a clone, so that edges can be
+    /// marked while decoding without affecting the clone.
+    void unshare_edge_markers();
     void add_edge(
         size_t u,
         size_t v,
         signed_weight_int weight,
-        const std::vector<size_t>& observables,
-        const std::vector<ImpliedWeightUnconverted>& implied_weights = {});
+        std::span<const size_t> observables,
+        std::span<const ImpliedWeightUnconverted> implied_weights = {});
     void add_boundary_edge(
         size_t u,
         signed_weight_int weight,
-        const std::vector<size_t>& observables,
-        const std::vector<ImpliedWeightUnconverted>& implied_weights = {});
+        std::span<const size_t> observables,
+        std::span<const ImpliedWeightUnconverted> implied_weights = {});
     void convert_implied_weights(const double normalizing_constant);
-    void reweight(std::vector<ImpliedWeight>& implied_weights);
+    void reweight(std::span<const ImpliedWeightIndices> implied_weights);
     void reweight_for_edge(const int64_t& u, const int64_t& v);
     void reweight_for_edges(const std::vector<int64_t>& edges);
     void undo_reweights();
 };
 
-inline void SearchGraph::reweight(std::vector<ImpliedWeight>& implied_weights) {
-    apply_reweights(implied_weights, previous_weights);
+inline void SearchGraph::reweight(std::span<const ImpliedWeightIndices> implied_weights) {
+    unshare_edge_weights();
+    apply_reweights(implied_weights, nodes, previous_weights);
 }
 
 }  // namespace pm
@@ -19,9 +19,9 @@
 
 TEST(SearchGraph, AddEdge) {
     pm::SearchGraph g(4);
-    g.add_edge(0, 1, 2, {0}, {});
-    g.add_edge(1, 2, 3, {0, 2}, {});
-    g.add_edge(0, 3, 10, {1, 3}, {});
+    g.add_edge(0, 1, 2, std::vector<size_t>{0}, {});
+    g.add_edge(1, 2, 3, std::vector<size_t>{0, 2}, {});
+    g.add_edge(0, 3, 10, std::vector<size_t>{1, 3}, {});
     ASSERT_EQ(g.nodes[0].neighbors[0], &g.nodes[1]);
     ASSERT_EQ(g.nodes[1].neighbors[0], &g.nodes[0]);
     ASSERT_EQ(g.nodes[3].neighbors[0], &g.nodes[0]);
@@ -36,9 +36,9 @@ TEST(SearchGraph, AddEdge) {
 
 TEST(SearchGraph, AddBoundaryEdge) {
     pm::SearchGraph g(6);
-    g.add_edge(0, 1, 2, {0, 1}, {});
-    g.add_boundary_edge(0, 7, {2}, {});
-    g.add_boundary_edge(5, 10, {0, 1, 3}, {});
+    g.add_edge(0, 1, 2, std::vector<size_t>{0, 1}, {});
+    g.add_boundary_edge(0, 7, std::vector<size_t>{2}, {});
+    g.add_boundary_edge(5, 10, std::vector<size_t>{0, 1, 3}, {});
     ASSERT_EQ(g.nodes[0].neighbors[0], nullptr);
     ASSERT_EQ(g.nodes[0].neighbors[1], &g.nodes[1]);
     ASSERT_EQ(g.nodes[5].neighbors[0], nullptr);
@@ -0,0 +1,131 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#ifndef PYMATCHING2_WIDE_OBS_INT_H
+#define PYMATCHING2_WIDE_OBS_INT_H
+
+#include <array>
+#include <cstddef>
+#include <cstdint>
+#include <iostream>
+
+namespace pm {
+
+/// A fixed-width observable mask made of `NUM_WORDS` 64-bit words, supporting the subset of integer
+/// operations that the decoder performs on observable masks (XOR-ing, shifting, masking and comparing).
+/// It is used as `pm::obs_int` when PyMatching is compiled with `PYMATCHING_OBS_INT_BITS` set to a
+/// multiple of 64 larger than 64, so that the decoder can track more than 64 observables without
+/// falling back to extracting the paths of matched edges with the search graph.
+///
+/// Bit `k` of the mask is bit `k % 64` of `words[k / 64]`.
+template <size_t NUM_WORDS>
+struct WideObsInt {
+    std::array<uint64_t, NUM_WORDS> words;
+
+    constexpr WideObsInt() : words{} {
+    }
+    constexpr WideObsInt(uint64_t low_word) : words{} {
+        words[0] = low_word;
+    }
+
+    inline WideObsInt& operator^=(const WideObsInt& rhs) {
+        for (size_t w = 0; w < NUM_WORDS; w++)
+            words[w] ^= rhs.words[w];
+        return *this;
+    }
+    inline WideObsInt& operator&=(const WideObsInt& rhs) {
+        for (size_t w = 0; w < NUM_WORDS; w++)
+            words[w] &= rhs.words[w];
+        return *this;
+    }
+    inline WideObsInt& operator|=(const WideObsInt& rhs) {
+        for (size_t w = 0; w < NUM_WORDS; w++)
+            words[w] |= rhs.words[w];
+        return *this;
+    }
+    inline WideObsInt operator^(const WideObsInt& rhs) const {
+        WideObsInt copy = *this;
+        copy ^= rhs;
+        return copy;
+    }
+    inline WideObsInt operator&(const WideObsInt& rhs) const {
+        WideObsInt copy = *this;
+        copy &= rhs;
+        return copy;
+    }
+    inline WideObsInt operator|(const WideObsInt& rhs) const {
+        WideObsInt copy = *this;
+        copy |= rhs;
+        return copy;
+    }
+    inline WideObsInt operator<<(size_t shift) const {
+        WideObsInt result;
+        size_t word_shift = shift / 64;
+        size_t bit_shift = shift % 64;
+        for (size_t w = NUM_WORDS; w-- > word_shift;) {
+            result.words[w] = words[w - word_shift] << bit_shift;
+            if (bit_shift && w > word_shift)
+                result.words[w] |= words[w - word_shift - 1] >> (64 - bit_shift);
+        }
+        return result;
+    }
+    inline WideObsInt operator>>(size_t shift) const {
+        WideObsInt result;
+        size_t word_shift = shift / 64;
+        size_t bit_shift = shift % 64;
+        for (size_t w = 0; w + word_shift < NUM_WORDS; w++) {
+            result.words[w] = words[w + word_shift] >> bit_shift;
+            if (bit_shift && w + word_shift + 1 < NUM_WORDS)
+                result.words[w] |= words[w + word_shift + 1] << (64 - bit_shift);
+        }
+        return result;
+    }
+    inline bool operator==(const WideObsInt& rhs) const {
+        return words == rhs.words;
+    }
+    inline bool operator!=(const WideObsInt& rhs) const {
+        return !(*this == rhs);
+    }
+    inline explicit operator bool() const {
+        for (auto w : words) {
+            if (w)
+                return true;
+        }
+        return false;
+    }
+    /// The lowest 8 bits of the mask, matching the behaviour of casting an integer mask to uint8_t.
+    inline explicit operator uint8_t() const {
+        return (uint8_t)words[0];
+    }
+};
+
+template <size_t NUM_WORDS>
+std::ostream& operator<<(std::ostream& out, const WideObsInt<NUM_WORDS>& mask) {
+    out << "0x";
+    auto flags = out.flags();
+    auto fill = out.fill();
+    out << std::hex;
+    for (size_t w = NUM_WORDS; w-- > 0;) {
+        out.width(16);
+        out.fill('0');
+        out << mask.words[w];
+    }
+    out.flags(flags);
+    out.fill(fill);
+    return out;
+}
+
+}  // namespace pm
+
+#endif  // PYMATCHING2_WIDE_OBS_INT_H
@@ -0,0 +1,69 @@
+// Copyright 2022 PyMatching Contributors
+//
+// Licensed under the Apache License, Version 2.0 (the "License");
+// you may not use this file except in compliance with the License.
+// You may obtain a copy of the License at
+//
+//      http://www.apache.org/licenses/LICENSE-2.0
+//
+// Unless required by applicable law or agreed to in writing, software
+// distributed under the License is distributed on an "AS IS" BASIS,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+// See the License for the specific language governing permissions and
+// limitations under the License.
+
+#include "pymatching/sparse_blossom/wide_obs_int.h"
+
+#include <sstream>
+
+#include "gtest/gtest.h"
+
+using WideObsInt = pm::WideObsInt<3>;
+
+TEST(WideObsInt, ConstructAndCompare) {
+    WideObsInt zero;
+    ASSERT_FALSE((bool)zero);
+    ASSERT_EQ(zero, WideObsInt(0));
+    WideObsInt five = 5;
+    ASSERT_TRUE((bool)five);
+    ASSERT_EQ(five.words[0], 5);
+    ASSERT_EQ(five.words[1], 0);
+    ASSERT_NE(five, zero);
+    ASSERT_EQ(five, 5);
+}
+
+TEST(WideObsInt, Shifts) {
+    for (size_t k = 0; k < 192; k++) {
+        WideObsInt bit = WideObsInt(1) << k;
+        for (size_t w = 0; w < 3; w++)
+            ASSERT_EQ(bit.words[w], w == k / 64 ? (uint64_t)1 << (k % 64) : 0) << k;
+        ASSERT_EQ(bit >> k, 1) << k;
+        ASSERT_EQ((bit >> k) & 1, 1) << k;
+    }
+    ASSERT_EQ(WideObsInt(1) << 192, 0);
+    WideObsInt x = 0xF0F0F0F0F0F0F0F0ULL;
+    WideObsInt y = x << 68;
+    ASSERT_EQ(y.words[0], 0);
+    ASSERT_EQ(y.words[1], 0x0F0F0F0F0F0F0F00ULL);
+    ASSERT_EQ(y.words[2], 0xFULL);
+    ASSERT_EQ(y >> 68, x);
+    ASSERT_EQ(y >> 4, x << 64);
+}
+
+TEST(WideObsInt, BitwiseOperators) {
+    WideObsInt a = (WideObsInt(1) << 3) ^ (WideObsInt(1) << 70) ^ (WideObsInt(1) << 150);
+    WideObsInt b = (WideObsInt(1) << 70) ^ (WideObsInt(1) << 100);
+    ASSERT_EQ(a ^ b, (WideObsInt(1) << 3) ^ (WideObsInt(1) << 100) ^ (WideObsInt(1) << 150));
+    ASSERT_EQ(a & b, WideObsInt(1) << 70);
+    ASSERT_EQ(a | b, a ^ (WideObsInt(1) << 100));
+    WideObsInt c = a;
+    c ^= a;
+    ASSERT_EQ(c, 0);
+    ASSERT_EQ((uint8_t)(a >> 3), 1);
+}
+
+TEST(WideObsInt, Print) {
+    std::stringstream ss;
+    ss << (WideObsInt(1) << 64 ^ WideObsInt(255)) << " " << 10;
+    ASSERT_EQ(ss.str(), "0x0000000000000000000000000000000100000000000000ff 10");
+}
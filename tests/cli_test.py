@@ -1,3 +1,4 @@
+import json
 import sys
 from pathlib import Path
 from typing import Callable, List
@@ -71,3 +72,95 @@ def test_load_surface_code_b8_cli(tmp_path: Path, data_dir: Path):
         "--out_format", "b8",
         "--in_includes_appended_observables"
     ])
+
+
+@pytest.mark.parametrize("enable_correlations", [False, True])
+def test_predict_cli_with_threads_matches_single_thread(
+    tmp_path: Path, data_dir: Path, enable_correlations: bool
+):
+    dem_path = data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    dets_b8_in_path = data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8"
+    outputs = []
+    for threads in ["1", "4"]:
+        out_fn = tmp_path / f"predictions_{threads}.01"
+        args = [
+            "predict",
+            "--dem", str(dem_path),
+            "--in", str(dets_b8_in_path),
+            "--in_format", "b8",
+            "--out", str(out_fn),
+            "--out_format", "01",
+            "--in_includes_appended_observables",
+            "--threads", threads,
+            "--chunk_size", "64",
+        ]
+        if enable_correlations:
+            args.append("--enable_correlations")
+        pymatching._cpp_pymatching.main(command_line_args=args)
+        with open(out_fn, encoding="utf-8") as f:
+            outputs.append(f.read())
+    assert len(outputs[0].splitlines()) == 1000
+    assert outputs[0] == outputs[1]
+
+
+def test_count_mistakes_cli_with_threads_and_stats_out(tmp_path: Path, data_dir: Path):
+    dem_path = data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    dets_b8_in_path = data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8"
+    outputs = []
+    for threads in ["1", "3"]:
+        out_fn = tmp_path / f"mistakes_{threads}.txt"
+        stats_fn = tmp_path / f"stats_{threads}.json"
+        pymatching._cpp_pymatching.main(command_line_args=[
+            "count_mistakes",
+            "--dem", str(dem_path),
+            "--in", str(dets_b8_in_path),
+            "--in_format", "b8",
+            "--out", str(out_fn),
+            "--in_includes_appended_observables",
+            "--threads", threads,
+            "--chunk_size", "64",
+            "--stats_out", str(stats_fn),
+        ])
+        with open(out_fn, encoding="utf-8") as f:
+            outputs.append(f.read())
+        with open(stats_fn, encoding="utf-8") as f:
+            stats = json.load(f)
+        assert stats["num_shots"] == 1000
+        assert stats["num_threads"] == int(threads)
+        assert f"{stats['num_mistakes']} / 1000\n" == outputs[-1]
+        latency = stats["decode_time_us"]
+        assert 0 <= latency["p50"] <= latency["p90"] <= latency["p99"] <= latency["max"]
+        histogram = stats["detection_events_histogram"]
+        assert sum(b["num_shots"] for b in histogram) == 1000
+        assert all(b["mean_decode_time_us"] <= b["max_decode_time_us"] for b in histogram)
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize("enable_correlations", [False, True])
+def test_predict_cli_with_compiled_dem(tmp_path: Path, data_dir: Path, enable_correlations: bool):
+    dem_path = data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    dets_b8_in_path = data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8"
+    compiled_dem_path = tmp_path / "surface_code.pmg"
+    pymatching.Matching.from_detector_error_model_file(
+        dem_path, enable_correlations=enable_correlations
+    ).save(compiled_dem_path)
+    outputs = []
+    for graph_args in [["--dem", str(dem_path)], ["--compiled_dem", str(compiled_dem_path)]]:
+        out_fn = tmp_path / "predictions.01"
+        args = [
+            "predict",
+            *graph_args,
+            "--in", str(dets_b8_in_path),
+            "--in_format", "b8",
+            "--out", str(out_fn),
+            "--out_format", "01",
+            "--in_includes_appended_observables",
+            "--threads", "2",
+        ]
+        if enable_correlations:
+            args.append("--enable_correlations")
+        pymatching._cpp_pymatching.main(command_line_args=args)
+        with open(out_fn, encoding="utf-8") as f:
+            outputs.append(f.read())
+    assert len(outputs[0].splitlines()) == 1000
+    assert outputs[0] == outputs[1]
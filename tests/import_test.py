@@ -0,0 +1,65 @@
+# Copyright 2022 PyMatching Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import pymatching
+
+HEAVY_MODULES = ["networkx", "scipy", "matplotlib", "stim", "rustworkx"]
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ)
+    package_dir = str(Path(pymatching.__file__).parent.parent)
+    env["PYTHONPATH"] = os.pathsep.join([package_dir, env.get("PYTHONPATH", "")])
+    return subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+
+
+def test_import_pymatching_does_not_import_heavy_dependencies():
+    result = run_python(
+        "import sys, pymatching; print(' '.join(m for m in {} if m in sys.modules))".format(HEAVY_MODULES)
+    )
+    assert result.stdout.split() == []
+
+
+def test_import_pymatching_only_imports_numpy_and_the_standard_library():
+    # Rather than timing the import (which is unreliable on a loaded machine), check that nothing other than numpy
+    # and the standard library is imported, since it is third-party packages that make the import slow
+    if not hasattr(sys, "stdlib_module_names"):
+        pytest.skip("sys.stdlib_module_names requires Python 3.10")
+    result = run_python(
+        "import sys, numpy\n"
+        "before = set(sys.modules)\n"
+        "import pymatching\n"
+        "print(' '.join({m.split('.')[0] for m in set(sys.modules) - before}))"
+    )
+    imported = set(result.stdout.split()) - set(sys.stdlib_module_names)
+    assert imported == {"pymatching"}
+
+
+def test_heavy_dependencies_are_imported_on_first_use():
+    result = run_python(
+        "import sys, pymatching\n"
+        "m = pymatching.Matching([[1, 1, 0], [0, 1, 1]])\n"
+        "assert 'scipy' in sys.modules and 'networkx' not in sys.modules\n"
+        "g = m.to_networkx()\n"
+        "assert 'networkx' in sys.modules\n"
+        "assert pymatching.Matching(g).num_edges == 3\n"
+    )
+    assert result.returncode == 0
@@ -0,0 +1,99 @@
+# Copyright 2022 PyMatching Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from pymatching import Matching
+
+
+def test_add_edges_matches_add_edge():
+    rng = np.random.default_rng(0)
+    num_edges = 500
+    node1 = rng.integers(0, 50, size=num_edges)
+    node2 = rng.integers(0, 50, size=num_edges)
+    weights = rng.uniform(-1, 5, size=num_edges)
+    error_probabilities = rng.uniform(0, 0.5, size=num_edges)
+    num_fault_ids = rng.integers(0, 3, size=num_edges)
+    fault_ids_indptr = np.concatenate([[0], np.cumsum(num_fault_ids)])
+    fault_ids_indices = rng.integers(0, 10, size=fault_ids_indptr[-1])
+    boundary_nodes = rng.integers(0, 60, size=20)
+
+    for merge_strategy in ["independent", "smallest-weight", "keep-original", "replace"]:
+        expected = Matching()
+        for i in range(num_edges):
+            fault_ids = set(fault_ids_indices[fault_ids_indptr[i]:fault_ids_indptr[i + 1]].tolist())
+            expected.add_edge(node1[i], node2[i], fault_ids=fault_ids, weight=weights[i],
+                              error_probability=error_probabilities[i], merge_strategy=merge_strategy)
+        for i, node in enumerate(boundary_nodes):
+            expected.add_boundary_edge(node, fault_ids={i}, weight=weights[i], merge_strategy=merge_strategy)
+
+        m = Matching()
+        m.add_edges(node1, node2, weights, error_probabilities, fault_ids_indptr, fault_ids_indices,
+                    merge_strategy=merge_strategy)
+        m.add_boundary_edges(boundary_nodes, weights=weights[:20], fault_ids_indptr=np.arange(21),
+                             fault_ids_indices=np.arange(20), merge_strategy=merge_strategy)
+        assert m.edges() == expected.edges()
+        assert m.num_nodes == expected.num_nodes
+        assert m.num_fault_ids == expected.num_fault_ids
+
+
+def test_add_edges_defaults_and_lists():
+    m = Matching()
+    m.add_edges([0, 1], [1, 2])
+    m.add_boundary_edges([2], error_probabilities=0.1)
+    assert m.edges() == [
+        (0, 1, {'fault_ids': set(), 'weight': 1.0, 'error_probability': -1.0}),
+        (1, 2, {'fault_ids': set(), 'weight': 1.0, 'error_probability': -1.0}),
+        (2, None, {'fault_ids': set(), 'weight': 1.0, 'error_probability': 0.1})
+    ]
+    m.add_edges(np.zeros(0, dtype=int), np.zeros(0, dtype=int))
+    assert m.num_edges == 3
+    assert np.array_equal(m.decode([0, 1, 0]), np.zeros(0, dtype=np.uint8))
+
+
+def test_add_edges_disallow_raises_value_error():
+    m = Matching()
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 0])
+    with pytest.raises(ValueError):
+        m.add_boundary_edges([0, 0])
+
+
+def test_add_edges_invalid_arguments_raise_value_error():
+    m = Matching()
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1])
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 2], weights=[1.0])
+    with pytest.raises(ValueError):
+        m.add_edges([0, -1], [1, 2])
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 2], fault_ids_indptr=[0, 1])
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 2], fault_ids_indptr=[0, 1, 3], fault_ids_indices=[0, 1])
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 2], fault_ids_indptr=[0, 1, 2], fault_ids_indices=[0, -1])
+    with pytest.raises(ValueError):
+        m.add_edges([0, 1], [1, 2], fault_ids_indptr=[0, 1, 2])
+    with pytest.raises(ValueError):
+        m.add_boundary_edges([0], merge_strategy="unknown")
+    assert m.num_edges == 0
+
+
+def test_add_edges_skips_and_warns_for_large_weights():
+    m = Matching()
+    with pytest.warns(UserWarning, match="2 edge"):
+        m.add_edges([0, 1, 2], [1, 2, 3], weights=[1.0, 2 ** 25, -2 ** 25])
+    assert m.edges() == [(0, 1, {'fault_ids': set(), 'weight': 1.0, 'error_probability': -1.0})]
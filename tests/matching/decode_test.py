@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+import threading
 from pathlib import Path
 
 import numpy as np
@@ -296,6 +297,284 @@ def test_decode_batch_to_bitpacked_predictions():
         m.decode_batch(np.array([[]], dtype=np.uint8))
 
 
+@pytest.mark.parametrize("num_fault_ids", [1, 8, 64, 65, 130])
+def test_decode_batch_bitpacked_matches_unpacked(num_fault_ids: int):
+    num_nodes = 150
+    m = pymatching.Matching()
+    for i in range(num_nodes - 1):
+        m.add_edge(i, i + 1, fault_ids={(7 * i) % num_fault_ids}, weight=1 + i % 5)
+    m.add_boundary_edge(0, fault_ids={num_fault_ids - 1})
+    rng = np.random.default_rng(3)
+    shots = (rng.random((50, num_nodes)) < 0.05).astype(np.uint8)
+    expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True)
+    packed_shots = np.packbits(shots, bitorder="little", axis=1)
+    # A strided view of the bit-packed shots, whose rows are not contiguous in memory
+    strided_shots = np.zeros((packed_shots.shape[0], 2 * packed_shots.shape[1]), dtype=np.uint8)
+    strided_shots[:, ::2] = packed_shots
+    for bit_packed_shots in [packed_shots, strided_shots[:, ::2]]:
+        predictions, weights = m.decode_batch(
+            bit_packed_shots, return_weights=True, bit_packed_shots=True, bit_packed_predictions=True
+        )
+        assert np.array_equal(predictions, np.packbits(expected_predictions, bitorder="little", axis=1))
+        assert np.array_equal(weights, expected_weights)
+
+
+@pytest.mark.parametrize("num_threads", [2, 3, 8])
+def test_decode_batch_multithreaded_matches_single_threaded(data_dir: Path, num_threads: int):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(
+        data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    )
+    m = Matching.from_detector_error_model(dem, enable_correlations=True)
+    shots = stim.read_shot_data_file(
+        path=data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8",
+        format="b8",
+        num_detectors=m.num_detectors,
+        num_observables=m.num_fault_ids,
+    )[:, 0: -m.num_fault_ids]
+    bitpacked_shots = np.packbits(shots, bitorder="little", axis=1)
+    for kwargs in [
+        {},
+        {"bit_packed_predictions": True},
+        {"enable_correlations": True},
+    ]:
+        expected_predictions, expected_weights = m.decode_batch(
+            shots, return_weights=True, **kwargs
+        )
+        predictions, weights = m.decode_batch(
+            shots, return_weights=True, num_threads=num_threads, **kwargs
+        )
+        assert np.array_equal(predictions, expected_predictions)
+        assert np.array_equal(weights, expected_weights)
+        predictions, weights = m.decode_batch(
+            bitpacked_shots,
+            return_weights=True,
+            bit_packed_shots=True,
+            num_threads=num_threads,
+            **kwargs
+        )
+        assert np.array_equal(predictions, expected_predictions)
+        assert np.array_equal(weights, expected_weights)
+
+
+def test_decode_batch_multithreaded_edge_cases():
+    m = Matching(repetition_code(5))
+    shots = np.array([[1, 0, 0, 1, 0], [0, 1, 1, 0, 0], [0, 0, 0, 0, 0]], dtype=np.uint8)
+    expected = m.decode_batch(shots)
+    assert np.array_equal(m.decode_batch(shots, num_threads=16), expected)
+    predictions, weights = m.decode_batch(
+        np.zeros((0, 5), dtype=np.uint8), return_weights=True, num_threads=4
+    )
+    assert predictions.shape == (0, 5)
+    assert weights.shape == (0,)
+    with pytest.raises(ValueError):
+        m.decode_batch(shots, num_threads=0)
+    with pytest.raises(ValueError):
+        # Raised from within a worker thread, since detection event 7 is not a node in the graph
+        m.decode_batch(
+            np.array([[0], [0], [128]], dtype=np.uint8),
+            bit_packed_shots=True,
+            num_threads=3,
+        )
+
+
+@pytest.mark.parametrize("num_threads", [1, 3])
+def test_decode_batch_sparse_matches_decode_batch(data_dir: Path, num_threads: int):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(
+        data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    )
+    m = Matching.from_detector_error_model(dem, enable_correlations=True)
+    shots = stim.read_shot_data_file(
+        path=data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8",
+        format="b8",
+        num_detectors=m.num_detectors,
+        num_observables=m.num_fault_ids,
+    )[:, 0: -m.num_fault_ids]
+    csr = csc_matrix(shots).tocsr()
+    ragged = [np.flatnonzero(shot) for shot in shots]
+    for kwargs in [{}, {"bit_packed_predictions": True}, {"enable_correlations": True}]:
+        expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True, **kwargs)
+        for args in [(csr.indices, csr.indptr), (csr,), (ragged,)]:
+            predictions, weights = m.decode_batch_sparse(
+                *args, return_weights=True, num_threads=num_threads, **kwargs
+            )
+            assert np.array_equal(predictions, expected_predictions)
+            assert np.array_equal(weights, expected_weights)
+
+
+def test_decode_batch_sparse_edge_cases():
+    m = Matching(repetition_code(5))
+    expected = m.decode_batch(np.array([[1, 0, 0, 1, 0], [0, 0, 0, 0, 0], [0, 1, 1, 0, 0]]))
+    # Unsorted detection events, and detection events that cancel out in pairs
+    assert np.array_equal(m.decode_batch_sparse([[3, 0], [2, 2], [1, 4, 2, 4]]), expected)
+    assert np.array_equal(m.decode_batch_sparse([np.array([0, 3, 3, 3], dtype=np.uint64), [], [1, 2]]), expected)
+    # Strided views of `indices` and `indptr`
+    indices_with_padding = np.array([[3, 99], [0, 99], [1, 99], [2, 99]], dtype=np.int64)
+    indptr_with_padding = np.array([0, -1, 2, -1, 2, -1, 4], dtype=np.int64)
+    assert np.array_equal(m.decode_batch_sparse(indices_with_padding[:, 0], indptr_with_padding[::2]), expected)
+    predictions, weights = m.decode_batch_sparse([], return_weights=True)
+    assert predictions.shape == (0, 5)
+    assert weights.shape == (0,)
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse([[5]])
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse([[-1]])
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse(np.array([0, 1]), np.array([0, 3]))
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse(np.array([0, 1]), np.array([0, 2, 1]))
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse(np.array([0, 1]), np.array([], dtype=np.int64))
+    with pytest.raises(ValueError):
+        m.decode_batch_sparse([[0]], num_threads=0)
+
+
+@pytest.mark.parametrize("max_chunks_in_flight", [1, 2, 5])
+def test_decode_stream_matches_decode_batch(data_dir: Path, max_chunks_in_flight: int):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(
+        data_dir / "surface_code_rotated_memory_x_13_0.01.dem"
+    )
+    m = Matching.from_detector_error_model(dem)
+    shots = stim.read_shot_data_file(
+        path=data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8",
+        format="b8",
+        num_detectors=m.num_detectors,
+        num_observables=m.num_fault_ids,
+    )[:, 0: -m.num_fault_ids]
+    expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True)
+    chunks = (shots[i:i + 77] for i in range(0, shots.shape[0], 77))
+    results = list(m.decode_stream(
+        chunks, return_weights=True, max_chunks_in_flight=max_chunks_in_flight, num_threads=2
+    ))
+    assert len(results) == 13
+    assert np.array_equal(np.concatenate([p for p, _ in results]), expected_predictions)
+    assert np.array_equal(np.concatenate([w for _, w in results]), expected_weights)
+
+    bitpacked_chunks = [np.packbits(shots[i:i + 500], bitorder="little", axis=1) for i in (0, 500)]
+    predictions = list(m.decode_stream(
+        bitpacked_chunks, bit_packed_shots=True, bit_packed_predictions=True
+    ))
+    assert np.array_equal(
+        np.concatenate(predictions), np.packbits(expected_predictions, bitorder="little", axis=1)
+    )
+
+
+def test_decode_stream_from_stim_sampler():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated(
+        "surface_code:rotated_memory_x", distance=3, rounds=3, after_clifford_depolarization=0.01
+    )
+    m = Matching.from_stim_circuit(circuit)
+    sampler = circuit.compile_detector_sampler()
+    chunk_sizes = []
+    for bit_packed in [False, True]:
+        for predictions, actual, weights in m.decode_stream(
+            sampler, num_shots=250, chunk_size=100, return_weights=True, bit_packed_shots=bit_packed
+        ):
+            assert predictions.shape == (actual.shape[0], 1)
+            assert weights.shape == (actual.shape[0],)
+            chunk_sizes.append(actual.shape[0])
+    assert chunk_sizes == [100, 100, 50] * 2
+    with pytest.raises(ValueError):
+        next(m.decode_stream(sampler))
+    with pytest.raises(ValueError):
+        next(m.decode_stream([np.zeros((1, m.num_detectors))], num_shots=1))
+    with pytest.raises(ValueError):
+        next(m.decode_stream(sampler, num_shots=10, max_chunks_in_flight=0))
+
+
+def test_decode_stream_is_lazy_and_bounded():
+    m = Matching(repetition_code(5))
+    num_produced = 0
+
+    def chunks():
+        nonlocal num_produced
+        for _ in range(100):
+            num_produced += 1
+            yield np.array([[1, 0, 0, 1, 0]], dtype=np.uint8)
+
+    stream = m.decode_stream(chunks(), max_chunks_in_flight=3)
+    assert num_produced == 0
+    assert np.array_equal(next(stream), m.decode_batch(np.array([[1, 0, 0, 1, 0]], dtype=np.uint8)))
+    assert num_produced == 3
+    assert sum(1 for _ in stream) == 99
+    assert num_produced == 100
+
+
+def test_decode_stream_raises_errors_from_decoding():
+    m = Matching(repetition_code(5))
+    with pytest.raises(ValueError):
+        list(m.decode_stream([np.zeros((2, 5), dtype=np.uint8), np.zeros((2, 4), dtype=np.uint8)]))
+
+
+def test_concurrent_calls_from_different_threads():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated(
+        "surface_code:rotated_memory_x", distance=5, rounds=5, after_clifford_depolarization=0.01
+    )
+    m = Matching.from_stim_circuit(circuit)
+    shots = circuit.compile_detector_sampler(seed=0).sample(shots=500)
+    expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True)
+    results = []
+
+    def decode_batches():
+        for _ in range(10):
+            results.append(m.decode_batch(shots, return_weights=True))
+
+    threads = [threading.Thread(target=decode_batches) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 20
+    for predictions, weights in results:
+        assert np.array_equal(predictions, expected_predictions)
+        assert np.array_equal(weights, expected_weights)
+
+    # Decode single shots while the stream is being decoded on its background thread
+    chunks = (shots[i:i + 50] for i in range(0, shots.shape[0], 50))
+    stream_predictions = []
+    for k, predictions in enumerate(m.decode_stream(chunks)):
+        stream_predictions.append(predictions)
+        for i in range(k * 50, k * 50 + 50, 7):
+            assert np.array_equal(m.decode(shots[i]), expected_predictions[i])
+    assert np.array_equal(np.concatenate(stream_predictions), expected_predictions)
+
+
+def test_concurrent_multithreaded_calls_from_different_threads():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated(
+        "surface_code:rotated_memory_x", distance=5, rounds=5, after_clifford_depolarization=0.01
+    )
+    shots = circuit.compile_detector_sampler(seed=0).sample(shots=500)
+    # Each call with `num_threads > 1` uses the worker decoders of the same graph
+    m = Matching.from_stim_circuit(circuit)
+    expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True)
+    m_corr = Matching.from_stim_circuit(circuit, enable_correlations=True)
+    expected_corr = m_corr.decode_batch(shots, enable_correlations=True)
+    results = []
+    corr_results = []
+
+    def decode_batches_multithreaded():
+        for _ in range(5):
+            results.append(m.decode_batch(shots, return_weights=True, num_threads=3))
+            corr_results.append(m_corr.decode_batch(shots, enable_correlations=True, num_threads=3))
+
+    threads = [threading.Thread(target=decode_batches_multithreaded) for _ in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == len(corr_results) == 10
+    for predictions, weights in results:
+        assert np.array_equal(predictions, expected_predictions)
+        assert np.array_equal(weights, expected_weights)
+    for predictions in corr_results:
+        assert np.array_equal(predictions, expected_corr)
+
+
 def test_detection_event_too_large_raises_value_error():
     m = pymatching.Matching()
     m.add_edge(0, 1)
@@ -490,3 +769,326 @@ def test_use_correlations_without_decompose_errors_raises_value_error(tmp_path):
         pymatching.Matching(dem, enable_correlations=True)
     with pytest.raises(ValueError):
         pymatching.Matching.from_detector_error_model_file(dem_file, enable_correlations=True)
+
+
+def test_decode_after_editing_graph_matches_new_graph():
+    rng = np.random.default_rng(1)
+    m = Matching(repetition_code(20), weights=rng.uniform(1, 2, size=20))
+    m.add_boundary_edge(0, fault_ids={20}, weight=5)
+    syndromes = rng.integers(0, 2, size=(50, 20), dtype=np.uint8)
+    m.decode_batch(syndromes)
+    for edits in range(4):
+        for _ in range(5):
+            i = int(rng.integers(0, 19))
+            m.add_edge(i, i + 1, fault_ids={int(rng.integers(0, 20))}, weight=rng.uniform(1, 3),
+                       merge_strategy="replace")
+        if edits == 1:
+            m.add_edge(3, 10, fault_ids={3}, weight=1.5)
+            m.add_boundary_edge(19, weight=1.2)
+        if edits == 2:
+            m.add_edge(5, 6, weight=-1, merge_strategy="replace")
+        if edits == 3:
+            m.set_boundary_nodes({19})
+        expected = Matching()
+        for u, v, d in m.edges():
+            if v is None:
+                expected.add_boundary_edge(u, fault_ids=d["fault_ids"], weight=d["weight"])
+            else:
+                expected.add_edge(u, v, fault_ids=d["fault_ids"], weight=d["weight"])
+        expected.set_boundary_nodes(m.boundary)
+        assert np.array_equal(m.decode_batch(syndromes), expected.decode_batch(syndromes))
+
+
+def test_decode_batch_weight_overrides_match_reweighted_graph():
+    rng = np.random.default_rng(2)
+    m = Matching()
+    for i in range(30):
+        m.add_edge(i, i + 1, fault_ids={i}, weight=int(rng.integers(1, 6)))
+        m.add_edge(i, (i + 7) % 31, weight=int(rng.integers(1, 6)))
+    m.add_boundary_edge(0, fault_ids={30}, weight=3)
+    m.add_edge(30, 31, fault_ids={31}, weight=2)
+    m.set_boundary_nodes({31})
+    edges = m.edges()
+    num_shots = 40
+    shots = rng.integers(0, 2, size=(num_shots, m.num_detectors), dtype=np.uint8)
+    num_overrides = rng.integers(0, 10, size=num_shots)
+    shot_indptr = np.concatenate([[0], np.cumsum(num_overrides)])
+    edge_indices = rng.integers(0, len(edges), size=shot_indptr[-1])
+    override_weights = rng.integers(0, 9, size=shot_indptr[-1]).astype(float)
+
+    for num_threads in [1, 3]:
+        predictions, weights = m.decode_batch(shots, return_weights=True, num_threads=num_threads,
+                                              weight_overrides=(shot_indptr, edge_indices, override_weights))
+        for i in range(num_shots):
+            new_weights = [d["weight"] for _, _, d in edges]
+            for k in range(shot_indptr[i], shot_indptr[i + 1]):
+                new_weights[edge_indices[k]] = override_weights[k]
+            expected = Matching()
+            for (u, v, d), w in zip(edges, new_weights):
+                if v is None:
+                    expected.add_boundary_edge(u, fault_ids=d["fault_ids"], weight=w)
+                else:
+                    expected.add_edge(u, v, fault_ids=d["fault_ids"], weight=w)
+            expected.set_boundary_nodes(m.boundary)
+            expected_prediction, expected_weight = expected.decode(shots[i], return_weight=True)
+            assert np.array_equal(predictions[i], expected_prediction)
+            assert weights[i] == expected_weight
+    # The weights of the graph are restored after each shot
+    no_overrides = (np.zeros(num_shots + 1), [], [])
+    assert np.array_equal(m.decode_batch(shots), m.decode_batch(shots, weight_overrides=no_overrides))
+
+
+def test_decode_batch_weight_overrides_with_correlations(data_dir: Path):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(data_dir / "surface_code_rotated_memory_x_13_0.01.dem")
+    m = Matching.from_detector_error_model(dem, enable_correlations=True)
+    shots = stim.read_shot_data_file(
+        path=data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8",
+        format="b8",
+        num_detectors=m.num_detectors,
+        num_observables=m.num_fault_ids,
+    )[:200, 0: -m.num_fault_ids]
+    expected_predictions, expected_weights = m.decode_batch(shots, return_weights=True, enable_correlations=True)
+    # Overriding every edge with its own weight has no effect
+    original_weights = m.edges_array()[2]
+    num_edges = len(original_weights)
+    shot_indptr = np.arange(len(shots) + 1) * num_edges
+    overrides = (shot_indptr, np.tile(np.arange(num_edges), len(shots)), np.tile(original_weights, len(shots)))
+    for num_threads in [1, 4]:
+        predictions, weights = m.decode_batch(shots, return_weights=True, enable_correlations=True,
+                                              num_threads=num_threads, weight_overrides=overrides)
+        assert np.array_equal(predictions, expected_predictions)
+        assert np.allclose(weights, expected_weights)
+    # Overrides in the first shot lower its solution weight, but do not affect the later shots
+    rng = np.random.default_rng(0)
+    edge_indices = rng.choice(num_edges, size=num_edges // 2, replace=False)
+    shot_indptr = np.full(len(shots) + 1, len(edge_indices))
+    shot_indptr[0] = 0
+    predictions, weights = m.decode_batch(shots, return_weights=True, enable_correlations=True,
+                                          weight_overrides=(shot_indptr, edge_indices, np.zeros(len(edge_indices))))
+    assert weights[0] <= expected_weights[0]
+    assert np.array_equal(predictions[1:], expected_predictions[1:])
+    assert np.array_equal(weights[1:], expected_weights[1:])
+
+
+def test_decode_batch_invalid_weight_overrides_raise_value_error():
+    m = Matching(repetition_code(5))
+    m.add_edge(0, 5, weight=-1)
+    shots = np.zeros((2, 6), dtype=np.uint8)
+    for overrides in [
+        ([0, 1], [0], [1.0]),
+        ([0, 1, 0], [0], [1.0]),
+        ([0, 1, 2], [0], [1.0]),
+        ([0, 1, 1], [0], [1.0, 2.0]),
+        ([0, 1, 1], [-1], [1.0]),
+        ([0, 1, 1], [6], [1.0]),
+        ([0, 1, 1], [0], [-1.0]),
+        ([0, 1, 1], [0], [np.nan]),
+        ([0, 1, 1], [5], [1.0]),
+        ([0, 1], [0]),
+    ]:
+        with pytest.raises(ValueError):
+            m.decode_batch(shots, weight_overrides=overrides)
+
+
+def test_decode_batch_large_weight_overrides_are_clamped():
+    rng = np.random.default_rng(4)
+    m = Matching()
+    for i in range(20):
+        m.add_edge(i, i + 1, fault_ids={i}, weight=rng.uniform(1, 5.9))
+        m.add_edge(i, (i + 5) % 21, weight=rng.uniform(1, 5.9))
+    m.add_boundary_edge(0, fault_ids={20}, weight=5.9)
+    num_edges = m.num_edges
+    max_weight = np.max(np.abs(m.edges_array()[2]))
+    num_shots = 30
+    shots = rng.integers(0, 2, size=(num_shots, m.num_detectors), dtype=np.uint8)
+    shot_indptr = np.arange(num_shots + 1) * 4
+    edge_indices = rng.integers(0, num_edges, size=shot_indptr[-1])
+
+    # Weights larger than the largest weight in the graph are clamped to it, rather than being rejected
+    expected = m.decode_batch(shots, return_weights=True,
+                              weight_overrides=(shot_indptr, edge_indices, np.full(len(edge_indices), max_weight)))
+    for override_weight in [max_weight + 0.5, 100.0, 1e300, np.inf]:
+        overrides = (shot_indptr, edge_indices, np.full(len(edge_indices), override_weight))
+        predictions, weights = m.decode_batch(shots, return_weights=True, weight_overrides=overrides)
+        assert np.array_equal(predictions, expected[0])
+        assert np.array_equal(weights, expected[1])
+
+
+def test_decode_erasures_match_zero_weight_edges():
+    rng = np.random.default_rng(3)
+    m = Matching()
+    for i in range(20):
+        m.add_edge(i, i + 1, fault_ids={i}, weight=rng.uniform(1, 3))
+        m.add_edge(i, (i + 5) % 21, weight=rng.uniform(1, 3))
+    m.add_boundary_edge(0, fault_ids={20}, weight=2)
+    edges = m.edges()
+    num_shots = 30
+    shots = rng.integers(0, 2, size=(num_shots, m.num_detectors), dtype=np.uint8)
+    erased = [rng.choice(len(edges), size=rng.integers(0, 6), replace=False) for _ in range(num_shots)]
+
+    expected_predictions = []
+    for i in range(num_shots):
+        expected = Matching()
+        for j, (u, v, d) in enumerate(edges):
+            w = 0 if j in erased[i] else d["weight"]
+            if v is None:
+                expected.add_boundary_edge(u, fault_ids=d["fault_ids"], weight=w)
+            else:
+                expected.add_edge(u, v, fault_ids=d["fault_ids"], weight=w)
+        expected_predictions.append(expected.decode(shots[i]))
+        assert np.array_equal(m.decode(shots[i], erased_edges=erased[i]), expected_predictions[-1])
+    expected_predictions = np.array(expected_predictions)
+
+    dense = np.zeros((num_shots, len(edges)), dtype=bool)
+    for i, e in enumerate(erased):
+        dense[i, e] = True
+    shot_indptr = np.concatenate([[0], np.cumsum([len(e) for e in erased])])
+    for erasures in [erased, dense, csc_matrix(dense), (shot_indptr, np.concatenate(erased))]:
+        assert np.array_equal(m.decode_batch(shots, erasures=erasures), expected_predictions)
+        assert np.array_equal(m.decode_batch(shots, erasures=erasures, num_threads=3), expected_predictions)
+    # Erasures take precedence over weight overrides
+    overrides = (shot_indptr, np.concatenate(erased), np.full(shot_indptr[-1], 2.5))
+    assert np.array_equal(m.decode_batch(shots, weight_overrides=overrides, erasures=erased), expected_predictions)
+    assert np.array_equal(m.decode(shots[0]), m.decode(shots[0], erased_edges=[]))
+
+
+def test_erasure_matrix_from_tagged_detector_error_model(data_dir: Path):
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit("""
+        R 0 1 2
+        X_ERROR[erasure:0](0.1) 1
+        DEPOLARIZE1(0.01) 0 1 2
+        X_ERROR[erasure:1](0.05) 2
+        CX 0 1 2 1
+        M 0 1 2
+        DETECTOR rec[-3]
+        DETECTOR rec[-2]
+        DETECTOR rec[-1]
+        OBSERVABLE_INCLUDE(0) rec[-1]
+    """)
+    model = circuit.detector_error_model(decompose_errors=True)
+    m = Matching.from_detector_error_model(model)
+    erasure_matrix = m.erasure_matrix(model)
+    assert erasure_matrix.shape == (2, m.num_edges)
+    edges = m.edges_array()
+    erased_by_0 = {tuple(edges[0][erasure_matrix[0].indices]), tuple(edges[1][erasure_matrix[0].indices])}
+    assert erased_by_0 == {(1,), (-1,)}
+    erased_by_1 = erasure_matrix[1].indices
+    assert erased_by_1.size == 1 and edges[0][erased_by_1[0]] in (1, 2) and edges[1][erased_by_1[0]] in (1, 2)
+
+    tagged = Matching.from_detector_error_model_file(data_dir / "tagged_dem.dem")
+    assert tagged.erasure_matrix(stim.DetectorErrorModel.from_file(data_dir / "tagged_dem.dem")).shape == (0, 1)
+    with pytest.raises(ValueError):
+        m.erasure_matrix(stim.DetectorErrorModel("error[erasure:x](0.1) D0"))
+    with pytest.raises(ValueError):
+        m.erasure_matrix(stim.DetectorErrorModel("error[erasure:0](0.1) D0 D2"))
+
+
+def test_decode_invalid_erasures_raise_value_error():
+    m = Matching(repetition_code(5))
+    m.add_edge(0, 5, weight=-1)
+    with pytest.raises(ValueError):
+        m.decode([1, 1, 0, 0, 0, 0], erased_edges=[5])
+    with pytest.raises(ValueError):
+        m.decode([1, 1, 0, 0, 0, 0], erased_edges=[6])
+    shots = np.zeros((2, 6), dtype=np.uint8)
+    with pytest.raises(ValueError):
+        m.decode_batch(shots, erasures=[[0]])
+    with pytest.raises(ValueError):
+        m.decode_batch(shots, erasures=np.zeros(6))
+    with pytest.raises(ValueError):
+        m.decode_batch(shots, erasures=([0, 1, 1], [0], [0.0]))
+
+
+def test_decode_batch_sliding_window_matches_decode_batch():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated("surface_code:rotated_memory_z", distance=3, rounds=15,
+                                     after_clifford_depolarization=0.01, before_measure_flip_probability=0.01)
+    model = circuit.detector_error_model(decompose_errors=True)
+    m = Matching.from_detector_error_model(model)
+    times = np.array([c[-1] for c in model.get_detector_coordinates().values()])
+    shots = circuit.compile_detector_sampler(seed=0).sample(shots=200)
+    expected, expected_weights = m.decode_batch(shots, return_weights=True)
+
+    predictions, weights = m.decode_batch_sliding_window(shots, times, 2, 100, return_weights=True)
+    assert np.array_equal(predictions, expected)
+    assert np.allclose(weights, expected_weights)
+
+    predictions, weights = m.decode_batch_sliding_window(shots, times, 2, 4, return_weights=True)
+    assert predictions.shape == expected.shape
+    assert np.mean(np.all(predictions == expected, axis=1)) > 0.9
+    assert np.all((weights >= expected_weights) | np.isclose(weights, expected_weights))
+
+
+def test_decode_batch_sliding_window_invalid_arguments_raise_value_error():
+    m = Matching(repetition_code(5))
+    shots = np.zeros((2, 5), dtype=np.uint8)
+    times = np.arange(5)
+    with pytest.raises(ValueError):
+        m.decode_batch_sliding_window(shots, times[:4], 1, 1)
+    with pytest.raises(ValueError):
+        m.decode_batch_sliding_window(shots, times, 0, 1)
+    with pytest.raises(ValueError):
+        m.decode_batch_sliding_window(shots, times, 1, -1)
+    with pytest.raises(ValueError):
+        m.decode_batch_sliding_window(np.zeros((2, 3), dtype=np.uint8), times, 1, 1)
+    assert m.decode_batch_sliding_window(shots, times, 1, 1).shape == (2, m.num_fault_ids)
+
+
+@pytest.mark.parametrize("num_threads", [1, 3])
+def test_decode_batch_parallel_window_matches_decode_batch(num_threads: int):
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated("surface_code:rotated_memory_z", distance=3, rounds=30,
+                                     after_clifford_depolarization=0.005, before_measure_flip_probability=0.005)
+    model = circuit.detector_error_model(decompose_errors=True)
+    m = Matching.from_detector_error_model(model)
+    times = np.array([c[-1] for c in model.get_detector_coordinates().values()])
+    shots = circuit.compile_detector_sampler(seed=0).sample(shots=200)
+    expected, expected_weights = m.decode_batch(shots, return_weights=True)
+
+    predictions, weights = m.decode_batch_parallel_window(shots, times, 100, 4, num_threads=num_threads,
+                                                          return_weights=True)
+    assert np.array_equal(predictions, expected)
+    assert np.allclose(weights, expected_weights)
+
+    predictions, weights = m.decode_batch_parallel_window(shots, times, 4, 4, num_threads=num_threads,
+                                                          return_weights=True)
+    assert np.mean(np.all(predictions == expected, axis=1)) > 0.9
+    assert np.all((weights >= expected_weights) | np.isclose(weights, expected_weights))
+    single_threaded = m.decode_batch_parallel_window(shots, times, 4, 4)
+    assert np.array_equal(predictions, single_threaded)
+
+
+def test_decode_batch_parallel_window_invalid_arguments_raise_value_error():
+    m = Matching(repetition_code(5))
+    shots = np.zeros((2, 5), dtype=np.uint8)
+    times = np.arange(5)
+    with pytest.raises(ValueError):
+        m.decode_batch_parallel_window(shots, times, 2, 1, num_threads=0)
+    with pytest.raises(ValueError):
+        m.decode_batch_parallel_window(shots, times[:4], 2, 1)
+    m.add_edge(0, 3)
+    with pytest.raises(ValueError):
+        m.decode_batch_parallel_window(shots, times, 1, 1)
+
+
+def test_decode_batch_sliding_window_from_detector_error_model_matches_full_graph():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated("surface_code:rotated_memory_z", distance=3, rounds=100,
+                                     after_clifford_depolarization=0.005, before_measure_flip_probability=0.005)
+    model = circuit.detector_error_model(decompose_errors=True)
+    m = Matching.from_detector_error_model(model)
+    times = np.array([c[-1] for c in model.get_detector_coordinates().values()])
+    shots = circuit.compile_detector_sampler(seed=0).sample(shots=100)
+    expected, expected_weights = m.decode_batch_sliding_window(shots, times, 3, 4, return_weights=True)
+
+    predictions, weights = Matching.decode_batch_sliding_window_from_detector_error_model(
+        model, shots, 3, 4, return_weights=True)
+    assert np.array_equal(predictions, expected)
+    assert np.array_equal(weights, expected_weights)
+    with pytest.raises(ValueError):
+        Matching.decode_batch_sliding_window_from_detector_error_model(model, shots[:, 1:], 3, 4)
+    with pytest.raises(ValueError):
+        Matching.decode_batch_sliding_window_from_detector_error_model(
+            stim.DetectorErrorModel("error(0.1) D0 D1"), np.zeros((1, 2), dtype=np.uint8), 3, 4)
@@ -179,3 +179,39 @@ def test_load_from_networkx_raises_value_error_if_qubit_id_and_fault_ids_both_su
         g.add_edge(1, 2, qubit_id=1, fault_ids=1)
         m = Matching()
         m.load_from_networkx(g)
+
+
+def test_load_from_networkx_mixed_fault_id_types():
+    g = nx.Graph()
+    g.add_edge(0, 1, fault_ids=np.int64(3))
+    g.add_edge(1, 2, fault_ids=[0, 0, 1])
+    g.add_edge(2, 3, fault_ids=frozenset({2}))
+    g.add_edge(3, 4, fault_ids=-1)
+    g.add_edge(4, 5, qubit_id=(4,))
+    g.add_edge(5, 6)
+    m = Matching(g)
+    assert [e[2]['fault_ids'] for e in m.edges()] == [{3}, {0, 1}, {2}, set(), {4}, set()]
+    assert m.num_fault_ids == 5
+    g = nx.Graph()
+    g.add_edge(0, 1, fault_ids={1.5})
+    with pytest.raises(TypeError):
+        Matching(g)
+
+
+def test_load_from_networkx_matches_add_edge():
+    rng = np.random.default_rng(1)
+    g = nx.Graph()
+    expected = Matching()
+    for u in range(100):
+        for v in rng.choice(100, size=3, replace=False):
+            if u == v or g.has_edge(u, v):
+                continue
+            w = rng.uniform(0, 3)
+            g.add_edge(u, v, fault_ids=int(u % 7), weight=w, error_probability=0.1)
+            expected.add_edge(u, v, fault_ids=u % 7, weight=w, error_probability=0.1)
+    m = Matching(g)
+
+    def normalised_edges(matching):
+        return sorted(((min(u, v), max(u, v), d) for u, v, d in matching.edges()), key=lambda e: e[:2])
+
+    assert normalised_edges(m) == normalised_edges(expected)
@@ -203,3 +203,24 @@ def test_load_from_rustworkx_without_rustworkx_raises_type_error():
     except ImportError:
         with pytest.raises(TypeError):
             Matching.load_from_rustworkx("test")
+
+
+def test_load_from_rustworkx_mixed_fault_id_types():
+    rx = pytest.importorskip("rustworkx")
+    g = rx.PyGraph()
+    g.add_nodes_from([{} for _ in range(6)])
+    g.add_edge(0, 1, dict(fault_ids=np.int64(3)))
+    g.add_edge(1, 2, dict(fault_ids=[0, 0, 1]))
+    g.add_edge(2, 3, dict(fault_ids=-1, weight=2.5, error_probability=0.2))
+    g.add_edge(3, 4, dict(qubit_id={4}))
+    g.add_edge(4, 5, {})
+    g[5]['is_boundary'] = True
+    m = Matching(g)
+    assert m.edges() == [
+        (0, 1, {'fault_ids': {3}, 'weight': 1.0, 'error_probability': -1.0}),
+        (1, 2, {'fault_ids': {0, 1}, 'weight': 1.0, 'error_probability': -1.0}),
+        (2, 3, {'fault_ids': set(), 'weight': 2.5, 'error_probability': 0.2}),
+        (3, 4, {'fault_ids': {4}, 'weight': 1.0, 'error_probability': -1.0}),
+        (4, 5, {'fault_ids': set(), 'weight': 1.0, 'error_probability': -1.0})
+    ]
+    assert m.boundary == {5}
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import networkx as nx
+import numpy as np
 import pytest
 
 from pymatching import Matching
@@ -123,3 +124,45 @@ def test_self_loop_to_networkx():
     assert list(g.edges(data=True)) == [(0, 0, {'fault_ids': set(), 'weight': 3.0, 'error_probability': -1.0}),
                                         (1, 1, {'fault_ids': set(), 'weight': 2.0, 'error_probability': -1.0}),
                                         (1, 2, {'fault_ids': set(), 'weight': 1.0, 'error_probability': -1.0})]
+
+
+def test_edges_array_matches_edges():
+    m = Matching()
+    m.add_edge(0, 1, fault_ids={0, 3}, weight=1.5, error_probability=0.1)
+    m.add_boundary_edge(1, fault_ids=2, weight=-2.0)
+    m.add_edge(1, 2, weight=0.0, error_probability=2)
+    m.add_edge(4, 2, fault_ids={1})
+    node1, node2, weights, error_probabilities, fault_ids_indptr, fault_ids_indices = m.edges_array()
+    edges = [
+        (u, None if v == -1 else v,
+         {'fault_ids': set(fault_ids_indices[fault_ids_indptr[i]:fault_ids_indptr[i + 1]].tolist()),
+          'weight': w, 'error_probability': p})
+        for i, (u, v, w, p) in enumerate(zip(node1.tolist(), node2.tolist(), weights, error_probabilities))
+    ]
+    assert edges == m.edges()
+    assert node1.dtype == node2.dtype == fault_ids_indptr.dtype == fault_ids_indices.dtype == np.int64
+
+    empty = Matching().edges_array()
+    assert [a.shape for a in empty] == [(0,), (0,), (0,), (0,), (1,), (0,)]
+
+
+def test_to_scipy_csr():
+    m = Matching()
+    m.add_edge(0, 1, weight=1.5)
+    m.add_edge(2, 1, weight=0.0)
+    m.add_edge(2, 3, weight=2.0)
+    adjacency = m.to_scipy_csr()
+    assert adjacency.shape == (4, 4)
+    assert adjacency.nnz == 6
+    assert adjacency.has_sorted_indices
+    expected = nx.to_scipy_sparse_array(m.to_networkx(), nodelist=range(4), format="csr")
+    assert np.array_equal(adjacency.toarray(), expected.toarray())
+
+    m.add_boundary_edge(3, weight=4.0)
+    m.add_boundary_edge(0, weight=5.0)
+    adjacency = m.to_scipy_csr()
+    assert adjacency.shape == (5, 5)
+    assert (adjacency != adjacency.T).nnz == 0
+    assert adjacency[4, 3] == 4.0 and adjacency[0, 4] == 5.0
+    expected = nx.to_scipy_sparse_array(m.to_networkx(), nodelist=range(5), format="csr")
+    assert np.array_equal(adjacency.toarray(), expected.toarray())
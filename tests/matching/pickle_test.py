@@ -0,0 +1,63 @@
+# Copyright 2022 PyMatching Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import concurrent.futures
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pymatching.matching import Matching
+
+
+def test_pickle_round_trip():
+    m = Matching()
+    m.add_edge(0, 1, fault_ids={0}, weight=1.5, error_probability=0.1)
+    m.add_edge(1, 2, fault_ids={1, 2}, weight=-2, error_probability=0.3)
+    m.add_boundary_edge(2, fault_ids=set(), weight=3)
+    m.add_edge(2, 3, fault_ids={3}, weight=1)
+    m.set_boundary_nodes({3})
+    m.ensure_num_fault_ids(6)
+    m2 = pickle.loads(pickle.dumps(m))
+    assert m2.edges() == m.edges()
+    assert m2.boundary == {3}
+    assert m2.num_fault_ids == 6
+    assert m2.num_nodes == m.num_nodes
+    for syndrome in ([0, 0, 0, 0], [1, 0, 0, 0], [1, 1, 0, 0], [0, 1, 1, 0]):
+        assert np.array_equal(m2.decode(syndrome), m.decode(syndrome))
+
+
+def _decode_batch(m: Matching, shots: np.ndarray, enable_correlations: bool) -> np.ndarray:
+    return m.decode_batch(shots, enable_correlations=enable_correlations)
+
+
+@pytest.mark.parametrize("enable_correlations", [False, True])
+def test_pickled_matching_decodes_in_worker_process(data_dir: Path, enable_correlations: bool):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(data_dir / "surface_code_rotated_memory_x_13_0.01.dem")
+    m = Matching.from_detector_error_model(dem, enable_correlations=enable_correlations)
+    shots = stim.read_shot_data_file(
+        path=str(data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8"),
+        format="b8",
+        num_detectors=dem.num_detectors,
+        num_observables=dem.num_observables,
+    )[:100, :dem.num_detectors]
+    expected = m.decode_batch(shots, enable_correlations=enable_correlations)
+    # The implied weights used for correlated matching are preserved
+    m2 = pickle.loads(pickle.dumps(m))
+    assert np.array_equal(m2.decode_batch(shots, enable_correlations=enable_correlations), expected)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+        predictions = executor.submit(_decode_batch, m, shots, enable_correlations).result()
+    assert np.array_equal(predictions, expected)
@@ -0,0 +1,73 @@
+# Copyright 2022 PyMatching Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pymatching.matching import Matching
+
+
+def test_save_and_load_matching_graph(tmp_path: Path):
+    m = Matching()
+    m.add_edge(0, 1, fault_ids={0}, weight=1.5, error_probability=0.1)
+    m.add_edge(1, 2, fault_ids={1, 2}, weight=-2, error_probability=0.3)
+    m.add_boundary_edge(2, fault_ids=set(), weight=3)
+    m.add_edge(2, 3, fault_ids={3}, weight=1)
+    m.set_boundary_nodes({3})
+    path = tmp_path / "graph.pmg"
+    m.save(path)
+    m2 = Matching.load(str(path))
+    assert m2.edges() == m.edges()
+    assert m2.boundary == {3}
+    assert m2.num_fault_ids == m.num_fault_ids
+    assert m2.num_detectors == m.num_detectors
+    for syndrome in ([0, 0, 0, 0], [1, 0, 0, 0], [1, 1, 0, 0], [0, 1, 1, 0]):
+        assert np.array_equal(m2.decode(syndrome), m.decode(syndrome))
+        assert np.array_equal(m2.decode_to_edges_array(syndrome), m.decode_to_edges_array(syndrome))
+    # The loaded graph can still be modified
+    for g in (m, m2):
+        g.add_edge(0, 4, fault_ids={4}, weight=1)
+    assert m2.num_fault_ids == 5
+    assert np.array_equal(m2.decode([0, 0, 0, 0, 1]), m.decode([0, 0, 0, 0, 1]))
+
+
+@pytest.mark.parametrize("enable_correlations", [False, True])
+def test_save_and_load_detector_error_model(tmp_path: Path, data_dir: Path, enable_correlations: bool):
+    stim = pytest.importorskip("stim")
+    dem = stim.DetectorErrorModel.from_file(data_dir / "surface_code_rotated_memory_x_13_0.01.dem")
+    m = Matching.from_detector_error_model(dem, enable_correlations=enable_correlations)
+    m.save(tmp_path / "graph.pmg")
+    m2 = Matching.load(tmp_path / "graph.pmg")
+    shots = stim.read_shot_data_file(
+        path=str(data_dir / "surface_code_rotated_memory_x_13_0.01_1000_shots.b8"),
+        format="b8",
+        num_detectors=dem.num_detectors,
+        num_observables=dem.num_observables,
+    )[:200, :dem.num_detectors]
+    expected, expected_weights = m.decode_batch(shots, return_weights=True, enable_correlations=enable_correlations)
+    predictions, weights = m2.decode_batch(
+        shots, return_weights=True, enable_correlations=enable_correlations, num_threads=2
+    )
+    assert np.array_equal(predictions, expected)
+    assert np.array_equal(weights, expected_weights)
+
+
+def test_load_invalid_file_raises_value_error(tmp_path: Path):
+    for contents in [b"", b"not a matching graph", b"PMGRAPH\x00" + bytes(8)]:
+        path = tmp_path / "invalid.pmg"
+        path.write_bytes(contents)
+        with pytest.raises(ValueError):
+            Matching.load(path)
@@ -0,0 +1,76 @@
+# Copyright 2022 PyMatching Contributors
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#      http://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import numpy as np
+import pytest
+
+from pymatching import Matching
+
+
+def rebuilt_matching(m: Matching) -> Matching:
+    expected = Matching()
+    for u, v, d in m.edges():
+        if v is None:
+            expected.add_boundary_edge(u, fault_ids=d["fault_ids"], weight=d["weight"])
+        else:
+            expected.add_edge(u, v, fault_ids=d["fault_ids"], weight=d["weight"])
+    expected.set_boundary_nodes(m.boundary)
+    return expected
+
+
+def test_set_edge_weights_and_error_probabilities_match_rebuilt_graph():
+    stim = pytest.importorskip("stim")
+    circuit = stim.Circuit.generated("surface_code:rotated_memory_x", distance=5, rounds=5,
+                                     after_clifford_depolarization=0.005, before_measure_flip_probability=0.005)
+    m = Matching.from_stim_circuit(circuit)
+    shots = circuit.compile_detector_sampler(seed=0).sample(200)
+    m.decode_batch(shots)
+    rng = np.random.default_rng(0)
+    num_edges = m.num_edges
+
+    m.set_error_probabilities(rng.uniform(0.001, 0.1, size=num_edges))
+    assert np.array_equal(m.decode_batch(shots), rebuilt_matching(m).decode_batch(shots))
+    m.set_edge_weights(m.edges_array()[2] * 2)
+    assert np.array_equal(m.decode_batch(shots), rebuilt_matching(m).decode_batch(shots))
+    m.set_edge_weights(np.round(m.edges_array()[2]))
+    assert np.array_equal(m.decode_batch(shots), rebuilt_matching(m).decode_batch(shots))
+    weights = m.edges_array()[2]
+    weights[0] = -1
+    m.set_edge_weights(weights)
+    assert np.array_equal(m.decode_batch(shots), rebuilt_matching(m).decode_batch(shots))
+
+
+def test_set_error_probabilities_sets_weights():
+    m = Matching()
+    m.add_edge(0, 1, weight=1)
+    m.add_edge(1, 2, error_probability=0.2)
+    m.add_boundary_edge(2)
+    m.set_error_probabilities(np.array([0.1, 0.2, 0.3]))
+    _, _, weights, error_probabilities, _, _ = m.edges_array()
+    assert np.allclose(weights, np.log((1 - error_probabilities) / error_probabilities))
+    assert np.array_equal(error_probabilities, [0.1, 0.2, 0.3])
+    assert m.decode([1, 0, 0]).tolist() == []
+
+
+def test_set_edge_weights_invalid_arguments_raise_value_error():
+    m = Matching()
+    m.add_edge(0, 1)
+    m.add_boundary_edge(1)
+    for weights in [[1], [1, 2, 3], [[1, 2]], [1, np.nan], [1, 2 ** 25]]:
+        with pytest.raises(ValueError):
+            m.set_edge_weights(weights)
+    for error_probabilities in [[0.1], [0.1, 0], [0.1, 1], [0.1, -0.5], [[0.1, 0.2]]]:
+        with pytest.raises(ValueError):
+            m.set_error_probabilities(error_probabilities)
+    assert m.edges_array()[2].tolist() == [1, 1]